@@ -1,8 +1,12 @@
 import sys
 import os
-from PyQt5.QtCore import Qt, QTimer
+import queue
+import threading
+import time
+from collections import Counter, deque
+from PyQt5.QtCore import Qt, QTimer, QThread, pyqtSignal
 from PyQt5.QtWidgets import QApplication, QMainWindow, QLabel, QVBoxLayout, QWidget, QPushButton, QHBoxLayout, \
-    QFileDialog, QMessageBox
+    QFileDialog, QMessageBox, QProgressBar
 from PyQt5.QtGui import QImage, QPixmap, QIcon
 import cv2
 from ultralytics import YOLO
@@ -44,6 +48,160 @@ class Worker:
                 cv2.imwrite(file_name, image)
 
 
+def put_latest(q, item):
+    # 有界队列满时丢弃最旧的元素 (drop-oldest), 返回是否丢弃了元素
+    dropped = False
+    while True:
+        try:
+            q.put_nowait(item)
+            return dropped
+        except queue.Full:
+            try:
+                q.get_nowait()
+                dropped = True
+            except queue.Empty:
+                pass
+
+
+class VideoPipeline:
+    """
+    视频检测流水线: 解码线程 -> 推理线程 -> UI 渲染.
+
+    解码线程按视频帧率读帧, 推理线程把已排队的帧凑成 batch 送入 predict(stream=True), UI 定时器只渲染最新的结果.
+    各级之间是 drop-oldest 的有界队列, 推理跟不上时丢弃旧帧而不是阻塞 Qt 主线程.
+    """
+
+    def __init__(self, model, source, batch=4, queue_size=8):
+        self.model = model
+        self.batch = batch
+        self.cap = cv2.VideoCapture(source)
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 30
+        self.frames = queue.Queue(maxsize=queue_size)  # 解码 -> 推理
+        self.results = queue.Queue(maxsize=2)  # 推理 -> 渲染
+        self.stop_event = threading.Event()
+        self.done = threading.Event()  # 推理线程已结束, 不会再有新结果
+        self.stats = {k: deque(maxlen=30) for k in ("decode", "infer", "render", "latency")}  # 最近 30 帧各阶段耗时
+        self.shown = deque(maxlen=30)  # 最近 30 次渲染的时间点, 用于计算 FPS
+        self.dropped_frames = 0  # 解码线程丢弃的帧, 只由解码线程修改
+        self.dropped_results = 0  # 推理线程丢弃的结果, 只由推理线程修改
+        self.threads = [threading.Thread(target=self.decode, daemon=True), threading.Thread(target=self.infer, daemon=True)]
+
+    def start(self):
+        if not self.cap.isOpened():
+            return False
+        for t in self.threads:
+            t.start()
+        return True
+
+    @property
+    def dropped(self):
+        return self.dropped_frames + self.dropped_results
+
+    def stop(self):
+        self.stop_event.set()
+        put_latest(self.frames, None)  # 唤醒等待中的推理线程
+        for t in self.threads:
+            if t.is_alive():
+                t.join(timeout=1)
+        if not self.threads[0].is_alive():  # 解码线程仍卡在 cap.read() 时由它退出时释放, 不能在读帧过程中 release
+            self.cap.release()
+
+    def decode(self):
+        interval, next_t = 1 / self.fps, time.perf_counter()
+        try:
+            while not self.stop_event.is_set():
+                t0 = time.perf_counter()
+                ret, frame = self.cap.read()
+                if not ret:
+                    break
+                self.stats["decode"].append(time.perf_counter() - t0)
+                self.dropped_frames += put_latest(self.frames, (t0, frame))
+                next_t = max(next_t + interval, time.perf_counter() - interval)  # 按视频原始帧率送帧
+                time.sleep(max(0.0, next_t - time.perf_counter()))
+        finally:
+            self.cap.release()
+        put_latest(self.frames, None)  # 视频结束
+
+    def infer(self):
+        end = False
+        while not end and not self.stop_event.is_set():
+            items = [self.frames.get()]
+            while len(items) < self.batch:  # 取出已排队的帧组成一个 batch, 不等待新帧
+                try:
+                    items.append(self.frames.get_nowait())
+                except queue.Empty:
+                    break
+            end = any(x is None for x in items)
+            items = [x for x in items if x is not None]
+            if not items or self.stop_event.is_set():
+                continue
+            t0 = time.perf_counter()
+            results = self.model.predict([frame for _, frame in items], stream=True, verbose=False)
+            for (t_read, frame), result in zip(items, results):
+                self.dropped_results += put_latest(self.results, (t_read, frame, result))
+            self.stats["infer"].append((time.perf_counter() - t0) / len(items))
+        self.done.set()
+
+    def latest(self):
+        # 只取最新的一个结果, 其余的直接丢弃
+        item = None
+        while True:
+            try:
+                item = self.results.get_nowait()
+            except queue.Empty:
+                return item
+
+    def finished(self):
+        return self.done.is_set() and self.results.empty()
+
+    def summary(self):
+        ms = {k: 1000 * sum(v) / len(v) if v else 0.0 for k, v in self.stats.items()}
+        fps = (len(self.shown) - 1) / (self.shown[-1] - self.shown[0]) if len(self.shown) > 1 and self.shown[-1] > self.shown[0] else 0.0
+        return (f"FPS {fps:.1f} | 解码 {ms['decode']:.1f}ms | 推理 {ms['infer']:.1f}ms/帧 | 渲染 {ms['render']:.1f}ms | "
+                f"端到端延迟 {ms['latency']:.0f}ms | 丢帧 {self.dropped}")
+
+
+class FolderDetector(QThread):
+    """
+    文件夹检测线程: 所有图片通过一次 predict(source=paths, stream=True, batch=N) 流式处理.
+
+    每张图只读取一次, 结果边处理边汇总 (类别计数), 不在内存中保留所有 Results. 预览图按时间间隔节流后发给 UI.
+    图片由 decode_workers 个线程提前解码 (最多提前 read_ahead 张), 解码与推理重叠.
+    """
+
+    progress = pyqtSignal(int, int)  # 已完成, 总数
+    preview = pyqtSignal(object, object)  # 原图, 标注图 (BGR numpy)
+    done = pyqtSignal(object, int, float)  # 类别计数, 图片数, 耗时(秒)
+
+    def __init__(self, model, image_paths, batch=8, preview_interval=0.2, decode_workers=4, read_ahead=0):
+        super().__init__()
+        self.model = model
+        self.image_paths = image_paths
+        self.batch = batch
+        self.decode_workers = decode_workers
+        self.read_ahead = read_ahead  # 0: 提前两个 batch
+        self.preview_interval = preview_interval
+        self.stopped = False
+
+    def run(self):
+        counts, n, last_preview = Counter(), 0, 0.0
+        t0 = time.perf_counter()
+        results = self.model.predict(source=self.image_paths, stream=True, batch=self.batch, save=True, verbose=False,
+                                     decode_workers=self.decode_workers, read_ahead=self.read_ahead)
+        for result in results:
+            if self.stopped:
+                break
+            boxes = result.obb if result.obb is not None else result.boxes
+            if boxes is not None:
+                counts.update(result.names[int(c)] for c in boxes.cls.tolist())
+            n += 1
+            self.progress.emit(n, len(self.image_paths))
+            if time.perf_counter() - last_preview > self.preview_interval or n == len(self.image_paths):
+                last_preview = time.perf_counter()
+                self.preview.emit(result.orig_img, result.plot())
+        self.done.emit(counts, n, time.perf_counter() - t0)
+
+
 class MainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
@@ -113,13 +271,21 @@ class MainWindow(QMainWindow):
         hbox_buttons.addWidget(self.exit_button)
 
         layout.addLayout(hbox_buttons)
+
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setVisible(False)
+        layout.addWidget(self.progress_bar)
+
         central_widget = QWidget()
         central_widget.setLayout(layout)
         self.setCentralWidget(central_widget)
 
         self.timer = QTimer(self)
         self.timer.timeout.connect(self.update_frame)
-        self.cap = None
+        self.pipeline = None
+        self.folder_detector = None
+        self.folder_counts = None
+        self.folder_batch = 8  # 文件夹检测的 batch 大小
 
     def save_detection(self):
         detection_type = self.worker.detection_type
@@ -128,98 +294,128 @@ class MainWindow(QMainWindow):
 
     def select_image(self):
         image_path, _ = QFileDialog.getOpenFileName(None, "选择图片文件", "", "图片文件 (*.jpg *.jpeg *.png)")
-        self.flag = 0
         if image_path:
             self.detect_image(image_path)
 
     def detect_folder(self):
         folder_path = QFileDialog.getExistingDirectory(self, "选择图片文件夹")
-        self.flag = 1
         if folder_path:
             image_paths = []
             for filename in os.listdir(folder_path):
                 if filename.lower().endswith((".jpg", ".jpeg", ".png")):
                     image_path = os.path.join(folder_path, filename)
                     image_paths.append(image_path)
-            for image_path in image_paths:
-                self.detect_image(image_path)
+            if image_paths:
+                self.start_folder_detection(image_paths)
+
+    def start_folder_detection(self, image_paths):
+        self.stop_video()
+        self.worker.detection_type = "folder"
+        self.folder_counts = Counter()
+        self.set_detect_buttons_enabled(False)
+        self.progress_bar.setRange(0, len(image_paths))
+        self.progress_bar.setValue(0)
+        self.progress_bar.setVisible(True)
+        self.folder_detector = FolderDetector(self.worker.model, image_paths, batch=self.folder_batch)
+        self.folder_detector.progress.connect(self.on_folder_progress)
+        self.folder_detector.preview.connect(self.on_folder_preview)
+        self.folder_detector.done.connect(self.on_folder_done)
+        self.folder_detector.start()
+
+    def on_folder_progress(self, n, total):
+        self.progress_bar.setValue(n)
+        self.statusBar().showMessage(f"文件夹检测 {n}/{total}")
+
+    def on_folder_preview(self, image, annotated_image):
+        self.show_image(self.label1, image)
+        self.show_image(self.label2, annotated_image)
+
+    def on_folder_done(self, counts, n, elapsed):
+        self.folder_counts = counts
+        self.folder_detector = None
+        self.progress_bar.setVisible(False)
+        self.set_detect_buttons_enabled(True)
+        self.statusBar().showMessage(f"文件夹检测完成: {n} 张图片, 耗时 {elapsed:.1f}s, {n / max(elapsed, 1e-6):.1f} 张/秒")
+
+    def stop_folder_detection(self):
+        if self.folder_detector is not None:
+            self.folder_detector.stopped = True
+            self.folder_detector.wait()
+
+    def set_detect_buttons_enabled(self, enabled):
+        self.image_detect_button.setEnabled(enabled)
+        self.folder_detect_button.setEnabled(enabled)
+        self.video_detect_button.setEnabled(enabled)
 
     def select_video(self):
         video_path, _ = QFileDialog.getOpenFileName(None, "选择视频文件", "", "视频文件 (*.mp4 *.avi)")
         if video_path:
-            self.cap = cv2.VideoCapture(video_path)
-            if self.cap.isOpened():
-                self.timer.start(30)  # 每30毫秒更新一帧
+            self.stop_video()
+            self.pipeline = VideoPipeline(self.worker.model, video_path)
+            if self.pipeline.start():
+                self.worker.detection_type = "video"
+                self.timer.start(10)  # 只负责渲染, 解码和推理在后台线程
+
+    def stop_video(self):
+        self.timer.stop()
+        if self.pipeline is not None:
+            self.pipeline.stop()
+            self.pipeline = None
 
     def update_frame(self):
-        ret, frame = self.cap.read()
-        if ret:
-            results = self.worker.model.predict(frame)
-            self.worker.detection_type = "video"
-            if results:
-                self.current_results = results
-                annotated_frame = results[0].plot()
-                frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                height1, width1, channel1 = frame_rgb.shape
-                bytesPerLine1 = 3 * width1
-                qimage1 = QImage(frame_rgb.data, width1, height1, bytesPerLine1, QImage.Format_RGB888)
-                pixmap1 = QPixmap.fromImage(qimage1)
-                self.label1.setPixmap(pixmap1.scaled(self.label1.size(), Qt.KeepAspectRatio))
-
-                annotated_frame = cv2.cvtColor(annotated_frame, cv2.COLOR_BGR2RGB)
-                height2, width2, channel2 = annotated_frame.shape
-                bytesPerLine2 = 3 * width2
-                qimage2 = QImage(annotated_frame.data, width2, height2, bytesPerLine2, QImage.Format_RGB888)
-                pixmap2 = QPixmap.fromImage(qimage2)
-                self.label2.setPixmap(pixmap2.scaled(self.label2.size(), Qt.KeepAspectRatio))
-        else:
-            self.timer.stop()
-            self.cap.release()
+        item = self.pipeline.latest()
+        if item is None:
+            if self.pipeline.finished():
+                self.statusBar().showMessage(f"视频检测结束 | {self.pipeline.summary()}")
+                self.stop_video()
+            return
+        t_read, frame, result = item
+        t0 = time.perf_counter()
+        self.current_results = [result]
+        self.show_image(self.label1, frame)
+        self.show_image(self.label2, result.plot())
+        now = time.perf_counter()
+        self.pipeline.stats["render"].append(now - t0)
+        self.pipeline.stats["latency"].append(now - t_read)
+        self.pipeline.shown.append(now)
+        self.statusBar().showMessage(self.pipeline.summary())
+
+    def show_image(self, label, image):
+        # BGR numpy 图像 -> QPixmap, 按 label 大小等比例缩放
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        height, width, channel = image.shape
+        qimage = QImage(image.data, width, height, 3 * width, QImage.Format_RGB888)
+        label.setPixmap(QPixmap.fromImage(qimage).scaled(label.size(), Qt.KeepAspectRatio))
 
     def detect_image(self, image_path):
         if image_path:
+            self.stop_video()
             image = cv2.imread(image_path)
             if image is not None:
-                if self.flag == 0:
-                    results = self.worker.model.predict(image)
-                elif self.flag == 1:
-                    results = self.worker.model.predict(image_path, save=True)
+                results = self.worker.model.predict(image)
                 self.worker.detection_type = "image"
                 if results:
                     self.current_results = results
                     self.worker.current_annotated_image = results[0].plot()
-                    annotated_image = self.worker.current_annotated_image
-                    image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-                    height1, width1, channel1 = image_rgb.shape
-                    bytesPerLine1 = 3 * width1
-                    qimage1 = QImage(image_rgb.data, width1, height1, bytesPerLine1, QImage.Format_RGB888)
-                    pixmap1 = QPixmap.fromImage(qimage1)
-                    self.label1.setPixmap(pixmap1.scaled(self.label1.size(), Qt.KeepAspectRatio))
-                    annotated_image = cv2.cvtColor(annotated_image, cv2.COLOR_BGR2RGB)
-                    height2, width2, channel2 = annotated_image.shape
-                    bytesPerLine2 = 3 * width2
-                    qimage2 = QImage(annotated_image.data, width2, height2, bytesPerLine2, QImage.Format_RGB888)
-                    pixmap2 = QPixmap.fromImage(qimage2)
-                    self.label2.setPixmap(pixmap2.scaled(self.label2.size(), Qt.KeepAspectRatio))
+                    self.show_image(self.label1, image)
+                    self.show_image(self.label2, self.worker.current_annotated_image)
                     self.save_button.setEnabled(True)
-            cv2.waitKey(300)
 
     def save_detection_results(self):
         if self.worker.current_annotated_image is not None:
             self.worker.save_image(self.worker.current_annotated_image)
 
     def show_detected_objects(self):
-        if hasattr(self, 'current_results') and self.current_results:
-            det_info = self.worker.detect_objects(self.current_results)
-            if det_info:
-                object_count = len(det_info)
+        if self.worker.detection_type == "folder" and self.folder_counts is not None:
+            object_dict = self.folder_counts  # 文件夹检测时已边检测边汇总
+        elif hasattr(self, 'current_results') and self.current_results:
+            object_dict = Counter(self.worker.detect_objects(self.current_results))
+        else:
+            object_dict = None
+        if object_dict is not None:
+            if object_dict:
+                object_count = sum(object_dict.values())
                 object_info = f"识别到的物体总个数：{object_count}\n"
-                object_dict = {}
-                for obj in det_info:
-                    if obj in object_dict:
-                        object_dict[obj] += 1
-                    else:
-                        object_dict[obj] = 1
                 sorted_objects = sorted(object_dict.items(), key=lambda x: x[1], reverse=True)
                 for obj_name, obj_count in sorted_objects:
                     object_info += f"{obj_name}: {obj_count}\n"
@@ -243,10 +439,15 @@ class MainWindow(QMainWindow):
             self.display_objects_button.setEnabled(True)
 
     def exit_application(self):
-        if self.cap is not None and self.cap.isOpened():
-            self.cap.release()
+        self.stop_video()
+        self.stop_folder_detection()
         sys.exit()
 
+    def closeEvent(self, event):
+        self.stop_video()
+        self.stop_folder_detection()
+        super().closeEvent(event)
+
 
 if __name__ == '__main__':
     app = QApplication(sys.argv)
@@ -1,10 +1,17 @@
+import bisect
 import os
+import queue
+import threading
 import cv2
 import random
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
 from tqdm import tqdm
+from ultralytics.data.utils import exif_size
 
-def create_natural_scrolling_video(dataset_path, output_video_path, max_images=100, resolution=(1280, 720), speed_factor=1.0):
+def create_natural_scrolling_video(dataset_path, output_video_path, max_images=100, resolution=(1280, 720), speed_factor=1.0,
+                                   prefetch=4, workers=4, async_write=True):
     """
     创建自然的从左往右滚动显示图片的视频，限制最多使用100张图片
     
@@ -14,6 +21,9 @@ def create_natural_scrolling_video(dataset_path, output_video_path, max_images=1
         max_images: 最多使用的图片数量
         resolution: 视频的分辨率
         speed_factor: 速度因子，1.0表示正常速度
+        prefetch: 沿滚动方向提前解码的图片数量
+        workers: 解码图片的线程数
+        async_write: 是否在单独线程中写入视频帧
     """
     # 确保输出目录存在
     output_dir = os.path.dirname(output_video_path)
@@ -49,52 +59,28 @@ def create_natural_scrolling_video(dataset_path, output_video_path, max_images=1
     # 设置滚动速度（像素/帧）
     scroll_speed = 2  # 每帧移动的像素数，可以调整以改变滚动速度
     
-    # 预加载所有图像并调整大小
-    print("预加载图像...")
-    processed_images = []
-    for image_path in tqdm(image_files):
-        try:
-            img = cv2.imread(image_path)
-            if img is None:
-                print(f"无法读取图像: {image_path}")
-                continue
-            
-            # 调整图像大小，保持原始宽高比
-            h, w = img.shape[:2]
-            scale = resolution[1] / h
-            new_w = int(w * scale)
-            img_resized = cv2.resize(img, (new_w, resolution[1]))
-            
-            processed_images.append(img_resized)
-        except Exception as e:
-            print(f"处理图像 {image_path} 时出错: {e}")
+    # 只读取文件头获得尺寸 (不解码像素), 计算每张图缩放后在长画布上的位置
+    layout = scan_image_layout(image_files, resolution[1])
     
     # 如果图像不足，复制已有图像
-    if len(processed_images) < 10:  # 确保至少有10张图片用于滚动
-        processed_images = processed_images * (10 // len(processed_images) + 1)
-    
-    print(f"实际处理了 {len(processed_images)} 张照片")
+    if 0 < len(layout) < 10:  # 确保至少有10张图片用于滚动
+        layout = layout * (10 // len(layout) + 1)
+    if not layout:
+        print("没有可用的图片")
+        return
     
-    # 计算所有图像的总宽度
-    total_width = sum(img.shape[1] for img in processed_images)
+    print(f"实际处理了 {len(layout)} 张照片")
     
-    # 创建一个足够长的画布来容纳所有图像
+    # 计算所有图像的总宽度, 长画布 = 所有图像 + 末尾一屏黑色 (不再真正分配这块内存)
+    offsets = np.cumsum([0] + [w for _, w in layout]).tolist()
+    total_width = offsets[-1]
     long_canvas_width = total_width + resolution[0]
-    long_canvas = np.zeros((resolution[1], long_canvas_width, 3), dtype=np.uint8)
-    
-    # 将所有图像放置在长画布上
-    current_x = 0
-    for img in processed_images:
-        h, w = img.shape[:2]
-        # 确保不会超出画布边界
-        if current_x + w <= long_canvas_width:
-            long_canvas[:, current_x:current_x+w] = img
-            current_x += w
     
     # 计算需要多少帧来完成整个滚动
     total_scroll_frames = (long_canvas_width - resolution[0]) // scroll_speed
     
     # 调整滚动速度以适应一分钟的视频长度
+    repeat_times = 1
     if total_scroll_frames < total_frames_needed:
         # 减慢滚动速度以填满一分钟
         new_scroll_speed = max(1, (long_canvas_width - resolution[0]) // total_frames_needed)
@@ -107,7 +93,6 @@ def create_natural_scrolling_video(dataset_path, output_video_path, max_images=1
             repeat_times = total_frames_needed // total_scroll_frames + 1
             print(f"滚动将重复 {repeat_times} 次以达到一分钟")
     else:
-        repeat_times = 1
         # 如果帧数过多，增加滚动速度
         if total_scroll_frames > total_frames_needed:
             scroll_speed = (long_canvas_width - resolution[0]) // total_frames_needed + 1
@@ -124,29 +109,20 @@ def create_natural_scrolling_video(dataset_path, output_video_path, max_images=1
     except Exception as e:
         print(f"创建视频写入器时出错: {e}")
         return
+    writer = AsyncWriter(video_writer) if async_write else video_writer
     
     # 创建滚动效果
     print("正在创建自然滚动效果视频...")
     frame_count = 0
+    current_pos = 0
+    canvas = StreamingCanvas(layout, offsets, resolution, prefetch=prefetch, workers=workers)
     
     try:
         for _ in range(repeat_times):
             current_pos = 0
             while current_pos + resolution[0] <= long_canvas_width and frame_count < total_frames_needed:
-                # 从长画布中截取当前视图
-                frame = long_canvas[:, current_pos:current_pos + resolution[0]].copy()
-                
-                # 确保帧的尺寸正确
-                if frame.shape[1] != resolution[0] or frame.shape[0] != resolution[1]:
-                    # 调整帧大小以匹配分辨率
-                    frame = cv2.resize(frame, resolution)
-                
-                # 确保帧是BGR格式，而不是BGRA
-                if frame.shape[2] > 3:
-                    frame = frame[:, :, :3]
-                
-                # 写入视频帧
-                video_writer.write(frame)
+                # 只用与当前视口相交的图片拼出这一帧
+                writer.write(canvas.frame(current_pos))
                 frame_count += 1
                 
                 # 移动位置
@@ -154,7 +130,7 @@ def create_natural_scrolling_video(dataset_path, output_video_path, max_images=1
                 
                 # 显示进度
                 if frame_count % 100 == 0:
-                    print(f"已生成 {frame_count}/{total_frames_needed} 帧")
+                    print(f"已生成 {frame_count}/{total_frames_needed} 帧, 缓存 {len(canvas.cache)} 张图片")
         
         # 如果还不足一分钟，添加静态帧
         if frame_count < total_frames_needed:
@@ -163,26 +139,109 @@ def create_natural_scrolling_video(dataset_path, output_video_path, max_images=1
             
             # 使用最后一帧作为静态帧
             last_pos = min(long_canvas_width - resolution[0], current_pos)
-            last_frame = long_canvas[:, last_pos:last_pos + resolution[0]].copy()
-            
-            # 确保帧的尺寸正确
-            if last_frame.shape[1] != resolution[0] or last_frame.shape[0] != resolution[1]:
-                last_frame = cv2.resize(last_frame, resolution)
-            
-            # 确保帧是BGR格式
-            if last_frame.shape[2] > 3:
-                last_frame = last_frame[:, :, :3]
+            last_frame = canvas.frame(last_pos)
             
             for _ in range(remaining_frames):
-                video_writer.write(last_frame)
+                writer.write(last_frame)
     
     except Exception as e:
         print(f"生成视频帧时出错: {e}")
     finally:
         # 确保视频写入器被正确释放
-        video_writer.release()
+        canvas.close()
+        writer.release()
         print(f"视频已保存到: {output_video_path}")
 
+
+def scan_image_layout(image_files, height):
+    """只读取图片文件头得到 (路径, 缩放到 height 高度后的宽度), 跳过无法读取或缩放后宽度为 0 的图片."""
+    layout = []
+    for image_path in tqdm(image_files, desc="读取图片尺寸"):
+        try:
+            with Image.open(image_path) as im:
+                w, h = exif_size(im)  # cv2.imread 会按 EXIF 旋转, 尺寸保持一致
+        except Exception as e:
+            print(f"无法读取图像: {image_path} ({e})")
+            continue
+        w = int(w * height / h)
+        if w < 1 or not cv2.haveImageReader(image_path):  # cv2.resize 无法缩放到宽度 0 / OpenCV 不支持该格式
+            print(f"跳过图像: {image_path} (缩放后宽度 {w})" if w < 1 else f"OpenCV 无法读取图像: {image_path}")
+            continue
+        layout.append((image_path, w))
+    return layout
+
+
+class StreamingCanvas:
+    """
+    流式的"长画布": 不再把所有图片拼成一个巨大数组, 只缓存与视口相交的图片 (环形缓冲).
+
+    图片在线程池中按滚动方向提前 prefetch 张解码缩放, 滚出视口的图片立即释放, 内存与图片总数无关.
+    """
+
+    def __init__(self, layout, offsets, resolution, prefetch=4, workers=4):
+        self.layout = layout
+        self.offsets = offsets
+        self.width, self.height = resolution
+        self.prefetch = prefetch
+        self.pool = ThreadPoolExecutor(workers)
+        self.cache = {}  # 图片序号 -> Future(缩放后的图片)
+
+    def load(self, i):
+        """解码并缩放第 i 张图片, 文件头正常但内容损坏的图片在 layout 中已占位, 用黑色填充并给出警告."""
+        image_path, w = self.layout[i]
+        try:
+            img = cv2.imread(image_path)
+            if img is not None:
+                # 调整图像大小，保持原始宽高比
+                return cv2.resize(img, (w, self.height))[..., :3]
+            print(f"无法读取图像: {image_path}")
+        except cv2.error as e:
+            print(f"处理图像 {image_path} 时出错: {e}")
+        return np.zeros((self.height, w, 3), dtype=np.uint8)
+
+    def frame(self, pos):
+        # 与视口 [pos, pos + width) 相交的图片序号范围 [first, last)
+        first = max(bisect.bisect_right(self.offsets, pos) - 1, 0)
+        last = min(bisect.bisect_left(self.offsets, pos + self.width), len(self.layout))
+        for i in [i for i in self.cache if i < first]:
+            del self.cache[i]  # 已滚出视口
+        for i in range(first, min(last + self.prefetch, len(self.layout))):
+            if i not in self.cache:
+                self.cache[i] = self.pool.submit(self.load, i)
+
+        frame = np.zeros((self.height, self.width, 3), dtype=np.uint8)  # 画布末尾为黑色
+        for i in range(first, last):
+            x0, x1 = max(self.offsets[i], pos), min(self.offsets[i + 1], pos + self.width)
+            if x1 > x0:
+                frame[:, x0 - pos:x1 - pos] = self.cache[i].result()[:, x0 - self.offsets[i]:x1 - self.offsets[i]]
+        return frame
+
+    def close(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
+        self.cache.clear()
+
+
+class AsyncWriter:
+    """在单独线程中编码写入视频帧, 队列有上限, 生成速度过快时阻塞而不是堆积内存."""
+
+    def __init__(self, video_writer, maxsize=32):
+        self.video_writer = video_writer
+        self.queue = queue.Queue(maxsize)
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        while (frame := self.queue.get()) is not None:
+            self.video_writer.write(frame)
+
+    def write(self, frame):
+        self.queue.put(frame)
+
+    def release(self):
+        self.queue.put(None)
+        self.thread.join()
+        self.video_writer.release()
+
 if __name__ == "__main__":
     # 设置参数
     dataset_path = r"E:\Yolo\Pidray\test"  # PIDay数据集路径
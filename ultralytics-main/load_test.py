@@ -0,0 +1,65 @@
+# load_test.py
+# website.py 检测服务压测: 多个并发客户端持续发送图片, 统计 p50/p99 延迟和每秒请求数
+#   python website.py --model best.pt
+#   python load_test.py --image test.jpg --concurrency 16 --requests 400
+import argparse
+import threading
+import time
+
+import numpy as np
+import requests
+
+
+def worker(url, data, annotate, n, latencies, errors, lock):
+    session = requests.Session()
+    for _ in range(n):
+        t0 = time.perf_counter()
+        try:
+            r = session.post(url, files={'image_file': ('image.jpg', data)}, data={'annotate': annotate})
+            ok = r.status_code == 200
+        except requests.RequestException:
+            ok = False
+        dt = time.perf_counter() - t0
+        with lock:
+            if ok:
+                latencies.append(dt)
+            else:
+                errors.append(dt)
+
+
+def run(url, data, concurrency, total, annotate=0):
+    latencies, errors, lock = [], [], threading.Lock()
+    per_thread = [total // concurrency + (i < total % concurrency) for i in range(concurrency)]
+    threads = [threading.Thread(target=worker, args=(url, data, annotate, n, latencies, errors, lock))
+               for n in per_thread]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - t0
+    ms = np.array(latencies) * 1000 if latencies else np.zeros(1)
+    return {'concurrency': concurrency, 'requests': len(latencies), 'errors': len(errors),
+            'p50': float(np.percentile(ms, 50)), 'p99': float(np.percentile(ms, 99)),
+            'rps': len(latencies) / elapsed}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--url', default='http://127.0.0.1:5000')
+    parser.add_argument('--image', required=True, help='测试图片')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 16], help='并发客户端数, 可给多个')
+    parser.add_argument('--requests', type=int, default=200, help='每个并发设置的总请求数')
+    parser.add_argument('--warmup', type=int, default=5)
+    parser.add_argument('--annotate', action='store_true', help='同时请求标注图片')
+    opt = parser.parse_args()
+
+    url = opt.url.rstrip('/') + '/api/predict'
+    with open(opt.image, 'rb') as f:
+        data = f.read()
+    run(url, data, 1, opt.warmup)  # 预热, 不计入统计
+    for c in opt.concurrency:
+        s = run(url, data, c, opt.requests, int(opt.annotate))
+        print(f"并发 {s['concurrency']:>3} | 成功 {s['requests']} 失败 {s['errors']} | "
+              f"p50 {s['p50']:.1f}ms p99 {s['p99']:.1f}ms | {s['rps']:.1f} req/s")
+    print(requests.get(opt.url.rstrip('/') + '/api/stats').json())
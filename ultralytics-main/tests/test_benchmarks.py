@@ -0,0 +1,525 @@
+# Ultralytics YOLO 🚀, AGPL-3.0 license
+"""Micro-benchmarks of optimized training and inference code paths against their reference implementations."""
+
+import math
+from pathlib import Path
+
+import pytest
+import torch
+
+from tests import CUDA_IS_AVAILABLE
+from tests.test_engine import tile_model, tile_predict_reference
+from tests.test_python import (
+    ap_inputs,
+    ap_per_class_reference,
+    apply_segments_reference,
+    bbox_iof_reference,
+    bg_loss_inputs,
+    bg_loss_reference,
+    collate_reference,
+    collate_samples,
+    crowded_segments,
+    detect_predictions,
+    dota_dataset,
+    edge_loss_reference,
+    frame_video,
+    image_dataset,
+    image_folder,
+    label_dicts,
+    nms_rotated_reference,
+    non_max_suppression_reference,
+    obb_edge_inputs,
+    resample_segments_reference,
+    rotated_candidates,
+    select_candidates_in_rotated_gts_reference,
+    xray_scene,
+)
+from ultralytics.utils import LOGGER
+from ultralytics.utils.torch_utils import time_sync
+
+DEVICE = "cuda" if CUDA_IS_AVAILABLE else "cpu"
+
+
+def benchmark(fn, n=10, warmup=2):
+    """Return the mean wall time of `fn()` in milliseconds over `n` timed runs after `warmup` untimed runs."""
+    for _ in range(warmup):
+        fn()
+    t = time_sync()
+    for _ in range(n):
+        fn()
+    return (time_sync() - t) / n * 1e3
+
+
+def peak_memory(fn):
+    """Return the peak CUDA memory in MB allocated by `fn()`, or the total CPU memory allocated when CUDA is absent."""
+    if torch.cuda.is_available():
+        torch.cuda.synchronize()
+        base = torch.cuda.memory_allocated()
+        torch.cuda.reset_peak_memory_stats()
+        fn()
+        return (torch.cuda.max_memory_allocated() - base) / 1e6
+    with torch.profiler.profile(activities=[torch.profiler.ProfilerActivity.CPU], profile_memory=True) as prof:
+        fn()
+    return sum(max(e.self_cpu_memory_usage, 0) for e in prof.events()) / 1e6
+
+
+@pytest.mark.slow
+def test_obb_edge_loss_benchmark():
+    """Benchmark per-iteration time of the batched AcceleratedOBBEdgeLoss against the per-box reference."""
+    from ultralytics.utils.loss import AcceleratedOBBEdgeLoss
+
+    images, boxes, scores = obb_edge_inputs(b=16, n=8400, imgsz=640, device=DEVICE)
+    loss_fn = AcceleratedOBBEdgeLoss().to(DEVICE)
+    t_ref = benchmark(lambda: edge_loss_reference(loss_fn, images, boxes, scores), n=2, warmup=1)
+    t_new = benchmark(lambda: loss_fn(images, boxes, scores))
+    t_sobel = benchmark(lambda: loss_fn.edge_map(images))
+    LOGGER.info(
+        f"AcceleratedOBBEdgeLoss: loop {t_ref:.1f}ms, batched {t_new:.1f}ms per iteration "
+        f"(Sobel edge map {t_sobel:.1f}ms of each)"
+    )
+
+
+@pytest.mark.slow
+def test_bg_sensitive_loss_benchmark():
+    """Benchmark time and memory of the fused BackgroundSensitiveLoss against the dense formulation at nc=12."""
+    from ultralytics.utils.loss import BackgroundSensitiveLoss
+
+    loss_fn = BackgroundSensitiveLoss()
+    pred_scores, pred_bboxes, target_scores, target_bboxes, fg_mask = bg_loss_inputs(device=DEVICE)
+    bce_fn = torch.nn.functional.binary_cross_entropy_with_logits
+    bce = bce_fn(pred_scores, target_scores, reduction="none")  # already computed by v8OBBLoss
+
+    def dense():
+        bce_fn(pred_scores, target_scores, reduction="none").sum()  # main classification loss
+        bg_loss_reference(loss_fn, pred_scores, pred_bboxes, target_scores, target_bboxes, fg_mask).backward()
+
+    def fused():
+        bce = bce_fn(pred_scores, target_scores, reduction="none")
+        bce.sum()  # main classification loss
+        loss_fn(bce, target_scores, pred_bboxes, target_bboxes, fg_mask).backward()
+
+    with torch.no_grad():
+        t_dense = benchmark(
+            lambda: bg_loss_reference(loss_fn, pred_scores, pred_bboxes, target_scores, target_bboxes, fg_mask)
+        )
+        t_fused = benchmark(lambda: loss_fn(bce, target_scores, pred_bboxes, target_bboxes, fg_mask))
+    LOGGER.info(
+        f"BackgroundSensitiveLoss forward: dense {t_dense:.1f}ms, fused {t_fused:.1f}ms | "
+        f"forward+backward incl. main BCE: dense {benchmark(dense):.1f}ms {peak_memory(dense):.0f}MB, "
+        f"fused {benchmark(fused):.1f}ms {peak_memory(fused):.0f}MB"
+    )
+
+
+@pytest.mark.slow
+def test_ap_per_class_benchmark():
+    """Benchmark ap_per_class with the per-class loop and with the batched curves on CPU and the validation device."""
+    import numpy as np
+
+    from ultralytics.utils.metrics import ap_curves_batched
+
+    x = np.linspace(0, 1, 1000)
+    for nc in (12, 80):
+        tp, conf, pred_cls, target_cls = stats = ap_inputs(n=300_000, nc=nc)
+        curves = (tp, conf, pred_cls, *np.unique(target_cls, return_counts=True), x)
+        t_loop = benchmark(lambda stats=stats: ap_per_class_reference(*stats), n=3, warmup=1)
+        t_cpu = benchmark(lambda curves=curves: ap_curves_batched(*curves, device="cpu"), n=3, warmup=1)
+        t_dev = benchmark(lambda curves=curves: ap_curves_batched(*curves, device=DEVICE), n=3, warmup=1)
+        LOGGER.info(
+            f"ap_per_class 300k predictions, {nc} classes: per-class loop {t_loop:.1f}ms, batched CPU {t_cpu:.1f}ms, "
+            f"batched {DEVICE} {t_dev:.1f}ms"
+        )
+
+
+@pytest.mark.slow
+def test_label_cache_benchmark(tmp_path):
+    """Benchmark startup time and per-worker private memory of the legacy pickled cache vs the columnar cache."""
+    import multiprocessing as mp
+
+    import psutil
+
+    from ultralytics.data.utils import (
+        load_dataset_cache_file,
+        load_label_cache,
+        save_dataset_cache_file,
+        save_label_cache,
+    )
+
+    def worker_uss(labels, workers=4):
+        """Private memory in MB of forked workers that touch every label, like dataloader workers over an epoch."""
+
+        def touch(q):
+            sum(len(lb["cls"]) for lb in labels)
+            q.put(psutil.Process().memory_full_info().uss / 1e6)
+
+        q = mp.get_context("fork").Queue()
+        ps = [mp.get_context("fork").Process(target=touch, args=(q,)) for _ in range(workers)]
+        [p.start() for p in ps]
+        uss = [q.get() for _ in ps]
+        [p.join() for p in ps]
+        return sum(uss) / len(uss)
+
+    labels = label_dicts(n=300_000)
+    x = {"labels": labels, "hash": "h", "results": [len(labels), 0, 0, 0, len(labels)], "msgs": []}
+    save_dataset_cache_file("", tmp_path / "train.cache", dict(x), "v")
+    save_label_cache("", tmp_path / "train.labels", x, "v")
+    del labels, x
+
+    t_legacy = benchmark(lambda: load_dataset_cache_file(tmp_path / "train.cache"), n=1, warmup=0)
+    t_table = benchmark(lambda: load_label_cache(tmp_path / "train.labels"), n=1, warmup=0)
+    uss_legacy = worker_uss(load_dataset_cache_file(tmp_path / "train.cache")["labels"])
+    uss_table = worker_uss(load_label_cache(tmp_path / "train.labels")["labels"])
+    LOGGER.info(
+        f"label cache 300k images: load pickled {t_legacy:.0f}ms vs columnar {t_table:.0f}ms, "
+        f"private memory per worker {uss_legacy:.0f}MB vs {uss_table:.0f}MB"
+    )
+
+
+@pytest.mark.slow
+def test_shared_image_cache_benchmark(tmp_path):
+    """Compare node memory of the per-process RAM image cache and the shared-memory cache for 4 DDP-like ranks."""
+    import multiprocessing as mp
+
+    import psutil
+
+    from ultralytics.data.base import BaseDataset
+
+    def uss():
+        return psutil.Process().memory_full_info().uss / 1e6
+
+    def rank(q, shared):
+        """Build the dataset like a DDP rank would, then report private memory in MB."""
+        if not shared:
+            BaseDataset.cache_images_to_shm = lambda self: False
+        m = uss()
+        dataset = image_dataset(tmp_path, n=200, cache="ram", imgsz=640)
+        sum(int(dataset.load_image(i)[0][0, 0, 0]) for i in range(dataset.ni))  # one epoch of reads
+        q.put(uss() - m)
+
+    image_dataset(tmp_path, n=200)  # write images
+    ctx = mp.get_context("fork")
+    for shared in (False, True):
+        q = ctx.Queue()
+        ps = [ctx.Process(target=rank, args=(q, shared))]  # local rank 0 builds the cache first
+        ps[0].start()
+        memory = [q.get()]
+        ps += [ctx.Process(target=rank, args=(q, shared)) for _ in range(3)]
+        [p.start() for p in ps[1:]]
+        memory += [q.get() for _ in ps[1:]]
+        files = list(Path("/dev/shm").glob("ultralytics-*.cache*"))
+        shm = sum(f.stat().st_size for f in files) / 1e6
+        [p.join() for p in ps]
+        [f.unlink() for f in files]  # forked processes exit without running atexit
+        LOGGER.info(
+            f"RAM image cache {'shared' if shared else 'per process'}, 200 images, 4 ranks: "
+            f"{sum(memory) + shm:.0f}MB node memory ({' + '.join(f'{m:.0f}' for m in memory)} private + {shm:.0f} shm)"
+        )
+
+
+@pytest.mark.slow
+def test_packed_image_cache_benchmark(tmp_path):
+    """Benchmark image loading and cache size of source JPEGs, full-size *.npy files and the packed disk cache."""
+    import cv2
+    import numpy as np
+
+    rng = np.random.default_rng(0)
+    (tmp_path / "images").mkdir()
+    for i in range(32):  # smooth, X-ray like 1920px scans
+        im = cv2.GaussianBlur(rng.integers(0, 255, (1080, 1920), dtype=np.uint8), (0, 0), 6)
+        im = cv2.normalize(im, None, 0, 255, cv2.NORM_MINMAX)
+        cv2.imwrite(str(tmp_path / "images" / f"{i}.jpg"), cv2.merge([im, im, im]), [cv2.IMWRITE_JPEG_QUALITY, 95])
+    jpeg = image_dataset(tmp_path, imgsz=640)
+    packed = image_dataset(tmp_path, imgsz=640, cache="disk")
+
+    def load_npy():
+        for i, f in enumerate(jpeg.npy_files):
+            if not f.exists():  # previous cache='disk': full resolution *.npy next to each image
+                np.save(f.as_posix(), cv2.imread(jpeg.im_files[i]), allow_pickle=False)
+        return [jpeg.load_image(i) for i in range(jpeg.ni)]
+
+    t_jpeg = benchmark(lambda: [jpeg.load_image(i) for i in range(jpeg.ni)], n=3, warmup=1) / jpeg.ni
+    t_npy = benchmark(load_npy, n=3, warmup=1) / jpeg.ni
+    t_pack = benchmark(lambda: [packed.load_image(i) for i in range(packed.ni)], n=3, warmup=1) / packed.ni
+    mb_jpeg = sum(Path(f).stat().st_size for f in jpeg.im_files) / 1e6
+    mb_npy = sum(f.stat().st_size for f in jpeg.npy_files) / 1e6
+    mb_pack = packed.image_pack.path.stat().st_size / 1e6
+    LOGGER.info(
+        f"disk cache, 32 1920x1080 images at imgsz=640: JPEG {t_jpeg:.1f}ms/{mb_jpeg:.0f}MB, "
+        f"*.npy {t_npy:.1f}ms/{mb_npy:.0f}MB, packed {t_pack:.1f}ms/{mb_pack:.0f}MB per image load/total size"
+    )
+
+
+@pytest.mark.slow
+def test_cache_size_estimate_benchmark(tmp_path):
+    """Benchmark the decoding RAM cache check against header-only estimates for 64 mixed-size JPEGs."""
+    import random
+
+    import cv2
+    import numpy as np
+
+    from ultralytics.data.utils import estimate_cache_size
+
+    rng = np.random.default_rng(0)
+    (tmp_path / "images").mkdir()
+    for i in range(64):  # 4K scans next to small crops
+        h, w = (2160, 3840) if i % 4 == 0 else (int(rng.integers(200, 1200)), int(rng.integers(200, 1200)))
+        im = cv2.resize(rng.integers(0, 255, (h // 8, w // 8, 3), dtype=np.uint8), (w, h))
+        cv2.imwrite(str(tmp_path / "images" / f"{i}.jpg"), im)
+    dataset = image_dataset(tmp_path, imgsz=640)
+    actual = sum(dataset.load_image(i)[0].nbytes for i in range(dataset.ni))
+
+    def decode(n=30):  # previous check_cache_ram(): decode n random images
+        b = 0
+        for _ in range(n):
+            im = cv2.imread(random.choice(dataset.im_files))
+            b += im.nbytes * (dataset.imgsz / max(im.shape[:2])) ** 2
+        return b * dataset.ni / n
+
+    random.seed(0)
+    t_decode, e_decode = benchmark(decode, n=3, warmup=1), decode() / actual - 1
+    t_header = benchmark(lambda: estimate_cache_size(dataset.im_files, 640, n=30), n=3, warmup=1)
+    e_header = estimate_cache_size(dataset.im_files, 640, n=30)["ram"] / actual - 1
+    t_all = benchmark(lambda: estimate_cache_size(dataset.im_files, 640, n=0), n=3, warmup=1)
+    t_labels = benchmark(lambda: dataset.cache_size(), n=3, warmup=1)
+    LOGGER.info(
+        f"cache size estimate, 64 JPEGs at imgsz=640: decode 30 {t_decode:.0f}ms ({e_decode:+.1%}), "
+        f"headers 30 {t_header:.1f}ms ({e_header:+.1%}), headers all {t_all:.1f}ms (exact), "
+        f"label cache shapes {t_labels:.2f}ms (exact)"
+    )
+
+
+@pytest.mark.slow
+def test_batch_augment_benchmark(tmp_path):
+    """Benchmark dataloader worker time per sample and device time per batch of 16 with batch_augment at 640."""
+    from ultralytics.cfg import get_cfg
+
+    workers = image_dataset(tmp_path, imgsz=640, augment=True)
+    batch = image_dataset(tmp_path, imgsz=640, augment=True, hyp=get_cfg(overrides={"batch_augment": True}))
+    t_workers = benchmark(lambda: [workers[i] for i in range(16)], n=3) / 16
+    t_batch = benchmark(lambda: [batch[i] for i in range(16)], n=3) / 16
+    samples = batch.collate_fn([batch[i] for i in range(16)])
+    samples["img"] = samples["img"].to(DEVICE).float()
+    t_device = benchmark(lambda: batch.batch_transforms(dict(samples)), n=5)
+    LOGGER.info(
+        f"batch_augment: workers {t_workers:.1f}ms -> {t_batch:.1f}ms per sample, "
+        f"{t_device:.1f}ms per batch of 16 on {DEVICE}"
+    )
+
+
+@pytest.mark.slow
+def test_random_perspective_segments_benchmark():
+    """Benchmark per-sample time of segment resampling and RandomPerspective labels for 100 polygons at 640."""
+    import numpy as np
+
+    from ultralytics.data.augment import RandomPerspective
+    from ultralytics.utils.ops import resample_segments
+
+    polygons, segments = crowded_segments()
+    transform = RandomPerspective()
+    transform.size = (640, 640)
+    M = np.array([[0.9, 0.2, 10], [-0.1, 1.1, -20], [0, 0, 1]])
+    t_resample_ref = benchmark(lambda: resample_segments_reference(polygons), n=10)
+    t_resample = benchmark(lambda: resample_segments(list(polygons)), n=10)
+    t_ref = benchmark(lambda: apply_segments_reference(transform, segments, M), n=10)
+    t_new = benchmark(lambda: transform.apply_segments(segments, M), n=10)
+    LOGGER.info(
+        f"100 segments of 1000 points: resample_segments {t_resample_ref:.1f}ms -> {t_resample:.1f}ms, "
+        f"RandomPerspective.apply_segments {t_ref:.1f}ms -> {t_new:.1f}ms per sample"
+    )
+
+
+@pytest.mark.slow
+def test_collate_fn_benchmark(monkeypatch):
+    """Benchmark collating a batch of 64 samples at 640 and moving it to shared memory like a dataloader worker."""
+    from ultralytics.data.dataset import YOLODataset
+
+    samples = collate_samples(b=64, imgsz=640)
+
+    def reference():
+        for v in collate_reference(samples).values():
+            if isinstance(v, torch.Tensor):
+                v.share_memory_()  # copied to shared memory when a worker sends the batch
+
+    t_ref = benchmark(reference, n=5)
+    monkeypatch.setattr(torch.utils.data, "get_worker_info", lambda: object())
+    t_new = benchmark(lambda: YOLODataset.collate_fn(samples), n=5)
+    mb = sum(s["img"].numel() for s in samples) / 1e6
+    LOGGER.info(
+        f"collate_fn batch 64 at 640 in a worker: stack + share {t_ref:.1f}ms ({2 * mb:.0f}MB copied, "
+        f"4 shared tensors), shared buffers {t_new:.1f}ms ({mb:.0f}MB copied, 2 shared buffers)"
+    )
+
+
+@pytest.mark.slow
+def test_image_buffer_benchmark(tmp_path):
+    """Benchmark per-sample mosaic loading time and buffer hit rates over one epoch of 64 images at 640."""
+    from ultralytics.cfg import get_cfg
+
+    image_dataset(tmp_path, n=64)  # write the images once
+    for buffer, prefetch in ((8, False), (32, False), (128, False), (32, True)):
+        hyp = get_cfg(overrides={"mosaic_buffer": buffer, "mosaic_prefetch": prefetch})
+        dataset = image_dataset(tmp_path, imgsz=640, augment=True, hyp=hyp)
+        t = benchmark(lambda dataset=dataset: [dataset[i] for i in range(len(dataset))], n=1, warmup=0) / len(dataset)
+        n = dataset.buffer.stats()
+        LOGGER.info(
+            f"mosaic_buffer={buffer} mosaic_prefetch={prefetch}: {t:.1f}ms per sample, "
+            f"{n['hits'] / (n['hits'] + n['misses']):.1%} hit rate, {n['misses']} images decoded in the loop"
+        )
+
+
+@pytest.mark.slow
+def test_split_dota_benchmark(tmp_path):
+    """Benchmark IoF of 2000 polygons against 64 windows and splitting 8 images in-process and in a pool."""
+    import cv2
+    import numpy as np
+
+    from ultralytics.data.split_dota import bbox_iof, split_images_and_labels
+
+    rng = np.random.default_rng(0)
+    rects = zip(rng.uniform(0, 4000, (2000, 2)), rng.uniform(5, 60, (2000, 2)), rng.uniform(0, 180, 2000))
+    polygons = np.stack([cv2.boxPoints((tuple(c), tuple(s), a)) for c, s, a in rects]).reshape(-1, 8)
+    windows = np.array([[x, y, x + 1024, y + 1024] for x in range(0, 4000, 500) for y in range(0, 4000, 500)])
+    t_ref = benchmark(lambda: bbox_iof_reference(polygons, windows), n=1, warmup=0)
+    t_new = benchmark(lambda: bbox_iof(polygons, windows), n=5)
+    dota_dataset(tmp_path / "DOTA", n=8)
+    rates, t = ((512, 1024), (100, 200)), {}
+    for workers in (0, 4):
+        t[workers] = benchmark(
+            lambda workers=workers: split_images_and_labels(
+                tmp_path / "DOTA", tmp_path / "split", "train", *rates, workers, False
+            ),
+            n=1,
+            warmup=0,
+        )
+    t_resume = benchmark(
+        lambda: split_images_and_labels(tmp_path / "DOTA", tmp_path / "split", "train", *rates), n=1, warmup=0
+    )
+    LOGGER.info(
+        f"bbox_iof 2000 polygons x 64 windows: per-pair clipping {t_ref:.1f}ms -> vectorized {t_new:.1f}ms; "
+        f"split 8 images: in-process {t[0]:.0f}ms, 4 processes {t[4]:.0f}ms, resumed after completion {t_resume:.0f}ms"
+    )
+
+
+@pytest.mark.slow
+def test_nms_rotated_benchmark():
+    """Benchmark latency and memory of dense and tiled rotated NMS across candidate counts."""
+    from ultralytics.utils.ops import nms_rotated
+
+    for n in (1000, 4000, 16000, 30000):
+        candidates = rotated_candidates(n)
+        dense = ""
+        if n <= 4000:  # a 30000 x 30000 float matrix alone is 3.6GB
+            t = benchmark(lambda x=candidates: nms_rotated_reference(*x), n=2, warmup=1)
+            dense = f"dense {t:.0f}ms {peak_memory(lambda x=candidates: nms_rotated_reference(*x)):.0f}MB, "
+        t_fast = benchmark(lambda x=candidates: nms_rotated(*x), n=2, warmup=1)
+        t_greedy = benchmark(lambda x=candidates: nms_rotated(*x, greedy=True), n=2, warmup=1)
+        mb = peak_memory(lambda x=candidates: nms_rotated(*x))
+        LOGGER.info(
+            f"nms_rotated {n} candidates: {dense}tiled fast-NMS {t_fast:.0f}ms {mb:.0f}MB, "
+            f"tiled greedy {t_greedy:.0f}ms"
+        )
+
+
+@pytest.mark.slow
+def test_non_max_suppression_benchmark():
+    """Benchmark postprocess latency of detection NMS for 8400 anchors and 80 classes at several batch sizes."""
+    from ultralytics.utils.ops import non_max_suppression
+
+    for bs in (1, 8, 32):
+        prediction = detect_predictions(bs=bs)
+        t_ref = benchmark(lambda x=prediction: non_max_suppression_reference(x.clone(), 0.25, 0.7), n=5)
+        t_new = benchmark(lambda x=prediction: non_max_suppression(x.clone(), 0.25, 0.7), n=5)
+        LOGGER.info(f"non_max_suppression batch {bs}: per-image loop {t_ref:.1f}ms -> batched {t_new:.1f}ms")
+
+
+@pytest.mark.slow
+def test_prepared_probiou_benchmark(monkeypatch):
+    """Benchmark the rotated assigner on dense 300-object scenes and rotated NMS with and without distance pruning."""
+    from ultralytics.utils import ops
+    from ultralytics.utils.tal import RotatedTaskAlignedAssigner, TaskAlignedAssigner
+
+    inputs = xray_scene()
+    assigner = RotatedTaskAlignedAssigner(topk=10, num_classes=10, alpha=0.5, beta=6.0)
+    t_assign = benchmark(lambda: assigner(*inputs), n=3, warmup=1)
+    boxes, scores = rotated_candidates(16000, imgsz=2000)
+    t_nms = benchmark(lambda: ops.nms_rotated(boxes, scores), n=3, warmup=1)
+    t_greedy = benchmark(lambda: ops.nms_rotated(boxes, scores, greedy=True), n=3, warmup=1)
+    monkeypatch.setattr(RotatedTaskAlignedAssigner, "get_box_metrics", TaskAlignedAssigner.get_box_metrics)
+    monkeypatch.setattr(
+        RotatedTaskAlignedAssigner, "select_candidates_in_gts", staticmethod(select_candidates_in_rotated_gts_reference)
+    )
+    monkeypatch.setattr(ops, "probiou_candidates", lambda a, b, threshold: torch.ones(len(a), len(b), dtype=torch.bool))
+    t_assign_ref = benchmark(lambda: assigner(*inputs), n=3, warmup=1)
+    t_nms_ref = benchmark(lambda: ops.nms_rotated(boxes, scores), n=3, warmup=1)
+    t_greedy_ref = benchmark(lambda: ops.nms_rotated(boxes, scores, greedy=True), n=3, warmup=1)
+    LOGGER.info(
+        f"RotatedTaskAlignedAssigner batch 8 with 300 objects: corner tests and per-pair covariance "
+        f"{t_assign_ref:.0f}ms -> projections and prepared OBBs {t_assign:.0f}ms; nms_rotated 16000 candidates "
+        f"on 2000px: all pairs {t_nms_ref:.0f}ms -> nearby pairs {t_nms:.0f}ms, "
+        f"greedy {t_greedy_ref:.0f}ms -> {t_greedy:.0f}ms"
+    )
+
+
+@pytest.mark.slow
+@pytest.mark.parametrize("task", ["detect", "obb"])
+def test_tiled_predict_benchmark(task):
+    """Benchmark tiled prediction of a 2000px image against per-tile predict calls merged afterwards."""
+    import numpy as np
+
+    from ultralytics.data.split_dota import get_windows
+
+    model = tile_model(task)
+    im = (np.random.default_rng(0).random((2000, 2000, 3)) * 255).astype(np.uint8)
+    args = {"imgsz": 320, "conf": 0.51, "device": DEVICE, "verbose": False}
+    t_ref = benchmark(lambda: tile_predict_reference(model, im, 320, 0.2, **args), n=2, warmup=1)
+    n = len(get_windows(im.shape[:2], (320,), (64,)))
+    results = {}
+    for bs in 1, 16:
+        t = benchmark(lambda bs=bs: model.predict(im, tile=320, tile_batch=bs, tile_full=False, **args), n=2, warmup=1)
+        results[bs] = model.predictor.tiles / t * 1e3
+    t_full = benchmark(lambda: model.predict(im, tile=320, tile_batch=16, tile_full=True, **args), n=2, warmup=1)
+    LOGGER.info(
+        f"Tiled {task} predict 2000px image, {n} tiles of 320px: per-tile predict calls {n / t_ref * 1e3:.1f} tiles/s"
+        f" -> tile_batch=1 {results[1]:.1f} tiles/s, tile_batch=16 {results[16]:.1f} tiles/s, "
+        f"with full-image pass {t_full:.0f}ms per image"
+    )
+
+
+@pytest.mark.slow
+def test_pipelined_predict_benchmark(tmp_path):
+    """Benchmark sequential against pipelined folder prediction and report the stage utilization."""
+    model = tile_model("detect")
+    folder = image_folder(tmp_path / "images", n=64, shape=(1080, 1920))
+    args = {"imgsz": 320, "conf": 0.51, "batch": 8, "device": DEVICE, "verbose": False}
+    t = benchmark(lambda: model.predict(folder, pipeline=0, **args), n=2, warmup=1)
+    t_pipeline = benchmark(lambda: model.predict(folder, pipeline=2, **args), n=2, warmup=1)
+    utilization = ", ".join(f"{k} {v:.0%}" for k, v in model.predictor.utilization.items())
+    LOGGER.info(
+        f"predict 64 1080p JPEGs at imgsz=320 batch 8: sequential {64 / t * 1e3:.1f} img/s -> pipeline=2 "
+        f"{64 / t_pipeline * 1e3:.1f} img/s, busy {utilization}"
+    )
+
+
+@pytest.mark.slow
+def test_parallel_image_loading_benchmark(tmp_path):
+    """Benchmark folder decoding with threads and reduced JPEG decoding, and video striding by seeking."""
+    from ultralytics.data.loaders import LoadImagesAndVideos
+
+    folder = str(image_folder(tmp_path / "images", n=64, shape=(1080, 1920)))
+
+    def throughput(**kwargs):
+        return 64 / benchmark(lambda: sum(len(b[1]) for b in LoadImagesAndVideos(folder, 8, **kwargs)), 2, 1) * 1e3
+
+    ref, threaded, reduced = throughput(), throughput(workers=4), throughput(workers=4, imgsz=320)
+    videos = []
+    for fourcc, suffix in ("MJPG", "avi"), ("mp4v", "mp4"):
+        video = str(frame_video(tmp_path / f"video.{suffix}", n=1500, shape=(720, 1280), fourcc=fourcc, texture=40))
+        loader = LoadImagesAndVideos(video, vid_stride=150)
+        loader.seek_stride = math.inf
+        t_grab = benchmark(lambda loader=loader: list(loader), 1, 0)
+        loader.seek_stride = 150
+        t_seek = benchmark(lambda loader=loader: list(loader), 1, 0)
+        videos.append(f"{fourcc} grab {t_grab:.0f}ms -> seek {t_seek:.0f}ms")
+    LOGGER.info(
+        f"LoadImagesAndVideos 64 1080p JPEGs batch 8: sequential {ref:.0f} img/s -> 4 threads {threaded:.0f} img/s, "
+        f"reduced for imgsz=320 {reduced:.0f} img/s; 1500-frame 720p video vid_stride=150: {', '.join(videos)}"
+    )
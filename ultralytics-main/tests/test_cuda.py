@@ -7,6 +7,7 @@ import pytest
 import torch
 
 from tests import CUDA_DEVICE_COUNT, CUDA_IS_AVAILABLE, MODEL, SOURCE
+from tests.test_python import assert_ap_per_class_parity
 from ultralytics import YOLO
 from ultralytics.cfg import TASK2DATA, TASK2MODEL, TASKS
 from ultralytics.utils import ASSETS, WEIGHTS_DIR
@@ -109,6 +110,12 @@ def test_utils_benchmarks():
     ProfileModels([MODEL], imgsz=32, half=False, min_time=1, num_timed_runs=3, num_warmup_runs=1).profile()
 
 
+@pytest.mark.skipif(not CUDA_IS_AVAILABLE, reason="CUDA is not available")
+def test_ap_per_class():
+    """Test ap_per_class computed on the validation device against the per-class loop."""
+    assert_ap_per_class_parity("cuda")
+
+
 @pytest.mark.skipif(not CUDA_IS_AVAILABLE, reason="CUDA is not available")
 def test_predict_sam():
     """Test SAM model predictions using different prompts, including bounding boxes and point annotations."""
@@ -3,7 +3,11 @@
 import sys
 from unittest import mock
 
+import pytest
+import torch
+
 from tests import MODEL
+from tests.test_python import frame_video, image_folder, nms_rotated_reference
 from ultralytics import YOLO
 from ultralytics.cfg import get_cfg
 from ultralytics.engine.exporter import Exporter
@@ -129,3 +133,150 @@ def test_classify():
     assert test_func in pred.callbacks["on_predict_start"], "callback test failed"
     result = pred(source=ASSETS, model=trainer.best)
     assert len(result), "predictor test failed"
+
+
+def tile_model(task="detect", seed=0):
+    """Untrained YOLO11n model with variance-preserving weights, so random images give dense, varied predictions."""
+    torch.manual_seed(seed)
+    model = YOLO("yolo11n-obb.yaml" if task == "obb" else "yolo11n.yaml")
+    for m in model.model.modules():
+        if isinstance(m, torch.nn.Conv2d) and m.weight.requires_grad:  # skip the fixed DFL convolution
+            torch.nn.init.kaiming_normal_(m.weight)
+            if m.bias is not None:
+                torch.nn.init.zeros_(m.bias)
+    return model
+
+
+def tile_predict_reference(model, im, tile, overlap, iou=0.7, max_det=300, **kwargs):
+    """Per-tile `predict` calls shifted to image coordinates and merged with class-wise NMS, like the SAHI example."""
+    import torchvision
+
+    from ultralytics.data.split_dota import get_windows
+
+    preds = []
+    for x1, y1, x2, y2 in get_windows(im.shape[:2], (tile,), (round(tile * overlap),)):
+        r = model.predict(im[y1:y2, x1:x2], iou=iou, max_det=max_det, **kwargs)[0]
+        pred = (r.boxes if r.obb is None else r.obb).data.clone()
+        pred[:, :2] += pred.new_tensor([x1, y1])
+        if r.obb is None:
+            pred[:, 2:4] += pred.new_tensor([x1, y1])
+        preds.append(pred)
+    pred = torch.cat(preds)
+    keep = []
+    for c in pred[:, -1].unique():
+        (j,) = torch.nonzero(pred[:, -1] == c, as_tuple=True)
+        if pred.shape[1] == 7:  # xywhr, conf, cls
+            keep.append(j[nms_rotated_reference(pred[j, :5], pred[j, 5], iou)])
+        else:
+            keep.append(j[torchvision.ops.nms(pred[j, :4], pred[j, 4], iou)])
+    keep = torch.cat(keep)
+    return pred[keep[pred[keep, -2].argsort(descending=True)]][:max_det]
+
+
+@pytest.mark.parametrize("task", ["detect", "obb"])
+def test_tiled_predict(task):
+    """Tiled prediction matches plain prediction on images within one tile and merged per-tile predictions otherwise."""
+    import numpy as np
+
+    model = tile_model(task)
+    rng = np.random.default_rng(0)
+    small = (rng.random((200, 240, 3)) * 255).astype(np.uint8)
+    large = (rng.random((480, 720, 3)) * 255).astype(np.uint8)
+    args = {"imgsz": 256, "conf": 0.51, "max_det": 1000, "verbose": False}
+
+    def data(r):
+        return (r.boxes if r.obb is None else r.obb).data
+
+    def rows(x):
+        return x[torch.from_numpy(np.lexsort(x.T.numpy()[::-1]))]  # equal-score boxes may be kept in any order
+
+    # A single window covering the image reduces to plain prediction
+    plain = model.predict(small, **args)[0]
+    tiled = model.predict(small, tile=256, **args)[0]
+    assert model.predictor.tiles == 1 and len(data(plain))
+    torch.testing.assert_close(data(tiled), data(plain))
+
+    # Overlapping windows in mixed batches match per-tile predictions merged in image coordinates
+    ref = tile_predict_reference(model, large, 256, 0.25, **args)
+    r = model.predict([large, small], tile=256, tile_overlap=0.25, tile_batch=3, tile_full=False, **args)
+    assert model.predictor.tiles == 12 + 1 and len(ref) > len(data(plain))
+    torch.testing.assert_close(rows(data(r[0])), rows(ref), atol=1e-3, rtol=1e-4)
+    torch.testing.assert_close(data(r[1]), data(tiled))
+    assert data(r[0])[:, :2].max() > 256  # boxes in image, not tile, coordinates
+
+    # The full-image pass adds one crop per image that needs more than one window
+    model.predict(large, tile=256, tile_overlap=0.25, tile_full=True, **args)  # predictor arguments are sticky
+    assert model.predictor.tiles == 12 + 1
+
+    # Results report the image shape, not the tile shape, and overlaps without an offset between tiles are rejected
+    model.predict(large, tile=256, tile_overlap=0.25, **{**args, "verbose": True})
+    assert "480x720 " in model.predictor.batch[2][0]
+    with pytest.raises(ValueError, match="tile_overlap"):
+        model.predict(large, tile=256, tile_overlap=1.0, **args)
+
+
+def test_tiled_predict_unsupported():
+    """Detect predictors without tile hooks, like RT-DETR, fall back to plain prediction instead of failing."""
+    import numpy as np
+
+    from ultralytics import RTDETR
+
+    model = RTDETR("rtdetr-l.yaml")
+    im = (np.random.default_rng(0).random((480, 640, 3)) * 255).astype(np.uint8)
+    plain = model.predict(im, imgsz=640, verbose=False)[0]
+    tiled = model.predict(im, imgsz=640, tile=320, verbose=False)[0]
+    assert model.predictor.args.tile == 0 and model.predictor.tiles == 0
+    torch.testing.assert_close(tiled.boxes.data, plain.boxes.data)
+
+
+def test_pipelined_predict(tmp_path, monkeypatch):
+    """Pipelined prediction yields and saves the same results in order, cleans up threads and propagates errors."""
+    import threading
+
+    from ultralytics.data import loaders
+
+    model = tile_model("detect")
+    folder = image_folder(tmp_path / "images", n=10, shape=(240, 320))
+    args = {"imgsz": 160, "conf": 0.51, "batch": 3, "verbose": False}
+    ref = model.predict(folder, **args)
+    results = model.predict(folder, pipeline=2, save_txt=True, project=tmp_path, name="pipeline", **args)
+    assert [r.path for r in results] == [r.path for r in ref]
+    for r, r_ref in zip(results, ref):
+        torch.testing.assert_close(r.boxes.data, r_ref.boxes.data)
+    assert len(list((tmp_path / "pipeline" / "labels").glob("*.txt"))) == sum(len(r) > 0 for r in ref)
+    assert set(model.predictor.utilization) == {"decode", "preprocess", "inference", "postprocess"}
+    assert 0 < model.predictor.utilization["inference"] <= 1
+
+    # Closing the generator early stops all pipeline threads
+    stream = model.predict(folder, stream=True, pipeline=2, save_txt=False, **args)
+    assert next(stream).path == ref[0].path
+    stream.close()
+    assert not [t for t in threading.enumerate() if t.name.startswith("predict-")]
+
+    # Loader errors are raised in the calling thread
+    def imread(path, *args):
+        raise OSError(f"cannot read {path}")
+
+    monkeypatch.setattr(loaders, "imread", imread)
+    with pytest.raises(OSError, match="cannot read"):
+        model.predict(folder, pipeline=2, **args)
+    assert not [t for t in threading.enumerate() if t.name.startswith("predict-")]
+
+
+def test_pipelined_predict_mixed_sources(tmp_path):
+    """Pipelined prediction saves images, videos and labels of a mixed folder under the same names as sequential."""
+    model = tile_model("detect")
+    folder = image_folder(tmp_path / "source", n=6, shape=(240, 320))
+    frame_video(folder / "video.mp4", n=8, shape=(240, 320), fourcc="mp4v", texture=40)
+    args = {"imgsz": 160, "conf": 0.3, "batch": 1, "save": True, "save_txt": True, "verbose": False}
+    ref = model.predict(folder, project=tmp_path, name="sequential", **args)
+    results = model.predict(folder, pipeline=2, project=tmp_path, name="pipeline", **args)
+    assert [r.path for r in results] == [r.path for r in ref] and len(ref) == 6 + 8
+
+    def saved(name):
+        return sorted(str(f.relative_to(tmp_path / name)) for f in (tmp_path / name).rglob("*.*"))
+
+    files = saved("sequential")
+    assert files == saved("pipeline")
+    assert {f"{i}.jpg" for i in range(6)} | {"video.avi"} <= set(files)
+    assert any(f.startswith("labels/video_") for f in files) and not any("None" in f for f in files)
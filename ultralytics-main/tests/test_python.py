@@ -2,7 +2,9 @@
 
 import contextlib
 import csv
+import math
 import urllib
+import warnings
 from copy import copy
 from pathlib import Path
 
@@ -622,3 +624,1214 @@ def test_yolov10():
     model.val(data="coco8.yaml", imgsz=32)
     model.predict(imgsz=32, save_txt=True, save_crop=True, augment=True)
     model(SOURCE)
+
+
+def edge_loss_reference(loss_fn, images, obb_bboxes, conf_scores):
+    """Per-box Python loop implementation of AcceleratedOBBEdgeLoss used as parity and speed baseline."""
+    edge_map = loss_fn.edge_map(images)
+    _, _, h, w = images.shape
+    total_loss, box_count = torch.zeros([], device=images.device, dtype=images.dtype), 0
+    for bboxes, scores, e_map in zip(obb_bboxes, conf_scores, edge_map[:, 0]):
+        mask = scores > loss_fn.conf_thresh
+        val_boxes, val_scores = bboxes[mask], scores[mask]
+        if val_scores.numel() > loss_fn.topk:
+            val_boxes = val_boxes[val_scores.topk(loss_fn.topk)[1]]
+        for xc, yc, bw, bh, angle in val_boxes.tolist():
+            cos_a, sin_a, hw, hh = math.cos(angle), math.sin(angle), bw / 2, bh / 2
+            poly = [
+                (xc - hw * cos_a + hh * sin_a, yc - hw * sin_a - hh * cos_a),
+                (xc + hw * cos_a + hh * sin_a, yc + hw * sin_a - hh * cos_a),
+                (xc + hw * cos_a - hh * sin_a, yc + hw * sin_a + hh * cos_a),
+                (xc - hw * cos_a - hh * sin_a, yc - hw * sin_a + hh * cos_a),
+            ]
+            coords = []
+            for i in range(4):
+                (xa, ya), (xb, yb) = poly[i], poly[(i + 1) % 4]
+                dx, dy = xb - xa, yb - ya
+                length = math.hypot(dx, dy)
+                if length < 1e-6:
+                    continue
+                steps = int(length // loss_fn.stride)
+                for s in range(steps + 1):
+                    xx, yy = round(xa + s / (steps + 1) * dx), round(ya + s / (steps + 1) * dy)
+                    if 0 <= xx < w and 0 <= yy < h:
+                        coords.append((yy, xx))
+            if not coords:
+                continue
+            mean_val = torch.stack([e_map[r, c] for r, c in coords]).mean()
+            total_loss += 1.0 - mean_val if loss_fn.threshold is None else torch.relu(loss_fn.threshold - mean_val)
+            box_count += 1
+    if box_count:
+        total_loss = total_loss / box_count
+    return total_loss * loss_fn.penalty_weight
+
+
+def obb_edge_inputs(b=4, n=2000, imgsz=160, device="cpu"):
+    """Random images, OBB predictions partially outside the image, and confidences for the OBB edge loss."""
+    images = torch.rand(b, 3, imgsz, imgsz, device=device)
+    xy = torch.rand(b, n, 2, device=device) * imgsz * 1.2 - imgsz * 0.1
+    wh = torch.rand(b, n, 2, device=device) * imgsz / 2
+    angle = (torch.rand(b, n, 1, device=device) - 0.5) * math.pi
+    scores = torch.rand(b, n, device=device)
+    scores[0] = 0.0  # image without confident boxes
+    return images, torch.cat([xy, wh, angle], -1), scores
+
+
+def test_obb_edge_loss_parity():
+    """Test the batched AcceleratedOBBEdgeLoss against the per-box reference implementation."""
+    from ultralytics.utils.loss import AcceleratedOBBEdgeLoss
+
+    images, boxes, scores = obb_edge_inputs(n=300)
+    for threshold in None, 0.2:
+        loss_fn = AcceleratedOBBEdgeLoss(threshold=threshold)
+        ref = edge_loss_reference(loss_fn, images, boxes, scores)
+        assert torch.allclose(loss_fn(images, boxes, scores), ref, rtol=1e-3, atol=1e-6)
+    empty = torch.zeros_like(scores)
+    assert loss_fn(images, boxes, empty) == 0
+
+
+def test_obb_edge_map_precomputed():
+    """Test that dataloader-side uint8 edge maps decode to the Sobel magnitude computed by the OBB edge loss."""
+    from ultralytics.data.augment import Format
+    from ultralytics.utils.loss import AcceleratedOBBEdgeLoss
+
+    img = np.random.randint(0, 256, (96, 128, 3), dtype=np.uint8)
+    edge = Format._format_edge(img)[None]
+    images = torch.from_numpy(img).permute(2, 0, 1)[None].float() / 255
+    loss_fn = AcceleratedOBBEdgeLoss()
+    decoded = edge.float() * (4 * math.sqrt(2) / 255)
+    assert edge.dtype == torch.uint8 and edge.shape == (1, 1, 96, 128)
+    assert (decoded - loss_fn.edge_map(images)).abs().max() <= 2 * math.sqrt(2) / 255 + 1e-5  # half quantization step
+
+    _, boxes, scores = obb_edge_inputs(b=1, n=200, imgsz=96, device="cpu")
+    assert torch.allclose(loss_fn(images, boxes, scores, edge=edge), loss_fn(images, boxes, scores), atol=1e-4)
+
+
+def bg_loss_reference(loss_fn, pred_scores, pred_bboxes, target_scores, target_bboxes, fg_mask):
+    """Dense BackgroundSensitiveLoss formulation with two masked BCE passes and a masked SmoothL1 over all anchors."""
+    bg, fg, anchors = (target_scores == 0).float(), (target_scores > 0).float(), fg_mask[..., None].float()
+    bce = torch.nn.functional.binary_cross_entropy_with_logits
+    cls_loss = loss_fn.bg_weight * bce(pred_scores * bg, target_scores * bg)
+    cls_loss = cls_loss + loss_fn.fg_weight * bce(pred_scores * fg, target_scores * fg)
+    iou_loss = torch.nn.functional.smooth_l1_loss(pred_bboxes * anchors, target_bboxes * anchors)
+    return cls_loss + loss_fn.iou_weight * iou_loss
+
+
+def bg_loss_inputs(b=16, a=8400, nc=12, device="cpu"):
+    """Random scores, boxes and sparse assigner targets for BackgroundSensitiveLoss."""
+    fg_mask = torch.rand(b, a, device=device) < 0.02
+    target_scores = torch.zeros(b, a, nc, device=device)
+    target_scores[fg_mask, torch.randint(nc, (int(fg_mask.sum()),), device=device)] = torch.rand(1, device=device)
+    pred_scores = torch.randn(b, a, nc, device=device, requires_grad=True)
+    pred_bboxes = torch.rand(b, a, 5, device=device, requires_grad=True)
+    return pred_scores, pred_bboxes, target_scores, torch.rand(b, a, 5, device=device), fg_mask
+
+
+def test_bg_sensitive_loss_parity():
+    """Test that the fused BackgroundSensitiveLoss yields the gradients of the dense masked formulation."""
+    from ultralytics.utils.loss import BackgroundSensitiveLoss
+
+    loss_fn = BackgroundSensitiveLoss()
+    pred_scores, pred_bboxes, target_scores, target_bboxes, fg_mask = bg_loss_inputs(b=2, a=500)
+    grads = []
+    for fused in True, False:
+        if fused:
+            bce = torch.nn.functional.binary_cross_entropy_with_logits(pred_scores, target_scores, reduction="none")
+            loss = loss_fn(bce, target_scores, pred_bboxes, target_bboxes, fg_mask)
+        else:
+            loss = bg_loss_reference(loss_fn, pred_scores, pred_bboxes, target_scores, target_bboxes, fg_mask)
+        grads.append(torch.autograd.grad(loss, [pred_scores, pred_bboxes]))
+    for g_fused, g_ref in zip(*grads):
+        assert torch.allclose(g_fused, g_ref, atol=1e-8)
+
+
+def test_named_ap_metrics():
+    """Test that dataset-defined per-class AP metrics are cached on update and line up with metric keys."""
+    from ultralytics.utils import yaml_load
+    from ultralytics.utils.metrics import OBBMetrics
+
+    rng = np.random.default_rng(0)
+    n, nc = 2000, 12
+    ap_metrics = {"FO": [0, 0.5, 0.1], "knives": [[1, 2], [0.5, 0.75]], "missing": [11, None]}
+    metrics = OBBMetrics(names={i: str(i) for i in range(nc)}, ap_metrics=ap_metrics)
+    target_cls = rng.integers(0, nc - 1, n // 2)  # class 11 has no labels
+    metrics.process(rng.random((n, 10)) > 0.5, rng.random(n), rng.integers(0, nc, n), target_cls)
+
+    box, results = metrics.box, metrics.results_dict
+    assert len(metrics.keys) == len(metrics.mean_results()) == len(box.class_result(0)) == 8
+    assert np.allclose([results[f"metrics/{k}(B)"] for k in ("mAP50", "mAP75", "mAP50-95")], box.mean_results()[2:5])
+    assert np.allclose(box.mean_results()[2:5], [box.map50, box.map75, box.map])
+    row = list(box.ap_class_index).index
+    assert results["metrics/FO(B)"] == box.all_ap[row(0), 0]
+    assert np.isclose(results["metrics/knives(B)"], box.all_ap[[row(1), row(2)]][:, [0, 5]].mean())
+    assert results["metrics/missing(B)"] == 0.0 and np.isnan(box.class_result(row(0))[-1])
+    assert np.isclose(metrics.fitness, 0.1 * (box.map50 + box.map75 + box.map + results["metrics/FO(B)"]))
+
+    # PIDray fitness is 0.1 * (mAP50 + mAP75 + mAP50-95 + AP50 of classes 0-3) + 0.3 * AP50 of class 4
+    box.ap_metrics = yaml_load(ROOT / "cfg/datasets/pidray.yaml")["ap_metrics"]
+    metrics.process(rng.random((n, 10)) > 0.5, rng.random(n), rng.integers(0, nc, n), target_cls)
+    ap50 = box.all_ap[[row(c) for c in range(5)], 0]
+    expected = 0.1 * (box.map50 + box.map75 + box.map + ap50[:4].sum()) + 0.3 * ap50[4]
+    assert np.isclose(metrics.fitness, expected)
+
+
+def ap_per_class_reference(tp, conf, pred_cls, target_cls, eps=1e-16):
+    """Per-class loop implementation of ap_per_class curves used as parity and speed baseline."""
+    from ultralytics.utils.metrics import compute_ap
+
+    i = np.argsort(-conf, kind="stable")
+    tp, conf, pred_cls = tp[i], conf[i], pred_cls[i]
+    unique_classes, nt = np.unique(target_cls, return_counts=True)
+    nc = unique_classes.shape[0]
+    x, prec_values = np.linspace(0, 1, 1000), []
+    ap, p_curve, r_curve = np.zeros((nc, tp.shape[1])), np.zeros((nc, 1000)), np.zeros((nc, 1000))
+    for ci, c in enumerate(unique_classes):
+        i = pred_cls == c
+        n_l, n_p = nt[ci], i.sum()
+        if n_p == 0 or n_l == 0:
+            continue
+        fpc, tpc = (1 - tp[i]).cumsum(0), tp[i].cumsum(0)
+        recall = tpc / (n_l + eps)
+        r_curve[ci] = np.interp(-x, -conf[i], recall[:, 0], left=0)
+        precision = tpc / (tpc + fpc)
+        p_curve[ci] = np.interp(-x, -conf[i], precision[:, 0], left=1)
+        for j in range(tp.shape[1]):
+            ap[ci, j], mpre, mrec = compute_ap(recall[:, j], precision[:, j])
+            if j == 0:
+                prec_values.append(np.interp(x, mrec, mpre))
+    return ap, p_curve, r_curve, np.array(prec_values).reshape(-1, 1000)
+
+
+def ap_inputs(n=5000, nc=12, seed=0):
+    """Random validation statistics with a class without predictions and a predicted class without labels."""
+    rng = np.random.default_rng(seed)
+    target_cls = rng.integers(0, nc - 1, n // 2).astype(float)  # class nc - 1 has no labels
+    target_cls[target_cls == 3] = 4  # class 3 has no labels
+    pred_cls = rng.integers(0, nc, n).astype(float)
+    pred_cls[pred_cls == 5] = 6  # class 5 has labels but no predictions
+    conf = rng.random(n).astype(np.float32)
+    tp = rng.random(n)[:, None] > np.linspace(0.3, 0.9, 10)
+    for c in np.unique(pred_cls):  # a label matches at most one prediction
+        i = pred_cls == c
+        tp[i] &= tp[i].cumsum(0) <= (target_cls == c).sum()
+    return tp, conf, pred_cls, target_cls
+
+
+def assert_ap_per_class_parity(device=None):
+    """Assert ap_per_class on `device` matches the per-class loop, with tied confidences and without predictions."""
+    from ultralytics.utils.metrics import ap_per_class
+
+    for n, decimals in (5000, None), (5000, 2), (7, None):
+        tp, conf, pred_cls, target_cls = ap_inputs(n)
+        conf = conf if decimals is None else conf.round(decimals)  # tied confidences
+        ref = ap_per_class_reference(tp, conf, pred_cls, target_cls)
+        out = ap_per_class(tp, conf, pred_cls, target_cls, device=device)
+        for a, b in zip((out[5], out[7], out[8], out[11]), ref):
+            assert a.shape == b.shape and np.allclose(a, b, rtol=0, atol=1e-12)
+    out = ap_per_class(np.zeros((0, 10), bool), np.zeros(0), np.zeros(0), np.array([0.0, 1.0]), device=device)
+    assert not out[5].any() and out[11].shape == (0, 1000)
+
+
+def test_ap_per_class_parity():
+    """Test ap_per_class on CPU and the batched curves of CUDA devices computed on CPU against the per-class loop."""
+    from ultralytics.utils.metrics import ap_curves_batched
+
+    assert_ap_per_class_parity("cpu")
+    for n, decimals in (5000, None), (5000, 2), (7, None), (0, None):
+        tp, conf, pred_cls, target_cls = ap_inputs(n)
+        conf = conf if decimals is None else conf.round(decimals)  # tied confidences
+        classes, nt = np.unique(target_cls, return_counts=True)
+        out = ap_curves_batched(tp, conf, pred_cls, classes, nt, np.linspace(0, 1, 1000), device="cpu")
+        for a, b in zip(out, ap_per_class_reference(tp, conf, pred_cls, target_cls)):
+            assert a.shape == b.shape and np.allclose(a, b, rtol=0, atol=1e-12)
+
+
+def label_dicts(n=200, seed=0, segments=True, nkpt=0):
+    """Random per-image label dicts in the legacy `cache_labels` layout, with empty images and optional segments."""
+    rng = np.random.default_rng(seed)
+    labels = []
+    for i in range(n):
+        k = int(rng.integers(0, 6)) if i % 7 else 0
+        labels.append(
+            {
+                "im_file": f"images/{i}.jpg",
+                "shape": (int(rng.integers(10, 2000)), int(rng.integers(10, 2000))),
+                "cls": rng.integers(0, 5, (k, 1)).astype(np.float32),
+                "bboxes": rng.random((k, 4), dtype=np.float32),
+                "segments": [rng.random((int(rng.integers(3, 9)), 2), dtype=np.float32) for _ in range(k)]
+                if segments and i % 2
+                else [],
+                "keypoints": rng.random((k, nkpt, 3), dtype=np.float32) if nkpt else None,
+                "normalized": True,
+                "bbox_format": "xywh",
+            }
+        )
+    return labels
+
+
+def assert_labels_equal(a, b):
+    """Assert two per-image label dicts are equal."""
+    assert a.keys() == b.keys() and a["im_file"] == b["im_file"] and tuple(a["shape"]) == tuple(b["shape"])
+    for k in ("cls", "bboxes"):
+        assert np.array_equal(a[k], b[k]) and a[k].dtype == b[k].dtype
+    assert (a["keypoints"] is None) == (b["keypoints"] is None)
+    assert a["keypoints"] is None or np.array_equal(a["keypoints"], b["keypoints"])
+    assert len(a["segments"]) == len(b["segments"])
+    assert all(np.array_equal(x, y) for x, y in zip(a["segments"], b["segments"]))
+
+
+def test_label_table_parity(tmp_path):
+    """LabelTable round-trips, class filtering, reordering and pickling match the legacy list of label dicts."""
+    import pickle
+
+    from ultralytics.data.utils import LabelTable, load_label_cache, save_label_cache
+
+    for segments, nkpt in ((True, 0), (False, 17)):
+        labels = label_dicts(segments=segments, nkpt=nkpt)
+        x = {"labels": labels, "hash": "h", "results": [len(labels), 0, 0, 0, len(labels)], "msgs": []}
+        assert save_label_cache("", tmp_path / "train.labels", x, "v")
+        cache = load_label_cache(tmp_path / "train.labels")
+        table = cache["labels"]
+        assert cache["hash"] == "h" and cache["version"] == "v" and len(table) == len(labels)
+        assert isinstance(table.bboxes.base, np.memmap)
+        for a, b in zip(table, labels):
+            assert_labels_equal(a, b)
+        assert_labels_equal(table[-1], labels[-1])
+
+        # Same filtering as BaseDataset.update_labels on a list of dicts
+        include = [1, 3]
+        filtered = table.filter(include, single_cls=True)
+        for a, b in zip(filtered, labels):
+            j = np.isin(b["cls"][:, 0], include)
+            b = dict(b, cls=np.zeros_like(b["cls"][j]), bboxes=b["bboxes"][j])
+            b["segments"] = [s for s, keep in zip(b["segments"], j) if keep] if b["segments"] else []
+            b["keypoints"] = None if b["keypoints"] is None else b["keypoints"][j]
+            assert_labels_equal(a, b)
+
+        order = np.random.default_rng(0).permutation(len(labels))
+        reordered = pickle.loads(pickle.dumps(filtered.select(order).select(order[::-1])))
+        for i, j in enumerate(order[order[::-1]]):
+            assert_labels_equal(reordered[i], filtered[j])
+        merged = LabelTable.concatenate([table.take(order[:50]), table.select(order[50:]), LabelTable.from_labels([])])
+        for i, j in enumerate(order):
+            assert_labels_equal(merged[i], labels[j])
+        assert len(pickle.dumps(table)) < 10_000  # memory-mapped arrays are pickled by path
+        assert table.drop_segments().num_segments == 0
+
+
+def test_label_cache_incremental(tmp_path, monkeypatch):
+    """Updating the label cache re-verifies only new or changed images and matches a full rescan."""
+    import os
+    import shutil
+
+    from ultralytics.data import dataset as yolo_dataset
+    from ultralytics.data.dataset import YOLODataset
+
+    rng = np.random.default_rng(0)
+    (tmp_path / "images").mkdir()
+    (tmp_path / "labels").mkdir()
+
+    def write(i, k):
+        cv2.imwrite(str(tmp_path / "images" / f"{i}.jpg"), rng.integers(0, 255, (40 + i, 60, 3), dtype=np.uint8))
+        lines = [f"{int(rng.integers(3))} " + " ".join(f"{x:.4f}" for x in rng.uniform(0.2, 0.4, 8)) for _ in range(k)]
+        (tmp_path / "labels" / f"{i}.txt").write_text("\n".join(lines))
+
+    verified = []
+
+    def verify(args):
+        verified.append(args[0])
+        return verify_image_label(args)
+
+    def load():
+        verified.clear()
+        return YOLODataset(img_path=str(tmp_path / "images"), data={"names": {0: "a", 1: "b", 2: "c"}}, task="obb")
+
+    verify_image_label = yolo_dataset.verify_image_label
+    monkeypatch.setattr(yolo_dataset, "verify_image_label", verify)
+    for i in range(20):
+        write(i, i % 4)
+    assert len(load().labels) == 20 and len(verified) == 20
+    assert len(load().labels) == 20 and not verified  # unchanged
+
+    for i in (20, 21):
+        write(i, 2)  # added
+    write(3, 5)  # changed
+    os.utime(tmp_path / "labels" / "3.txt", ns=(1, 1))
+    (tmp_path / "images" / "7.jpg").unlink()  # removed
+    updated = load()
+    assert sorted(verified) == sorted(str(tmp_path / "images" / f"{i}.jpg") for i in (3, 20, 21))
+
+    shutil.rmtree(tmp_path / "labels.labels")
+    rescanned = load()
+    assert len(verified) == 21 and updated.im_files == rescanned.im_files
+    for a, b in zip(updated.labels, rescanned.labels):
+        assert_labels_equal(a, b)
+
+
+def image_dataset(path, n=16, cache=False, imgsz=128, **kwargs):
+    """Detection dataset of `n` random images of varying size and aspect ratio without labels under `path`."""
+    from ultralytics.cfg import get_cfg
+    from ultralytics.data.dataset import YOLODataset
+
+    rng = np.random.default_rng(0)
+    if not (path / "images").exists():
+        (path / "images").mkdir(parents=True)
+        for i in range(n):
+            im = rng.integers(0, 255, (int(rng.integers(60, 400)), int(rng.integers(60, 400)), 3), dtype=np.uint8)
+            cv2.imwrite(str(path / "images" / f"{i}.png"), im)
+    hyp = kwargs.pop("hyp", get_cfg())
+    return YOLODataset(
+        img_path=str(path / "images"), data={"names": {0: "a"}}, imgsz=imgsz, cache=cache, hyp=hyp, **kwargs
+    )
+
+
+def test_shared_image_cache(tmp_path):
+    """cache='ram' maps images from one shared-memory file that matches decoding each image."""
+    import pickle
+
+    from ultralytics.data.utils import SharedImageCache
+
+    reference = image_dataset(tmp_path)
+    dataset = image_dataset(tmp_path, cache="ram", augment=True)
+    assert isinstance(dataset.ims, SharedImageCache) and dataset.ims.path.exists()
+    for i in range(dataset.ni):
+        im, hw0, hw = reference.load_image(i)
+        assert np.array_equal(dataset.ims[i], im) and not dataset.ims[i].flags.writeable
+        assert dataset.load_image(i)[1:] == (hw0, hw) and dataset.im_hw0[i] == hw0 and dataset.im_hw[i] == hw
+    assert len(pickle.dumps(dataset.ims)) < 1000  # pickled by path
+    assert image_dataset(tmp_path, cache="ram").ims.path == dataset.ims.path  # attach, don't rebuild
+    dataset[0]  # transforms must not write into cached images
+    dataset.ims.unlink()
+    assert not SharedImageCache.exists(dataset.ims.path)
+
+
+def test_packed_image_cache(tmp_path):
+    """cache='disk' decodes the same resized images as reading and resizing the source images."""
+    import pickle
+
+    from ultralytics.data.utils import PackedImageCache
+
+    reference = image_dataset(tmp_path)
+    dataset = image_dataset(tmp_path, cache="disk")
+    assert isinstance(dataset.image_pack, PackedImageCache) and len(dataset.image_pack) == dataset.ni
+    for i in range(dataset.ni):
+        a, b = reference.load_image(i), dataset.load_image(i)
+        assert np.array_equal(a[0], b[0]) and a[1:] == b[1:]
+    assert len(pickle.dumps(dataset.image_pack)) < 1000  # pickled by path
+    assert image_dataset(tmp_path, cache="disk").image_pack.path == dataset.image_pack.path  # reused
+    assert len(list(tmp_path.glob("*.imcache"))) == 1
+
+    # A subset of the directory gets its own cache, changed images only replace the cache of their image list
+    subset = image_dataset(tmp_path, cache="disk", fraction=0.5).image_pack.path
+    assert subset != dataset.image_pack.path and dataset.image_pack.path.exists()
+    cv2.imwrite(reference.im_files[-1], np.zeros((64, 64, 3), dtype=np.uint8))  # outside the subset
+    rebuilt = image_dataset(tmp_path, cache="disk").image_pack.path
+    assert sorted(tmp_path.glob("*.imcache")) == sorted([subset, rebuilt]) and rebuilt != dataset.image_pack.path
+
+
+def test_cache_size_estimate(tmp_path):
+    """Header-only cache size estimates equal the bytes of the images load_image() returns, in both resize modes."""
+    from ultralytics.data.utils import estimate_cache_size, get_image_shapes, resized_shapes
+
+    dataset = image_dataset(tmp_path)
+    exif = Image.Exif()
+    exif[274] = 6  # rotated 90 degrees, cv2.imread() returns the transposed shape
+    Image.new("RGB", (300, 100)).save(tmp_path / "images" / "exif.jpg", exif=exif)
+    dataset = image_dataset(tmp_path)  # labels re-verified with the new image
+    ims = [dataset.load_image(i)[0] for i in range(dataset.ni)]
+    assert dataset.cache_size() == {"ram": sum(im.nbytes for im in ims), "disk": sum(im.nbytes for im in ims)}
+    assert estimate_cache_size(dataset.im_files, dataset.imgsz, n=0)["ram"] == sum(im.nbytes for im in ims)
+    assert estimate_cache_size(dataset.im_files, dataset.imgsz, n=4)["ram"] > 0
+
+    shapes = get_image_shapes(dataset.im_files + [str(tmp_path / "missing.jpg")])
+    assert shapes[-1].tolist() == [0, 0]
+    assert shapes[:-1].tolist() == [list(dataset.read_image(i)[1]) for i in range(dataset.ni)]
+    for rect_mode in (True, False):
+        hw = [dataset.read_image(i, rect_mode)[0].shape[:2] for i in range(dataset.ni)]
+        assert np.array_equal(resized_shapes(shapes[:-1], dataset.imgsz, rect_mode), hw)
+
+
+def batch_augment_inputs(img, bboxes, ori_shape=None, ratio_pad=((1.0, 1.0), (0, 0))):
+    """Single sample batch of a letterboxed uint8 image and its normalized labels for BatchAugment."""
+    n = len(bboxes)
+    return {
+        "img": torch.from_numpy(img.transpose(2, 0, 1).copy())[None].float(),
+        "cls": torch.arange(n, dtype=torch.float32)[:, None],
+        "bboxes": bboxes,
+        "batch_idx": torch.zeros(n),
+        "ori_shape": (ori_shape or img.shape[:2],),
+        "ratio_pad": (ratio_pad,),
+    }
+
+
+def test_batch_augment_parity():
+    """BatchAugment warps, HSV gains and mosaic layout match the per-sample OpenCV augmentations."""
+    import random
+
+    from ultralytics.cfg import get_cfg
+    from ultralytics.data.augment import BatchAugment, Format, RandomHSV, RandomPerspective
+    from ultralytics.utils.instance import Instances
+    from ultralytics.utils.metrics import batch_probiou
+    from ultralytics.utils.ops import resample_segments, segments2boxes, xywhr2xyxyxyxy
+
+    s, n = 256, 20
+    rng = np.random.default_rng(0)
+    img = cv2.GaussianBlur(rng.integers(0, 255, (s, s, 3), dtype=np.uint8), (0, 0), 3)
+    hyp = get_cfg(overrides={"mosaic": 0.0, "hsv_h": 0.0, "hsv_s": 0.0, "hsv_v": 0.0, "fliplr": 0.0, "bgr": 1.0})
+    for obb in (False, True):
+        for seed in range(4):
+            xywhr = np.concatenate(
+                (rng.uniform(20, s - 20, (n, 2)), rng.uniform(8, 60, (n, 2)), rng.uniform(0, math.pi / 2, (n, 1))), 1
+            ).astype(np.float32)
+            corners = xywhr2xyxyxyxy(xywhr)
+            if obb:  # like YOLODataset OBB labels
+                segments = np.stack(resample_segments(list(corners), n=100))
+                instances = Instances(segments2boxes(segments), segments, bbox_format="xywh", normalized=False)
+                bboxes = torch.from_numpy(xywhr) / torch.tensor([s, s, s, s, 1])
+            else:
+                xyxy = np.concatenate((corners.min(1), corners.max(1)), 1)
+                instances = Instances(xyxy.copy(), np.zeros((0, 1000, 2), np.float32), bbox_format="xyxy")
+                instances.normalized = False
+                bboxes = torch.from_numpy(
+                    np.concatenate(((xyxy[:, :2] + xyxy[:, 2:]) / 2, xyxy[:, 2:] - xyxy[:, :2]), 1)
+                )
+                bboxes /= s
+            perspective = RandomPerspective(degrees=30, translate=0.2, scale=0.5, shear=5)
+            affine, drawn = perspective.affine_transform, {}
+
+            def draw(im, border, affine=affine, drawn=drawn):
+                drawn["im"], drawn["M"], drawn["scale"] = affine(im, border)
+                return drawn["im"], drawn["M"], drawn["scale"]
+
+            perspective.affine_transform = draw
+            random.seed(seed)
+            labels = perspective(
+                {"img": img.copy(), "cls": np.arange(n, dtype=np.float32)[:, None], "instances": instances}
+            )
+            ref = Format(bbox_format="xywh", normalize=True, return_obb=obb, batch_idx=True, bgr=1.0)(labels)
+
+            augment = BatchAugment(s, hyp, obb=obb)  # same matrix as the OpenCV warp
+            augment.affine_matrices = lambda canvas, drawn=drawn: (
+                torch.from_numpy(drawn["M"])[None],
+                torch.tensor([drawn["scale"]]),
+            )
+            out = augment(batch_augment_inputs(img, bboxes))
+            assert (out["img"][0] - ref["img"].float()).abs().mean() < 0.5  # bilinear rounding only
+            assert torch.equal(out["cls"].view(-1), ref["cls"].view(-1))  # same boxes kept
+            if obb:
+                scale = torch.tensor([s, s, s, s, 1], dtype=torch.float64)
+                iou = batch_probiou(out["bboxes"].double() * scale, ref["bboxes"].double() * scale).diagonal()
+                assert (iou > 0.99).all()
+            else:
+                torch.testing.assert_close(out["bboxes"], ref["bboxes"].float(), atol=1e-4, rtol=0)
+
+    # HSV gains in OpenCV 8-bit HSV ranges
+    for seed in range(3):
+        np.random.seed(seed)
+        gains = np.random.uniform(-1, 1, 3) * [0.5, 0.7, 0.4] + 1
+        np.random.seed(seed)
+        ref = RandomHSV(0.5, 0.7, 0.4)({"img": img.copy()})["img"]
+        out = BatchAugment.apply_hsv(
+            batch_augment_inputs(img, [])["img"], torch.tensor(gains, dtype=torch.float32)[None]
+        )
+        assert (out[0].permute(1, 2, 0) - torch.from_numpy(ref)).abs().mean() < 1  # LUT quantization only
+
+    # Minimum area rectangles of warped rectangles
+    rects = torch.cat((torch.rand(100, 2) * s, torch.rand(100, 2) * 50 + 5, torch.rand(100, 1) * 3), 1)
+    pts = xywhr2xyxyxyxy(rects) @ torch.tensor([[1.0, 0.2], [0.1, 0.9]])
+    ref = torch.tensor([[*c, *wh, math.radians(a)] for c, wh, a in map(cv2.minAreaRect, pts.numpy())])
+    assert (batch_probiou(BatchAugment.min_area_rect(pts).double(), ref.double()).diagonal() > 0.999).all()
+
+    # Mosaic tiles of a letterboxed 96x128 image placed around the center like Mosaic._mosaic4
+    hyp = get_cfg(overrides={"mosaic": 1.0, "translate": 0.0, "scale": 0.0, "hsv_h": 0.0, "hsv_s": 0.0, "hsv_v": 0.0})
+    hyp.fliplr, hyp.bgr = 0.0, 1.0
+    im = np.full((128, 128, 3), 114, dtype=np.uint8)
+    im[16:112] = img[:96, :128]
+    augment = BatchAugment(128, hyp)
+    tiles_fn, tiles = augment.mosaic_tiles, []
+    augment.mosaic_tiles = lambda *args: tiles.append(tiles_fn(*args)) or tiles[0]
+    out = augment(batch_augment_inputs(im, torch.tensor([[0.5, 0.5, 0.25, 0.25]]), (192, 256), ((0.5, 0.5), (0, 16))))
+    canvas = np.full((256, 256, 3), 114, dtype=np.uint8)
+    for x, y in tiles[0][1][0].int().tolist():  # source image origins in the canvas
+        y0, y1, x0, x1 = max(y + 16, 0), min(y + 112, 256), max(x, 0), min(x + 128, 256)
+        canvas[y0:y1, x0:x1] = im[y0 - y : y1 - y, x0 - x : x1 - x]
+    assert (out["img"][0].permute(1, 2, 0) - torch.from_numpy(canvas[64:192, 64:192])).abs().max() < 1e-3
+    assert len(out["bboxes"]) and ((out["bboxes"] >= 0) & (out["bboxes"] <= 1)).all()
+
+
+def resample_segments_reference(segments, n=1000):
+    """Per-segment `np.interp` loop implementation of `resample_segments` used as parity and speed baseline."""
+    out = []
+    for s in segments:
+        s = np.concatenate((s, s[0:1, :]), axis=0)
+        x = np.linspace(0, len(s) - 1, n - len(s) if len(s) < n else n)
+        xp = np.arange(len(s))
+        x = np.insert(x, np.searchsorted(x, xp), xp) if len(s) < n else x
+        out.append(np.concatenate([np.interp(x, xp, s[:, i]) for i in range(2)], dtype=np.float32).reshape(2, -1).T)
+    return out
+
+
+def apply_segments_reference(perspective, segments, M):
+    """Homogeneous matrix multiply and per-segment `segment2box` implementation of `apply_segments` as baseline."""
+    from ultralytics.utils.ops import segment2box
+
+    n, num = segments.shape[:2]
+    xy = np.ones((n * num, 3), dtype=segments.dtype)
+    xy[:, :2] = segments.reshape(-1, 2)
+    xy = xy @ M.T
+    segments = (xy[:, :2] / xy[:, 2:3]).reshape(n, -1, 2)
+    bboxes = np.stack([segment2box(xy, *perspective.size) for xy in segments], 0)
+    segments[..., 0] = segments[..., 0].clip(bboxes[:, 0:1], bboxes[:, 2:3])
+    segments[..., 1] = segments[..., 1].clip(bboxes[:, 1:2], bboxes[:, 3:4])
+    return bboxes, segments
+
+
+def crowded_segments(n=100, points=1000, imgsz=640, seed=0):
+    """Resampled random polygons of 3-60 vertices spread over and beyond an `imgsz` image."""
+    from ultralytics.utils.ops import resample_segments
+
+    rng = np.random.default_rng(seed)
+    polygons = []
+    for _ in range(n):
+        t = np.sort(rng.uniform(0, 2 * math.pi, int(rng.integers(3, 60))))
+        c, r = rng.uniform(-0.1, 1.1, 2) * imgsz, rng.uniform(5, 80)
+        polygons.append((c + r * np.stack((np.cos(t), np.sin(t)), -1)).astype(np.float32))
+    return polygons, np.stack(resample_segments([p.copy() for p in polygons], n=points))
+
+
+def test_random_perspective_segments():
+    """Batched segment resampling and RandomPerspective segment and keypoint transforms match the per-segment loops."""
+    from ultralytics.data.augment import RandomPerspective
+
+    polygons, segments = crowded_segments()
+    for n in (4, 100, 1000):
+        ref = resample_segments_reference(polygons, n=n)
+        np.testing.assert_allclose(np.stack(ref), crowded_segments(points=n)[1], atol=1e-3)
+
+    affine = np.array([[0.9, 0.2, 10], [-0.1, 1.1, -20], [0, 0, 1]])
+    for perspective, M in ((0.0, affine), (0.001, affine), (0.001, affine + [[0, 0, 0], [0, 0, 0], [3e-4, 1e-4, 0]])):
+        transform = RandomPerspective(perspective=perspective)
+        transform.size = (640, 640)
+        bboxes, new = transform.apply_segments(segments.copy(), M)
+        ref_bboxes, ref = apply_segments_reference(transform, segments.copy(), M)
+        np.testing.assert_allclose(bboxes, ref_bboxes, atol=1e-3)
+        np.testing.assert_allclose(new, ref, atol=1e-3)
+
+        xy = np.concatenate((segments[:, :17], np.ones_like(segments[:, :17, :1])), -1) @ M.T
+        xy = xy[..., :2] / xy[..., 2:]
+        new = transform.apply_keypoints(np.concatenate((segments[:, :17], np.ones_like(xy[..., :1])), -1), M)
+        np.testing.assert_allclose(new[..., :2], xy, atol=1e-3)
+        assert (new[..., 2] == ((xy >= 0) & (xy <= 640)).all(-1)).all()  # invisible out of the image
+
+
+def collate_reference(batch):
+    """Stack-and-cat `YOLODataset.collate_fn` without shared buffers, used as parity and speed baseline."""
+    new_batch = {}
+    for k, value in zip(batch[0].keys(), zip(*[list(b.values()) for b in batch])):
+        if k in {"img", "edge"}:
+            value = torch.stack(value, 0)
+        elif k in {"masks", "keypoints", "bboxes", "cls", "segments", "obb", "batch_idx"}:
+            value = torch.cat(value, 0)
+        new_batch[k] = value
+    new_batch["batch_idx"] += torch.repeat_interleave(
+        torch.arange(len(batch)), torch.tensor([len(b["batch_idx"]) for b in batch])
+    )
+    return new_batch
+
+
+def collate_samples(b=16, imgsz=64, seed=0):
+    """Formatted detection samples with 0-19 labels each like the output of `Format`."""
+    g = torch.Generator().manual_seed(seed)
+    samples = []
+    for i in range(b):
+        n = int(torch.randint(0, 20, (1,), generator=g))
+        samples.append(
+            {
+                "im_file": f"{i}.jpg",
+                "ori_shape": (imgsz, imgsz),
+                "img": torch.randint(0, 256, (3, imgsz, imgsz), dtype=torch.uint8, generator=g),
+                "cls": torch.randint(0, 80, (n, 1), generator=g).float(),
+                "bboxes": torch.rand(n, 4, generator=g),
+                "batch_idx": torch.zeros(n),
+            }
+        )
+    return samples
+
+
+def test_collate_fn(monkeypatch):
+    """collate_fn matches stack-and-cat, keeps a single image key and shares one label buffer per dtype in workers."""
+    from ultralytics.data.dataset import YOLODataset
+
+    samples = collate_samples()
+    ref, batch = collate_reference(samples), YOLODataset.collate_fn(samples)
+    assert list(batch) == list(samples[0]) and "images" not in batch
+    for k, v in ref.items():
+        assert torch.equal(batch[k], v) if isinstance(v, torch.Tensor) else batch[k] == v
+    assert samples[1]["batch_idx"].eq(0).all()  # samples are not modified
+
+    # A background image without labels first, with a 1-D empty cls, must not resize the output buffers
+    empty = {"cls": torch.zeros(0), "bboxes": torch.zeros(0, 4), "batch_idx": torch.zeros(0)}
+    labeled = {"cls": torch.ones(2, 1), "bboxes": torch.rand(2, 4), "batch_idx": torch.zeros(2)}
+    samples = [{**samples[0], **empty}, {**samples[1], **labeled}]
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")  # deprecated resize of a non-empty out tensor
+        batch = YOLODataset.collate_fn(samples)
+    for k, v in collate_reference(samples).items():
+        assert torch.equal(batch[k], v) if isinstance(v, torch.Tensor) else batch[k] == v
+
+    monkeypatch.setattr(torch.utils.data, "get_worker_info", lambda: object())  # as in a dataloader worker
+    batch = YOLODataset.collate_fn(samples)
+    assert all(batch[k].is_shared() for k in ("img", "cls", "bboxes", "batch_idx"))
+    assert len({batch[k].untyped_storage().data_ptr() for k in ("cls", "bboxes", "batch_idx")}) == 1
+
+
+def test_image_buffer(tmp_path):
+    """ImageBuffer evicts the least recently used image, counts lookups across pickling and prefetches in background."""
+    import pickle
+    from multiprocessing.reduction import ForkingPickler
+
+    from ultralytics.cfg import get_cfg
+    from ultralytics.data.utils import ImageBuffer
+
+    buffer = ImageBuffer(maxlen=3)
+    for i in range(4):
+        buffer.put(i, i)
+    assert list(buffer) == [1, 2, 3] and buffer.get(1) == 1 and buffer.get(0) is None
+    buffer.put(4, 4)  # evicts 2, the least recently used after 1 was read
+    assert list(buffer) == [3, 1, 4]
+    assert buffer.stats() == {"hits": 1, "misses": 1, "evictions": 2, "prefetched": 0}
+    assert buffer.stats() == dict.fromkeys(buffer.keys, 0)  # counts since the previous call
+
+    copy = pickle.loads(ForkingPickler.dumps(buffer))  # like a spawned dataloader worker, counting into shared memory
+    assert len(copy) == 0 and copy.get(4) is None
+    copy.prefetch([5, 6, 5], lambda i: copy.put(i, -i))
+    assert copy.get(5) == -5 and copy.get(6) == -6  # waits for the background loads
+    assert buffer.stats() == {"hits": 2, "misses": 1, "evictions": 0, "prefetched": 2}
+
+    hyp = get_cfg(overrides={"mosaic_buffer": 8, "mosaic_prefetch": True})
+    dataset = image_dataset(tmp_path, augment=True, hyp=hyp)
+    assert dataset.buffer.maxlen == 8
+    for i in range(16):
+        dataset[i]
+    n = dataset.buffer.stats()
+    assert n["hits"] >= 3 * 15 and n["misses"] <= 16 + 3 and len(dataset.buffer) == 8  # prefetched partners hit
+    im, _, hw = dataset.load_image(next(iter(dataset.buffer)))
+    assert dataset.buffer.stats()["hits"] == 1 and im.shape[:2] == hw
+
+
+def dota_dataset(path, n=4, seed=0):
+    """Write a DOTA-style train split of `n` images of mixed sizes with 30 rotated boxes each in pixel coordinates."""
+    rng = np.random.default_rng(seed)
+    (path / "images" / "train").mkdir(parents=True)
+    (path / "labels" / "train").mkdir(parents=True)
+    for i in range(n):
+        h, w = ((600, 900), (900, 600), (600, 900), (1200, 1300))[i % 4]
+        cv2.imwrite(str(path / "images" / "train" / f"{i}.png"), rng.integers(0, 256, (h, w, 3), dtype=np.uint8))
+        with open(path / "labels" / "train" / f"{i}.txt", "w") as f:
+            for _ in range(30):
+                c, s, a = rng.uniform(0, 1, 2) * (w, h), rng.uniform(10, 120, 2), rng.uniform(0, 180)
+                p = cv2.boxPoints(((c[0], c[1]), (s[0], s[1]), a)) / (w, h)
+                f.write(f"{rng.integers(0, 15)} {' '.join(f'{x:.6f}' for x in p.reshape(-1))}\n")
+
+
+def bbox_iof_reference(polygons, windows):
+    """Per-pair OpenCV convex intersection IoF used as parity and speed baseline, shapely is not required."""
+    iofs = np.zeros((len(polygons), len(windows)))
+    for i, p in enumerate(polygons.reshape(-1, 4, 2).astype(np.float32)):
+        area = max(cv2.contourArea(p), 1e-6)
+        for j, (x0, y0, x1, y1) in enumerate(windows.astype(np.float32)):
+            rect = np.array([[x0, y0], [x1, y0], [x1, y1], [x0, y1]], dtype=np.float32)
+            iofs[i, j] = cv2.intersectConvexConvex(p, rect)[0] / area
+    return iofs
+
+
+def test_split_dota(tmp_path, monkeypatch):
+    """Polygon clipping IoF matches OpenCV, parallel splitting matches serial and an interrupted split resumes."""
+    from ultralytics.data import split_dota
+
+    rng = np.random.default_rng(0)
+    rects = zip(rng.uniform(-50, 350, (200, 2)), rng.uniform(2, 150, (200, 2)), rng.uniform(0, 180, 200))
+    polygons = np.stack([cv2.boxPoints((tuple(c), tuple(s), a)) for c, s, a in rects]).reshape(-1, 8)
+    windows = np.array([[0, 0, 128, 128], [100, 50, 228, 178], [150, 150, 300, 300], [-20, 0, 400, 400]])
+    np.testing.assert_allclose(split_dota.bbox_iof(polygons, windows), bbox_iof_reference(polygons, windows), atol=1e-5)
+    assert split_dota.bbox_iof(polygons, windows[0]).shape == (200, 1)
+    concave = np.array([[0, 0, 100, 0, 50, 50, 0, 100]], dtype=np.float32)  # 5000 area, 1250 of it right of x=50
+    np.testing.assert_allclose(split_dota.bbox_iof(concave, np.array([[50, 0, 100, 100]])), [[0.25]])
+
+    dota_dataset(tmp_path / "DOTA")
+    for workers in (0, 2):
+        split_dota.split_images_and_labels(
+            tmp_path / "DOTA", tmp_path / f"split{workers}", crop_sizes=(512, 1024), gaps=(100, 200), workers=workers
+        )
+    files = sorted(x.relative_to(tmp_path / "split0") for x in (tmp_path / "split0").rglob("*.*"))
+    assert files == sorted(x.relative_to(tmp_path / "split2") for x in (tmp_path / "split2").rglob("*.*"))
+    sizes = ((600, 900), (900, 600), (600, 900), (1200, 1300))
+    n = sum(len(split_dota.get_windows(hw, (512, 1024), (100, 200))) for hw in sizes)
+    assert len([f for f in files if f.suffix == ".jpg"]) == n
+    for f in files:
+        if f.suffix == ".txt":
+            assert (tmp_path / "split0" / f).read_text() == (tmp_path / "split2" / f).read_text()
+
+    calls = []
+    monkeypatch.setattr(
+        split_dota, "split_image", lambda im_file, **kwargs: calls.append(im_file) or (Path(im_file).name, 0)
+    )
+    manifest = tmp_path / "split0" / "train.manifest"
+    lines = manifest.read_text().splitlines()
+    manifest.write_text("\n".join(lines[:3]) + '\n{"file": "3.p')  # interrupted after two images, last line cut short
+    split_dota.split_images_and_labels(
+        tmp_path / "DOTA", tmp_path / "split0", crop_sizes=(512, 1024), gaps=(100, 200), workers=0
+    )
+    assert len(calls) == 2 and len(manifest.read_text().splitlines()) == 5
+    split_dota.split_images_and_labels(
+        tmp_path / "DOTA", tmp_path / "split0", crop_sizes=(512,), gaps=(100,), workers=0
+    )
+    assert len(calls) == 6  # other settings split everything again
+
+
+def nms_rotated_reference(boxes, scores, threshold=0.45, greedy=False):
+    """Dense fast-NMS over the full probiou matrix, or a per-box greedy loop, used as parity and speed baselines."""
+    from ultralytics.utils.metrics import batch_probiou
+
+    order = scores.argsort(descending=True)
+    ious = batch_probiou(boxes[order], boxes[order])
+    if not greedy:
+        return order[torch.nonzero(ious.triu_(diagonal=1).max(dim=0)[0] < threshold).squeeze_(-1)]
+    keep = []
+    for i in range(len(order)):
+        if not keep or ious[keep, i].max() < threshold:
+            keep.append(i)
+    return order[keep]
+
+
+def rotated_candidates(n=2000, imgsz=640, seed=0):
+    """Clustered rotated boxes and scores like raw OBB predictions, about 20 candidates per object."""
+    g = torch.Generator().manual_seed(seed)
+    centers = torch.rand(n // 20 + 1, 2, generator=g) * imgsz
+    xy = centers.repeat_interleave(20, 0)[:n] + torch.randn(n, 2, generator=g) * 4
+    wh = torch.rand(n // 20 + 1, 2, generator=g).repeat_interleave(20, 0)[:n] * 60 + 10 + torch.randn(n, 2, generator=g)
+    r = (
+        torch.rand(n // 20 + 1, 1, generator=g).repeat_interleave(20, 0)[:n] * math.pi
+        + torch.randn(n, 1, generator=g) * 0.1
+    )
+    return torch.cat((xy, wh, r), 1), torch.rand(n, generator=g)
+
+
+def test_nms_rotated():
+    """Tiled rotated NMS matches dense fast-NMS and greedy NMS, per group and across a batch in non_max_suppression."""
+    from ultralytics.utils.ops import nms_rotated, non_max_suppression
+
+    boxes, scores = rotated_candidates(1000)
+    for tile in (64, 300, 4096):
+        assert torch.equal(nms_rotated(boxes, scores, tile=tile), nms_rotated_reference(boxes, scores))
+        assert torch.equal(
+            nms_rotated(boxes, scores, tile=tile, greedy=True), nms_rotated_reference(boxes, scores, greedy=True)
+        )
+    groups = torch.arange(len(boxes)) % 7
+    for greedy in (False, True):
+        ref = torch.cat(
+            [
+                torch.nonzero(groups == k)[:, 0][
+                    nms_rotated_reference(boxes[groups == k], scores[groups == k], greedy=greedy)
+                ]
+                for k in range(7)
+            ]
+        )
+        assert torch.equal(
+            nms_rotated(boxes, scores, idxs=groups, tile=100, greedy=greedy), ref[scores[ref].argsort(descending=True)]
+        )
+    assert nms_rotated(boxes[:0], scores[:0]).shape == (0,)
+
+    nc, bs = 3, 4
+    prediction = torch.zeros(bs, 4 + nc + 1, len(boxes))  # (xywh, classes, angle) per anchor
+    for b in range(bs):
+        perm = torch.randperm(len(boxes), generator=torch.Generator().manual_seed(b))
+        prediction[b, :4], prediction[b, -1] = boxes[perm, :4].T, boxes[perm, 4]
+        prediction[b, 4 + (perm % nc), torch.arange(len(boxes))] = scores[perm]
+    prediction[2, 4:-1] = 0  # no candidates in one image
+    output = non_max_suppression(prediction.clone(), 0.25, 0.45, nc=nc, max_det=100, rotated=True)
+    assert len(output) == bs and output[2].shape == (0, 7)
+    for b, out in enumerate(output):
+        if b == 2:
+            continue
+        x = prediction[b].T
+        x = x[x[:, 4:-1].amax(1) > 0.25]
+        conf, j = x[:, 4:-1].max(1)
+        c = j[:, None] * 7680.0
+        i = nms_rotated_reference(torch.cat((x[:, :2] + c, x[:, 2:4], x[:, -1:]), 1), conf)[:100]
+        ref = torch.cat((x[i, :4], conf[i, None], j[i, None].float(), x[i, -1:]), 1)
+        assert torch.equal(out, ref)
+
+
+def non_max_suppression_reference(
+    prediction,
+    conf_thres=0.25,
+    iou_thres=0.45,
+    classes=None,
+    agnostic=False,
+    multi_label=False,
+    labels=(),
+    max_det=300,
+    nc=0,
+    max_nms=30000,
+    max_wh=7680,
+):
+    """Per-image loop implementation of `ops.non_max_suppression` for detection used as parity and speed baseline."""
+    import torchvision
+
+    from ultralytics.utils.ops import xywh2xyxy
+
+    nc = nc or (prediction.shape[1] - 4)
+    nm = prediction.shape[1] - nc - 4
+    xc = prediction[:, 4 : 4 + nc].amax(1) > conf_thres
+    multi_label &= nc > 1
+    prediction = prediction.transpose(-1, -2).clone()
+    prediction[..., :4] = xywh2xyxy(prediction[..., :4])
+    output = [torch.zeros((0, 6 + nm), device=prediction.device)] * len(prediction)
+    for xi, x in enumerate(prediction):
+        x = x[xc[xi]]
+        if labels and len(labels[xi]):
+            lb = labels[xi]
+            v = torch.zeros((len(lb), nc + nm + 4), device=x.device)
+            v[:, :4] = xywh2xyxy(lb[:, 1:5])
+            v[range(len(lb)), lb[:, 0].long() + 4] = 1.0
+            x = torch.cat((x, v), 0)
+        box, cls, mask = x.split((4, nc, nm), 1)
+        if multi_label:
+            i, j = torch.where(cls > conf_thres)
+            x = torch.cat((box[i], x[i, 4 + j, None], j[:, None].float(), mask[i]), 1)
+        else:
+            conf, j = cls.max(1, keepdim=True)
+            x = torch.cat((box, conf, j.float(), mask), 1)[conf.view(-1) > conf_thres]
+        if classes is not None:
+            x = x[(x[:, 5:6] == torch.tensor(classes, device=x.device)).any(1)]
+        if not len(x):
+            continue
+        if len(x) > max_nms:
+            x = x[x[:, 4].argsort(descending=True)[:max_nms]]
+        c = x[:, 5:6] * (0 if agnostic else max_wh)
+        output[xi] = x[torchvision.ops.nms(x[:, :4] + c, x[:, 4], iou_thres)[:max_det]]
+    return output
+
+
+def detect_predictions(bs=4, anchors=8400, nc=80, nm=0, imgsz=640, seed=0):
+    """Raw (bs, 4 + nc + nm, anchors) detection outputs with 40 anchors per object, a quarter of them confident."""
+    g = torch.Generator().manual_seed(seed)
+    objects = torch.rand(bs, anchors // 40 + 1, 4, generator=g) * torch.tensor([imgsz, imgsz, 120, 120]) + 8
+    xywh = objects.repeat_interleave(40, 1)[:, :anchors] + torch.randn(bs, anchors, 4, generator=g) * 3
+    scores = torch.rand(bs, anchors, nc, generator=g) * 0.2  # background
+    cls = torch.randint(0, nc, (bs, anchors // 40 + 1, 1), generator=g).repeat_interleave(40, 1)[:, :anchors]
+    obj = torch.rand(bs, anchors, 1, generator=g) < 0.25
+    scores.scatter_(2, cls, torch.where(obj, torch.rand(bs, anchors, 1, generator=g) * 0.8 + 0.2, 0.0))
+    masks = torch.randn(bs, anchors, nm, generator=g)
+    return torch.cat((xywh, scores, masks), -1).transpose(1, 2).contiguous()
+
+
+def test_non_max_suppression_batched():
+    """Batched non_max_suppression matches the per-image loop for all options, and for images without candidates."""
+    from ultralytics.utils.ops import non_max_suppression
+
+    prediction = detect_predictions(bs=4, anchors=2000, nc=5, nm=3)
+    prediction[1, 4:9] = 0  # no candidates in one image
+    labels = [
+        torch.tensor([[1, 100, 100, 50, 50]]),
+        torch.zeros((0, 5)),
+        torch.tensor([[0, 10, 10, 5, 5], [3, 50, 50, 20, 20]]),
+        torch.zeros((0, 5)),
+    ]
+    for kwargs in (
+        {},
+        {"multi_label": True},
+        {"agnostic": True},
+        {"classes": [1, 3]},
+        {"max_det": 7, "max_nms": 50},
+        {"labels": labels, "conf_thres": 0.5},
+        {"conf_thres": 1.0},
+    ):
+        output = non_max_suppression(prediction.clone(), nc=5, **kwargs)
+        ref = non_max_suppression_reference(prediction.clone(), nc=5, **kwargs)
+        assert len(output) == len(ref) == 4 and output[1].shape == (0, 9)
+        for out, r in zip(output, ref):
+            assert torch.equal(out, r), kwargs
+
+
+def batch_probiou_reference(obb1, obb2, eps=1e-7):
+    """Pairwise probiou recomputing both covariances on every call, used as parity and speed baseline."""
+    from ultralytics.utils.metrics import _get_covariance_matrix
+
+    x1, y1 = obb1[..., :2].split(1, dim=-1)
+    x2, y2 = (x.squeeze(-1)[None] for x in obb2[..., :2].split(1, dim=-1))
+    a1, b1, c1 = _get_covariance_matrix(obb1)
+    a2, b2, c2 = (x.squeeze(-1)[None] for x in _get_covariance_matrix(obb2))
+    det = (a1 + a2) * (b1 + b2) - (c1 + c2).pow(2)
+    t1 = (((a1 + a2) * (y1 - y2).pow(2) + (b1 + b2) * (x1 - x2).pow(2)) / (det + eps)) * 0.25
+    t2 = (((c1 + c2) * (x2 - x1) * (y1 - y2)) / (det + eps)) * 0.5
+    t3 = (
+        det / (4 * ((a1 * b1 - c1.pow(2)).clamp_(0) * (a2 * b2 - c2.pow(2)).clamp_(0)).sqrt() + eps) + eps
+    ).log() * 0.5
+    return 1 - (1.0 - (-(t1 + t2 + t3).clamp(eps, 100.0)).exp() + eps).sqrt()
+
+
+def select_candidates_in_rotated_gts_reference(xy_centers, gt_bboxes):
+    """Corner dot-product test of anchors inside rotated boxes over (b, n, h*w, 2) tensors, used as parity baseline."""
+    from ultralytics.utils.ops import xywhr2xyxyxyxy
+
+    a, b, _, d = xywhr2xyxyxyxy(gt_bboxes).split(1, dim=-2)
+    ab, ad, ap = b - a, d - a, xy_centers - a
+    ap_dot_ab, ap_dot_ad = (ap * ab).sum(dim=-1), (ap * ad).sum(dim=-1)
+    return (ap_dot_ab >= 0) & (ap_dot_ab <= (ab * ab).sum(-1)) & (ap_dot_ad >= 0) & (ap_dot_ad <= (ad * ad).sum(-1))
+
+
+def xray_scene(bs=8, n=300, nc=10, imgsz=640, seed=0):
+    """Assigner inputs for dense scenes of `n` small rotated objects per image, with predictions near the anchors."""
+    from ultralytics.utils.tal import make_anchors
+
+    g = torch.Generator().manual_seed(seed)
+    feats = [torch.zeros(1, 1, imgsz // s, imgsz // s) for s in (8, 16, 32)]
+    anc_points, stride = make_anchors(feats, torch.tensor([8.0, 16.0, 32.0]))
+    anc_points, na = anc_points * stride, len(anc_points)
+    gt_bboxes = torch.cat(
+        (
+            torch.rand(bs, n, 2, generator=g) * imgsz,
+            torch.rand(bs, n, 2, generator=g) * 40 + 8,
+            torch.rand(bs, n, 1, generator=g) * math.pi / 2,
+        ),
+        -1,
+    )
+    pd_bboxes = torch.cat(
+        (
+            anc_points.expand(bs, -1, -1) + torch.randn(bs, na, 2, generator=g) * 2,
+            torch.rand(bs, na, 2, generator=g) * 40 + 8,
+            torch.rand(bs, na, 1, generator=g) * math.pi / 2,
+        ),
+        -1,
+    )
+    pd_scores = torch.rand(bs, na, nc, generator=g)
+    gt_labels = torch.randint(0, nc, (bs, n, 1), generator=g)
+    mask_gt = (torch.arange(n)[None, :, None] < torch.randint(n // 2, n + 1, (bs, 1, 1), generator=g)).float()
+    return pd_scores, pd_bboxes, anc_points, gt_labels, gt_bboxes, mask_gt
+
+
+def test_prepared_probiou(monkeypatch):
+    """Prepared OBBs give the same probiou, pruned pairs are below the threshold and rotated assignments unchanged."""
+    from ultralytics.utils.metrics import batch_probiou, prepare_obb, probiou, probiou_candidates
+    from ultralytics.utils.tal import RotatedTaskAlignedAssigner, TaskAlignedAssigner
+
+    boxes, _ = rotated_candidates(1000)
+    ref = batch_probiou_reference(boxes, boxes[:300])
+    prepared = prepare_obb(boxes)
+    assert prepared.shape == (1000, 10) and prepare_obb(prepared) is prepared
+    torch.testing.assert_close(batch_probiou(boxes, boxes[:300]), ref)
+    torch.testing.assert_close(batch_probiou(prepared, prepared[:300]), ref)
+    torch.testing.assert_close(probiou(prepared[:300], boxes[:300])[:, 0], ref.diagonal())
+    torch.testing.assert_close(
+        probiou(boxes[:300], boxes[:300], CIoU=True), probiou(prepared[:300], prepared[:300], CIoU=True)
+    )
+    for threshold in (0.0, 0.01, 0.3, 0.7):
+        near = probiou_candidates(prepared, prepared[:300], threshold)
+        assert (ref[~near] < max(threshold, 1e-6)).all() and near.float().mean() < 0.5
+        iou = batch_probiou(boxes, boxes[:300], threshold=threshold)
+        assert (
+            torch.equal(iou >= threshold, ref >= threshold)
+            if threshold
+            else torch.equal(iou[near], batch_probiou(boxes, boxes[:300])[near])
+        )
+
+    inputs = xray_scene(bs=2, n=50, imgsz=320)
+    mask = RotatedTaskAlignedAssigner.select_candidates_in_gts(inputs[2], inputs[4])
+    assert torch.equal(mask, select_candidates_in_rotated_gts_reference(inputs[2], inputs[4])) and mask.any()
+    assigner = RotatedTaskAlignedAssigner(topk=10, num_classes=10, alpha=0.5, beta=6.0)
+    out = assigner(*inputs)
+    monkeypatch.setattr(RotatedTaskAlignedAssigner, "get_box_metrics", TaskAlignedAssigner.get_box_metrics)
+    monkeypatch.setattr(
+        RotatedTaskAlignedAssigner, "select_candidates_in_gts", staticmethod(select_candidates_in_rotated_gts_reference)
+    )
+    for a, b in zip(out, assigner(*inputs)):
+        torch.testing.assert_close(a, b)
+
+
+def image_folder(path, n=16, shape=(480, 640), seed=0):
+    """Folder of `n` smooth random JPEG images of `shape`, compressible like photos, under `path`."""
+    rng = np.random.default_rng(seed)
+    path.mkdir(parents=True, exist_ok=True)
+    for i in range(n):
+        im = rng.integers(0, 255, (shape[0] // 16, shape[1] // 16, 3), dtype=np.uint8)
+        cv2.imwrite(str(path / f"{i}.jpg"), cv2.resize(im, shape[::-1], interpolation=cv2.INTER_CUBIC))
+    return path
+
+
+def frame_video(file, n=60, shape=(120, 160), fourcc="MJPG", texture=0):
+    """Video of `n` frames whose brightness encodes the frame index, plus a moving random `texture` of that size."""
+    noise = np.random.default_rng(0).integers(-texture, texture + 1, (shape[0], shape[1] * 2, 3)) if texture else 0
+    writer = cv2.VideoWriter(str(file), cv2.VideoWriter_fourcc(*fourcc), 30, shape[::-1])
+    for i in range(n):
+        im = np.full((*shape, 3), i * 4 % 256) + (noise[:, i % shape[1] :][:, : shape[1]] if texture else 0)
+        writer.write(im.clip(0, 255).astype(np.uint8))
+    writer.release()
+    return file
+
+
+def test_parallel_image_loading(tmp_path):
+    """Threaded decoding returns the same batches, reduced decoding keeps imgsz and seeking returns grabbed frames."""
+    from ultralytics.data.loaders import LoadImagesAndVideos
+
+    folder = image_folder(tmp_path / "images", n=11)
+    cv2.imwrite(str(folder / "z.png"), np.zeros((480, 640, 3), dtype=np.uint8))
+
+    def batches(loader):
+        return [(paths, [im.copy() for im in ims], info) for paths, ims, info in loader]
+
+    ref = batches(LoadImagesAndVideos(str(folder), batch=4))
+    loader = LoadImagesAndVideos(str(folder), batch=4, workers=3, read_ahead=5)
+    for _ in range(2):  # iterating again restarts decoding
+        for (paths, ims, info), (ref_paths, ref_ims, ref_info) in zip(batches(loader), ref, strict=True):
+            assert paths == ref_paths and info == ref_info
+            assert all((a == b).all() for a, b in zip(ims, ref_ims))
+    next(iter(loader))
+    assert sorted(loader.reads) == [4, 5, 6, 7]  # the read-ahead window includes the image being returned
+
+    # JPEGs are decoded at the largest reduction that still covers imgsz, other formats at full resolution
+    shapes = {
+        Path(p).suffix: im.shape for p, im in zip(*next(iter(LoadImagesAndVideos(str(folder), 12, imgsz=100)))[:2])
+    }
+    assert shapes == {".jpg": (120, 160, 3), ".png": (480, 640, 3)}
+    assert next(iter(LoadImagesAndVideos(str(folder), 1, imgsz=(320, 256))))[1][0].shape == (480, 640, 3)
+    reduced = next(iter(LoadImagesAndVideos(str(folder), 1, imgsz=200)))[1][0]
+    full = cv2.resize(ref[0][1][0], (320, 240), interpolation=cv2.INTER_AREA)
+    assert reduced.shape == full.shape and np.abs(reduced.astype(int) - full).mean() < 4
+
+    # Seeking for large strides returns the frames grabbing reaches
+    video = str(frame_video(tmp_path / "video.avi"))
+    grabbed = [ims[0].mean() for _, ims, _ in LoadImagesAndVideos(video, vid_stride=7)]
+    loader = LoadImagesAndVideos(video, vid_stride=7)
+    loader.seek_stride = 7
+    assert [ims[0].mean() for _, ims, _ in loader] == pytest.approx(grabbed, abs=2)
+    assert grabbed == pytest.approx([i * 4 for i in range(6, 60, 7)], abs=2)
+
+
+def heatmap_post_process_reference(task, nc, result, end2end=False):
+    """Single-image Grad-CAM post_process of yolov11_heatmap: predictions of image 0 sorted by confidence."""
+    if end2end:
+        logits, boxes = result[0, :, 4:], result[0, :, :4]
+        return logits[logits[:, 0].argsort(descending=True)], boxes[logits[:, 0].argsort(descending=True)]
+    preds = result[0] if task == "segment" else result
+    logits, boxes, extra = preds[0, 4 : 4 + nc].T, preds[0, :4].T, preds[0, 4 + nc :].T
+    i = logits.max(1)[0].argsort(descending=True)
+    if task == "segment":
+        mask_p, mask_nm = result[1][2].squeeze(), result[1][1].squeeze().T
+        return logits[i], boxes[i], (mask_nm @ mask_p.view(mask_p.shape[0], -1))[i]
+    return (logits[i], boxes[i], extra[i]) if task in {"pose", "obb"} else (logits[i], boxes[i])
+
+
+def heatmap_target_reference(output_type, conf, ratio, data, end2end=False):
+    """Per-prediction Grad-CAM target loop that stops at the first prediction below conf."""
+    post_result, boxes, *extra = data
+    result = []
+    for i in range(int(post_result.size(0) * ratio)):
+        score = post_result[i, 0] if end2end else post_result[i].max()
+        if float(score) < conf:
+            break
+        if output_type in {"class", "all"}:
+            result.append(score)
+        elif output_type == "box":
+            result.extend(boxes[i])
+        elif output_type in {"segment", "pose"}:
+            result.append(extra[0][i].mean())
+        elif output_type == "obb":
+            result.append(extra[0][i].sum())
+    return float(sum(result))
+
+
+def test_heatmap_batched_parity():
+    """Test batched Grad-CAM post_process, targets and box renormalization against the per-image implementation."""
+    pytest.importorskip("pytorch_grad_cam")
+    from types import SimpleNamespace
+
+    from pytorch_grad_cam.utils.image import scale_cam_image, show_cam_on_image
+
+    from ultralytics import yolov11_heatmap as heatmap
+
+    torch.manual_seed(0)
+    bs, nc, anchors, nm = 3, 3, 400, 8
+    outputs = {"detect": 0, "pose": 51, "obb": 1, "segment": 0}
+    targets = {"detect": "box", "pose": "pose", "obb": "obb", "segment": "segment"}
+    for task, extra in outputs.items():
+        result = torch.rand(bs, 4 + nc + extra, anchors)
+        if task == "segment":
+            result = (result, (None, torch.randn(bs, nm, anchors), torch.randn(bs, nm, 16, 16)))
+        grads = heatmap.ActivationsAndGradients.__new__(heatmap.ActivationsAndGradients)
+        grads.model = SimpleNamespace(end2end=False, task=task, nc=nc)
+        batched = grads.post_process(result)
+        target_cls = getattr(heatmap, f"yolo_{task}_target")
+        for i, data in enumerate(batched):
+            image = (
+                (result[0][i : i + 1], [x if x is None else x[i : i + 1] for x in result[1]])
+                if task == "segment"
+                else result[i : i + 1]
+            )
+            ref = heatmap_post_process_reference(task, nc, image)
+            assert all(torch.equal(a, b) for a, b in zip(data[:2], ref[:2]))
+            if task == "segment":  # batched masks are reduced to their mean
+                assert torch.allclose(data[2][:, 0], ref[2].mean(1), atol=1e-5)
+            elif task != "detect":
+                assert torch.equal(data[2], ref[2])
+            shuffle = torch.randperm(anchors)  # unsorted predictions stop at the first one below conf
+            for output_type in "class", "all", "box", targets[task]:
+                target = target_cls(output_type, 0.5, 0.5, False)
+                assert float(target(data)) == pytest.approx(
+                    heatmap_target_reference(output_type, 0.5, 0.5, ref), rel=1e-5
+                )
+                assert float(target([x[shuffle] for x in data])) == pytest.approx(
+                    heatmap_target_reference(output_type, 0.5, 0.5, [x[shuffle] for x in data]), rel=1e-5
+                )
+
+    # End-to-end detect outputs are sorted by the first logit
+    result = torch.rand(bs, anchors, 4 + nc)
+    grads.model = SimpleNamespace(end2end=True, task="detect", nc=nc)
+    for i, data in enumerate(grads.post_process(result)):
+        ref = heatmap_post_process_reference("detect", nc, result[i : i + 1], end2end=True)
+        assert all(torch.equal(a, b) for a, b in zip(data, ref))
+        target = heatmap.yolo_detect_target("class", 0.5, 0.5, True)
+        assert float(target(data)) == pytest.approx(heatmap_target_reference("class", 0.5, 0.5, ref, end2end=True))
+
+    # Box renormalization, rows normalized like scale_cam_image on a 2D CAM
+    rng = np.random.default_rng(0)
+    images, cams = rng.random((bs, 64, 96, 3), dtype=np.float32), rng.random((bs, 64, 96), dtype=np.float32)
+    boxes = [
+        np.array([[5, 4, 40, 30], [30, 20, 120, 80]], np.int32),
+        np.zeros((0, 4), np.int32),
+        np.array([[0, 0, 96, 64]], np.int32),
+    ]
+    for image, cam, b, out in zip(
+        images, cams, boxes, heatmap.yolo_heatmap.renormalize_cam_in_bounding_boxes(None, boxes, images, cams)
+    ):
+        renormalized = np.zeros(cam.shape, dtype=np.float32)
+        for x1, y1, x2, y2 in b:
+            x1, y1, x2, y2 = max(x1, 0), max(y1, 0), min(cam.shape[1] - 1, x2), min(cam.shape[0] - 1, y2)
+            renormalized[y1:y2, x1:x2] = scale_cam_image(cam[y1:y2, x1:x2].copy())
+        ref = show_cam_on_image(image, scale_cam_image(renormalized), use_rgb=True)
+        assert np.abs(out.astype(int) - ref).max() <= 1
+
+
+def test_micro_batcher_errors():
+    """A failing batch fails only its own requests and the website batcher keeps serving later ones."""
+    pytest.importorskip("flask")
+    from types import SimpleNamespace
+
+    import website
+
+    calls = []
+
+    def predict(images, verbose=False):
+        calls.append(len(images))
+        if len(calls) == 1:
+            raise IndexError("model internals")  # not a typical inference error
+        return [f"result {i}" for i in range(len(images))]
+
+    batcher = website.MicroBatcher(SimpleNamespace(predict=predict), max_batch=4, max_wait=0.0, timeout=5)
+    with pytest.raises(IndexError, match="model internals"):
+        batcher.predict("a")
+    assert batcher.predict("b") == "result 0" and batcher.thread.is_alive()
+    batcher.stop()
+    with pytest.raises(website.BatcherStopped):
+        batcher.submit("c")
@@ -177,6 +177,7 @@ CFG_FRACTION_KEYS = {  # fractional float arguments with 0.0<=values<=1.0
     "conf",
     "iou",
     "fraction",
+    "tile_overlap",
 }
 CFG_INT_KEYS = {  # integer-only arguments
     "epochs",
@@ -184,9 +185,15 @@ CFG_INT_KEYS = {  # integer-only arguments
     "workers",
     "seed",
     "close_mosaic",
+    "mosaic_buffer",
     "mask_ratio",
     "max_det",
     "vid_stride",
+    "tile",
+    "tile_batch",
+    "pipeline",
+    "decode_workers",
+    "read_ahead",
     "line_width",
     "nbs",
     "save_period",
@@ -226,6 +233,11 @@ CFG_BOOL_KEYS = {  # boolean-only arguments
     "nms",
     "profile",
     "multi_scale",
+    "batch_augment",
+    "mosaic_prefetch",
+    "edge_map",
+    "tile_full",
+    "reduced_decode",
 }
 
 
@@ -8,6 +8,7 @@ from typing import Tuple, Union
 import cv2
 import numpy as np
 import torch
+import torch.nn.functional as F
 from PIL import Image
 
 from ultralytics.data.utils import polygons2masks, polygons2masks_overlap
@@ -15,7 +16,7 @@ from ultralytics.utils import LOGGER, colorstr
 from ultralytics.utils.checks import check_version
 from ultralytics.utils.instance import Instances
 from ultralytics.utils.metrics import bbox_ioa
-from ultralytics.utils.ops import segment2box, xyxyxyxy2xywhr
+from ultralytics.utils.ops import xywh2xyxy, xywhr2xyxyxyxy, xyxy2xywh, xyxyxyxy2xywhr
 from ultralytics.utils.torch_utils import TORCHVISION_0_10, TORCHVISION_0_11, TORCHVISION_0_13
 
 DEFAULT_MEAN = (0.0, 0.0, 0.0)
@@ -499,6 +500,8 @@ class Mosaic(BaseMixTransform):
         p (float): Probability of applying the mosaic augmentation. Must be in the range 0-1.
         n (int): The grid size, either 4 (for 2x2) or 9 (for 3x3).
         border (Tuple[int, int]): Border size for width and height.
+        prefetch (bool): Whether the partner images of the next mosaic are drawn ahead and loaded in the background.
+        next_indexes (List[int] | None): Partner indexes drawn for the next mosaic if prefetching.
 
     Methods:
         get_indexes: Returns a list of random indexes from the dataset.
@@ -516,7 +519,7 @@ class Mosaic(BaseMixTransform):
         >>> augmented_labels = mosaic_aug(original_labels)
     """
 
-    def __init__(self, dataset, imgsz=640, p=1.0, n=4):
+    def __init__(self, dataset, imgsz=640, p=1.0, n=4, prefetch=False):
         """
         Initializes the Mosaic augmentation object.
 
@@ -528,6 +531,8 @@ class Mosaic(BaseMixTransform):
             imgsz (int): Image size (height and width) after mosaic pipeline of a single image.
             p (float): Probability of applying the mosaic augmentation. Must be in the range 0-1.
             n (int): The grid size, either 4 (for 2x2) or 9 (for 3x3).
+            prefetch (bool): If True, partner images are drawn from the whole dataset one mosaic ahead and loaded into
+                the dataset buffer on a background thread, instead of being drawn from the buffer.
 
         Examples:
             >>> from ultralytics.data.augment import Mosaic
@@ -540,17 +545,20 @@ class Mosaic(BaseMixTransform):
         self.imgsz = imgsz
         self.border = (-imgsz // 2, -imgsz // 2)  # width, height
         self.n = n
+        self.prefetch = prefetch
+        self.next_indexes = None
 
     def get_indexes(self, buffer=True):
         """
         Returns a list of random indexes from the dataset for mosaic augmentation.
 
         This method selects random image indexes either from a buffer or from the entire dataset, depending on
-        the 'buffer' parameter. It is used to choose images for creating mosaic augmentations.
+        the 'buffer' parameter. It is used to choose images for creating mosaic augmentations. When prefetching,
+        the indexes drawn at the previous call are returned and the next ones start loading in the background.
 
         Args:
-            buffer (bool): If True, selects images from the dataset buffer. If False, selects from the entire
-                dataset.
+            buffer (bool): If True, selects images from the dataset buffer, or from the entire dataset while the
+                buffer is empty, e.g. for datasets cached in RAM. If False, selects from the entire dataset.
 
         Returns:
             (List[int]): A list of random image indexes. The length of the list is n-1, where n is the number
@@ -561,7 +569,12 @@ class Mosaic(BaseMixTransform):
             >>> indexes = mosaic.get_indexes()
             >>> print(len(indexes))  # Output: 3
         """
-        if buffer:  # select images from buffer
+        if self.prefetch:  # select any images one mosaic ahead, they load in the background meanwhile
+            indexes = self.next_indexes or [random.randint(0, len(self.dataset) - 1) for _ in range(self.n - 1)]
+            self.next_indexes = [random.randint(0, len(self.dataset) - 1) for _ in range(self.n - 1)]
+            self.dataset.buffer.prefetch(self.next_indexes, self.dataset.load_image)
+            return indexes
+        if buffer and len(self.dataset.buffer):  # select images from buffer
             return random.choices(list(self.dataset.buffer), k=self.n - 1)
         else:  # select any images
             return [random.randint(0, len(self.dataset) - 1) for _ in range(self.n - 1)]
@@ -1117,6 +1130,9 @@ class RandomPerspective:
         This function applies affine transformations to input segments and generates new bounding boxes based on
         the transformed segments. It clips the transformed segments to fit within the new bounding boxes.
 
+        All points are transformed by one matrix multiply, without homogeneous coordinates for affine transforms, and
+        only the segments whose boxes are clipped to the image are clipped.
+
         Args:
             segments (np.ndarray): Input segments with shape (N, M, 2), where N is the number of segments and M is the
                 number of points in each segment.
@@ -1132,20 +1148,19 @@ class RandomPerspective:
             >>> M = np.eye(3)  # Identity transformation matrix
             >>> new_bboxes, new_segments = apply_segments(segments, M)
         """
-        n, num = segments.shape[:2]
-        if n == 0:
+        if len(segments) == 0:
             return [], segments
 
-        xy = np.ones((n * num, 3), dtype=segments.dtype)
-        segments = segments.reshape(-1, 2)
-        xy[:, :2] = segments
-        xy = xy @ M.T  # transform
-        xy = xy[:, :2] / xy[:, 2:3]
-        segments = xy.reshape(n, -1, 2)
-        bboxes = np.stack([segment2box(xy, self.size[0], self.size[1]) for xy in segments], 0)
-        segments[..., 0] = segments[..., 0].clip(bboxes[:, 0:1], bboxes[:, 2:3])
-        segments[..., 1] = segments[..., 1].clip(bboxes[:, 1:2], bboxes[:, 3:4])
-        return bboxes, segments
+        segments = self._transform(segments, M)
+        # Boxes of the segments clipped to the image like `segment2box`, zero if no point has x > 0
+        x, y = segments[..., 0], segments[..., 1]
+        bboxes = np.stack((x.min(1), y.min(1), x.max(1), y.max(1)), 1)
+        clipped = bboxes.clip(0, np.array(self.size * 2, dtype=bboxes.dtype))
+        clipped[bboxes[:, 2] <= 0] = 0
+        i = (clipped != bboxes).any(1)  # segments reaching out of their boxes
+        if i.any():
+            segments[i] = segments[i].clip(clipped[i, None, :2], clipped[i, None, 2:])
+        return clipped, segments
 
     def apply_keypoints(self, keypoints, M):
         """
@@ -1169,17 +1184,21 @@ class RandomPerspective:
             >>> M = np.eye(3)  # Identity transformation
             >>> transformed_keypoints = random_perspective.apply_keypoints(keypoints, M)
         """
-        n, nkpt = keypoints.shape[:2]
-        if n == 0:
+        if len(keypoints) == 0:
             return keypoints
-        xy = np.ones((n * nkpt, 3), dtype=keypoints.dtype)
-        visible = keypoints[..., 2].reshape(n * nkpt, 1)
-        xy[:, :2] = keypoints[..., :2].reshape(n * nkpt, 2)
-        xy = xy @ M.T  # transform
-        xy = xy[:, :2] / xy[:, 2:3]  # perspective rescale or affine
-        out_mask = (xy[:, 0] < 0) | (xy[:, 1] < 0) | (xy[:, 0] > self.size[0]) | (xy[:, 1] > self.size[1])
-        visible[out_mask] = 0
-        return np.concatenate([xy, visible], axis=-1).reshape(n, nkpt, 3)
+        xy = self._transform(keypoints[..., :2], M)
+        out_mask = (xy[..., 0] < 0) | (xy[..., 1] < 0) | (xy[..., 0] > self.size[0]) | (xy[..., 1] > self.size[1])
+        return np.concatenate([xy, np.where(out_mask, 0, keypoints[..., 2])[..., None]], axis=-1)
+
+    def _transform(self, xy, M):
+        """Transforms points of shape (..., 2) by the 3x3 matrix `M` with one matrix multiply in their dtype."""
+        shape, M = xy.shape, M.astype(xy.dtype)
+        if self.perspective:
+            xy = xy.reshape(-1, 2) @ M[:, :2].T + M[:, 2]
+            xy = xy[:, :2] / xy[:, 2:]  # perspective rescale
+        else:
+            xy = xy.reshape(-1, 2) @ M[:2, :2].T + M[:2, 2]  # affine
+        return xy.reshape(shape)
 
     def __call__(self, labels):
         """
@@ -1233,13 +1252,13 @@ class RandomPerspective:
         # Scale for func:`box_candidates`
         img, M, scale = self.affine_transform(img, border)
 
-        bboxes = self.apply_bboxes(instances.bboxes, M)
-
         segments = instances.segments
         keypoints = instances.keypoints
         # Update bboxes if there are segments.
         if len(segments):
             bboxes, segments = self.apply_segments(segments, M)
+        else:
+            bboxes = self.apply_bboxes(instances.bboxes, M)
 
         if keypoints is not None:
             keypoints = self.apply_keypoints(keypoints, M)
@@ -1933,10 +1952,12 @@ class Format:
         mask_overlap (bool): Whether to overlap masks.
         batch_idx (bool): Whether to keep batch indexes.
         bgr (float): The probability to return BGR images.
+        return_edge (bool): Whether to return a uint8 Sobel edge map of the image.
 
     Methods:
         __call__: Formats labels dictionary with image, classes, bounding boxes, and optionally masks and keypoints.
         _format_img: Converts image from Numpy array to PyTorch tensor.
+        _format_edge: Computes the quantized Sobel edge magnitude of an image.
         _format_segments: Converts polygon points to bitmap masks.
 
     Examples:
@@ -1958,6 +1979,7 @@ class Format:
         mask_overlap=True,
         batch_idx=True,
         bgr=0.0,
+        return_edge=False,
     ):
         """
         Initializes the Format class with given parameters for image and instance annotation formatting.
@@ -1975,6 +1997,7 @@ class Format:
             mask_overlap (bool): If True, allows mask overlap.
             batch_idx (bool): If True, keeps batch indexes.
             bgr (float): Probability of returning BGR images instead of RGB.
+            return_edge (bool): If True, returns a (1, H, W) uint8 Sobel edge map for the OBB edge-consistency loss.
 
         Attributes:
             bbox_format (str): Format for bounding boxes.
@@ -1986,6 +2009,7 @@ class Format:
             mask_overlap (bool): Whether masks can overlap.
             batch_idx (bool): Whether to keep batch indexes.
             bgr (float): The probability to return BGR images.
+            return_edge (bool): Whether to return a uint8 Sobel edge map.
 
         Examples:
             >>> format = Format(bbox_format="xyxy", return_mask=True, return_keypoint=False)
@@ -2001,6 +2025,7 @@ class Format:
         self.mask_overlap = mask_overlap
         self.batch_idx = batch_idx  # keep the batch indexes
         self.bgr = bgr
+        self.return_edge = return_edge
 
     def __call__(self, labels):
         """
@@ -2023,6 +2048,7 @@ class Format:
                 - 'bboxes': Bounding boxes tensor in the specified format.
                 - 'masks': Instance masks tensor (if return_mask is True).
                 - 'keypoints': Keypoints tensor (if return_keypoint is True).
+                - 'edge': uint8 Sobel edge map tensor (if return_edge is True).
                 - 'batch_idx': Batch index tensor (if batch_idx is True).
 
         Examples:
@@ -2048,6 +2074,8 @@ class Format:
                     1 if self.mask_overlap else nl, img.shape[0] // self.mask_ratio, img.shape[1] // self.mask_ratio
                 )
             labels["masks"] = masks
+        if self.return_edge:
+            labels["edge"] = self._format_edge(img)
         labels["img"] = self._format_img(img)
         labels["cls"] = torch.from_numpy(cls) if nl else torch.zeros(nl)
         labels["bboxes"] = torch.from_numpy(instances.bboxes) if nl else torch.zeros((nl, 4))
@@ -2100,6 +2128,32 @@ class Format:
         img = torch.from_numpy(img)
         return img
 
+    @staticmethod
+    def _format_edge(img):
+        """
+        Computes the Sobel gradient magnitude of the grayscale image as a compact uint8 tensor.
+
+        The magnitude matches `AcceleratedOBBEdgeLoss.edge_map` on the 0-1 scaled training image (zero padding, 3x3
+        Sobel kernels) and is quantized over its full range [0, 4 * sqrt(2)] to 0-255, so the loss can decode it with
+        `edge * 4 * sqrt(2) / 255`. Computing it here moves the convolution off the training critical path.
+
+        Args:
+            img (np.ndarray): Input image as a Numpy array with shape (H, W, C) or (H, W).
+
+        Returns:
+            (torch.Tensor): Quantized edge map with shape (1, H, W) and dtype uint8.
+
+        Examples:
+            >>> img = np.random.randint(0, 255, (100, 100, 3), dtype=np.uint8)
+            >>> Format._format_edge(img).shape
+            torch.Size([1, 100, 100])
+        """
+        gray = img.mean(2, dtype=np.float32) if img.ndim == 3 else img.astype(np.float32)
+        gx = cv2.Sobel(gray, cv2.CV_32F, 1, 0, ksize=3, borderType=cv2.BORDER_CONSTANT)
+        gy = cv2.Sobel(gray, cv2.CV_32F, 0, 1, ksize=3, borderType=cv2.BORDER_CONSTANT)
+        edge = cv2.magnitude(gx, gy) * (1 / (4 * math.sqrt(2)))  # 0-255 grayscale magnitude to 0-255 full range
+        return torch.from_numpy(np.clip(np.rint(edge), 0, 255).astype(np.uint8)[None])
+
     def _format_segments(self, instances, cls, w, h):
         """
         Converts polygon segments to bitmap masks.
@@ -2269,6 +2323,392 @@ class RandomLoadText:
         return labels
 
 
+class BatchAugment:
+    """
+    Applies mosaic, mixup, random perspective, HSV, flip and BGR augmentations to a whole batch on its device.
+
+    With `batch_augment=True` dataloader workers only load and letterbox images, and the trainer applies this class to
+    each collated batch on the training device, so detection and OBB training is no longer bound by per-sample OpenCV
+    augmentation on few CPU cores. Every sample draws its parameters from the same distributions as `Mosaic`,
+    `RandomPerspective`, `MixUp`, `RandomHSV`, `RandomFlip` and `Format` (bgr), except that mosaic and mixup partners
+    are drawn from the same batch instead of the whole dataset. The mosaic canvas is never materialized, mosaic and the
+    perspective warp are fused into one `grid_sample` pass per mosaic tile.
+
+    Attributes:
+        imgsz (int): Image size of the letterboxed input and augmented output images.
+        obb (bool): Whether 'bboxes' are normalized xywhr OBBs instead of normalized xywh boxes.
+        mosaic (float): Probability of mosaic augmentation.
+        mixup (float): Probability of mixup augmentation.
+        degrees (float): Maximum absolute degree range for random rotations.
+        translate (float): Maximum translation as a fraction of the image size.
+        scale (float): Scaling factor range, e.g., scale=0.1 means 0.9-1.1.
+        shear (float): Maximum shear angle in degrees.
+        perspective (float): Perspective distortion factor.
+        hsv (Tuple[float, float, float]): Maximum hue, saturation and value gains.
+        flipud (float): Probability of flipping up-down.
+        fliplr (float): Probability of flipping left-right.
+        bgr (float): Probability of keeping BGR channel order, images are converted to RGB otherwise.
+
+    Methods:
+        __call__: Augments a collated batch.
+        mosaic_tiles: Draws mosaic partners and centers and returns the tile layout of every output image.
+        affine_matrices: Draws the random perspective matrices of every output image.
+        warp_images: Samples the mosaic tiles through the perspective matrices.
+        warp_labels: Transforms and filters the labels of the mosaic tiles.
+        apply_hsv: Applies HSV gains to BGR images.
+        min_area_rect: Fits minimum area rotated rectangles to point sets.
+
+    Examples:
+        >>> from ultralytics.cfg import get_cfg
+        >>> augment = BatchAugment(imgsz=640, hyp=get_cfg())
+        >>> batch["img"] = batch["img"].to("cuda").float()
+        >>> batch = augment(batch)  # augmented 0-255 float images and labels on the same device
+    """
+
+    def __init__(self, imgsz=640, hyp=None, obb=False):
+        """
+        Initializes BatchAugment with the augmentation hyperparameters.
+
+        Args:
+            imgsz (int): Image size of the letterboxed input and augmented output images.
+            hyp (IterableSimpleNamespace): Augmentation hyperparameters, see `v8_transforms`.
+            obb (bool): Whether 'bboxes' are normalized xywhr OBBs instead of normalized xywh boxes.
+
+        Examples:
+            >>> from ultralytics.cfg import get_cfg
+            >>> augment = BatchAugment(imgsz=640, hyp=get_cfg(overrides={"mosaic": 0.5}), obb=True)
+        """
+        self.imgsz = imgsz
+        self.obb = obb
+        self.mosaic = hyp.mosaic
+        self.mixup = hyp.mixup
+        self.degrees = hyp.degrees
+        self.translate = hyp.translate
+        self.scale = hyp.scale
+        self.shear = hyp.shear
+        self.perspective = hyp.perspective
+        self.hsv = (hyp.hsv_h, hyp.hsv_s, hyp.hsv_v)
+        self.flipud = hyp.flipud
+        self.fliplr = hyp.fliplr
+        self.bgr = hyp.bgr
+
+    def __call__(self, batch):
+        """
+        Augments a batch collated from letterboxed samples.
+
+        Args:
+            batch (Dict): Collated batch with 'img' as float 0-255 BGR images of shape (B, 3, imgsz, imgsz) on the
+                target device, 'cls', 'bboxes' and 'batch_idx' labels, and the per-sample 'ori_shape' and 'ratio_pad'
+                letterbox metadata.
+
+        Returns:
+            (Dict): The same batch with augmented 'img' (float 0-255, RGB unless kept BGR by `bgr`) and augmented
+                'cls', 'bboxes' and 'batch_idx' on the images' device.
+        """
+        img = batch["img"]
+        b, device = len(img), img.device
+        bi = batch["batch_idx"].to(device)
+        i = bi.argsort(stable=True)
+        bi, cls, bboxes = bi[i].long(), batch["cls"].to(device)[i], batch["bboxes"].to(device)[i].float()
+
+        # Mosaic and perspective, labels as pixel corner points (N, 4, 2) of the letterboxed images
+        bboxes[:, :4] *= self.imgsz
+        pts = xywhr2xyxyxyxy(bboxes) if self.obb else xywh2xyxy(bboxes)[:, [0, 1, 2, 1, 2, 3, 0, 3]].view(-1, 4, 2)
+        tiles = self.mosaic_tiles(batch, device)
+        M, scale = self.affine_matrices(tiles[-1])
+        img = self.warp_images(img, M, *tiles)
+        bi, cls, bboxes = self.warp_labels(pts, bi, cls, M, scale, *tiles)
+
+        # MixUp
+        if self.mixup > 0:
+            mix = (torch.rand(b, device=device) < self.mixup).nonzero()[:, 0]
+            if len(mix):
+                j = torch.randint(0, b, (len(mix),), device=device)
+                r = torch.distributions.Beta(32.0, 32.0).sample((len(mix),)).to(device).view(-1, 1, 1, 1)
+                img[mix] = img[mix] * r + img[j] * (1 - r)
+                index, k = self._expand(bi, j, b)
+                bi = torch.cat((bi, mix[k]))
+                i = bi.argsort(stable=True)
+                bi, cls, bboxes = bi[i], torch.cat((cls, cls[index]))[i], torch.cat((bboxes, bboxes[index]))[i]
+
+        # HSV, flips and channel order
+        if any(self.hsv):
+            gains = (torch.rand(b, 3, device=device) * 2 - 1) * torch.tensor(self.hsv, device=device) + 1
+            img = self.apply_hsv(img, gains)
+        for p, dim in ((self.flipud, 1), (self.fliplr, 0)):
+            if p > 0:
+                flip = torch.rand(b, device=device) < p
+                img = torch.where(flip.view(-1, 1, 1, 1), img.flip(3 - dim), img)
+                f = flip[bi]
+                bboxes[:, dim] = torch.where(f, 1 - bboxes[:, dim], bboxes[:, dim])
+                if self.obb:  # mirrored angle -r, back into [0, pi/2) by swapping w and h
+                    r = torch.where(f, -bboxes[:, 4], bboxes[:, 4])
+                    swap = r < 0
+                    bboxes[:, 2:5] = torch.stack(
+                        (
+                            torch.where(swap, bboxes[:, 3], bboxes[:, 2]),
+                            torch.where(swap, bboxes[:, 2], bboxes[:, 3]),
+                            torch.where(swap, r + math.pi / 2, r),
+                        ),
+                        -1,
+                    )
+        rgb = torch.rand(b, device=device) >= self.bgr  # same draw as Format, uniform(0, 1) > bgr flips to RGB
+        img = torch.where(rgb.view(-1, 1, 1, 1), img.flip(1), img)
+
+        batch["img"], batch["cls"], batch["bboxes"], batch["batch_idx"] = img, cls, bboxes, bi.float()
+        return batch
+
+    def mosaic_tiles(self, batch, device):
+        """
+        Draws mosaic partners and centers and returns the tile layout of every output image.
+
+        Tiles are placed around the mosaic center like `Mosaic._mosaic4`, using the content (unpadded) size and letterbox
+        padding of each source image. Images without mosaic have a single tile, the whole letterboxed image.
+
+        Args:
+            batch (Dict): Collated batch with 'ori_shape' and 'ratio_pad' per sample.
+            device (torch.device): Device of the batch images.
+
+        Returns:
+            src (torch.Tensor): Source image index of each tile of shape (B, 4).
+            offset (torch.Tensor): Canvas position of the source image origin of each tile of shape (B, 4, 2).
+            active (torch.Tensor): Boolean mask of the used tiles of shape (B, 4).
+            canvas (torch.Tensor): Canvas size of every output image of shape (B,).
+        """
+        s = self.imgsz
+        b = len(batch["ori_shape"])
+        pad = torch.tensor([p for _, p in batch["ratio_pad"]], dtype=torch.float32, device=device)  # left, top
+        wh = torch.tensor(
+            [(round(r[1] * w0), round(r[0] * h0)) for (r, _), (h0, w0) in zip(batch["ratio_pad"], batch["ori_shape"])],
+            dtype=torch.float32,
+            device=device,
+        )  # content size, images are letterboxed without resizing
+        mosaic = torch.rand(b, device=device) < self.mosaic
+        src = torch.randint(0, b, (b, 4), device=device)
+        src[:, 0] = torch.arange(b, device=device)
+        c = torch.empty(b, 2, device=device).uniform_(s / 2, 3 * s / 2).floor()  # mosaic center x, y
+        tw, th = wh[src].unbind(-1)  # (B, 4) tile content sizes
+        origin = torch.stack(  # top left, top right, bottom left, bottom right
+            (
+                torch.stack((c[:, 0] - tw[:, 0], c[:, 1] - th[:, 0]), -1),
+                torch.stack((c[:, 0], c[:, 1] - th[:, 1]), -1),
+                torch.stack((c[:, 0] - tw[:, 2], c[:, 1]), -1),
+                c,
+            ),
+            1,
+        )
+        offset = torch.where(mosaic.view(-1, 1, 1), origin - pad[src], 0)
+        active = mosaic.view(-1, 1) | (torch.arange(4, device=device) == 0)
+        canvas = torch.where(mosaic, 2 * s, s).float()
+        return src, offset, active, canvas
+
+    def affine_matrices(self, canvas):
+        """
+        Draws the random perspective matrices of every output image like `RandomPerspective.affine_transform`.
+
+        Args:
+            canvas (torch.Tensor): Canvas size of every output image of shape (B,).
+
+        Returns:
+            M (torch.Tensor): Canvas to output image transformation matrices of shape (B, 3, 3).
+            scale (torch.Tensor): Scale factor of every matrix of shape (B,).
+        """
+        b, device = len(canvas), canvas.device
+
+        def uniform(lo, hi):
+            return torch.empty(b, device=device).uniform_(lo, hi)
+
+        C, P, R, S, T = torch.eye(3, device=device).repeat(5, b, 1, 1)
+        C[:, 0, 2] = C[:, 1, 2] = -canvas / 2  # center
+        P[:, 2, 0] = uniform(-self.perspective, self.perspective)  # x perspective (about y)
+        P[:, 2, 1] = uniform(-self.perspective, self.perspective)  # y perspective (about x)
+        a = uniform(-self.degrees, self.degrees) * (math.pi / 180)
+        scale = uniform(1 - self.scale, 1 + self.scale)
+        R[:, 0, 0] = R[:, 1, 1] = scale * a.cos()  # cv2.getRotationMatrix2D(angle=a, center=(0, 0), scale=s)
+        R[:, 0, 1] = scale * a.sin()
+        R[:, 1, 0] = -R[:, 0, 1]
+        S[:, 0, 1] = (uniform(-self.shear, self.shear) * (math.pi / 180)).tan()  # x shear (deg)
+        S[:, 1, 0] = (uniform(-self.shear, self.shear) * (math.pi / 180)).tan()  # y shear (deg)
+        T[:, 0, 2] = uniform(0.5 - self.translate, 0.5 + self.translate) * self.imgsz  # x translation (pixels)
+        T[:, 1, 2] = uniform(0.5 - self.translate, 0.5 + self.translate) * self.imgsz  # y translation (pixels)
+        return T @ S @ R @ P @ C, scale  # order of operations (right to left) is IMPORTANT
+
+    def warp_images(self, img, M, src, offset, active, canvas):
+        """
+        Samples the mosaic tiles of every output image through its perspective matrix.
+
+        Output pixels are mapped back onto the canvas and bilinearly sampled from each tile's source image. Sampling is
+        done on `img - 114`, so the letterbox padding and everything outside the source images contribute nothing and
+        the four tiles can simply be summed, reproducing the gray (114) mosaic canvas and warp border.
+
+        Args:
+            img (torch.Tensor): Letterboxed float 0-255 images of shape (B, 3, imgsz, imgsz).
+            M (torch.Tensor): Canvas to output image matrices of shape (B, 3, 3).
+            src (torch.Tensor): Source image index of each tile of shape (B, 4).
+            offset (torch.Tensor): Canvas position of the source image origin of each tile of shape (B, 4, 2).
+            active (torch.Tensor): Boolean mask of the used tiles of shape (B, 4).
+            canvas (torch.Tensor): Canvas size of every output image of shape (B,).
+
+        Returns:
+            (torch.Tensor): Warped images of shape (B, 3, imgsz, imgsz).
+        """
+        b, _, h, w = img.shape
+        s = self.imgsz
+        y, x = torch.meshgrid(
+            torch.arange(s, device=img.device, dtype=img.dtype),
+            torch.arange(s, device=img.device, dtype=img.dtype),
+            indexing="ij",
+        )
+        xy = torch.stack((x, y, torch.ones_like(x)), -1).view(1, -1, 3)
+        q = xy @ torch.linalg.inv(M).transpose(1, 2)  # (B, s * s, 3) canvas coordinates of the output pixels
+        q = q[..., :2] / q[..., 2:]
+        inside = ((q >= -0.5) & (q <= canvas.view(-1, 1, 1) - 0.5)).all(-1)  # mosaic crops tiles at the canvas border
+        size = torch.tensor([w, h], device=img.device, dtype=img.dtype)
+        out = torch.zeros_like(img)
+        base = img - 114
+        for k in range(4):
+            if not active[:, k].any():
+                continue
+            grid = (2 * (q - offset[:, k : k + 1]) + 1) / size - 1  # align_corners=False pixel centers
+            tile = F.grid_sample(base[src[:, k]], grid.view(b, s, s, 2), mode="bilinear", align_corners=False)
+            out += tile * (inside & active[:, k : k + 1]).view(b, 1, s, s)
+        return out + 114
+
+    def warp_labels(self, pts, bi, cls, M, scale, src, offset, active, canvas):
+        """
+        Transforms the labels of all mosaic tiles into the output images and filters them like `RandomPerspective`.
+
+        Boxes and OBB outlines, resampled to 100 points like the OBB segments of `YOLODataset`, are clipped to the canvas
+        (`Mosaic._cat_labels`), transformed, clipped to the output image and kept if they pass
+        `RandomPerspective.box_candidates`. OBBs are refit to the clipped outlines with `min_area_rect`, like `Format`
+        does with `cv2.minAreaRect`.
+
+        Args:
+            pts (torch.Tensor): Label corner points in letterboxed image pixels of shape (N, 4, 2), sorted by `bi`.
+            bi (torch.Tensor): Image index of each label of shape (N,).
+            cls (torch.Tensor): Label classes of shape (N, 1).
+            M (torch.Tensor): Canvas to output image matrices of shape (B, 3, 3).
+            scale (torch.Tensor): Scale factor of every matrix of shape (B,).
+            src (torch.Tensor): Source image index of each tile of shape (B, 4).
+            offset (torch.Tensor): Canvas position of the source image origin of each tile of shape (B, 4, 2).
+            active (torch.Tensor): Boolean mask of the used tiles of shape (B, 4).
+            canvas (torch.Tensor): Canvas size of every output image of shape (B,).
+
+        Returns:
+            bi (torch.Tensor): Output image index of each kept label of shape (n,), sorted.
+            cls (torch.Tensor): Classes of the kept labels of shape (n, 1).
+            bboxes (torch.Tensor): Normalized xywh boxes (n, 4) or xywhr OBBs (n, 5) of the kept labels.
+        """
+        s, b = self.imgsz, len(M)
+        pair = active.nonzero()  # (P, 2) output image, tile
+        index, k = self._expand(bi, src[pair[:, 0], pair[:, 1]], b)
+        i = pair[k, 0]  # output image of every label
+        p = pts[index] + offset[i, pair[k, 1]].unsqueeze(1)  # canvas coordinates
+        if self.obb:
+            edges = torch.cat((p, torch.ones_like(p[..., :1])), -1) @ M[i].transpose(1, 2)
+            edges = edges[..., :2] / edges[..., 2:]
+            edges = edges.roll(-1, 1) - edges  # transformed box sides
+            # Outline resampled at the same 100 positions along the sides as `resample_segments(n=100)` in YOLODataset
+            x = np.linspace(0, 4, 95)
+            x = torch.from_numpy(np.insert(x, np.searchsorted(x, np.arange(5)), np.arange(5))).to(p)
+            k0 = x.long().clamp(max=3)  # side index
+            p = p[:, k0] + (x - k0).view(1, -1, 1) * (p.roll(-1, 1)[:, k0] - p[:, k0])
+        lim = canvas[i].view(-1, 1, 1)
+        q = torch.where(lim > s, torch.minimum(p.clamp(min=0), lim), p)  # clip to the mosaic canvas
+        clipped, p = (q != p).any(-1), q
+        box1 = torch.cat((p.amin(1), p.amax(1)), -1) * scale[i].view(-1, 1)  # scaled like the transformed boxes
+
+        p = torch.cat((p, torch.ones_like(p[..., :1])), -1) @ M[i].transpose(1, 2)  # transform
+        p = p[..., :2] / p[..., 2:]
+        if self.obb:  # outline points clipped to the image like `RandomPerspective.apply_segments`
+            q = p.clamp(0, s)
+            clipped, p = clipped | (q != p).any(-1), q
+        box2 = torch.cat((p.amin(1), p.amax(1)), -1).clamp(0, s)
+
+        w1, h1 = box1[:, 2] - box1[:, 0], box1[:, 3] - box1[:, 1]
+        w2, h2 = box2[:, 2] - box2[:, 0], box2[:, 3] - box2[:, 1]
+        ar = torch.maximum(w2 / (h2 + 1e-16), h2 / (w2 + 1e-16))  # aspect ratio
+        area_thr = 0.01 if self.obb else 0.10  # OBB corners are segments for RandomPerspective
+        j = (w2 > 2) & (h2 > 2) & (w2 * h2 / (w1 * h1 + 1e-16) > area_thr) & (ar < 100)
+
+        if self.obb:
+            # Unclipped outlines are the transformed boxes with their sides as hull edges, clipped outlines are fitted
+            # to their extreme points in 32 directions, which contain the hull vertices but the flattest ones
+            p, clipped = p[j], clipped[j].any(1)
+            d = torch.cat((edges[j], M[i[j], :2, :2].transpose(1, 2)), 1)
+            bboxes = self.min_area_rect(p, torch.atan2(d[..., 1], d[..., 0]))
+            if clipped.any():
+                a = torch.arange(32, device=p.device) * (math.pi / 16)
+                k = (p[clipped] @ torch.stack((a.cos(), a.sin())).to(p)).argmax(1)  # (n, 32) extreme point indices
+                bboxes[clipped] = self.min_area_rect(p[clipped].gather(1, k.unsqueeze(-1).expand(-1, -1, 2)))
+        else:
+            bboxes = xyxy2xywh(box2[j])
+        bboxes[:, :4] /= s
+        return i[j], cls[index[j]], bboxes
+
+    @staticmethod
+    def apply_hsv(img, gains):
+        """
+        Applies hue, saturation and value gains to BGR images in the OpenCV 8-bit HSV ranges like `RandomHSV`.
+
+        Args:
+            img (torch.Tensor): Float 0-255 BGR images of shape (B, 3, H, W).
+            gains (torch.Tensor): Hue, saturation and value gains of every image of shape (B, 3).
+
+        Returns:
+            (torch.Tensor): Augmented float 0-255 BGR images of shape (B, 3, H, W).
+        """
+        bl, g, r = img.unbind(1)
+        v, d = img.amax(1), img.amax(1) - img.amin(1)
+        s = torch.where(v > 0, d / v.clamp(min=1e-6), 0)
+        dd = d.clamp(min=1e-6)
+        h = torch.where(v == r, (g - bl) / dd, torch.where(v == g, 2 + (bl - r) / dd, 4 + (r - g) / dd)) % 6
+        gains = gains.view(-1, 3, 1, 1)
+        h = (h * 30 * gains[:, 0]) % 180 / 30  # OpenCV hue is 0-180, sextants of 30
+        s = (s * 255 * gains[:, 1]).clamp(0, 255) / 255
+        v = (v * gains[:, 2]).clamp(0, 255)
+        k = (torch.tensor([1.0, 3.0, 5.0], device=img.device).view(1, 3, 1, 1) + h.unsqueeze(1)) % 6  # B, G, R
+        return v.unsqueeze(1) * (1 - s.unsqueeze(1) * torch.minimum(k, 4 - k).clamp(0, 1))
+
+    @staticmethod
+    def min_area_rect(pts, angles=None):
+        """
+        Fits minimum area rotated rectangles to point sets, a batched counterpart of `cv2.minAreaRect`.
+
+        The minimum area rectangle has a side collinear with an edge of the convex hull, so the extents of the points are
+        compared along candidate directions, by default the directions of all point pairs.
+
+        Args:
+            pts (torch.Tensor): Point sets of shape (N, M, 2).
+            angles (torch.Tensor, optional): Candidate hull edge directions in radians of shape (N, K).
+
+        Returns:
+            (torch.Tensor): Rotated rectangles in xywhr format with r in [0, pi/2) of shape (N, 5).
+        """
+        if angles is None:
+            i, j = torch.triu_indices(pts.shape[1], pts.shape[1], 1, device=pts.device)
+            e = pts[:, j] - pts[:, i]
+            angles = torch.atan2(e[..., 1], e[..., 0])
+        t = angles % (math.pi / 2)  # (N, K) a rectangle repeats every 90 degrees
+        cos, sin = t.cos().unsqueeze(-1), t.sin().unsqueeze(-1)
+        x, y = pts[..., 0].unsqueeze(1), pts[..., 1].unsqueeze(1)
+        u, v = x * cos + y * sin, y * cos - x * sin  # (N, K, M) rotated by -t
+        u0, u1, v0, v1 = u.amin(-1), u.amax(-1), v.amin(-1), v.amax(-1)
+        k = ((u1 - u0) * (v1 - v0)).argmin(1, keepdim=True)
+        u0, u1, v0, v1, t = (z.gather(1, k).squeeze(1) for z in (u0, u1, v0, v1, t))
+        cu, cv = (u0 + u1) / 2, (v0 + v1) / 2
+        return torch.stack((cu * t.cos() - cv * t.sin(), cu * t.sin() + cv * t.cos(), u1 - u0, v1 - v0, t), -1)
+
+    @staticmethod
+    def _expand(bi, src, b):
+        """Returns the indices of the labels of images `src` (labels sorted by `bi`) and the position in `src` of each."""
+        counts = torch.bincount(bi, minlength=b)
+        n = counts[src]
+        k = torch.repeat_interleave(torch.arange(len(src), device=bi.device), n)
+        first = (counts.cumsum(0) - counts)[src]
+        return first[k] + torch.arange(len(k), device=bi.device) - (n.cumsum(0) - n)[k], k
+
+
 def v8_transforms(dataset, imgsz, hyp, stretch=False):
     """
     Applies a series of image transformations for training.
@@ -2293,7 +2733,7 @@ def v8_transforms(dataset, imgsz, hyp, stretch=False):
         >>> transforms = v8_transforms(dataset, imgsz=640, hyp=hyp)
         >>> augmented_data = transforms(dataset[0])
     """
-    mosaic = Mosaic(dataset, imgsz=imgsz, p=hyp.mosaic)
+    mosaic = Mosaic(dataset, imgsz=imgsz, p=hyp.mosaic, prefetch=hyp.mosaic_prefetch)
     affine = RandomPerspective(
         degrees=hyp.degrees,
         translate=hyp.translate,
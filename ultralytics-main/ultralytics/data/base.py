@@ -1,9 +1,11 @@
 # Ultralytics YOLO 🚀, AGPL-3.0 license
 
+import atexit
 import glob
+import hashlib
+import inspect
 import math
 import os
-import random
 from copy import deepcopy
 from multiprocessing.pool import ThreadPool
 from pathlib import Path
@@ -14,7 +16,17 @@ import numpy as np
 import psutil
 from torch.utils.data import Dataset
 
-from ultralytics.data.utils import FORMATS_HELP_MSG, HELP_URL, IMG_FORMATS
+from ultralytics.data.utils import (
+    FORMATS_HELP_MSG,
+    HELP_URL,
+    IMG_FORMATS,
+    ImageBuffer,
+    LabelTable,
+    PackedImageCache,
+    SharedImageCache,
+    estimate_cache_size,
+    get_fingerprints,
+)
 from ultralytics.utils import DEFAULT_CFG, LOCAL_RANK, LOGGER, NUM_THREADS, TQDM
 
 
@@ -39,7 +51,7 @@ class BaseDataset(Dataset):
 
     Attributes:
         im_files (list): List of image file paths.
-        labels (list): List of label data dictionaries.
+        labels (list | LabelTable): Label data dictionaries, or a columnar LabelTable indexed the same way.
         ni (int): Number of images in the dataset.
         ims (list): List of loaded images.
         npy_files (list): List of numpy file paths.
@@ -82,13 +94,15 @@ class BaseDataset(Dataset):
             assert self.batch_size is not None
             self.set_rectangle()
 
-        # Buffer thread for mosaic images
-        self.buffer = []  # buffer size = batch size
-        self.max_buffer_length = min((self.ni, self.batch_size * 8, 1000)) if self.augment else 0
+        # LRU buffer of mosaic images per dataloader worker
+        self.max_buffer_length = (hyp.mosaic_buffer or min(self.batch_size * 8, 1000)) if self.augment else 0
+        self.max_buffer_length = min(self.max_buffer_length, self.ni)
+        self.buffer = ImageBuffer(self.max_buffer_length)
 
         # Cache images (options are cache = True, False, None, "ram", "disk")
         self.ims, self.im_hw0, self.im_hw = [None] * self.ni, [None] * self.ni, [None] * self.ni
         self.npy_files = [Path(f).with_suffix(".npy") for f in self.im_files]
+        self.image_pack = None  # PackedImageCache of resized images if cache="disk"
         self.cache = cache.lower() if isinstance(cache, str) else "ram" if cache is True else None
         if self.cache == "ram" and self.check_cache_ram():
             if hyp.deterministic:
@@ -99,6 +113,7 @@ class BaseDataset(Dataset):
             self.cache_images()
         elif self.cache == "disk" and self.check_cache_disk():
             self.cache_images()
+        self.buffer.clear()  # images loaded while caching
 
         # Transforms
         self.transforms = self.build_transforms(hyp=hyp)
@@ -131,6 +146,10 @@ class BaseDataset(Dataset):
 
     def update_labels(self, include_class: Optional[list]):
         """Update labels to include only these classes (optional)."""
+        if isinstance(self.labels, LabelTable):
+            if include_class is not None or self.single_cls:
+                self.labels = self.labels.filter(include_class, self.single_cls)
+            return
         include_class_array = np.array(include_class).reshape(1, -1)
         for i in range(len(self.labels)):
             if include_class is not None:
@@ -150,81 +169,159 @@ class BaseDataset(Dataset):
 
     def load_image(self, i, rect_mode=True):
         """Loads 1 image from dataset index 'i', returns (im, resized hw)."""
-        im, f, fn = self.ims[i], self.im_files[i], self.npy_files[i]
-        if im is None:  # not cached in RAM
-            if fn.exists():  # load npy
-                try:
-                    im = np.load(fn)
-                except Exception as e:
-                    LOGGER.warning(f"{self.prefix}WARNING ⚠️ Removing corrupt *.npy image file {fn} due to: {e}")
-                    Path(fn).unlink(missing_ok=True)
-                    im = cv2.imread(f)  # BGR
-            else:  # read image
+        if self.ims[i] is not None:  # cached in RAM
+            return self.ims[i], self.im_hw0[i], self.im_hw[i]
+        x = self.buffer.get(i) if self.buffer.maxlen else None  # buffered if training with augmentations
+        if x is None:
+            if self.image_pack is not None:  # already resized in the disk cache
+                im, (h0, w0) = self.image_pack[i], self.image_pack.index[i, 2:4].tolist()
+            else:
+                im, (h0, w0) = self.read_image(i, rect_mode)
+            x = im, (h0, w0), im.shape[:2]  # im, hw_original, hw_resized
+            if self.buffer.maxlen:
+                self.buffer.put(i, x)
+        return x
+
+    def read_image(self, i, rect_mode=True):
+        """Reads image 'i' from file and resizes it to imgsz, returns (im, original hw)."""
+        f, fn = self.im_files[i], self.npy_files[i]
+        if fn.exists():  # load npy
+            try:
+                im = np.load(fn)
+            except Exception as e:
+                LOGGER.warning(f"{self.prefix}WARNING ⚠️ Removing corrupt *.npy image file {fn} due to: {e}")
+                Path(fn).unlink(missing_ok=True)
                 im = cv2.imread(f)  # BGR
-            if im is None:
-                raise FileNotFoundError(f"Image Not Found {f}")
-
-            h0, w0 = im.shape[:2]  # orig hw
-            if rect_mode:  # resize long side to imgsz while maintaining aspect ratio
-                r = self.imgsz / max(h0, w0)  # ratio
-                if r != 1:  # if sizes are not equal
-                    w, h = (min(math.ceil(w0 * r), self.imgsz), min(math.ceil(h0 * r), self.imgsz))
-                    im = cv2.resize(im, (w, h), interpolation=cv2.INTER_LINEAR)
-            elif not (h0 == w0 == self.imgsz):  # resize by stretching image to square imgsz
-                im = cv2.resize(im, (self.imgsz, self.imgsz), interpolation=cv2.INTER_LINEAR)
-
-            # Add to buffer if training with augmentations
-            if self.augment:
-                self.ims[i], self.im_hw0[i], self.im_hw[i] = im, (h0, w0), im.shape[:2]  # im, hw_original, hw_resized
-                self.buffer.append(i)
-                if 1 < len(self.buffer) >= self.max_buffer_length:  # prevent empty buffer
-                    j = self.buffer.pop(0)
-                    if self.cache != "ram":
-                        self.ims[j], self.im_hw0[j], self.im_hw[j] = None, None, None
-
-            return im, (h0, w0), im.shape[:2]
-
-        return self.ims[i], self.im_hw0[i], self.im_hw[i]
+        else:  # read image
+            im = cv2.imread(f)  # BGR
+        if im is None:
+            raise FileNotFoundError(f"Image Not Found {f}")
+
+        h0, w0 = im.shape[:2]  # orig hw
+        if rect_mode:  # resize long side to imgsz while maintaining aspect ratio
+            r = self.imgsz / max(h0, w0)  # ratio
+            if r != 1:  # if sizes are not equal
+                w, h = (min(math.ceil(w0 * r), self.imgsz), min(math.ceil(h0 * r), self.imgsz))
+                im = cv2.resize(im, (w, h), interpolation=cv2.INTER_LINEAR)
+        elif not (h0 == w0 == self.imgsz):  # resize by stretching image to square imgsz
+            im = cv2.resize(im, (self.imgsz, self.imgsz), interpolation=cv2.INTER_LINEAR)
+        return im, (h0, w0)
 
     def cache_images(self):
         """Cache images to memory or disk."""
+        if self.cache == "ram" and self.cache_images_to_shm():
+            return
+        if self.cache == "disk":
+            return self.cache_images_to_disk()
         b, gb = 0, 1 << 30  # bytes of cached images, bytes per gigabytes
-        fcn, storage = (self.cache_images_to_disk, "Disk") if self.cache == "disk" else (self.load_image, "RAM")
         with ThreadPool(NUM_THREADS) as pool:
-            results = pool.imap(fcn, range(self.ni))
+            results = pool.imap(self.load_image, range(self.ni))
             pbar = TQDM(enumerate(results), total=self.ni, disable=LOCAL_RANK > 0)
             for i, x in pbar:
-                if self.cache == "disk":
-                    b += self.npy_files[i].stat().st_size
-                else:  # 'ram'
-                    self.ims[i], self.im_hw0[i], self.im_hw[i] = x  # im, hw_orig, hw_resized = load_image(self, i)
-                    b += self.ims[i].nbytes
-                pbar.desc = f"{self.prefix}Caching images ({b / gb:.1f}GB {storage})"
+                self.ims[i], self.im_hw0[i], self.im_hw[i] = x  # im, hw_orig, hw_resized = load_image(self, i)
+                b += self.ims[i].nbytes
+                pbar.desc = f"{self.prefix}Caching images ({b / gb:.1f}GB RAM)"
             pbar.close()
 
-    def cache_images_to_disk(self, i):
-        """Saves an image as an *.npy file for faster loading."""
-        f = self.npy_files[i]
-        if not f.exists():
-            np.save(f.as_posix(), cv2.imread(self.im_files[i]), allow_pickle=False)
+    def cache_images_to_shm(self):
+        """
+        Cache images in a SharedImageCache in /dev/shm, shared by all DDP ranks and dataloader workers on this node.
 
-    def check_cache_disk(self, safety_margin=0.5):
-        """Check image caching requirements vs available disk space."""
-        import shutil
+        The first local rank builds the cache, the other ranks attach to it (they construct their datasets after rank 0
+        under `torch_distributed_zero_first`). The cache is removed when the process that built it exits.
 
-        b, gb = 0, 1 << 30  # bytes of cached images, bytes per gigabytes
-        n = min(self.ni, 30)  # extrapolate from 30 random images
-        for _ in range(n):
-            im_file = random.choice(self.im_files)
-            im = cv2.imread(im_file)
-            if im is None:
-                continue
-            b += im.nbytes
-            if not os.access(Path(im_file).parent, os.W_OK):
-                self.cache = None
-                LOGGER.info(f"{self.prefix}Skipping caching images to disk, directory not writeable ⚠️")
+        Returns:
+            (bool): True if images are cached in shared memory, False to fall back to a per-process RAM cache.
+        """
+        shm = Path("/dev/shm")
+        if not (shm.is_dir() and os.access(shm, os.W_OK)):
+            return False
+        key = [self.__class__.__name__, str(self.imgsz), *self.im_files]
+        h = hashlib.sha256("\n".join(key).encode())
+        h.update(get_fingerprints(self.im_files).tobytes())  # rebuild when images change
+        path = shm / f"ultralytics-{h.hexdigest()[:16]}.cache"
+        built = False
+        if not SharedImageCache.exists(path):
+            if LOCAL_RANK not in {-1, 0}:
+                return False
+            gb = 1 << 30  # bytes per gigabytes
+            pbar = TQDM(total=self.ni, desc=f"{self.prefix}Caching images (shared memory)")
+
+            def images():
+                with ThreadPool(NUM_THREADS) as pool:
+                    for x in pool.imap(self.load_image, range(self.ni)):
+                        pbar.update()
+                        yield x
+
+            try:
+                b, built = SharedImageCache.build(path, images()), True
+                pbar.desc = f"{self.prefix}Caching images ({b / gb:.1f}GB shared memory)"
+            except OSError as e:  # e.g. /dev/shm full
+                LOGGER.warning(f"{self.prefix}WARNING ⚠️ Shared memory image cache failed, caching per process: {e}")
                 return False
-        disk_required = b * self.ni / n * (1 + safety_margin)  # bytes required to cache dataset to disk
+            finally:
+                pbar.close()
+        self.ims = SharedImageCache(path)
+        self.im_hw0, self.im_hw = self.ims.shapes
+        if built:
+            atexit.register(self.ims.unlink)
+        return True
+
+    def cache_images_to_disk(self):
+        """
+        Cache images resized to imgsz and PNG-compressed in a PackedImageCache file next to the image directory.
+
+        The file name holds a hash of the dataset class, imgsz and image paths followed by a hash of the image
+        fingerprints, so a cache is rebuilt when the images change. Only caches of the same image list are removed as
+        outdated, caches of other subsets of the directory are kept. The first local rank builds the cache, the other
+        ranks open it.
+        """
+        parent = Path(self.im_files[0]).parent
+        key = [self.__class__.__name__, str(self.imgsz), *self.im_files]
+        files = hashlib.sha256("\n".join(key).encode()).hexdigest()[:16]
+        images = hashlib.sha256(get_fingerprints(self.im_files).tobytes()).hexdigest()[:16]  # rebuild on changes
+        path = parent.with_name(f"{parent.name}.{self.imgsz}.{files}.{images}.imcache")
+        if not path.exists():
+            if LOCAL_RANK not in {-1, 0}:
+                return
+            for f in parent.parent.glob(f"{parent.name}.{self.imgsz}.{files}.*.imcache"):
+                f.unlink(missing_ok=True)  # outdated caches of this image list
+            gb = 1 << 30  # bytes per gigabytes
+            pbar = TQDM(total=self.ni, desc=f"{self.prefix}Caching images (Disk)")
+
+            def encode(i):
+                im, hw0, _ = self.load_image(i)
+                return PackedImageCache.encode(im, hw0)
+
+            def blocks():
+                with ThreadPool(NUM_THREADS) as pool:
+                    for x in pool.imap(encode, range(self.ni)):
+                        pbar.update()
+                        yield x
+
+            try:
+                b = PackedImageCache.build(path, blocks())
+                pbar.desc = f"{self.prefix}Caching images ({b / gb:.1f}GB Disk)"
+            finally:
+                pbar.close()
+        self.image_pack = PackedImageCache(path)
+
+    def cache_size(self, n=200):
+        """Returns the projected bytes to cache the images per cache mode, see `estimate_cache_size`."""
+        shapes = self.labels.image_shapes if isinstance(self.labels, LabelTable) else None  # exact, no file reads
+        rect_mode = inspect.signature(self.load_image).parameters["rect_mode"].default  # subclasses may stretch
+        return estimate_cache_size(self.im_files, self.imgsz, rect_mode, shapes=shapes, n=n)
+
+    def check_cache_disk(self, safety_margin=0.5, n=200):
+        """Check image caching requirements vs available disk space, sampling the headers of n images if needed."""
+        import shutil
+
+        gb = 1 << 30  # bytes per gigabytes
+        if not os.access(Path(self.im_files[0]).parent.parent, os.W_OK):
+            self.cache = None
+            LOGGER.info(f"{self.prefix}Skipping caching images to disk, directory not writeable ⚠️")
+            return False
+        disk_required = self.cache_size(n)["disk"] * (1 + safety_margin)  # bytes required to cache dataset to disk
         total, used, free = shutil.disk_usage(Path(self.im_files[0]).parent)
         if disk_required > free:
             self.cache = None
@@ -236,17 +333,10 @@ class BaseDataset(Dataset):
             return False
         return True
 
-    def check_cache_ram(self, safety_margin=0.5):
-        """Check image caching requirements vs available memory."""
-        b, gb = 0, 1 << 30  # bytes of cached images, bytes per gigabytes
-        n = min(self.ni, 30)  # extrapolate from 30 random images
-        for _ in range(n):
-            im = cv2.imread(random.choice(self.im_files))  # sample image
-            if im is None:
-                continue
-            ratio = self.imgsz / max(im.shape[0], im.shape[1])  # max(h, w)  # ratio
-            b += im.nbytes * ratio**2
-        mem_required = b * self.ni / n * (1 + safety_margin)  # GB required to cache dataset into RAM
+    def check_cache_ram(self, safety_margin=0.5, n=200):
+        """Check image caching requirements vs available memory, sampling the headers of n images if needed."""
+        gb = 1 << 30  # bytes per gigabytes
+        mem_required = self.cache_size(n)["ram"] * (1 + safety_margin)  # bytes required to cache dataset into RAM
         mem = psutil.virtual_memory()
         if mem_required > mem.available:
             self.cache = None
@@ -263,11 +353,17 @@ class BaseDataset(Dataset):
         bi = np.floor(np.arange(self.ni) / self.batch_size).astype(int)  # batch index
         nb = bi[-1] + 1  # number of batches
 
-        s = np.array([x.pop("shape") for x in self.labels])  # hw
+        if isinstance(self.labels, LabelTable):
+            s = self.labels.image_shapes  # hw
+        else:
+            s = np.array([x.pop("shape") for x in self.labels])  # hw
         ar = s[:, 0] / s[:, 1]  # aspect ratio
         irect = ar.argsort()
         self.im_files = [self.im_files[i] for i in irect]
-        self.labels = [self.labels[i] for i in irect]
+        if isinstance(self.labels, LabelTable):
+            self.labels = self.labels.select(irect)  # reorder without materializing per-image dicts
+        else:
+            self.labels = [self.labels[i] for i in irect]
         ar = ar[irect]
 
         # Set training image shapes
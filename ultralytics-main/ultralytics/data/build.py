@@ -171,7 +171,7 @@ def check_source(source):
     return source, webcam, screenshot, from_img, in_memory, tensor
 
 
-def load_inference_source(source=None, batch=1, vid_stride=1, buffer=False):
+def load_inference_source(source=None, batch=1, vid_stride=1, buffer=False, workers=0, read_ahead=0, imgsz=None):
     """
     Loads an inference source for object detection and applies necessary transformations.
 
@@ -180,6 +180,9 @@ def load_inference_source(source=None, batch=1, vid_stride=1, buffer=False):
         batch (int, optional): Batch size for dataloaders. Default is 1.
         vid_stride (int, optional): The frame interval for video sources. Default is 1.
         buffer (bool, optional): Determined whether stream frames will be buffered. Default is False.
+        workers (int, optional): Threads decoding image files ahead of iteration. Default is 0, decode on demand.
+        read_ahead (int, optional): Maximum number of image files decoded ahead. Default is 0, two batches.
+        imgsz (int | tuple, optional): Decode JPEG files at reduced resolution down to this size. Default is None.
 
     Returns:
         dataset (Dataset): A dataset object for the specified input source.
@@ -199,7 +202,9 @@ def load_inference_source(source=None, batch=1, vid_stride=1, buffer=False):
     elif from_img:
         dataset = LoadPilAndNumpy(source)
     else:
-        dataset = LoadImagesAndVideos(source, batch=batch, vid_stride=vid_stride)
+        dataset = LoadImagesAndVideos(
+            source, batch=batch, vid_stride=vid_stride, workers=workers, read_ahead=read_ahead, imgsz=imgsz
+        )
 
     # Attach source types to the dataset
     setattr(dataset, "source_type", source_type)
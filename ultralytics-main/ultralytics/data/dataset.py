@@ -16,6 +16,8 @@ from ultralytics.utils.ops import resample_segments
 from ultralytics.utils.torch_utils import TORCHVISION_0_18
 
 from .augment import (
+    Albumentations,
+    BatchAugment,
     Compose,
     Format,
     Instances,
@@ -29,10 +31,15 @@ from .base import BaseDataset
 from .utils import (
     HELP_URL,
     LOGGER,
+    PIN_MEMORY,
+    LabelTable,
+    get_fingerprints,
     get_hash,
     img2label_paths,
     load_dataset_cache_file,
+    load_label_cache,
     save_dataset_cache_file,
+    save_label_cache,
     verify_image,
     verify_image_label,
 )
@@ -41,6 +48,19 @@ from .utils import (
 DATASET_CACHE_VERSION = "1.0.3"
 
 
+def _collate_buffer(like, numel):
+    """
+    Returns an uninitialized flat tensor of `numel` elements of the dtype of `like` to collate a batch into.
+
+    In dataloader workers the buffer is allocated in shared memory like `default_collate` does, so the batch is not
+    copied again to send it to the main process. In the main process it is allocated in pinned memory for CUDA, so the
+    DataLoader does not copy it again to pin it.
+    """
+    if torch.utils.data.get_worker_info() is not None:
+        return like.new(like._typed_storage()._new_shared(numel, device=like.device))
+    return torch.empty(numel, dtype=like.dtype, pin_memory=PIN_MEMORY and torch.cuda.is_available())
+
+
 class YOLODataset(BaseDataset):
     """
     Dataset class for loading object detection and/or segmentation labels in YOLO format.
@@ -62,20 +82,55 @@ class YOLODataset(BaseDataset):
         assert not (self.use_segments and self.use_keypoints), "Can not use both segments and keypoints."
         super().__init__(*args, **kwargs)
 
-    def cache_labels(self, path=Path("./labels.cache")):
+    def cache_labels(self, path=Path("./labels.labels"), cache=None):
         """
         Cache dataset labels, check images and read shapes.
 
+        Images are fingerprinted by the modification time and size of the image and label file. Only images that are
+        new or changed since `cache` are verified again, the rest is reused from `cache` and images no longer in the
+        dataset are dropped.
+
         Args:
-            path (Path): Path where to save the cache file. Default is Path('./labels.cache').
+            path (Path): Label cache directory to save the columnar cache to. Default is Path('./labels.labels').
+            cache (dict, optional): Previous label cache to update. Defaults to None, which verifies every image.
 
         Returns:
-            (dict): labels.
+            (dict): Cache dict with 'labels' as a LabelTable, memory-mapped from `path` if it could be saved. This is
+                `cache` itself if nothing changed.
         """
-        x = {"labels": []}
-        nm, nf, ne, nc, msgs = 0, 0, 0, 0, []  # number missing, found, empty, corrupt, messages
+        n = len(self.im_files)
+        fingerprints = np.concatenate((get_fingerprints(self.im_files), get_fingerprints(self.label_files)), 1)
+        if cache is None:
+            cache = {
+                "files": [],
+                "fingerprints": np.zeros((0, 4), dtype=np.int64),
+                "status": np.zeros((0, 4), dtype=np.uint8),
+                "msgs": [],
+                "labels": LabelTable.from_labels([]),
+            }
+        previous = {f: i for i, f in enumerate(cache["files"])}
+        j = np.array([previous.get(f, -1) for f in self.im_files], dtype=np.int64).reshape(-1)  # index in cache
+        fresh = j >= 0
+        fresh[fresh] = (cache["fingerprints"][j[fresh]] == fingerprints[fresh]).all(1)
+        stale = np.flatnonzero(~fresh)  # new or changed images
+        removed = len(previous) - np.count_nonzero(j >= 0)
+        if not len(stale) and not removed and cache["files"] == self.im_files:
+            return cache  # nothing changed
+
+        # Reuse the scan results of unchanged images
+        status = np.zeros((n, 4), dtype=np.uint8)  # missing, found, empty, corrupt
+        status[fresh] = cache["status"][j[fresh]]
+        msgs = [cache["msgs"][k] if k >= 0 and ok else "" for k, ok in zip(j.tolist(), fresh.tolist())]
+        if previous:
+            LOGGER.info(
+                f"{self.prefix}Updating {path}: {len(stale)} new or changed, {removed} removed, "
+                f"{n - len(stale)} unchanged images ({(n - len(stale)) / max(n, 1):.1%} of verification skipped)"
+            )
+
+        # Verify new or changed images
+        labels, rows = [], []
+        nm, nf, ne, nc = status.sum(0).tolist()  # number missing, found, empty, corrupt
         desc = f"{self.prefix}Scanning {path.parent / path.stem}..."
-        total = len(self.im_files)
         nkpt, ndim = self.data.get("kpt_shape", (0, 0))
         if self.use_keypoints and (nkpt <= 0 or ndim not in {2, 3}):
             raise ValueError(
@@ -86,8 +141,8 @@ class YOLODataset(BaseDataset):
             results = pool.imap(
                 func=verify_image_label,
                 iterable=zip(
-                    self.im_files,
-                    self.label_files,
+                    [self.im_files[i] for i in stale],
+                    [self.label_files[i] for i in stale],
                     repeat(self.prefix),
                     repeat(self.use_keypoints),
                     repeat(len(self.data["names"])),
@@ -95,14 +150,16 @@ class YOLODataset(BaseDataset):
                     repeat(ndim),
                 ),
             )
-            pbar = TQDM(results, desc=desc, total=total)
-            for im_file, lb, shape, segments, keypoint, nm_f, nf_f, ne_f, nc_f, msg in pbar:
+            pbar = TQDM(results, desc=desc, total=len(stale))
+            for i, (im_file, lb, shape, segments, keypoint, nm_f, nf_f, ne_f, nc_f, msg) in zip(stale, pbar):
                 nm += nm_f
                 nf += nf_f
                 ne += ne_f
                 nc += nc_f
+                status[i] = nm_f, nf_f, ne_f, nc_f
                 if im_file:
-                    x["labels"].append(
+                    rows.append(i)
+                    labels.append(
                         {
                             "im_file": im_file,
                             "shape": shape,
@@ -115,67 +172,93 @@ class YOLODataset(BaseDataset):
                         }
                     )
                 if msg:
-                    msgs.append(msg)
+                    msgs[i] = msg
                 pbar.desc = f"{desc} {nf} images, {nm + ne} backgrounds, {nc} corrupt"
             pbar.close()
 
-        if msgs:
-            LOGGER.info("\n".join(msgs))
+        new_msgs = [msgs[i] for i in stale if msgs[i]]
+        if new_msgs:
+            LOGGER.info("\n".join(new_msgs))
         if nf == 0:
             LOGGER.warning(f"{self.prefix}WARNING ⚠️ No labels found in {path}. {HELP_URL}")
-        x["hash"] = get_hash(self.label_files + self.im_files)
-        x["results"] = nf, nm, ne, nc, len(self.im_files)
-        x["msgs"] = msgs  # warnings
-        save_dataset_cache_file(self.prefix, path, x, DATASET_CACHE_VERSION)
+
+        # Merge reused and new labels in dataset order
+        table = cache["labels"]
+        row = {f: i for i, f in enumerate(table.im_files)}
+        kept = [i for i in np.flatnonzero(fresh).tolist() if self.im_files[i] in row]
+        merged = LabelTable.concatenate(
+            [table.take([row[self.im_files[i]] for i in kept]), LabelTable.from_labels(labels)]
+        )
+        x = {
+            "files": list(self.im_files),
+            "fingerprints": fingerprints,
+            "status": status,
+            "results": [nf, nm, ne, nc, n],
+            "msgs": msgs,
+            "labels": merged.take(np.argsort(kept + rows, kind="stable")),
+        }
+        if save_label_cache(self.prefix, path, x, DATASET_CACHE_VERSION):
+            x["labels"] = load_label_cache(path)["labels"]  # share memory-mapped arrays with dataloader workers
         return x
 
     def get_labels(self):
         """Returns dictionary of labels for YOLO training."""
         self.label_files = img2label_paths(self.im_files)
-        cache_path = Path(self.label_files[0]).parent.with_suffix(".cache")
+        cache_path = Path(self.label_files[0]).parent.with_suffix(".labels")  # columnar label cache directory
         try:
-            cache, exists = load_dataset_cache_file(cache_path), True  # attempt to load a *.cache file
+            cache = load_label_cache(cache_path)  # attempt to load a label cache
             assert cache["version"] == DATASET_CACHE_VERSION  # matches current version
-            assert cache["hash"] == get_hash(self.label_files + self.im_files)  # identical hash
-        except (FileNotFoundError, AssertionError, AttributeError):
-            cache, exists = self.cache_labels(cache_path), False  # run cache ops
+            assert "fingerprints" in cache
+        except (FileNotFoundError, AssertionError, KeyError, ValueError):
+            cache = None  # no per-image status in legacy *.cache files, verify every image
+        x = self.cache_labels(cache_path, cache)  # verify only new or changed images
+        exists = x is cache
 
         # Display cache
-        nf, nm, ne, nc, n = cache.pop("results")  # found, missing, empty, corrupt, total
+        nf, nm, ne, nc, n = x["results"]  # found, missing, empty, corrupt, total
         if exists and LOCAL_RANK in {-1, 0}:
             d = f"Scanning {cache_path}... {nf} images, {nm + ne} backgrounds, {nc} corrupt"
             TQDM(None, desc=self.prefix + d, total=n, initial=n)  # display results
-            if cache["msgs"]:
-                LOGGER.info("\n".join(cache["msgs"]))  # display warnings
+            msgs = [m for m in x["msgs"] if m]
+            if msgs:
+                LOGGER.info("\n".join(msgs))  # display warnings
 
         # Read cache
-        [cache.pop(k) for k in ("hash", "version", "msgs")]  # remove items
-        labels = cache["labels"]
-        if not labels:
+        labels = x["labels"]
+        if not len(labels):
             LOGGER.warning(f"WARNING ⚠️ No images found in {cache_path}, training may not work correctly. {HELP_URL}")
-        self.im_files = [lb["im_file"] for lb in labels]  # update im_files
+        self.im_files = list(labels.im_files)  # update im_files
 
         # Check if the dataset is all boxes or all segments
-        lengths = ((len(lb["cls"]), len(lb["bboxes"]), len(lb["segments"])) for lb in labels)
-        len_cls, len_boxes, len_segments = (sum(x) for x in zip(*lengths))
+        len_cls, len_boxes, len_segments = len(labels.cls), len(labels.bboxes), labels.num_segments
         if len_segments and len_boxes != len_segments:
             LOGGER.warning(
                 f"WARNING ⚠️ Box and segment counts should be equal, but got len(segments) = {len_segments}, "
                 f"len(boxes) = {len_boxes}. To resolve this only boxes will be used and all segments will be removed. "
                 "To avoid this please supply either a detect or segment dataset, not a detect-segment mixed dataset."
             )
-            for lb in labels:
-                lb["segments"] = []
+            labels = labels.drop_segments()
         if len_cls == 0:
             LOGGER.warning(f"WARNING ⚠️ No labels found in {cache_path}, training may not work correctly. {HELP_URL}")
         return labels
 
     def build_transforms(self, hyp=None):
         """Builds and appends transforms to the list."""
+        self.batch_transforms = None
         if self.augment:
             hyp.mosaic = hyp.mosaic if self.augment and not self.rect else 0.0
             hyp.mixup = hyp.mixup if self.augment and not self.rect else 0.0
-            transforms = v8_transforms(self, self.imgsz, hyp)
+            if hyp.batch_augment and not (self.rect or self.use_segments or self.use_keypoints or hyp.copy_paste):
+                # Workers only load and letterbox, the trainer applies the remaining augmentations on its device
+                transforms = Compose([LetterBox(new_shape=(self.imgsz, self.imgsz), scaleup=False), Albumentations()])
+                self.batch_transforms = BatchAugment(self.imgsz, hyp, obb=self.use_obb)
+            else:
+                if hyp.batch_augment:
+                    LOGGER.warning(
+                        "WARNING ⚠️ 'batch_augment=True' supports detect and obb training without 'rect' and "
+                        "'copy_paste', augmenting in dataloader workers instead."
+                    )
+                transforms = v8_transforms(self, self.imgsz, hyp)
         else:
             transforms = Compose([LetterBox(new_shape=(self.imgsz, self.imgsz), scaleup=False)])
         transforms.append(
@@ -188,7 +271,9 @@ class YOLODataset(BaseDataset):
                 batch_idx=True,
                 mask_ratio=hyp.mask_ratio,
                 mask_overlap=hyp.overlap_mask,
-                bgr=hyp.bgr if self.augment else 0.0,  # only affect training.
+                bgr=(1.0 if self.batch_transforms else hyp.bgr) if self.augment else 0.0,  # only affect training.
+                # OBB edge-consistency loss input, computed by the loss from batch-augmented images
+                return_edge=self.use_obb and self.augment and hyp.edge_map and not self.batch_transforms,
             )
         )
         return transforms
@@ -245,27 +330,38 @@ class YOLODataset(BaseDataset):
     #     return new_batch
     @staticmethod
     def collate_fn(batch):
-        """Collates data samples into batches."""
+        """
+        Collates data samples into batches.
+
+        Images and edge maps are stacked into one buffer each and the label tensors of each dtype, batch indices
+        included, are concatenated into one buffer at precomputed offsets, see `_collate_buffer`.
+        """
         new_batch = {}
         keys = batch[0].keys()  # 获取所有样本的键
-        values = list(zip(*[list(b.values()) for b in batch]))  # 收集每个样本的值
-    
-        for i, k in enumerate(keys):
-            value = values[i]
-            if k == "img":  # 如果是图像数据
-                value = torch.stack(value, 0)  # 将所有图像堆叠为一个批量
-                new_batch["images"] = value  # 将处理后的图像保存为 "images"
-            elif k in {"masks", "keypoints", "bboxes", "cls", "segments", "obb"}:  # 其他需要拼接的键
-                value = torch.cat(value, 0)
-            new_batch[k] = value
-    
+        values = dict(zip(keys, zip(*[list(b.values()) for b in batch])))  # 收集每个样本的值
+        cat_keys = [k for k in keys if k in {"masks", "keypoints", "bboxes", "cls", "segments", "obb", "batch_idx"}]
+
+        for k, value in values.items():
+            if k in {"img", "edge"}:  # 图像数据堆叠为一个批量
+                out = _collate_buffer(value[0], sum(x.numel() for x in value))
+                new_batch[k] = torch.stack(value, 0, out=out.view(len(value), *value[0].shape))
+            elif k not in cat_keys:
+                new_batch[k] = value
+
+        # 同一 dtype 的标签拼接到同一块内存
+        for dtype in {values[k][0].dtype for k in cat_keys}:
+            group = [k for k in cat_keys if values[k][0].dtype == dtype]
+            numel = [sum(x.numel() for x in values[k]) for k in group]
+            buffer = _collate_buffer(values[group[0]][0], sum(numel))
+            for k, out in zip(group, buffer.split(numel)):
+                value = values[k]
+                shape = next((x for x in value if x.numel()), value[0]).shape[1:]  # background labels may be (0,)
+                new_batch[k] = torch.cat(value, 0, out=out.view(-1, *shape))
+
         # 处理 batch_idx
-        new_batch["batch_idx"] = list(new_batch["batch_idx"])
-        for i in range(len(new_batch["batch_idx"])):
-            new_batch["batch_idx"][i] += i  # 为目标图像索引添加偏移量
-        new_batch["batch_idx"] = torch.cat(new_batch["batch_idx"], 0)
-    
-        return new_batch
+        counts = torch.tensor([len(x) for x in values["batch_idx"]])
+        new_batch["batch_idx"] += torch.repeat_interleave(torch.arange(len(batch)), counts)  # 为目标图像索引添加偏移量
+        return {k: new_batch[k] for k in keys}
 
 
 class YOLOMultiModalDataset(YOLODataset):
@@ -4,6 +4,7 @@ import glob
 import math
 import os
 import time
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from pathlib import Path
 from threading import Thread
@@ -300,6 +301,11 @@ class LoadImagesAndVideos:
         frames (int): Total number of frames in the video.
         count (int): Counter for iteration, initialized at 0 during __iter__().
         ni (int): Number of images.
+        pool (ThreadPoolExecutor | None): Threads decoding images ahead of iteration, None to decode on demand.
+        read_ahead (int): Maximum number of images decoded ahead of iteration by `pool`.
+        imgsz (tuple | None): Inference size (h, w) below which JPEGs are not reduced at decode, None to decode at
+            full resolution.
+        seek_stride (int): Smallest `vid_stride` for which video frames are reached by seeking instead of grabbing.
 
     Methods:
         __init__: Initialize the LoadImagesAndVideos object.
@@ -318,10 +324,24 @@ class LoadImagesAndVideos:
         - Supports various image formats including HEIC.
         - Handles both local files and directories.
         - Can read from a text file containing paths to images and videos.
+        - With `imgsz`, JPEGs are decoded at 1/2, 1/4 or 1/8 resolution while still at least `imgsz`, so returned
+          images and pixel coordinates of predictions refer to the reduced image.
     """
 
-    def __init__(self, path, batch=1, vid_stride=1):
-        """Initialize dataloader for images and videos, supporting various input formats."""
+    seek_stride = 100  # seeking costs up to a keyframe interval of decoding, grabbing costs vid_stride frames
+
+    def __init__(self, path, batch=1, vid_stride=1, workers=0, read_ahead=0, imgsz=None):
+        """
+        Initialize dataloader for images and videos, supporting various input formats.
+
+        Args:
+            path (str | Path | List): Image or video file, directory, glob, *.txt file or list of sources.
+            batch (int): Batch size.
+            vid_stride (int): Stride for video frame-rate.
+            workers (int): Number of threads decoding images ahead of iteration, 0 to decode on demand.
+            read_ahead (int): Maximum number of images decoded ahead, 0 for two batches.
+            imgsz (int | tuple, optional): Inference size, enables reduced resolution JPEG decoding down to this size.
+        """
         parent = None
         if isinstance(path, str) and Path(path).suffix == ".txt":  # *.txt file with img/vid/dir on each line
             parent = Path(path).parent
@@ -357,6 +377,10 @@ class LoadImagesAndVideos:
         self.mode = "video" if ni == 0 else "image"  # default to video if no images
         self.vid_stride = vid_stride  # video frame-rate stride
         self.bs = batch
+        self.pool = ThreadPoolExecutor(workers, thread_name_prefix="load-images") if workers and ni else None
+        self.read_ahead = read_ahead or 2 * batch
+        self.imgsz = (imgsz, imgsz) if isinstance(imgsz, int) else imgsz
+        self.reads = {}  # image index -> decode future
         if any(videos):
             self._new_video(videos[0])  # new video
         else:
@@ -367,6 +391,9 @@ class LoadImagesAndVideos:
     def __iter__(self):
         """Iterates through image/video files, yielding source paths, images, and metadata."""
         self.count = 0
+        for f in self.reads.values():
+            f.cancel()
+        self.reads = {}
         return self
 
     def __next__(self):
@@ -386,10 +413,14 @@ class LoadImagesAndVideos:
                     self._new_video(path)
 
                 success = False
-                for _ in range(self.vid_stride):
+                if self.vid_stride >= self.seek_stride:  # seek past skipped frames instead of decoding them
+                    self.cap.set(cv2.CAP_PROP_POS_FRAMES, (self.frame + 1) * self.vid_stride - 1)
                     success = self.cap.grab()
-                    if not success:
-                        break  # end of video or failure
+                else:
+                    for _ in range(self.vid_stride):
+                        success = self.cap.grab()
+                        if not success:
+                            break  # end of video or failure
 
                 if success:
                     success, im0 = self.cap.retrieve()
@@ -411,17 +442,7 @@ class LoadImagesAndVideos:
             else:
                 # Handle image files (including HEIC)
                 self.mode = "image"
-                if path.split(".")[-1].lower() == "heic":
-                    # Load HEIC image using Pillow with pillow-heif
-                    check_requirements("pillow-heif")
-
-                    from pillow_heif import register_heif_opener
-
-                    register_heif_opener()  # Register HEIF opener with Pillow
-                    with Image.open(path) as img:
-                        im0 = cv2.cvtColor(np.asarray(img), cv2.COLOR_RGB2BGR)  # convert image to BGR nparray
-                else:
-                    im0 = imread(path)  # BGR
+                im0 = self._read_image(self.count)
                 if im0 is None:
                     LOGGER.warning(f"WARNING ⚠️ Image Read Error {path}")
                 else:
@@ -434,6 +455,38 @@ class LoadImagesAndVideos:
 
         return paths, imgs, info
 
+    def _read_image(self, i):
+        """Returns image `i`, decoded ahead on the thread pool if enabled, keeping up to `read_ahead` images queued."""
+        if self.pool is None:
+            return self._decode(self.files[i])
+        for j in range(i, min(i + self.read_ahead, self.ni)):
+            if j not in self.reads:
+                self.reads[j] = self.pool.submit(self._decode, self.files[j])
+        return self.reads.pop(i).result()
+
+    def _decode(self, path):
+        """Decodes an image file to BGR, JPEGs at the lowest of 1/8, 1/4 or 1/2 resolution still covering `imgsz`."""
+        suffix = path.split(".")[-1].lower()
+        if suffix == "heic":
+            # Load HEIC image using Pillow with pillow-heif
+            check_requirements("pillow-heif")
+
+            from pillow_heif import register_heif_opener
+
+            register_heif_opener()  # Register HEIF opener with Pillow
+            with Image.open(path) as img:
+                return cv2.cvtColor(np.asarray(img), cv2.COLOR_RGB2BGR)  # convert image to BGR nparray
+        flags = cv2.IMREAD_COLOR
+        if self.imgsz and suffix in {"jpg", "jpeg"}:
+            with Image.open(path) as img:  # reads the header only
+                w, h = img.size
+            r = min(max(h, w) / max(self.imgsz), min(h, w) / min(self.imgsz))  # largest reduction, any orientation
+            for f in 8, 4, 2:
+                if r >= f:
+                    flags = getattr(cv2, f"IMREAD_REDUCED_COLOR_{f}")
+                    break
+        return imread(path, flags)  # BGR
+
     def _new_video(self, path):
         """Creates a new video capture object for the given path and initializes video-related attributes."""
         self.frame = 0
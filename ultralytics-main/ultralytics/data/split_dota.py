@@ -1,8 +1,11 @@
 # Ultralytics YOLO 🚀, AGPL-3.0 license
 
 import itertools
+import json
+from functools import lru_cache, partial
 from glob import glob
 from math import ceil
+from multiprocessing import Pool
 from pathlib import Path
 
 import cv2
@@ -11,10 +14,42 @@ from PIL import Image
 from tqdm import tqdm
 
 from ultralytics.data.utils import exif_size, img2label_paths
+from ultralytics.utils import NUM_THREADS
 from ultralytics.utils.checks import check_requirements
 
 
-def bbox_iof(polygon1, bbox2, eps=1e-6):
+def polygon_clip_area(polygons, bboxes, chunk=65536):
+    """
+    Calculate the areas of polygons clipped to axis-aligned bounding boxes, one box per polygon.
+
+    Every polygon vertex is clamped into its box after splitting each edge where it crosses a box side. The clamped
+    outline runs along the box border outside the box and encloses exactly the intersection, so its shoelace area is
+    the intersection area, for convex and concave polygons alike.
+
+    Args:
+        polygons (np.ndarray): Polygon coordinates, shape (k, n, 2).
+        bboxes (np.ndarray): Bounding boxes, shape (k, 4), format [x_min, y_min, x_max, y_max].
+        chunk (int, optional): Number of pairs processed at once to bound memory. Defaults to 65536.
+
+    Returns:
+        (np.ndarray): Intersection areas, shape (k,).
+    """
+    areas = np.zeros(len(polygons))
+    for i in range(0, len(polygons), chunk):
+        s = polygons[i : i + chunk].astype(np.float64)  # edge starts
+        d = np.roll(s, -1, axis=1) - s  # edge vectors
+        lo, hi = (x[:, None, None].astype(np.float64) for x in np.split(bboxes[i : i + chunk], 2, axis=1))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            t = np.concatenate(((lo[:, 0] - s) / d, (hi[:, 0] - s) / d), axis=-1)  # where edges cross box sides
+        t = np.sort(np.nan_to_num(t, nan=0.0, posinf=0.0, neginf=0.0).clip(0, 1), axis=-1)
+        t = np.concatenate((np.zeros_like(t[..., :1]), t), axis=-1)  # (k, n, 5) including the edge start
+        p = np.clip(s[..., None, :] + t[..., None] * d[..., None, :], lo, hi).reshape(len(s), -1, 2)
+        x, y = p[..., 0], p[..., 1]
+        areas[i : i + chunk] = 0.5 * np.abs((x * np.roll(y, -1, axis=1) - np.roll(x, -1, axis=1) * y).sum(1))
+    return areas
+
+
+def bbox_iof(polygon1, bbox2, eps=1e-6, vectorized=True):
     """
     Calculate Intersection over Foreground (IoF) between polygons and bounding boxes.
 
@@ -22,6 +57,7 @@ def bbox_iof(polygon1, bbox2, eps=1e-6):
         polygon1 (np.ndarray): Polygon coordinates, shape (n, 8).
         bbox2 (np.ndarray): Bounding boxes, shape (n, 4).
         eps (float, optional): Small value to prevent division by zero. Defaults to 1e-6.
+        vectorized (bool, optional): Clip polygons to boxes with NumPy instead of shapely. Defaults to True.
 
     Returns:
         (np.ndarray): IoF scores, shape (n, 1) or (n, m) if bbox2 is (m, 4).
@@ -30,9 +66,6 @@ def bbox_iof(polygon1, bbox2, eps=1e-6):
         Polygon format: [x1, y1, x2, y2, x3, y3, x4, y4].
         Bounding box format: [x_min, y_min, x_max, y_max].
     """
-    check_requirements("shapely")
-    from shapely.geometry import Polygon
-
     polygon1 = polygon1.reshape(-1, 4, 2)
     lt_point = np.min(polygon1, axis=-2)  # left-top
     rb_point = np.max(polygon1, axis=-2)  # right-bottom
@@ -43,6 +76,18 @@ def bbox_iof(polygon1, bbox2, eps=1e-6):
     wh = np.clip(rb - lt, 0, np.inf)
     h_overlaps = wh[..., 0] * wh[..., 1]
 
+    if vectorized:
+        overlaps = np.zeros(h_overlaps.shape)
+        i, *j = np.nonzero(h_overlaps)
+        overlaps[(i, *j)] = polygon_clip_area(polygon1[i], bbox2.reshape(-1, 4)[j[0] if j else 0])
+        x, y = polygon1[..., 0].astype(np.float64), polygon1[..., 1].astype(np.float64)
+        unions = 0.5 * np.abs((x * np.roll(y, -1, axis=1) - np.roll(x, -1, axis=1) * y).sum(1))[..., None]
+        outputs = overlaps / np.clip(unions, eps, np.inf)
+        return outputs[..., None] if outputs.ndim == 1 else outputs
+
+    check_requirements("shapely")
+    from shapely.geometry import Polygon
+
     left, top, right, bottom = (bbox2[..., i] for i in range(4))
     polygon2 = np.stack([left, top, right, top, right, bottom, left, bottom], axis=-1).reshape(-1, 4, 2)
 
@@ -98,6 +143,8 @@ def get_windows(im_size, crop_sizes=(1024,), gaps=(200,), im_rate_thr=0.6, eps=0
     """
     Get the coordinates of windows.
 
+    Windows are computed once per image size and settings and shared by all images of that size.
+
     Args:
         im_size (tuple): Original image size, (h, w).
         crop_sizes (List(int)): Crop size of windows.
@@ -105,6 +152,12 @@ def get_windows(im_size, crop_sizes=(1024,), gaps=(200,), im_rate_thr=0.6, eps=0
         im_rate_thr (float): Threshold of windows areas divided by image ares.
         eps (float): Epsilon value for math operations.
     """
+    return _get_windows(tuple(im_size), tuple(crop_sizes), tuple(gaps), im_rate_thr, eps).copy()
+
+
+@lru_cache(maxsize=256)
+def _get_windows(im_size, crop_sizes, gaps, im_rate_thr, eps):
+    """Get the coordinates of windows for hashable arguments, see `get_windows`."""
     h, w = im_size
     windows = []
     for crop_size, gap in zip(crop_sizes, gaps):
@@ -152,7 +205,7 @@ def get_window_obj(anno, windows, iof_thr=0.7):
         return [np.zeros((0, 9), dtype=np.float32) for _ in range(len(windows))]  # window_anns
 
 
-def crop_and_save(anno, windows, window_objs, im_dir, lb_dir, allow_background_images=True):
+def crop_and_save(anno, windows, window_objs, im_dir, lb_dir, allow_background_images=True, im=None):
     """
     Crop images and save new labels.
 
@@ -163,6 +216,7 @@ def crop_and_save(anno, windows, window_objs, im_dir, lb_dir, allow_background_i
         im_dir (str): The output directory path of images.
         lb_dir (str): The output directory path of labels.
         allow_background_images (bool): Whether to include background images without labels.
+        im (np.ndarray, optional): The already decoded image, read from `anno["filepath"]` if None.
 
     Notes:
         The directory structure assumed for the DOTA dataset:
@@ -174,7 +228,7 @@ def crop_and_save(anno, windows, window_objs, im_dir, lb_dir, allow_background_i
                     - train
                     - val
     """
-    im = cv2.imread(anno["filepath"])
+    im = cv2.imread(anno["filepath"]) if im is None else im
     name = Path(anno["filepath"]).stem
     for i, window in enumerate(windows):
         x_start, y_start, x_stop, y_stop = window.tolist()
@@ -197,10 +251,111 @@ def crop_and_save(anno, windows, window_objs, im_dir, lb_dir, allow_background_i
                     f.write(f"{int(lb[0])} {' '.join(formatted_coords)}\n")
 
 
-def split_images_and_labels(data_root, save_dir, split="train", crop_sizes=(1024,), gaps=(200,)):
+def split_image(im_file, im_dir, lb_dir=None, crop_sizes=(1024,), gaps=(200,)):
+    """
+    Split one image, and its labels if `lb_dir` is given, into windows.
+
+    Args:
+        im_file (str): The image file path, labels are read from the matching label file.
+        im_dir (str): The output directory path of images.
+        lb_dir (str, optional): The output directory path of labels, None to save image crops only.
+        crop_sizes (List(int)): Crop size of windows.
+        gaps (List(int)): Gap between crops.
+
+    Returns:
+        (tuple): The image file name and the number of windows.
+    """
+    im = cv2.imread(im_file)
+    h, w = im.shape[:2]
+    windows = get_windows((h, w), crop_sizes, gaps)
+    if lb_dir is None:
+        name = Path(im_file).stem
+        for window in windows:
+            x_start, y_start, x_stop, y_stop = window.tolist()
+            new_name = f"{name}__{x_stop - x_start}__{x_start}___{y_start}"
+            cv2.imwrite(str(Path(im_dir) / f"{new_name}.jpg"), im[y_start:y_stop, x_start:x_stop])
+    else:
+        lb_file = Path(img2label_paths([im_file])[0])
+        lb = [x.split() for x in lb_file.read_text().strip().splitlines() if len(x)] if lb_file.exists() else []
+        anno = dict(ori_size=(h, w), label=np.array(lb, dtype=np.float32).reshape(-1, 9), filepath=im_file)
+        crop_and_save(anno, windows, get_window_obj(anno, windows), im_dir, lb_dir, im=im)
+    return Path(im_file).name, len(windows)
+
+
+def load_manifest(file, settings, resume=True):
+    """
+    Load the names of images already split with the same settings, starting a new manifest otherwise.
+
+    The manifest is a JSON lines file with the settings on the first line and one line per finished image, so an
+    interrupted split resumes from the images it has not finished.
+
+    Args:
+        file (Path): The manifest file path.
+        settings (dict): The split settings, a manifest written with other settings is discarded.
+        resume (bool): Whether to keep the images finished by a previous run.
+
+    Returns:
+        (set): The names of finished images.
+    """
+    done, lines = set(), []
+    if resume and file.exists():
+        lines = file.read_text().splitlines()
+    if lines and lines[0] == json.dumps(settings):
+        for i, line in enumerate(lines[1:], 1):
+            try:
+                done.add(json.loads(line)["file"])
+            except (json.JSONDecodeError, KeyError):  # line cut short by the interruption
+                lines[i] = None
+        file.write_text("".join(f"{line}\n" for line in lines if line is not None))
+        return done
+    file.parent.mkdir(parents=True, exist_ok=True)
+    file.write_text(json.dumps(settings) + "\n")
+    return done
+
+
+def split_images(
+    im_files, im_dir, lb_dir, manifest, desc, crop_sizes=(1024,), gaps=(200,), workers=NUM_THREADS, resume=True
+):
+    """
+    Split images in a process pool with one task per image, recording finished images in a manifest.
+
+    Args:
+        im_files (List(str)): The image file paths.
+        im_dir (Path): The output directory path of images.
+        lb_dir (Path, optional): The output directory path of labels, None to save image crops only.
+        manifest (Path): The manifest file path used to resume an interrupted split.
+        desc (str): The progress bar description.
+        crop_sizes (List(int)): Crop size of windows.
+        gaps (List(int)): Gap between crops.
+        workers (int): Number of worker processes, 0 to split in the calling process.
+        resume (bool): Whether to skip images finished by a previous run with the same settings.
+    """
+    settings = dict(crop_sizes=list(crop_sizes), gaps=list(gaps), labels=lb_dir is not None)
+    done = load_manifest(Path(manifest), settings, resume)
+    todo = sorted(f for f in im_files if Path(f).name not in done)
+    fn = partial(split_image, im_dir=str(im_dir), lb_dir=lb_dir and str(lb_dir), crop_sizes=crop_sizes, gaps=gaps)
+    pool = Pool(min(workers, len(todo))) if workers and len(todo) > 1 else None
+    try:
+        results = pool.imap_unordered(fn, todo) if pool else map(fn, todo)
+        with open(manifest, "a") as f:
+            for name, n in tqdm(results, total=len(im_files), initial=len(im_files) - len(todo), desc=desc):
+                f.write(json.dumps({"file": name, "windows": n}) + "\n")
+                f.flush()
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+
+
+def split_images_and_labels(
+    data_root, save_dir, split="train", crop_sizes=(1024,), gaps=(200,), workers=NUM_THREADS, resume=True
+):
     """
     Split both images and labels.
 
+    Images are split in parallel by `workers` processes and finished images are recorded in `save_dir/{split}.manifest`,
+    so running again with the same settings resumes an interrupted split.
+
     Notes:
         The directory structure assumed for the DOTA dataset:
             - data_root
@@ -220,14 +375,15 @@ def split_images_and_labels(data_root, save_dir, split="train", crop_sizes=(1024
     lb_dir = Path(save_dir) / "labels" / split
     lb_dir.mkdir(parents=True, exist_ok=True)
 
-    annos = load_yolo_dota(data_root, split=split)
-    for anno in tqdm(annos, total=len(annos), desc=split):
-        windows = get_windows(anno["ori_size"], crop_sizes, gaps)
-        window_objs = get_window_obj(anno, windows)
-        crop_and_save(anno, windows, window_objs, str(im_dir), str(lb_dir))
+    assert split in {"train", "val"}, f"Split must be 'train' or 'val', not {split}."
+    src = Path(data_root) / "images" / split
+    assert src.exists(), f"Can't find {src}, please check your data root."
+    im_files = glob(str(src / "*"))
+    manifest = Path(save_dir) / f"{split}.manifest"
+    split_images(im_files, im_dir, lb_dir, manifest, split, crop_sizes, gaps, workers, resume)
 
 
-def split_trainval(data_root, save_dir, crop_size=1024, gap=200, rates=(1.0,)):
+def split_trainval(data_root, save_dir, crop_size=1024, gap=200, rates=(1.0,), workers=NUM_THREADS, resume=True):
     """
     Split train and val set of DOTA.
 
@@ -254,10 +410,10 @@ def split_trainval(data_root, save_dir, crop_size=1024, gap=200, rates=(1.0,)):
         crop_sizes.append(int(crop_size / r))
         gaps.append(int(gap / r))
     for split in ["train", "val"]:
-        split_images_and_labels(data_root, save_dir, split, crop_sizes, gaps)
+        split_images_and_labels(data_root, save_dir, split, crop_sizes, gaps, workers, resume)
 
 
-def split_test(data_root, save_dir, crop_size=1024, gap=200, rates=(1.0,)):
+def split_test(data_root, save_dir, crop_size=1024, gap=200, rates=(1.0,), workers=NUM_THREADS, resume=True):
     """
     Split test set of DOTA, labels are not included within this set.
 
@@ -275,22 +431,14 @@ def split_test(data_root, save_dir, crop_size=1024, gap=200, rates=(1.0,)):
     for r in rates:
         crop_sizes.append(int(crop_size / r))
         gaps.append(int(gap / r))
-    save_dir = Path(save_dir) / "images" / "test"
-    save_dir.mkdir(parents=True, exist_ok=True)
+    im_dir = Path(save_dir) / "images" / "test"
+    im_dir.mkdir(parents=True, exist_ok=True)
 
-    im_dir = Path(data_root) / "images" / "test"
-    assert im_dir.exists(), f"Can't find {im_dir}, please check your data root."
-    im_files = glob(str(im_dir / "*"))
-    for im_file in tqdm(im_files, total=len(im_files), desc="test"):
-        w, h = exif_size(Image.open(im_file))
-        windows = get_windows((h, w), crop_sizes=crop_sizes, gaps=gaps)
-        im = cv2.imread(im_file)
-        name = Path(im_file).stem
-        for window in windows:
-            x_start, y_start, x_stop, y_stop = window.tolist()
-            new_name = f"{name}__{x_stop - x_start}__{x_start}___{y_start}"
-            patch_im = im[y_start:y_stop, x_start:x_stop]
-            cv2.imwrite(str(save_dir / f"{new_name}.jpg"), patch_im)
+    src = Path(data_root) / "images" / "test"
+    assert src.exists(), f"Can't find {src}, please check your data root."
+    im_files = glob(str(src / "*"))
+    manifest = Path(save_dir) / "test.manifest"
+    split_images(im_files, im_dir, None, manifest, "test", crop_sizes, gaps, workers, resume)
 
 
 if __name__ == "__main__":
@@ -4,15 +4,20 @@ import hashlib
 import json
 import os
 import random
+import shutil
 import subprocess
+import threading
 import time
 import zipfile
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from multiprocessing.pool import ThreadPool
 from pathlib import Path
 from tarfile import is_tarfile
 
 import cv2
 import numpy as np
+import torch
 from PIL import Image, ImageOps
 
 from ultralytics.nn.autobackend import check_class_names
@@ -55,6 +60,39 @@ def get_hash(paths):
     return h.hexdigest()  # return hash
 
 
+def get_fingerprints(paths):
+    """Returns the (mtime_ns, size) of each path as an int64 array of shape (n, 2), (-1, -1) for missing files."""
+
+    def stat(p):
+        try:
+            s = os.stat(p)
+            return s.st_mtime_ns, s.st_size
+        except OSError:
+            return -1, -1
+
+    with ThreadPool(NUM_THREADS) as pool:  # stat() latency dominates on network file systems
+        return np.array(pool.map(stat, paths, chunksize=1024), dtype=np.int64).reshape(-1, 2)
+
+
+def get_image_shapes(paths):
+    """Returns the exif-corrected (h, w) of each image as an int64 array of shape (n, 2), (0, 0) for unreadable images.
+
+    Only the image headers are read, PIL opens images lazily and parses the JPEG SOF/EXIF and PNG IHDR segments without
+    decoding any pixels.
+    """
+
+    def shape(p):
+        try:
+            with Image.open(p) as im:
+                w, h = exif_size(im)
+            return h, w
+        except Exception:
+            return 0, 0
+
+    with ThreadPool(NUM_THREADS) as pool:
+        return np.array(pool.map(shape, paths, chunksize=64), dtype=np.int64).reshape(-1, 2)
+
+
 def exif_size(img: Image.Image):
     """Returns exif-corrected PIL size."""
     s = img.size  # (width, height)
@@ -672,3 +710,679 @@ def save_dataset_cache_file(prefix, path, x, version):
         LOGGER.info(f"{prefix}New cache created: {path}")
     else:
         LOGGER.warning(f"{prefix}WARNING ⚠️ Cache directory {path.parent} is not writeable, cache not saved.")
+
+
+def gather_ranges(offsets, index):
+    """
+    Gather the ranges `offsets[i]:offsets[i + 1]` for each `i` in `index`.
+
+    Args:
+        offsets (np.ndarray): Range offsets, shape (n + 1,).
+        index (np.ndarray): Indices of the ranges to gather.
+
+    Returns:
+        (np.ndarray): Element indices of all gathered ranges in order.
+        (np.ndarray): Offsets of the gathered ranges, shape (len(index) + 1,).
+    """
+    start = offsets[:-1][index]
+    count = offsets[1:][index] - start
+    new = np.concatenate(([0], np.cumsum(count))).astype(np.int64)
+    return np.repeat(start - new[:-1], count) + np.arange(new[-1]), new
+
+
+class LabelTable:
+    """
+    Columnar per-image YOLO labels.
+
+    Instead of one dict of small arrays per image, all instances are stored in concatenated arrays with per-image
+    offsets, so a dataset holds a handful of numpy arrays regardless of its size. Arrays loaded from a label cache
+    directory are memory-mapped read-only; every dataloader worker shares the same page cache and indexing returns
+    zero-copy views. `table[i]` returns the same dict layout as the legacy list of labels.
+
+    Attributes:
+        im_files (list): Image file paths.
+        shapes (np.ndarray): Image shapes (h, w), shape (N, 2).
+        offsets (np.ndarray): Instance offsets per image, shape (N + 1,).
+        cls (np.ndarray): Classes of all instances, shape (M, 1).
+        bboxes (np.ndarray): Normalized xywh boxes of all instances, shape (M, 4).
+        keypoints (np.ndarray | None): Keypoints of all instances, shape (M, nkpt, ndim).
+        seg_offsets (np.ndarray): Segment offsets per image, shape (N + 1,).
+        point_offsets (np.ndarray): Point offsets per segment, shape (S + 1,).
+        points (np.ndarray): Points of all segments, shape (P, 2).
+        index (np.ndarray | None): Optional order of the images, e.g. for rectangular training.
+        path (Path | None): Cache directory memory-mapped arrays are loaded from.
+
+    Examples:
+        >>> table = LabelTable.from_labels(labels)
+        >>> table[0]["bboxes"]  # same as labels[0]["bboxes"]
+    """
+
+    arrays = ("shapes", "offsets", "cls", "bboxes", "keypoints", "seg_offsets", "point_offsets", "points")
+
+    def __init__(
+        self,
+        im_files,
+        shapes,
+        offsets,
+        cls,
+        bboxes,
+        keypoints=None,
+        seg_offsets=None,
+        point_offsets=None,
+        points=None,
+        index=None,
+        path=None,
+    ):
+        """Initialize a LabelTable from concatenated label arrays."""
+        self.im_files = im_files
+        self.shapes = shapes
+        self.offsets = offsets
+        self.cls = cls
+        self.bboxes = bboxes
+        self.keypoints = keypoints
+        self.seg_offsets = np.zeros(len(im_files) + 1, dtype=np.int64) if seg_offsets is None else seg_offsets
+        self.point_offsets = np.zeros(1, dtype=np.int64) if point_offsets is None else point_offsets
+        self.points = np.zeros((0, 2), dtype=np.float32) if points is None else points
+        self.index = index
+        self.path = path
+
+    @classmethod
+    def from_labels(cls, labels):
+        """Build a LabelTable from a list of per-image label dicts as produced by `verify_image_label`."""
+        n = [len(lb["cls"]) for lb in labels]
+        segments = [s for lb in labels for s in lb["segments"]]
+        kpts = [lb["keypoints"] for lb in labels if lb.get("keypoints") is not None]
+        return cls(
+            im_files=[lb["im_file"] for lb in labels],
+            shapes=np.array([lb["shape"] for lb in labels], dtype=np.int32).reshape(-1, 2),
+            offsets=np.concatenate(([0], np.cumsum(n))).astype(np.int64),
+            cls=np.concatenate([lb["cls"] for lb in labels] or [np.zeros((0, 1))]).astype(np.float32).reshape(-1, 1),
+            bboxes=np.concatenate([lb["bboxes"] for lb in labels] or [np.zeros((0, 4))]).astype(np.float32),
+            keypoints=np.concatenate(kpts).astype(np.float32) if kpts else None,
+            seg_offsets=np.concatenate(([0], np.cumsum([len(lb["segments"]) for lb in labels]))).astype(np.int64),
+            point_offsets=np.concatenate(([0], np.cumsum([len(s) for s in segments]))).astype(np.int64),
+            points=np.concatenate(segments).astype(np.float32).reshape(-1, 2) if segments else None,
+        )
+
+    def __len__(self):
+        """Return the number of images."""
+        return len(self.im_files) if self.index is None else len(self.index)
+
+    def __getitem__(self, i):
+        """Return the label dict of image `i`, with zero-copy views into the label arrays."""
+        if i < 0:
+            i += len(self)
+        if self.index is not None:
+            i = self.index[i]
+        a, b = self.offsets[i], self.offsets[i + 1]
+        po = self.point_offsets
+        return {
+            "im_file": self.im_files[i],
+            "shape": tuple(self.shapes[i].tolist()),
+            "cls": self.cls[a:b],
+            "bboxes": self.bboxes[a:b],
+            "segments": [self.points[po[k] : po[k + 1]] for k in range(self.seg_offsets[i], self.seg_offsets[i + 1])],
+            "keypoints": None if self.keypoints is None else self.keypoints[a:b],
+            "normalized": True,
+            "bbox_format": "xywh",
+        }
+
+    def __iter__(self):
+        """Iterate over the per-image label dicts."""
+        return (self[i] for i in range(len(self)))
+
+    def __getstate__(self):
+        """Pickle memory-mapped arrays by path so spawned dataloader workers re-map them instead of copying."""
+        state = self.__dict__.copy()
+        for k in self.arrays:
+            if isinstance(getattr(self, k), np.ndarray) and isinstance(getattr(self, k).base, np.memmap):
+                state.pop(k)
+        return state
+
+    def __setstate__(self, state):
+        """Restore a pickled table, re-mapping the arrays that were pickled by path."""
+        self.__dict__.update(state)
+        for k, x in self.load_arrays(self.path).items() if self.path else ():
+            if k not in state:
+                setattr(self, k, x)
+
+    @property
+    def num_instances(self):
+        """Total number of labelled instances."""
+        return len(self.cls)
+
+    @property
+    def num_segments(self):
+        """Total number of segments."""
+        return len(self.point_offsets) - 1
+
+    @property
+    def image_shapes(self):
+        """Image shapes (h, w) in table order, shape (len(self), 2)."""
+        return np.asarray(self.shapes if self.index is None else self.shapes[self.index])
+
+    def replace(self, **kwargs):
+        """Return a shallow copy of the table with the given attributes replaced."""
+        table = LabelTable.__new__(LabelTable)
+        table.__dict__.update(self.__dict__, **kwargs)
+        return table
+
+    def select(self, index):
+        """Return the table reordered or subset to `index`, without copying the label arrays."""
+        index = np.asarray(index, dtype=np.int64)
+        return self.replace(index=index if self.index is None else self.index[index])
+
+    def take(self, index):
+        """Return a new table with the images `index` (in table order), copying their rows into compact arrays."""
+        index = np.asarray(index, dtype=np.int64)
+        if self.index is not None:
+            index = self.index[index]
+        instance, offsets = gather_ranges(self.offsets, index)
+        segment, seg_offsets = gather_ranges(self.seg_offsets, index)
+        point, point_offsets = gather_ranges(self.point_offsets, segment)
+        return LabelTable(
+            im_files=[self.im_files[i] for i in index],
+            shapes=self.shapes[index],
+            offsets=offsets,
+            cls=self.cls[instance],
+            bboxes=self.bboxes[instance],
+            keypoints=None if self.keypoints is None else self.keypoints[instance],
+            seg_offsets=seg_offsets,
+            point_offsets=point_offsets,
+            points=self.points[point],
+        )
+
+    @classmethod
+    def concatenate(cls, tables):
+        """Concatenate tables into a new table with the images of all tables in order."""
+        tables = [t if t.index is None else t.take(np.arange(len(t))) for t in tables]
+
+        def offsets(name):
+            x = [getattr(t, name) for t in tables]
+            shift = np.cumsum([0] + [o[-1] for o in x[:-1]])
+            return np.concatenate([x[0][:1]] + [o[1:] + s for o, s in zip(x, shift)]).astype(np.int64)
+
+        kpts = [t.keypoints for t in tables if t.num_instances]
+        return cls(
+            im_files=[f for t in tables for f in t.im_files],
+            shapes=np.concatenate([t.shapes for t in tables]),
+            offsets=offsets("offsets"),
+            cls=np.concatenate([t.cls for t in tables]),
+            bboxes=np.concatenate([t.bboxes for t in tables]),
+            keypoints=np.concatenate(kpts) if kpts and kpts[0] is not None else None,
+            seg_offsets=offsets("seg_offsets"),
+            point_offsets=offsets("point_offsets"),
+            points=np.concatenate([t.points for t in tables]),
+        )
+
+    def filter(self, include_class=None, single_cls=False):
+        """Return a table keeping only instances of `include_class`, optionally mapping all classes to 0."""
+        cls = np.asarray(self.cls)
+        keep = np.ones(len(cls), dtype=bool) if include_class is None else np.isin(cls[:, 0], include_class)
+        image = np.repeat(np.arange(len(self.offsets) - 1), np.diff(self.offsets))  # image index of each instance
+        counts = np.bincount(image[keep], minlength=len(self.offsets) - 1)
+
+        # Segments map 1:1 onto the instances of their image
+        seg_counts = np.diff(self.seg_offsets)
+        instance = np.repeat(self.offsets[:-1] - self.seg_offsets[:-1], seg_counts) + np.arange(self.num_segments)
+        seg_keep = keep[instance]
+        points = np.repeat(seg_keep, np.diff(self.point_offsets))
+        seg_image = np.repeat(np.arange(len(seg_counts)), seg_counts)
+        lengths = np.diff(self.point_offsets)[seg_keep]
+
+        return self.replace(
+            offsets=np.concatenate(([0], np.cumsum(counts))).astype(np.int64),
+            cls=np.zeros_like(cls[keep]) if single_cls else cls[keep],
+            bboxes=self.bboxes[keep],
+            keypoints=None if self.keypoints is None else self.keypoints[keep],
+            seg_offsets=np.concatenate(([0], np.cumsum(np.bincount(seg_image[seg_keep], minlength=len(seg_counts))))),
+            point_offsets=np.concatenate(([0], np.cumsum(lengths))).astype(np.int64),
+            points=self.points[points],
+        )
+
+    def drop_segments(self):
+        """Return the table without segments, sharing all other arrays."""
+        return self.replace(
+            seg_offsets=np.zeros(len(self.im_files) + 1, dtype=np.int64),
+            point_offsets=np.zeros(1, dtype=np.int64),
+            points=np.zeros((0, 2), dtype=np.float32),
+        )
+
+    def save(self, path):
+        """Save the label arrays as .npy files into directory `path`."""
+        path.mkdir(parents=True, exist_ok=True)
+        for k in self.arrays:
+            x = getattr(self, k)
+            if x is not None:
+                np.save(path / f"{k}.npy", np.ascontiguousarray(x), allow_pickle=False)
+
+    @staticmethod
+    def load_arrays(path):
+        """Memory-map the label arrays saved by `save` from directory `path`."""
+        arrays = dict.fromkeys(LabelTable.arrays)
+        for k in LabelTable.arrays:
+            f = path / f"{k}.npy"
+            if f.exists():
+                arrays[k] = np.asarray(np.load(f, mmap_mode="r", allow_pickle=False))  # plain ndarray view of memmap
+        return arrays
+
+
+def load_label_cache(path):
+    """
+    Load a columnar label cache directory written by `save_label_cache`.
+
+    Args:
+        path (Path): Label cache directory.
+
+    Returns:
+        (dict): Cache dict with 'labels' (LabelTable with memory-mapped arrays) and the other saved values.
+    """
+    with open(path / "meta.json", encoding="utf-8") as f:
+        cache = json.load(f)
+    for f in path.glob("*.npy"):
+        if f.stem not in LabelTable.arrays:
+            cache[f.stem] = np.load(f, allow_pickle=False)  # other arrays of the cache, e.g. file fingerprints
+    cache["labels"] = LabelTable(cache.pop("im_files"), **LabelTable.load_arrays(path), path=path)
+    return cache
+
+
+def save_label_cache(prefix, path, x, version):
+    """
+    Save a label cache dict `x` as a columnar cache directory `path`.
+
+    The labels are written as one .npy file per array plus a 'meta.json' with image files and scan results, so that
+    `load_label_cache` can memory-map them instead of unpickling a list of dicts. Other array values of `x` are saved
+    as .npy files too.
+
+    Args:
+        prefix (str): Logging prefix.
+        path (Path): Label cache directory.
+        x (dict): Cache dict with 'labels' (LabelTable or list of label dicts) and JSON-serializable or array values.
+        version (str): Cache version.
+
+    Returns:
+        (bool): True if the cache was saved.
+    """
+    if not is_dir_writeable(path.parent):
+        LOGGER.warning(f"{prefix}WARNING ⚠️ Cache directory {path.parent} is not writeable, cache not saved.")
+        return False
+    labels = x["labels"] if isinstance(x["labels"], LabelTable) else LabelTable.from_labels(x["labels"])
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")  # write aside, then swap in
+    shutil.rmtree(tmp, ignore_errors=True)
+    labels.save(tmp)
+    for k, v in x.items():
+        if isinstance(v, np.ndarray):
+            np.save(tmp / f"{k}.npy", v, allow_pickle=False)
+    meta = {k: v for k, v in x.items() if k != "labels" and not isinstance(v, np.ndarray)}
+    meta.update(version=version, im_files=[str(f) for f in labels.im_files])
+    with open(tmp / "meta.json", "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    shutil.rmtree(path, ignore_errors=True)
+    tmp.rename(path)
+    LOGGER.info(f"{prefix}New cache created: {path}")
+    return True
+
+
+def resized_shapes(shapes, imgsz, rect_mode=True):
+    """
+    Returns the (h, w) that BaseDataset.load_image() resizes images of the given original (h, w) shapes to.
+
+    Args:
+        shapes (np.ndarray): Original image shapes (h, w) of shape (n, 2).
+        imgsz (int): Target image size.
+        rect_mode (bool): Resize the long side to imgsz keeping the aspect ratio if True, else stretch to imgsz square.
+
+    Returns:
+        (np.ndarray): Resized image shapes (h, w) of shape (n, 2).
+    """
+    shapes = np.asarray(shapes, dtype=np.int64).reshape(-1, 2)
+    if not rect_mode:
+        return np.full_like(shapes, imgsz)
+    r = imgsz / shapes.max(1, keepdims=True)  # ratio
+    return np.where(r != 1, np.minimum(np.ceil(shapes * r), imgsz), shapes).astype(np.int64)
+
+
+def estimate_cache_size(im_files, imgsz, rect_mode=True, shapes=None, n=200, channels=3):
+    """
+    Estimates the bytes needed to cache a dataset's images per `cache` mode without decoding any image.
+
+    Original image sizes are taken from `shapes` when known (e.g. from the label cache), otherwise read from the
+    headers of `n` randomly sampled images and extrapolated to the whole dataset. The exact load_image() resize logic is
+    applied to them, so the 'ram' estimate is the size of the resized uint8 arrays. The 'disk' estimate is the same
+    figure as an upper bound, as the PNG blocks of the disk cache are never larger than the raw pixels and typically
+    2-5x smaller.
+
+    Args:
+        im_files (List[str]): Image file paths.
+        imgsz (int): Target image size.
+        rect_mode (bool): Resize mode of load_image(), see `resized_shapes`.
+        shapes (np.ndarray, optional): Known original image shapes (h, w) of shape (len(im_files), 2).
+        n (int): Number of images to sample when `shapes` is not given, all images if n <= 0.
+        channels (int): Channels of the loaded images, cv2.imread() always returns BGR.
+
+    Returns:
+        (dict): Projected cache bytes with keys 'ram' and 'disk'.
+
+    Examples:
+        >>> from ultralytics.data.utils import estimate_cache_size
+        >>> sizes = estimate_cache_size(["path/to/im0.jpg", "path/to/im1.jpg"], imgsz=640)
+        >>> print(f"{sizes['ram'] / 1e6:.1f}MB RAM")
+    """
+    ni = len(im_files)
+    if shapes is None:
+        index = sorted(random.sample(range(ni), n)) if 0 < n < ni else range(ni)
+        shapes = get_image_shapes([im_files[i] for i in index])
+        shapes = shapes[(shapes > 0).all(1)]  # unreadable images are dropped by dataset verification
+    b = int(resized_shapes(shapes, imgsz, rect_mode).prod(1).sum()) * channels
+    b = round(b * ni / len(shapes)) if len(shapes) else 0  # extrapolate to the whole dataset
+    return {"ram": b, "disk": b}
+
+
+class SharedImageCache:
+    """
+    Images packed back to back into one file in shared memory, with an offset/shape index.
+
+    The cache is built once per node and memory-mapped read-only by every DDP rank and dataloader worker, so a RAM
+    image cache takes 1x the dataset size per node regardless of world size and `workers`. `cache[i]` returns a
+    read-only view of image `i`.
+
+    Attributes:
+        path (Path): Image data file, the index is saved next to it as '<path>.index.npy'.
+        index (np.ndarray): Per-image offset, resized (h, w, c) and original (h0, w0), shape (N, 6). c is 0 for 2D
+            images.
+        data (np.memmap): Read-only mapping of the image data.
+
+    Examples:
+        >>> SharedImageCache.build(path, (load_image(i) for i in range(n)))
+        >>> ims = SharedImageCache(path)
+        >>> im = ims[0]
+    """
+
+    def __init__(self, path):
+        """Attach to a cache built by `build`."""
+        self.path = Path(path)
+        self.index = np.load(self.index_file(self.path), allow_pickle=False)
+        self.data = np.memmap(self.path, dtype=np.uint8, mode="r")
+
+    @staticmethod
+    def index_file(path):
+        """Return the index file of the cache at `path`, whose presence marks the cache as complete."""
+        return path.with_name(f"{path.name}.index.npy")
+
+    @staticmethod
+    def exists(path):
+        """Whether a complete cache exists at `path`."""
+        return SharedImageCache.index_file(path).exists()
+
+    @staticmethod
+    def build(path, images):
+        """
+        Write images to a new cache at `path`, streaming them so the images are never all held in process memory.
+
+        Args:
+            path (Path): Image data file to create.
+            images (Iterable): Tuples (im, (h0, w0), (h, w)) in dataset order, e.g. from `BaseDataset.load_image`.
+
+        Returns:
+            (int): Number of bytes cached.
+        """
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        index, offset = [], 0
+        try:
+            with open(tmp, "wb") as f:
+                for im, (h0, w0), _ in images:
+                    f.write(np.ascontiguousarray(im).data)
+                    index.append((offset, *im.shape[:2], im.shape[2] if im.ndim == 3 else 0, h0, w0))
+                    offset += im.nbytes
+            np.save(tmp.with_name(f"{tmp.name}.npy"), np.array(index, dtype=np.int64).reshape(-1, 6))
+            tmp.rename(path)
+            tmp.with_name(f"{tmp.name}.npy").rename(SharedImageCache.index_file(path))  # marks the cache complete
+        finally:
+            tmp.unlink(missing_ok=True)
+            tmp.with_name(f"{tmp.name}.npy").unlink(missing_ok=True)
+        return offset
+
+    def unlink(self):
+        """Remove the cache files, processes that already mapped the cache keep their mapping."""
+        self.index_file(self.path).unlink(missing_ok=True)
+        self.path.unlink(missing_ok=True)
+
+    def __len__(self):
+        """Return the number of images."""
+        return len(self.index)
+
+    def __getitem__(self, i):
+        """Return a read-only view of image `i`."""
+        o, h, w, c = self.index[i, :4].tolist()
+        return self.data[o : o + h * w * max(c, 1)].view(np.ndarray).reshape((h, w, c) if c else (h, w))
+
+    @property
+    def shapes(self):
+        """Original (h0, w0) and resized (h, w) shapes of all images as lists of tuples."""
+        return [tuple(x) for x in self.index[:, 4:].tolist()], [tuple(x) for x in self.index[:, 1:3].tolist()]
+
+    def __getstate__(self):
+        """Pickle by path so spawned dataloader workers map the cache instead of copying it."""
+        return {"path": self.path}
+
+    def __setstate__(self, state):
+        """Map the cache again after unpickling."""
+        self.__init__(state["path"])
+
+
+class PackedImageCache:
+    """
+    Pre-resized images stored losslessly compressed in one packed file with a random-access index.
+
+    Each image is a PNG block, so the cache is a fraction of the size of raw *.npy files and holds images at training
+    size, which also removes the per-epoch resize. BGR images whose channels are equal (e.g. X-ray scans) are stored as
+    single-channel PNGs, which are about 3x smaller and 2x faster to decode. The file is the concatenated blocks,
+    followed by an int64 index of (offset, nbytes, h0, w0, channels) per image and a footer (index offset, number of
+    images). Every process memory-maps the file read-only on first access and decodes images on demand.
+
+    Attributes:
+        path (Path): Cache file.
+        index (np.ndarray): Per-image block offset and size, original (h0, w0) and channels, shape (N, 5).
+
+    Examples:
+        >>> PackedImageCache.build(path, (PackedImageCache.encode(*load_image(i)) for i in range(n)))
+        >>> ims = PackedImageCache(path)
+        >>> im = ims[0]
+    """
+
+    footer = 16  # bytes, int64 index offset and number of images
+
+    def __init__(self, path):
+        """Open a cache built by `build`."""
+        self.path = Path(path)
+        self.data = None
+        data = self.map()
+        offset, n = np.frombuffer(data[-self.footer :], dtype=np.int64).tolist()
+        self.index = np.frombuffer(data[offset : offset + n * 40], dtype=np.int64).reshape(n, 5)
+
+    def map(self):
+        """Memory-map the cache file read-only, once per process."""
+        if self.data is None:
+            self.data = np.memmap(self.path, dtype=np.uint8, mode="r")
+        return self.data
+
+    @staticmethod
+    def encode(im, hw0, hw=None, level=3):
+        """Return the PNG block, original (h0, w0) and channels of an image, e.g. from `BaseDataset.load_image`."""
+        c = im.shape[2] if im.ndim == 3 else 0
+        if c == 3 and (im[..., 0] == im[..., 1]).all() and (im[..., 1] == im[..., 2]).all():
+            im = im[..., 0]  # grayscale content, restored to BGR on decode
+        return cv2.imencode(".png", im, [cv2.IMWRITE_PNG_COMPRESSION, level])[1], hw0, c
+
+    @staticmethod
+    def build(path, blocks):
+        """
+        Write encoded images to a new cache file at `path`, replacing it atomically.
+
+        Args:
+            path (Path): Cache file to create.
+            blocks (Iterable): Tuples (block, (h0, w0), channels) in dataset order from `encode`.
+
+        Returns:
+            (int): Size of the cache file in bytes.
+        """
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        index, offset = [], 0
+        try:
+            with open(tmp, "wb") as f:
+                for block, (h0, w0), c in blocks:
+                    f.write(block.data)
+                    index.append((offset, block.nbytes, h0, w0, c))
+                    offset += block.nbytes
+                f.write(np.array(index, dtype=np.int64).reshape(-1, 5).tobytes())
+                f.write(np.array([offset, len(index)], dtype=np.int64).tobytes())
+            tmp.replace(path)
+        finally:
+            tmp.unlink(missing_ok=True)
+        return path.stat().st_size
+
+    def __len__(self):
+        """Return the number of images."""
+        return len(self.index)
+
+    def __getitem__(self, i):
+        """Decode image `i`."""
+        o, n, _, _, c = self.index[i].tolist()
+        im = cv2.imdecode(self.map()[o : o + n], cv2.IMREAD_UNCHANGED)
+        return cv2.cvtColor(im, cv2.COLOR_GRAY2BGR) if c == 3 and im.ndim == 2 else im
+
+    @property
+    def hw0(self):
+        """Original (h0, w0) of all images as a list of tuples."""
+        return [tuple(x) for x in self.index[:, 2:4].tolist()]
+
+    def __getstate__(self):
+        """Pickle by path, the file is mapped again on first access."""
+        return {"path": self.path}
+
+    def __setstate__(self, state):
+        """Open the cache again after unpickling."""
+        self.__init__(state["path"])
+
+
+class ImageBuffer:
+    """
+    LRU buffer of recently loaded images of a dataset, private to each dataloader worker, for mosaic partners.
+
+    Entries are the (im, (h0, w0), (h, w)) tuples of `BaseDataset.load_image`, kept in an OrderedDict so lookups,
+    refreshes and evictions are O(1). `prefetch` loads indexes ahead of use on one background thread. Hit, miss,
+    eviction and prefetch counts of every worker are kept in shared memory, so the main process can report them.
+
+    Attributes:
+        maxlen (int): Maximum number of buffered images, 0 disables the buffer.
+        items (OrderedDict): Buffered entries by dataset index, least recently used first.
+        pending (dict): Futures of the prefetches in flight by dataset index.
+        counts (torch.Tensor): Hit, miss, eviction and prefetch counts in shared memory, shape (slots, 4) for the main
+            process and the dataloader workers.
+
+    Examples:
+        >>> buffer = ImageBuffer(maxlen=128)
+        >>> buffer.put(0, dataset.load_image(0))
+        >>> im, hw0, hw = buffer.get(0)
+        >>> buffer.prefetch([3, 7, 9], dataset.load_image)
+        >>> buffer.stats()  # {'hits': 1, 'misses': 0, 'evictions': 0, 'prefetched': 3}
+    """
+
+    keys = ("hits", "misses", "evictions", "prefetched")
+
+    def __init__(self, maxlen, slots=65):
+        """Create an empty buffer of `maxlen` images with counters for the main process and `slots - 1` workers."""
+        self.maxlen = maxlen
+        self.counts = torch.zeros(slots, len(self.keys), dtype=torch.int64).share_memory_()
+        self.last = np.zeros(len(self.keys), dtype=np.int64)  # totals at the previous `stats` call
+        self._reset()
+
+    def _reset(self):
+        """Initialize the per-process state, after creation or in a new process."""
+        self.items, self.pending = OrderedDict(), {}
+        self.lock, self.local = threading.Lock(), threading.local()
+        self.executor, self.slot, self.pid = None, None, os.getpid()
+
+    def _count(self, k):
+        """Increment counter `k` of this process."""
+        if self.slot is None:
+            info = torch.utils.data.get_worker_info()
+            self.slot = self.counts.numpy()[0 if info is None else 1 + info.id % (len(self.counts) - 1)]
+        self.slot[k] += 1
+
+    def __len__(self):
+        """Return the number of buffered images."""
+        return len(self.items)
+
+    def __contains__(self, i):
+        """Whether image `i` is buffered."""
+        return i in self.items
+
+    def __iter__(self):
+        """Iterate over a snapshot of the buffered indexes."""
+        with self.lock:
+            return iter(list(self.items))
+
+    def get(self, i):
+        """Return buffered image `i` as most recently used, waiting for a prefetch in flight, or None if missing."""
+        self._check_process()
+        prefetching = getattr(self.local, "prefetching", False)
+        future = None if prefetching else self.pending.get(i)
+        if future is not None:
+            future.exception()  # wait, failed loads are retried and raised by the caller
+        with self.lock:
+            x = self.items.get(i)
+            if x is not None:
+                self.items.move_to_end(i)
+            if not prefetching:
+                self._count(0 if x is not None else 1)
+        return x
+
+    def put(self, i, x):
+        """Buffer image `i` as most recently used, evicting the least recently used image when full."""
+        self._check_process()
+        with self.lock:
+            self.items[i] = x
+            self.items.move_to_end(i)
+            while len(self.items) > self.maxlen:
+                self.items.popitem(last=False)
+                self._count(2)
+
+    def prefetch(self, indexes, load):
+        """Load the `indexes` not buffered or in flight with `load(i)`, which buffers them, on a background thread."""
+        self._check_process()
+        if self.executor is None:
+            init = (self.local, "prefetching", True)  # loads on this thread do not wait for or count as lookups
+            self.executor = ThreadPoolExecutor(1, "ImageBuffer", initializer=setattr, initargs=init)
+        with self.lock:
+            indexes = [i for i in dict.fromkeys(indexes) if i not in self.items and i not in self.pending]
+            for i in indexes:
+                self.pending[i] = future = self.executor.submit(load, i)
+                future.add_done_callback(lambda _, i=i: self.pending.pop(i, None))
+                self._count(3)
+
+    def _check_process(self):
+        """Start over with an empty buffer in a forked dataloader worker, the parent's threads and locks are stale."""
+        if self.pid != os.getpid():
+            self._reset()
+
+    def clear(self):
+        """Drop all buffered images and restart the counts of `stats`."""
+        with self.lock:
+            self.items.clear()
+        self.stats()
+
+    def stats(self):
+        """Return the counts of all processes since the previous call as a dict."""
+        total = self.counts.numpy().sum(0)
+        delta, self.last = total - self.last, total
+        return dict(zip(self.keys, delta.tolist()))
+
+    def __getstate__(self):
+        """Pickle the size and shared counters only, images and threads stay in their process."""
+        return {"maxlen": self.maxlen, "counts": self.counts, "last": self.last}
+
+    def __setstate__(self, state):
+        """Restore an empty buffer that keeps counting into the shared counters."""
+        self.__dict__.update(state)
+        self._reset()
@@ -30,9 +30,14 @@ Usage - formats:
                               yolov8n_ncnn_model         # NCNN
 """
 
+import contextlib
 import platform
+import queue
 import re
 import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 import cv2
@@ -76,6 +81,8 @@ class BasePredictor:
         device (torch.device): Device used for prediction.
         dataset (Dataset): Dataset used for prediction.
         vid_writer (dict): Dictionary of {save_path: video_writer, ...} writer for saving video output.
+        tiles (int): Number of tiles run by sliced inference (`tile`) in the current prediction.
+        utilization (dict): Busy fraction of each stage of the last pipelined prediction (`pipeline`).
     """
 
     def __init__(self, cfg=DEFAULT_CFG, overrides=None, _callbacks=None):
@@ -104,6 +111,8 @@ class BasePredictor:
         self.plotted_img = None
         self.source_type = None
         self.seen = 0
+        self.tiles = 0
+        self.utilization = {}
         self.windows = []
         self.batch = None
         self.results = None
@@ -127,7 +136,9 @@ class BasePredictor:
             im = np.ascontiguousarray(im)  # contiguous
             im = torch.from_numpy(im)
 
-        im = im.to(self.device)
+        if self.args.pipeline and self.device.type == "cuda" and im.device.type == "cpu":
+            im = im.pin_memory()  # page-locked for asynchronous copies, recycled by the caching host allocator
+        im = im.to(self.device, non_blocking=True)
         im = im.half() if self.model.fp16 else im.float()  # uint8 to fp16/32
         if not_tensor:
             im /= 255  # 0 - 255 to 0.0 - 1.0
@@ -164,6 +175,63 @@ class BasePredictor:
         """Post-processes predictions for an image and returns them."""
         return preds
 
+    def tile_windows(self, shape):
+        """
+        Returns the overlapping `tile` x `tile` windows covering an image, see `split_dota.get_windows`.
+
+        Args:
+            shape (tuple): Image shape, (h, w).
+
+        Returns:
+            (np.ndarray): Windows as x1, y1, x2, y2, shape (N, 4). Windows may extend past images smaller than a tile.
+        """
+        from ultralytics.data.split_dota import get_windows
+
+        tile = self.args.tile
+        return get_windows(shape, crop_sizes=(tile,), gaps=(round(tile * self.args.tile_overlap),))
+
+    def tile_inference(self, im0s, profilers, *args, **kwargs):
+        """
+        Runs sliced inference on a batch of images and merges the tile predictions per image.
+
+        Every image is cut into overlapping windows, plus the full image if `tile_full` and it needs more than one
+        window. The crops of the whole batch are run `tile_batch` at a time, mapped back to image coordinates with
+        `postprocess_tiles` and merged per image with `merge_tiles` unless the image is covered by a single crop.
+
+        Args:
+            im0s (List[np.ndarray]): Original images, [(h, w, 3) x B].
+            profilers (tuple): Preprocess, inference and postprocess profilers.
+
+        Returns:
+            preds (List[torch.Tensor]): Merged predictions of each image in original image coordinates.
+            im (torch.Tensor): Last preprocessed batch of tiles.
+            n (int): Number of crops run.
+        """
+        crops, offsets, owners = [], [], []
+        for i, im0 in enumerate(im0s):
+            windows = self.tile_windows(im0.shape[:2])
+            crops += [im0[y1:y2, x1:x2] for x1, y1, x2, y2 in windows]
+            offsets += windows[:, :2].tolist()
+            owners += [i] * len(windows)
+            if self.args.tile_full and len(windows) > 1:
+                crops.append(im0)
+                offsets.append([0, 0])
+                owners.append(i)
+
+        preds = [[] for _ in im0s]
+        bs = max(self.args.tile_batch, 1)
+        for j in range(0, len(crops), bs):
+            with profilers[0]:
+                im = self.preprocess(crops[j : j + bs])
+            with profilers[1]:
+                p = self.inference(im, *args, **kwargs)
+            with profilers[2]:
+                for k, pred in enumerate(self.postprocess_tiles(p, im, crops[j : j + bs], offsets[j : j + bs])):
+                    preds[owners[j + k]].append(pred)
+        with profilers[2]:
+            preds = [self.merge_tiles(torch.cat(x)) if len(x) > 1 else x[0] for x in preds]
+        return preds, im, len(crops)
+
     def __call__(self, source=None, model=None, stream=False, *args, **kwargs):
         """Performs inference on an image or stream."""
         self.stream = stream
@@ -205,6 +273,9 @@ class BasePredictor:
             batch=self.args.batch,
             vid_stride=self.args.vid_stride,
             buffer=self.args.stream_buffer,
+            workers=self.args.decode_workers,
+            read_ahead=self.args.read_ahead,
+            imgsz=self.imgsz if self.args.reduced_decode else None,
         )
         self.source_type = self.dataset.source_type
         if not getattr(self, "stream", True) and (
@@ -214,6 +285,22 @@ class BasePredictor:
             or any(getattr(self.dataset, "video_flag", [False]))
         ):  # videos
             LOGGER.warning(STREAM_WARNING)
+        if self.args.tile and (
+            self.args.task not in {"detect", "obb"}
+            or not hasattr(self, "postprocess_tiles")  # e.g. RT-DETR and YOLO-NAS detect predictors
+            or self.source_type.tensor
+            or self.args.embed
+        ):
+            LOGGER.warning("WARNING ⚠️ 'tile' is only supported for detect and obb predictions on image sources.")
+            self.args.tile = 0
+        if self.args.tile and round(self.args.tile * self.args.tile_overlap) >= self.args.tile:
+            raise ValueError(
+                f"'tile_overlap={self.args.tile_overlap}' is invalid. Neighbouring tiles must be offset by at least "
+                f"one pixel, use a tile_overlap below 1, i.e. 'tile_overlap=0.2'."
+            )
+        if self.args.pipeline and (self.args.tile or self.args.embed or self.args.visualize):
+            LOGGER.warning("WARNING ⚠️ 'pipeline' is not supported with 'tile', 'embed' or 'visualize'.")
+            self.args.pipeline = 0
         self.vid_writer = {}
 
     @smart_inference_mode()
@@ -239,51 +326,44 @@ class BasePredictor:
                 self.model.warmup(imgsz=(1 if self.model.pt or self.model.triton else self.dataset.bs, 3, *self.imgsz))
                 self.done_warmup = True
 
-            self.seen, self.windows, self.batch = 0, [], None
+            self.seen, self.tiles, self.windows, self.batch = 0, 0, [], None
             profilers = (
                 ops.Profile(device=self.device),
                 ops.Profile(device=self.device),
                 ops.Profile(device=self.device),
             )
             self.run_callbacks("on_predict_start")
-            for self.batch in self.dataset:
-                self.run_callbacks("on_predict_batch_start")
-                paths, im0s, s = self.batch
-
-                # Preprocess
-                with profilers[0]:
-                    im = self.preprocess(im0s)
-
-                # Inference
-                with profilers[1]:
-                    preds = self.inference(im, *args, **kwargs)
-                    if self.args.embed:
-                        yield from [preds] if isinstance(preds, torch.Tensor) else preds  # yield embedding tensors
-                        continue
-
-                # Postprocess
-                with profilers[2]:
-                    self.results = self.postprocess(preds, im, im0s)
-                self.run_callbacks("on_predict_postprocess_end")
-
-                # Visualize, save, write results
-                n = len(im0s)
-                for i in range(n):
-                    self.seen += 1
-                    self.results[i].speed = {
-                        "preprocess": profilers[0].dt * 1e3 / n,
-                        "inference": profilers[1].dt * 1e3 / n,
-                        "postprocess": profilers[2].dt * 1e3 / n,
-                    }
-                    if self.args.verbose or self.args.save or self.args.save_txt or self.args.show:
-                        s[i] += self.write_results(i, Path(paths[i]), im, s)
-
-                # Print batch results
-                if self.args.verbose:
-                    LOGGER.info("\n".join(s))
-
-                self.run_callbacks("on_predict_batch_end")
-                yield from self.results
+            if self.args.pipeline:
+                im = yield from self.pipeline_inference(profilers, *args, **kwargs)
+            else:
+                for self.batch in self.dataset:
+                    self.run_callbacks("on_predict_batch_start")
+                    paths, im0s, s = self.batch
+                    t0 = [x.t for x in profilers]
+
+                    if self.args.tile:
+                        # Sliced inference, tiles are preprocessed, run and postprocessed in batches of `tile_batch`
+                        preds, im, n = self.tile_inference(im0s, profilers, *args, **kwargs)
+                        self.tiles += n
+                        with profilers[2]:
+                            self.results = [self.construct_result(*x) for x in zip(preds, im0s, paths)]
+                    else:
+                        # Preprocess
+                        with profilers[0]:
+                            im = self.preprocess(im0s)
+
+                        # Inference
+                        with profilers[1]:
+                            preds = self.inference(im, *args, **kwargs)
+                            if self.args.embed:
+                                yield from [preds] if isinstance(preds, torch.Tensor) else preds  # embedding tensors
+                                continue
+
+                        # Postprocess
+                        with profilers[2]:
+                            self.results = self.postprocess(preds, im, im0s)
+                    self.run_callbacks("on_predict_postprocess_end")
+                    yield from self.write_batch_results(im, [x.t - t for x, t in zip(profilers, t0)])
 
         # Release assets
         for v in self.vid_writer.values():
@@ -293,16 +373,146 @@ class BasePredictor:
         # Print final results
         if self.args.verbose and self.seen:
             t = tuple(x.t / self.seen * 1e3 for x in profilers)  # speeds per image
+            shape = self.results[-1].orig_shape if self.args.tile else im.shape[2:]  # im is the last batch of tiles
             LOGGER.info(
                 f"Speed: %.1fms preprocess, %.1fms inference, %.1fms postprocess per image at shape "
-                f"{(min(self.args.batch, self.seen), 3, *im.shape[2:])}" % t
+                f"{(min(self.args.batch, self.seen), 3, *shape)}" % t
             )
+            if self.tiles:
+                LOGGER.info(f"Tiles: {self.tiles} tiles, {self.tiles / sum(x.t for x in profilers):.1f} tiles/s")
         if self.args.save or self.args.save_txt or self.args.save_crop:
             nl = len(list(self.save_dir.glob("labels/*.txt")))  # number of labels
             s = f"\n{nl} label{'s' * (nl > 1)} saved to {self.save_dir / 'labels'}" if self.args.save_txt else ""
             LOGGER.info(f"Results saved to {colorstr('bold', self.save_dir)}{s}")
         self.run_callbacks("on_predict_end")
 
+    def write_batch_results(self, im, dt, state=None):
+        """
+        Sets the speed of the results of the current batch, then writes, prints and returns them.
+
+        Args:
+            im (torch.Tensor): Preprocessed batch.
+            dt (List[float]): Preprocess, inference and postprocess time of the batch in seconds.
+            state (tuple, optional): Dataset `source_state()` captured when the batch was loaded, defaults to the
+                current state of the dataset.
+
+        Returns:
+            (List[Results]): Results of the batch.
+        """
+        paths, im0s, s = self.batch
+        n = len(im0s)
+        state = state or self.source_state()
+        speed = dict(zip(("preprocess", "inference", "postprocess"), (x * 1e3 / n for x in dt)))  # ms per image
+        for i in range(n):
+            self.seen += 1
+            self.results[i].speed = speed.copy()
+            if self.args.verbose or self.args.save or self.args.save_txt or self.args.show:
+                s[i] += self.write_results(i, Path(paths[i]), im, s, state)
+
+        # Print batch results
+        if self.args.verbose:
+            LOGGER.info("\n".join(s))
+
+        self.run_callbacks("on_predict_batch_end")
+        return self.results
+
+    def pipeline_inference(self, profilers, *args, **kwargs):
+        """
+        Runs prediction as a pipeline with up to `pipeline` batches in flight and yields the results in order.
+
+        A loader thread iterates the dataset and preprocesses batches on a pool of `pipeline` threads, into pinned
+        memory copied to the device without blocking. The calling thread only runs inference, while postprocessing,
+        callbacks and `write_results` run in order on a single worker thread. By then the loader has moved the dataset
+        on, so `write_results` uses the `source_state()` captured with each batch. Busy time of each stage as a
+        fraction of the wall time is stored in `utilization`.
+
+        Args:
+            profilers (tuple): Preprocess, inference and postprocess profilers.
+
+        Returns:
+            (torch.Tensor): Last preprocessed batch.
+        """
+        depth = self.args.pipeline
+        loaded = queue.Queue(maxsize=depth)  # (batch, state, preprocess future), an exception or None when done
+        stop = threading.Event()
+        decode = ops.Profile()
+
+        @torch.inference_mode()  # thread-local, enabled for the calling thread by stream_inference
+        def preprocess(im0s):
+            """Preprocesses a batch on a pool thread, timed without device synchronization."""
+            with ops.Profile() as dt:
+                im = self.preprocess(im0s)
+            return im, dt.dt
+
+        def put(item):
+            """Queues an item, giving up once the pipeline is stopped."""
+            while not stop.is_set():
+                with contextlib.suppress(queue.Full):
+                    return loaded.put(item, timeout=0.1)
+
+        def load():
+            """Iterates the dataset and submits the preprocessing of each batch."""
+            try:
+                batches = iter(self.dataset)
+                while not stop.is_set():
+                    with decode:
+                        batch = next(batches, None)
+                    if batch is None:
+                        break
+                    put((batch, self.source_state(), pool.submit(preprocess, batch[1])))
+                put(None)
+            except Exception as e:
+                put(e)
+
+        @torch.inference_mode()  # thread-local, enabled for the calling thread by stream_inference
+        def postprocess(batch, state, im, preds, dt):
+            """Postprocesses, writes and returns the results of a batch on the worker thread."""
+            self.batch = batch
+            self.run_callbacks("on_predict_batch_start")
+            with profilers[2]:
+                self.results = self.postprocess(preds, im, batch[1])
+            self.run_callbacks("on_predict_postprocess_end")
+            return self.write_batch_results(im, (*dt, profilers[2].dt), state)
+
+        pool = ThreadPoolExecutor(depth, thread_name_prefix="predict-preprocess")
+        worker = ThreadPoolExecutor(1, thread_name_prefix="predict-postprocess")
+        loader = threading.Thread(target=load, name="predict-loader", daemon=True)
+        pending = deque()  # postprocess futures in batch order
+        t0 = time.perf_counter()
+        loader.start()
+        try:
+            while (item := loaded.get()) is not None:
+                if isinstance(item, Exception):
+                    raise item
+                batch, state, future = item
+                im, dt = future.result()
+                profilers[0].t += dt
+                with profilers[1]:
+                    preds = self.inference(im, *args, **kwargs)
+                pending.append(worker.submit(postprocess, batch, state, im, preds, (dt, profilers[1].dt)))
+                while len(pending) > depth or (pending and pending[0].done()):
+                    yield from pending.popleft().result()
+            while pending:
+                yield from pending.popleft().result()
+        finally:
+            stop.set()
+            loader.join()
+            pool.shutdown(cancel_futures=True)
+            worker.shutdown(cancel_futures=True)
+
+        t = max(time.perf_counter() - t0, 1e-9)
+        self.utilization = {
+            "decode": decode.t / t,
+            "preprocess": profilers[0].t / t / depth,
+            "inference": profilers[1].t / t,
+            "postprocess": profilers[2].t / t,
+        }
+        if self.args.verbose:
+            LOGGER.info(
+                f"Pipeline: {', '.join(f'{k} {v:.0%}' for k, v in self.utilization.items())} busy over {t:.1f}s"
+            )
+        return im
+
     def setup_model(self, model, verbose=True):
         """Initialize YOLO model with given parameters and set it to evaluation mode."""
         self.model = AutoBackend(
@@ -320,21 +530,26 @@ class BasePredictor:
         self.args.half = self.model.fp16  # update half
         self.model.eval()
 
-    def write_results(self, i, p, im, s):
-        """Write inference results to a file or directory."""
+    def source_state(self):
+        """Returns the (mode, count, fps) of the dataset for the batch it returned last."""
+        return self.dataset.mode, getattr(self.dataset, "count", 0), getattr(self.dataset, "fps", 30)
+
+    def write_results(self, i, p, im, s, state=None):
+        """Write inference results to a file or directory, `state` is the dataset `source_state()` of the batch."""
+        mode, count, _ = state = state or self.source_state()
         string = ""  # print string
         if len(im.shape) == 3:
             im = im[None]  # expand for batch dim
         if self.source_type.stream or self.source_type.from_img or self.source_type.tensor:  # batch_size >= 1
             string += f"{i}: "
-            frame = self.dataset.count
+            frame = count
         else:
             match = re.search(r"frame (\d+)/", s[i])
             frame = int(match[1]) if match else None  # 0 if frame undetermined
 
-        self.txt_path = self.save_dir / "labels" / (p.stem + ("" if self.dataset.mode == "image" else f"_{frame}"))
-        string += "{:g}x{:g} ".format(*im.shape[2:])
+        self.txt_path = self.save_dir / "labels" / (p.stem + ("" if mode == "image" else f"_{frame}"))
         result = self.results[i]
+        string += "{:g}x{:g} ".format(*(result.orig_shape if self.args.tile else im.shape[2:]))  # image, not tile
         result.save_dir = self.save_dir.__str__()  # used in other locations
         string += f"{result.verbose()}{result.speed['inference']:.1f}ms"
 
@@ -345,7 +560,7 @@ class BasePredictor:
                 boxes=self.args.show_boxes,
                 conf=self.args.show_conf,
                 labels=self.args.show_labels,
-                im_gpu=None if self.args.retina_masks else im[i],
+                im_gpu=None if self.args.retina_masks or self.args.tile else im[i],  # tiled results have no masks
             )
 
         # Save results
@@ -356,17 +571,18 @@ class BasePredictor:
         if self.args.show:
             self.show(str(p))
         if self.args.save:
-            self.save_predicted_images(str(self.save_dir / p.name), frame)
+            self.save_predicted_images(str(self.save_dir / p.name), frame, state)
 
         return string
 
-    def save_predicted_images(self, save_path="", frame=0):
-        """Save video predictions as mp4 at specified path."""
+    def save_predicted_images(self, save_path="", frame=0, state=None):
+        """Save video predictions as mp4 at specified path, `state` is the dataset `source_state()` of the batch."""
         im = self.plotted_img
+        mode, _, fps = state or self.source_state()
 
         # Save videos and streams
-        if self.dataset.mode in {"stream", "video"}:
-            fps = self.dataset.fps if self.dataset.mode == "video" else 30
+        if mode in {"stream", "video"}:
+            fps = fps if mode == "video" else 30
             frames_path = f'{save_path.split(".", 1)[0]}_frames/'
             if save_path not in self.vid_writer:  # new video
                 if self.args.save_frames:
@@ -22,7 +22,7 @@ from torch import distributed as dist
 from torch import nn, optim
 
 from ultralytics.cfg import get_cfg, get_save_dir
-from ultralytics.data.utils import check_cls_dataset, check_det_dataset
+from ultralytics.data.utils import ImageBuffer, check_cls_dataset, check_det_dataset
 from ultralytics.nn.tasks import attempt_load_one_weight, attempt_load_weights
 from ultralytics.utils import (
     DEFAULT_CFG,
@@ -425,6 +425,7 @@ class BaseTrainer:
             self.run_callbacks("on_train_epoch_end")
             if RANK in {-1, 0}:
                 final_epoch = epoch + 1 >= self.epochs
+                self.log_buffer_stats()
                 self.ema.update_attr(self.model, include=["yaml", "nc", "args", "names", "stride", "class_weights"])
 
                 # Validation
@@ -473,6 +474,18 @@ class BaseTrainer:
         self._clear_memory()
         self.run_callbacks("teardown")
 
+    def log_buffer_stats(self):
+        """Logs the mosaic buffer hits and misses of all dataloader workers during the last epoch to tune its size."""
+        buffer = getattr(self.train_loader.dataset, "buffer", None)
+        if isinstance(buffer, ImageBuffer) and buffer.maxlen:
+            n = buffer.stats()
+            if n["hits"] + n["misses"]:
+                LOGGER.info(
+                    f"{colorstr('mosaic buffer:')} {n['hits'] / (n['hits'] + n['misses']):.1%} hit rate with "
+                    f"{buffer.maxlen} images per worker ({n['hits']} hits, {n['misses']} misses, "
+                    f"{n['evictions']} evictions, {n['prefetched']} prefetched)"
+                )
+
     def auto_batch(self, max_num_obj=0):
         """Get batch size by calculating memory occupation of model."""
         return check_train_batch_size(
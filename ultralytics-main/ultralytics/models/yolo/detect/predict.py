@@ -22,7 +22,26 @@ class DetectionPredictor(BasePredictor):
 
     def postprocess(self, preds, img, orig_imgs):
         """Post-processes predictions and returns a list of Results objects."""
-        preds = ops.non_max_suppression(
+        preds = self.non_max_suppression(preds)
+
+        if not isinstance(orig_imgs, list):  # input images are a torch.Tensor, not a list
+            orig_imgs = ops.convert_torch2numpy_batch(orig_imgs)
+
+        return [
+            self.construct_result(self.scale_preds(pred, img.shape[2:], orig_img.shape), orig_img, img_path)
+            for pred, orig_img, img_path in zip(preds, orig_imgs, self.batch[0])
+        ]
+
+    def postprocess_tiles(self, preds, img, crops, offsets):
+        """Applies NMS to the predictions of a batch of tiles and maps them to the coordinates of the full images."""
+        return [
+            self.scale_preds(pred, img.shape[2:], crop.shape, offset)
+            for pred, crop, offset in zip(self.non_max_suppression(preds), crops, offsets)
+        ]
+
+    def non_max_suppression(self, preds):
+        """Applies non-max suppression to the raw predictions of a batch."""
+        return ops.non_max_suppression(
             preds,
             self.args.conf,
             self.args.iou,
@@ -31,11 +50,33 @@ class DetectionPredictor(BasePredictor):
             classes=self.args.classes,
         )
 
-        if not isinstance(orig_imgs, list):  # input images are a torch.Tensor, not a list
-            orig_imgs = ops.convert_torch2numpy_batch(orig_imgs)
+    def scale_preds(self, pred, img_shape, orig_shape, offset=(0, 0)):
+        """
+        Rescales boxes from the letterboxed input to the original image and shifts them by the image's offset.
+
+        Args:
+            pred (torch.Tensor): NMS output of one image, (N, 6) as x1, y1, x2, y2, conf, cls.
+            img_shape (tuple): Shape of the letterboxed input, (h, w).
+            orig_shape (tuple): Shape of the original image or tile, (h, w, c).
+            offset (tuple): Top-left corner (x, y) of the tile in the full image. Defaults to (0, 0).
+
+        Returns:
+            (torch.Tensor): Predictions in the layout of `Results.boxes`.
+        """
+        pred[:, :4] = ops.scale_boxes(img_shape, pred[:, :4], orig_shape)
+        pred[:, :4] += pred.new_tensor(offset).repeat(2)
+        return pred
+
+    def merge_tiles(self, pred):
+        """Merges the scaled predictions of all tiles of an image with class-aware NMS, keeping up to `max_det`."""
+        import torchvision  # scope for faster 'import ultralytics'
+
+        if not len(pred):
+            return pred
+        c = pred[:, 5:6] * (0 if self.args.agnostic_nms else pred[:, :4].max() + 1)  # offset boxes by class
+        i = torchvision.ops.nms(pred[:, :4] + c, pred[:, 4], self.args.iou)
+        return pred[i[: self.args.max_det]]
 
-        results = []
-        for pred, orig_img, img_path in zip(preds, orig_imgs, self.batch[0]):
-            pred[:, :4] = ops.scale_boxes(img.shape[2:], pred[:, :4], orig_img.shape)
-            results.append(Results(orig_img, path=img_path, names=self.model.names, boxes=pred))
-        return results
+    def construct_result(self, pred, orig_img, img_path):
+        """Creates the Results object of one image from predictions in original image coordinates."""
+        return Results(orig_img, path=img_path, names=self.model.names, boxes=pred)
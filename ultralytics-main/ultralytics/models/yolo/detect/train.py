@@ -56,7 +56,12 @@ class DetectionTrainer(BaseTrainer):
 
     def preprocess_batch(self, batch):
         """Preprocesses a batch of images by scaling and converting to float."""
-        batch["img"] = batch["img"].to(self.device, non_blocking=True).float() / 255
+        batch["img"] = batch["img"].to(self.device, non_blocking=True).float()
+        if getattr(self.train_loader.dataset, "batch_transforms", None):  # batch_augment=True
+            batch = self.train_loader.dataset.batch_transforms(batch)
+        batch["img"] /= 255
+        if "edge" in batch:
+            batch["edge"] = batch["edge"].to(self.device, non_blocking=True)  # uint8, decoded by the OBB loss
         if self.args.multi_scale:
             imgs = batch["img"]
             sz = (
@@ -93,9 +98,11 @@ class DetectionTrainer(BaseTrainer):
     def get_validator(self):
         """Returns a DetectionValidator for YOLO model validation."""
         self.loss_names = "box_loss", "cls_loss", "dfl_loss"
-        return yolo.detect.DetectionValidator(
+        validator = yolo.detect.DetectionValidator(
             self.test_loader, save_dir=self.save_dir, args=copy(self.args), _callbacks=self.callbacks
         )
+        validator.metrics.ap_metrics = self.data.get("ap_metrics")  # metric keys before the first validation
+        return validator
 
     def label_loss_items(self, loss_items=None, prefix="train"):
         """
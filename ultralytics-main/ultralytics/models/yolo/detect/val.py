@@ -79,7 +79,9 @@ class DetectionValidator(BaseValidator):
         self.names = model.names
         self.nc = len(model.names)
         self.metrics.names = self.names
+        self.metrics.ap_metrics = self.data.get("ap_metrics")  # named per-class AP metrics from the dataset YAML
         self.metrics.plot = self.args.plots
+        self.metrics.device = self.device  # batch PR curves on CUDA validation devices
         self.confusion_matrix = ConfusionMatrix(nc=self.nc, conf=self.args.conf)
         self.seen = 0
         self.jdict = []
@@ -87,7 +89,16 @@ class DetectionValidator(BaseValidator):
 
     def get_desc(self):
         """Return a formatted string summarizing class metrics of YOLO model."""
-        return ("%22s" + "%11s" * 12) % ("Class", "Images", "Instances", "Box(P", "R", "mAP50","mAP75", "mAP50-95","FO","ST","SC","UT","MU)")
+        return self.format_desc(("Box", self.metrics.box))
+
+    @staticmethod
+    def format_desc(*metrics):
+        """Return the results table header for (prefix, Metric) pairs, e.g. 'Box(P  R  mAP50  mAP75  mAP50-95)'."""
+        columns = ["Class", "Images", "Instances"]
+        for prefix, metric in metrics:
+            names = ["P", "R", *metric.results.dtype.names[2:]]
+            columns += [f"{prefix}({names[0]}", *names[1:-1], f"{names[-1]})"]
+        return ("%22s" + "%11s" * (len(columns) - 1)) % tuple(columns)
 
     def postprocess(self, preds):
         """Apply Non-maximum suppression to prediction outputs."""
@@ -193,12 +204,11 @@ class DetectionValidator(BaseValidator):
         if self.nt_per_class.sum() == 0:
             LOGGER.warning(f"WARNING ⚠️ no labels found in {self.args.task} set, can not compute metrics without labels")
 
-        # Print results per class
+        # Print results per class, "-" for named AP metrics that exclude the class
         if self.args.verbose and not self.training and self.nc > 1 and len(self.stats):
             for i, c in enumerate(self.metrics.ap_class_index):
-                LOGGER.info(
-                    pf % (self.names[c], self.nt_per_image[c], self.nt_per_class[c], *self.metrics.class_result(i))
-                )
+                results = "".join("%11s" % "-" if np.isnan(x) else "%11.3g" % x for x in self.metrics.class_result(i))
+                LOGGER.info("%22s%11i%11i" % (self.names[c], self.nt_per_image[c], self.nt_per_class[c]) + results)
 
         if self.args.plots:
             for normalize in True, False:
@@ -329,7 +339,7 @@ class DetectionValidator(BaseValidator):
                 if self.is_lvis:
                     val.print_results()  # explicitly call print_results
                 # update mAP50-95 and mAP50
-                stats[self.metrics.keys[-1]], stats[self.metrics.keys[-2]] = (
+                stats["metrics/mAP50-95(B)"], stats["metrics/mAP50(B)"] = (
                     val.stats[:2] if self.is_coco else [val.results["AP50"], val.results["AP"]]
                 )
             except Exception as e:
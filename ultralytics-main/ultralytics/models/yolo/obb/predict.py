@@ -27,9 +27,9 @@ class OBBPredictor(DetectionPredictor):
         super().__init__(cfg, overrides, _callbacks)
         self.args.task = "obb"
 
-    def postprocess(self, preds, img, orig_imgs):
-        """Post-processes predictions and returns a list of Results objects."""
-        preds = ops.non_max_suppression(
+    def non_max_suppression(self, preds):
+        """Applies rotated non-max suppression to the raw predictions of a batch."""
+        return ops.non_max_suppression(
             preds,
             self.args.conf,
             self.args.iou,
@@ -40,14 +40,29 @@ class OBBPredictor(DetectionPredictor):
             rotated=True,
         )
 
-        if not isinstance(orig_imgs, list):  # input images are a torch.Tensor, not a list
-            orig_imgs = ops.convert_torch2numpy_batch(orig_imgs)
-
-        results = []
-        for pred, orig_img, img_path in zip(preds, orig_imgs, self.batch[0]):
-            rboxes = ops.regularize_rboxes(torch.cat([pred[:, :4], pred[:, -1:]], dim=-1))
-            rboxes[:, :4] = ops.scale_boxes(img.shape[2:], rboxes[:, :4], orig_img.shape, xywh=True)
-            # xywh, r, conf, cls
-            obb = torch.cat([rboxes, pred[:, 4:6]], dim=-1)
-            results.append(Results(orig_img, path=img_path, names=self.model.names, obb=obb))
-        return results
+    def scale_preds(self, pred, img_shape, orig_shape, offset=(0, 0)):
+        """
+        Rescales rotated boxes from the letterboxed input to the original image and shifts them by the image's offset.
+
+        Args:
+            pred (torch.Tensor): Rotated NMS output of one image, (N, 7) as x, y, w, h, conf, cls, r.
+            img_shape (tuple): Shape of the letterboxed input, (h, w).
+            orig_shape (tuple): Shape of the original image or tile, (h, w, c).
+            offset (tuple): Top-left corner (x, y) of the tile in the full image. Defaults to (0, 0).
+
+        Returns:
+            (torch.Tensor): Predictions in the layout of `Results.obb`, (N, 7) as x, y, w, h, r, conf, cls.
+        """
+        rboxes = ops.regularize_rboxes(torch.cat([pred[:, :4], pred[:, -1:]], dim=-1))
+        rboxes[:, :4] = ops.scale_boxes(img_shape, rboxes[:, :4], orig_shape, xywh=True)
+        rboxes[:, :2] += rboxes.new_tensor(offset)
+        return torch.cat([rboxes, pred[:, 4:6]], dim=-1)
+
+    def merge_tiles(self, pred):
+        """Merges the scaled predictions of all tiles of an image with class-aware rotated NMS, up to `max_det`."""
+        i = ops.nms_rotated(pred[:, :5], pred[:, 5], self.args.iou, idxs=None if self.args.agnostic_nms else pred[:, 6])
+        return pred[i[: self.args.max_det]]
+
+    def construct_result(self, pred, orig_img, img_path):
+        """Creates the Results object of one image from rotated predictions in original image coordinates."""
+        return Results(orig_img, path=img_path, names=self.model.names, obb=pred)
@@ -76,7 +76,9 @@ class OBBValidator(DetectionValidator):
         Note:
             This method relies on `batch_probiou` to calculate IoU between detections and ground truth bounding boxes.
         """
-        iou = batch_probiou(gt_bboxes, torch.cat([detections[:, :4], detections[:, -1:]], dim=-1))
+        iou = batch_probiou(  # IoUs below the lowest threshold never match and are skipped
+            gt_bboxes, torch.cat([detections[:, :4], detections[:, -1:]], dim=-1), threshold=float(self.iouv[0])
+        )
         return self.match_predictions(detections[:, 5], gt_cls, iou)
 
     def _prepare_batch(self, si, batch):
@@ -47,19 +47,7 @@ class PoseValidator(DetectionValidator):
 
     def get_desc(self):
         """Returns description of evaluation metrics in string format."""
-        return ("%22s" + "%11s" * 10) % (
-            "Class",
-            "Images",
-            "Instances",
-            "Box(P",
-            "R",
-            "mAP50",
-            "mAP50-95)",
-            "Pose(P",
-            "R",
-            "mAP50",
-            "mAP50-95)",
-        )
+        return self.format_desc(("Box", self.metrics.box), ("Pose", self.metrics.pose))
 
     def postprocess(self, preds):
         """Apply non-maximum suppression and return detections with high confidence scores."""
@@ -267,16 +255,13 @@ class PoseValidator(DetectionValidator):
                     assert x.is_file(), f"{x} file not found"
                 anno = COCO(str(anno_json))  # init annotations api
                 pred = anno.loadRes(str(pred_json))  # init predictions api (must pass string, not Path)
-                for i, eval in enumerate([COCOeval(anno, pred, "bbox"), COCOeval(anno, pred, "keypoints")]):
+                for suffix, eval in zip("BP", [COCOeval(anno, pred, "bbox"), COCOeval(anno, pred, "keypoints")]):
                     if self.is_coco:
                         eval.params.imgIds = [int(Path(x).stem) for x in self.dataloader.dataset.im_files]  # im to eval
                     eval.evaluate()
                     eval.accumulate()
                     eval.summarize()
-                    idx = i * 4 + 2
-                    stats[self.metrics.keys[idx + 1]], stats[self.metrics.keys[idx]] = eval.stats[
-                        :2
-                    ]  # update mAP50-95 and mAP50
+                    stats[f"metrics/mAP50-95({suffix})"], stats[f"metrics/mAP50({suffix})"] = eval.stats[:2]
             except Exception as e:
                 LOGGER.warning(f"pycocotools unable to run: {e}")
         return stats
@@ -1,11 +1,13 @@
 # Ultralytics YOLO 🚀, AGPL-3.0 license
+import math
+
 import torchvision.transforms.functional as TF  # 引入 torchvision.transforms.functional 并命名为 TF
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
 
 from ultralytics.utils.metrics import OKS_SIGMA
-from ultralytics.utils.ops import crop_mask, xywh2xyxy, xyxy2xywh
+from ultralytics.utils.ops import crop_mask, xywh2xyxy, xywhr2xyxyxyxy, xyxy2xywh
 from ultralytics.utils.tal import RotatedTaskAlignedAssigner, TaskAlignedAssigner, dist2bbox, dist2rbox, make_anchors
 from ultralytics.utils.torch_utils import autocast
 
@@ -13,91 +15,53 @@ from .metrics import bbox_iou, probiou
 from .tal import bbox2dist
 
 class BackgroundSensitiveLoss(nn.Module):
-    """背景敏感损失函数"""
+    """
+    Background-sensitive loss that up-weights background classification errors and regresses foreground boxes.
+
+    The classification term reuses the elementwise BCE already computed by the detection loss and re-weights it with
+    `bg_weight` where the target score is zero and `fg_weight` elsewhere, so no extra pass over the (B, anchors, nc)
+    scores is made. The box term is a SmoothL1 loss evaluated on foreground anchors only. Both terms are averaged over
+    all elements, giving the same gradients as masking the dense tensors.
+    """
 
     def __init__(self, bg_weight=2.0, fg_weight=1.0, iou_weight=1.0):
-        super(BackgroundSensitiveLoss, self).__init__()
+        """Initialize BackgroundSensitiveLoss with background, foreground and box term weights."""
+        super().__init__()
         self.bg_weight = bg_weight
         self.fg_weight = fg_weight
         self.iou_weight = iou_weight
-        self.bce_loss = nn.BCEWithLogitsLoss()
-        self.iou_loss = nn.SmoothL1Loss()
-
-    def forward(self, pred_scores, pred_bboxes, target_scores, target_bboxes):
-        # 背景和前景掩码
-        bg_mask = (target_scores == 0).float()
-        fg_mask = (target_scores > 0).float()
 
-        # 分类损失
-        cls_loss_bg = self.bce_loss(pred_scores * bg_mask, target_scores * bg_mask)
-        cls_loss_fg = self.bce_loss(pred_scores * fg_mask, target_scores * fg_mask)
-        cls_loss = self.bg_weight * cls_loss_bg + self.fg_weight * cls_loss_fg
+    def forward(self, bce, target_scores, pred_bboxes, target_bboxes, fg_mask):
+        """
+        Compute the background-sensitive loss.
 
-        # IoU 损失
-        iou_loss = self.iou_loss(pred_bboxes * fg_mask, target_bboxes * fg_mask)
+        Args:
+            bce (torch.Tensor): Elementwise BCE-with-logits of the predicted scores, shape (B, A, nc).
+            target_scores (torch.Tensor): Assigned target scores, shape (B, A, nc).
+            pred_bboxes (torch.Tensor): Predicted boxes, shape (B, A, 4) or (B, A, 5).
+            target_bboxes (torch.Tensor): Assigned target boxes, same shape as `pred_bboxes`.
+            fg_mask (torch.Tensor): Boolean foreground anchor mask, shape (B, A).
 
-        # 总损失
-        total_loss = cls_loss + self.iou_weight * iou_loss
-        return total_loss       
+        Returns:
+            (torch.Tensor): Scalar loss.
+        """
+        weight = torch.where(target_scores > 0, self.fg_weight, self.bg_weight)
+        cls_loss = (bce * weight).sum() / bce.numel()
+        iou_loss = F.smooth_l1_loss(pred_bboxes[fg_mask], target_bboxes[fg_mask], reduction="sum") / pred_bboxes.numel()
+        return cls_loss + self.iou_weight * iou_loss
 
-import math
-import torch
-import torch.nn as nn
-import torch.nn.functional as F
 
-def obb_to_polygon(x_c, y_c, w, h, angle):
-    """
-    将旋转框 (x_c, y_c, w, h, angle) -> 四顶点 (x,y)，angle 为弧度
+class AcceleratedOBBEdgeLoss(nn.Module):
     """
-    cos_a = math.cos(angle)
-    sin_a = math.sin(angle)
-    hw, hh = w/2.0, h/2.0
-    # 逆时针顺序
-    x1 = x_c - hw*cos_a + hh*sin_a
-    y1 = y_c - hw*sin_a - hh*cos_a
-
-    x2 = x_c + hw*cos_a + hh*sin_a
-    y2 = y_c + hw*sin_a - hh*cos_a
-
-    x3 = x_c + hw*cos_a - hh*sin_a
-    y3 = y_c + hw*sin_a + hh*cos_a
-
-    x4 = x_c - hw*cos_a - hh*sin_a
-    y4 = y_c - hw*sin_a + hh*cos_a
+    Edge-consistency penalty for OBB predictions computed fully batched on device.
 
-    return [(x1,y1),(x2,y2),(x3,y3),(x4,y4)]
-
-def sample_polygon_edges(polygon, stride=4):
-    """
-    对多边形(4点)每条边做等距采样，每stride一个点
-    返回采样像素坐标(浮点)，后续可 int(round(...)) 再 clamp
+    Confident boxes (score > conf_thresh, top-k per image) are converted to polygons, each polygon edge is sampled every
+    `stride` pixels and the Sobel edge magnitude of the image is averaged at the sampled locations. Boxes whose outlines
+    do not lie on image edges are penalized. All steps are padded tensor ops, so no host synchronization is required.
     """
-    coords = []
-    n = len(polygon)
-    for i in range(n):
-        (xA,yA) = polygon[i]
-        (xB,yB) = polygon[(i+1)%n]
-        dx, dy = (xB-xA), (yB-yA)
-        length = math.hypot(dx, dy)
-        if length < 1e-6:
-            continue
-        steps = int(length // stride)
-        for s in range(steps+1):
-            t = s / float(steps+1)
-            xx = xA + t*dx
-            yy = yA + t*dy
-            coords.append((xx,yy))
-    return coords
 
-class AcceleratedOBBEdgeLoss(nn.Module):
-    """
-    使用 OBB + sobel 边缘图:
-      - 置信度>conf_thresh + topk => 减少框
-      - 每条边 stride 采样 => 减少像素
-      - angle 弧度 => obb_to_polygon
-    """
-    def __init__(self, penalty_weight=0.01, threshold=None,
-                 conf_thresh=0.3, topk=50, stride=4):
+    def __init__(self, penalty_weight=0.01, threshold=None, conf_thresh=0.3, topk=50, stride=4):
+        """Initialize AcceleratedOBBEdgeLoss with penalty weight, optional margin threshold, box filter and stride."""
         super().__init__()
         self.penalty_weight = penalty_weight
         self.threshold = threshold
@@ -105,95 +69,99 @@ class AcceleratedOBBEdgeLoss(nn.Module):
         self.topk = topk
         self.stride = stride
 
-        sobel_x = torch.tensor([[-1., 0., 1.],
-                                [-2., 0., 2.],
-                                [-1., 0., 1.]]).view(1,1,3,3)
-        sobel_y = torch.tensor([[-1.,-2.,-1.],
-                                [ 0., 0., 0.],
-                                [ 1., 2., 1.]]).view(1,1,3,3)
-        self.register_buffer('sobel_x', sobel_x)
-        self.register_buffer('sobel_y', sobel_y)
+        sobel_x = torch.tensor([[-1.0, 0.0, 1.0], [-2.0, 0.0, 2.0], [-1.0, 0.0, 1.0]]).view(1, 1, 3, 3)
+        sobel_y = torch.tensor([[-1.0, -2.0, -1.0], [0.0, 0.0, 0.0], [1.0, 2.0, 1.0]]).view(1, 1, 3, 3)
+        self.register_buffer("sobel_x", sobel_x)
+        self.register_buffer("sobel_y", sobel_y)
 
-    def forward(self, images, obb_bboxes, conf_scores):
+    def edge_map(self, images):
+        """Return the Sobel gradient magnitude of the grayscale images (B, 3, H, W) as a (B, 1, H, W) tensor."""
+        sobel = torch.cat([self.sobel_x, self.sobel_y]).to(device=images.device, dtype=images.dtype)
+        g = F.conv2d(images.mean(dim=1, keepdim=True), sobel, padding=1)  # (B, 2, H, W) x and y gradients
+        return g.pow(2).sum(1, keepdim=True).sqrt()
+
+    @torch.no_grad()
+    def sample_edges(self, obb_bboxes, conf_scores, h, w):
         """
-        :param images:   (B,3,H,W)
-        :param obb_bboxes: (B,N,5) => (x_c,y_c,w,h,angle[弧度])
-        :param conf_scores: (B,N) => 置信度
+        Sample pixel locations along the edges of the top-k confident boxes of every image.
+
+        Args:
+            obb_bboxes (torch.Tensor): Boxes in [cx, cy, w, h, rotation] format of shape (B, N, 5).
+            conf_scores (torch.Tensor): Box confidences of shape (B, N).
+            h (int): Edge map height.
+            w (int): Edge map width.
+
+        Returns:
+            index (torch.Tensor): Flat (row * w + col) edge map indices of shape (B, K, 4 * S).
+            valid (torch.Tensor): Boolean mask of shape (B, K, 4 * S) marking real, in-image samples.
         """
-        device = images.device
-        B, C, H, W = images.shape
-
-        # 1) Sobel 边缘图
-        sobel_x = self.sobel_x.to(device=device, dtype=images.dtype)
-        sobel_y = self.sobel_y.to(device=device, dtype=images.dtype)
-        gray = images.mean(dim=1, keepdim=True)
-        gx   = F.conv2d(gray, sobel_x, padding=1)
-        gy   = F.conv2d(gray, sobel_y, padding=1)
-        edge_map = torch.sqrt(gx*gx + gy*gy)  # (B,1,H,W)
-
-        total_loss = torch.zeros([], device=device, dtype=images.dtype)
-        box_count  = 0
-
-        # 2) batch 逐图处理
-        for b_idx in range(B):
-            bboxes  = obb_bboxes[b_idx]   # (N,5)
-            scores  = conf_scores[b_idx] # (N,)
-
-            # 2.1) 置信度过滤
-            mask = (scores > self.conf_thresh)
-            val_boxes = bboxes[mask]
-            val_scores= scores[mask]
-            if val_scores.numel() == 0:
-                continue
-
-            # 2.2) topk
-            if val_scores.numel() > self.topk:
-                _, tk_idx = val_scores.topk(self.topk)
-                val_boxes = val_boxes[tk_idx]
-
-            e_map = edge_map[b_idx,0]
-            # 2.3) 遍历 OBB => 多边形 => 边采样
-            for (xc,yc,ww,hh,angle) in val_boxes:
-                # OBB -> polygon
-                poly = obb_to_polygon(xc.item(), yc.item(),
-                                      ww.item(), hh.item(),
-                                      angle.item())  # angle=弧度
-
-                coords = sample_polygon_edges(poly, stride=self.stride)  # [float]
-                if not coords:
-                    continue
-
-                # clamp, round => int
-                int_coords = []
-                for (fx,fy) in coords:
-                    xx = int(round(fx))
-                    yy = int(round(fy))
-                    if xx<0 or xx>=W or yy<0 or yy>=H:
-                        continue
-                    int_coords.append((yy,xx))  # e_map 索引 => (row, col)
-
-                if not int_coords:
-                    continue
-
-                boundary_vals = [ e_map[r,c] for (r,c) in int_coords ]
-                mean_val = torch.stack(boundary_vals).mean()
-
-                if self.threshold is not None:
-                    loss_box = F.relu(self.threshold - mean_val)
-                else:
-                    loss_box = 1.0 - mean_val
+        b = conf_scores.shape[0]
+        k = min(self.topk, conf_scores.shape[1])
+        scores = conf_scores.masked_fill(~(conf_scores > self.conf_thresh), float("-inf"))
+        top_scores, top_idx = scores.topk(k, dim=1)
+        boxes = obb_bboxes.gather(1, top_idx[..., None].expand(-1, -1, obb_bboxes.shape[-1])).float()
+
+        # Polygon corners in (-w/2, -h/2), (w/2, -h/2), (w/2, h/2), (-w/2, h/2) order, edges i -> i + 1
+        start = xywhr2xyxyxyxy(boxes[..., :5])[..., [2, 1, 0, 3], :]  # (B, K, 4, 2)
+        delta = start.roll(-1, dims=2) - start
+        length = delta.norm(dim=-1)  # (B, K, 4)
+        n = torch.div(length, self.stride, rounding_mode="floor") + 1  # samples per edge at t = s / n, s < n
+
+        # Edges may be far longer than the image; clip each to the image (Liang-Barsky) and only sample the part that
+        # can round to a valid pixel. S bounds the number of samples on any clipped edge, keeping all shapes static.
+        lo, hi = start.new_tensor([-1.0, -1.0]), start.new_tensor([w, h])
+        inside = (start >= lo) & (start <= hi)
+        t1, t2 = (lo - start) / delta, (hi - start) / delta
+        t_enter = torch.where(delta != 0, torch.minimum(t1, t2), torch.where(inside, -math.inf, math.inf))
+        t_lo = t_enter.amax(-1).nan_to_num(1.0).clamp(0, 1)  # (B, K, 4)
+        s_lo = (t_lo * n).floor().nan_to_num(0.0)
+        num = int(math.hypot(w + 1, h + 1) // self.stride) + 3
+        s = s_lo[..., None] + torch.arange(num, device=s_lo.device, dtype=s_lo.dtype)  # (B, K, 4, S)
+
+        xy = (start[..., None, :] + (s / n[..., None])[..., None] * delta[..., None, :]).round()  # (B, K, 4, S, 2)
+        x, y = xy.unbind(-1)
+        valid = (
+            (s < n[..., None])
+            & (length >= 1e-6)[..., None]
+            & (top_scores > self.conf_thresh)[..., None, None]
+            & (x >= 0)
+            & (x <= w - 1)
+            & (y >= 0)
+            & (y <= h - 1)
+        )
+        index = torch.where(valid, y * w + x, torch.zeros_like(x)).long()
+        return index.view(b, k, -1), valid.view(b, k, -1)
 
-                total_loss += loss_box
-                box_count += 1
+    def forward(self, images, obb_bboxes, conf_scores, edge=None):
+        """
+        Compute the edge-consistency loss.
 
-        if box_count>0:
-            total_loss = total_loss / box_count
+        Args:
+            images (torch.Tensor): Input images of shape (B, 3, H, W).
+            obb_bboxes (torch.Tensor): Predicted boxes in [cx, cy, w, h, rotation] format of shape (B, N, 5).
+            conf_scores (torch.Tensor): Box confidences of shape (B, N).
+            edge (torch.Tensor, optional): uint8 edge maps of shape (B, 1, H, W) precomputed by the dataloader, see
+                `Format._format_edge`. The edge map is computed from `images` when missing or of a different size.
 
-        return total_loss * self.penalty_weight
+        Returns:
+            (torch.Tensor): Scalar loss, zero when no box passes the confidence filter.
+        """
+        if edge is not None and edge.shape[-2:] == images.shape[-2:]:
+            edge_map = edge.to(images.dtype) * (4 * math.sqrt(2) / 255)  # dequantize to Sobel magnitude
+        else:
+            edge_map = self.edge_map(images)
+        b, _, h, w = edge_map.shape
+        index, valid = self.sample_edges(obb_bboxes.detach(), conf_scores.detach(), h, w)
 
+        values = edge_map.view(b, -1).gather(1, index.view(b, -1)).view(index.shape)
+        count = valid.sum(-1)  # (B, K)
+        mean_val = (values * valid).sum(-1) / count.clamp(min=1)
+        loss_box = 1.0 - mean_val if self.threshold is None else F.relu(self.threshold - mean_val)
 
+        box_mask = count > 0
+        total_loss = (loss_box * box_mask).sum() / box_mask.sum().clamp(min=1)
+        return total_loss * self.penalty_weight
 
-  
 
 class VarifocalLoss(nn.Module):
     """
@@ -1010,7 +978,8 @@ class v8OBBLoss(v8DetectionLoss):
         target_scores_sum = max(target_scores.sum(), 1)
 
         # Cls loss
-        loss[1] = self.bce(pred_scores, target_scores.to(dtype)).sum() / target_scores_sum
+        bce = self.bce(pred_scores, target_scores.to(dtype))  # shared with the background-sensitive loss
+        loss[1] = bce.sum() / target_scores_sum
 
         # Bbox loss
         if fg_mask.sum():
@@ -1025,9 +994,7 @@ class v8OBBLoss(v8DetectionLoss):
         loss[1] *= self.hyp.cls
         loss[2] *= self.hyp.dfl
 
-        bg_sensitive_loss = self.bg_sensitive_loss_fn(
-            pred_scores, pred_bboxes, target_scores, target_bboxes
-        )
+        bg_sensitive_loss = self.bg_sensitive_loss_fn(bce, target_scores, pred_bboxes, target_bboxes, fg_mask)
         total_loss = (loss.sum() * batch_size) + bg_sensitive_loss
 
         # =============== 在此添加极简“边缘一致性”损失 =================
@@ -1039,7 +1006,7 @@ class v8OBBLoss(v8DetectionLoss):
             # 这里示例：只取前4个坐标
             conf_scores = pred_scores.sigmoid().max(dim=-1)[0]  # (B,n_anchors)
             
-            edge_loss = self.obb_edge_loss(images, pred_bboxes, conf_scores)
+            edge_loss = self.obb_edge_loss(images, pred_bboxes, conf_scores, edge=batch.get("edge"))
             total_loss += edge_loss
         # ============================================================
 
@@ -7,12 +7,19 @@ import numpy as np
 import torch
 
 from ultralytics.utils import LOGGER, SimpleClass, TryExcept, plt_settings
+from ultralytics.utils.checks import check_version
 
 OKS_SIGMA = (
     np.array([0.26, 0.25, 0.25, 0.35, 0.35, 0.79, 0.79, 0.72, 0.72, 0.62, 0.62, 1.07, 1.07, 0.87, 0.87, 0.89, 0.89])
     / 10.0
 )
 
+# Named AP metrics reported after precision and recall as (name, class indices, IoU thresholds, fitness weight), where
+# None selects all classes or all IoU thresholds 0.5:0.95. Datasets extend these with an `ap_metrics` YAML entry.
+AP_METRICS = (("mAP50", None, 0.5, 0.1), ("mAP75", None, 0.75, 0.1), ("mAP50-95", None, None, 0.1))
+IOU_THRESHOLDS = np.linspace(0.5, 0.95, 10)
+NUMPY_2_0 = check_version(np.__version__, ">=2.0")  # np.trapz deprecated in favour of np.trapezoid
+
 
 def bbox_ioa(box1, box2, iou=False, eps=1e-7):
     """
@@ -172,13 +179,13 @@ def _get_covariance_matrix(boxes):
     Generating covariance matrix from obbs.
 
     Args:
-        boxes (torch.Tensor): A tensor of shape (N, 5) representing rotated bounding boxes, with xywhr format.
+        boxes (torch.Tensor): A tensor of shape (..., 5) representing rotated bounding boxes, with xywhr format.
 
     Returns:
         (torch.Tensor): Covariance matrices corresponding to original rotated bounding boxes.
     """
     # Gaussian bounding boxes, ignore the center points (the first two columns) because they are not needed here.
-    gbbs = torch.cat((boxes[:, 2:4].pow(2) / 12, boxes[:, 4:]), dim=-1)
+    gbbs = torch.cat((boxes[..., 2:4].pow(2) / 12, boxes[..., 4:5]), dim=-1)
     a, b, c = gbbs.split(1, dim=-1)
     cos = c.cos()
     sin = c.sin()
@@ -187,6 +194,65 @@ def _get_covariance_matrix(boxes):
     return a * cos2 + b * sin2, a * sin2 + b * cos2, (a - b) * cos * sin
 
 
+def prepare_obb(obb):
+    """
+    Precompute the Gaussian terms of OBBs used by `probiou` and `batch_probiou`.
+
+    Prepared boxes can be indexed, expanded and passed to `probiou`, `batch_probiou` and `probiou_candidates` in place
+    of xywhr boxes, so boxes compared many times compute their covariance only once.
+
+    Args:
+        obb (torch.Tensor | np.ndarray): OBBs, shape (..., 5), format xywhr, or already prepared OBBs.
+
+    Returns:
+        (torch.Tensor): Prepared OBBs, shape (..., 10), format xywhr followed by the covariance terms a, b, c, the square
+            root of the covariance determinant and the squared circumradius.
+    """
+    obb = torch.from_numpy(obb) if isinstance(obb, np.ndarray) else obb
+    if obb.shape[-1] == 10:
+        return obb
+    a, b, c = _get_covariance_matrix(obb)
+    det = (a * b - c.pow(2)).clamp_(0).sqrt()
+    return torch.cat((obb, a, b, c, det, obb[..., 2:4].pow(2).sum(-1, keepdim=True) / 4), dim=-1)
+
+
+def _probiou(obb1, obb2, eps=1e-7):
+    """Calculate probabilistic IoU between broadcastable prepared OBBs, shape (..., 1)."""
+    x1, y1, a1, b1, c1, d1 = (obb1[..., i : i + 1] for i in (0, 1, 5, 6, 7, 8))
+    x2, y2, a2, b2, c2, d2 = (obb2[..., i : i + 1] for i in (0, 1, 5, 6, 7, 8))
+    a, b, c = a1 + a2, b1 + b2, c1 + c2
+    det = a * b - c.pow(2)
+    t1 = ((a * (y1 - y2).pow(2) + b * (x1 - x2).pow(2)) / (det + eps)) * 0.25
+    t2 = ((c * (x2 - x1) * (y1 - y2)) / (det + eps)) * 0.5
+    t3 = (det / (4 * d1 * d2 + eps) + eps).log() * 0.5
+    bd = (t1 + t2 + t3).clamp(eps, 100.0)
+    hd = (1.0 - (-bd).exp() + eps).sqrt()
+    return 1 - hd
+
+
+def probiou_candidates(obb1, obb2, threshold, eps=1e-7):
+    """
+    Find pairs of OBBs whose probabilistic IoU may reach a threshold, from their center distance and circumradii.
+
+    The Bhattacharyya distance of two boxes is at least 3 * d^2 / (4 * (r1^2 + r2^2)) for center distance d and
+    circumradii r1, r2, so pairs beyond the distance that bounds their IoU below `threshold` are skipped.
+
+    Args:
+        obb1 (torch.Tensor): OBBs, shape (N, 5) or prepared (N, 10).
+        obb2 (torch.Tensor): OBBs, shape (M, 5) or prepared (M, 10).
+        threshold (float): IoU threshold, pairs that cannot reach it are False.
+        eps (float, optional): The small value used by `batch_probiou`. Defaults to 1e-7.
+
+    Returns:
+        (torch.Tensor): Boolean tensor of shape (N, M), False for pairs with IoU below `threshold`.
+    """
+    bd = -math.log(max(1 + eps - (1 - threshold) ** 2, eps))  # largest distance with IoU >= threshold
+    d2 = (obb1[:, None, :2] - obb2[None, :, :2]).pow(2).sum(-1)
+    r1 = obb1[:, 9] if obb1.shape[-1] == 10 else obb1[:, 2:4].pow(2).sum(-1) / 4
+    r2 = obb2[:, 9] if obb2.shape[-1] == 10 else obb2[:, 2:4].pow(2).sum(-1) / 4
+    return 3 * d2 <= 4 * bd * (r1[:, None] + r2[None]) * 1.001  # margin for rounding
+
+
 def probiou(obb1, obb2, CIoU=False, eps=1e-7):
     """
     Calculate probabilistic IoU between oriented bounding boxes.
@@ -194,8 +260,8 @@ def probiou(obb1, obb2, CIoU=False, eps=1e-7):
     Implements the algorithm from https://arxiv.org/pdf/2106.06072v1.pdf.
 
     Args:
-        obb1 (torch.Tensor): Ground truth OBBs, shape (N, 5), format xywhr.
-        obb2 (torch.Tensor): Predicted OBBs, shape (N, 5), format xywhr.
+        obb1 (torch.Tensor): Ground truth OBBs, shape (N, 5), format xywhr, or prepared OBBs, shape (N, 10).
+        obb2 (torch.Tensor): Predicted OBBs, shape (N, 5), format xywhr, or prepared OBBs, shape (N, 10).
         CIoU (bool, optional): If True, calculate CIoU. Defaults to False.
         eps (float, optional): Small value to avoid division by zero. Defaults to 1e-7.
 
@@ -206,23 +272,7 @@ def probiou(obb1, obb2, CIoU=False, eps=1e-7):
         OBB format: [center_x, center_y, width, height, rotation_angle].
         If CIoU is True, returns CIoU instead of IoU.
     """
-    x1, y1 = obb1[..., :2].split(1, dim=-1)
-    x2, y2 = obb2[..., :2].split(1, dim=-1)
-    a1, b1, c1 = _get_covariance_matrix(obb1)
-    a2, b2, c2 = _get_covariance_matrix(obb2)
-
-    t1 = (
-        ((a1 + a2) * (y1 - y2).pow(2) + (b1 + b2) * (x1 - x2).pow(2)) / ((a1 + a2) * (b1 + b2) - (c1 + c2).pow(2) + eps)
-    ) * 0.25
-    t2 = (((c1 + c2) * (x2 - x1) * (y1 - y2)) / ((a1 + a2) * (b1 + b2) - (c1 + c2).pow(2) + eps)) * 0.5
-    t3 = (
-        ((a1 + a2) * (b1 + b2) - (c1 + c2).pow(2))
-        / (4 * ((a1 * b1 - c1.pow(2)).clamp_(0) * (a2 * b2 - c2.pow(2)).clamp_(0)).sqrt() + eps)
-        + eps
-    ).log() * 0.5
-    bd = (t1 + t2 + t3).clamp(eps, 100.0)
-    hd = (1.0 - (-bd).exp() + eps).sqrt()
-    iou = 1 - hd
+    iou = _probiou(prepare_obb(obb1), prepare_obb(obb2), eps)
     if CIoU:  # only include the wh aspect ratio part
         w1, h1 = obb1[..., 2:4].split(1, dim=-1)
         w2, h2 = obb2[..., 2:4].split(1, dim=-1)
@@ -233,38 +283,30 @@ def probiou(obb1, obb2, CIoU=False, eps=1e-7):
     return iou
 
 
-def batch_probiou(obb1, obb2, eps=1e-7):
+def batch_probiou(obb1, obb2, eps=1e-7, threshold=None):
     """
     Calculate the prob IoU between oriented bounding boxes, https://arxiv.org/pdf/2106.06072v1.pdf.
 
     Args:
-        obb1 (torch.Tensor | np.ndarray): A tensor of shape (N, 5) representing ground truth obbs, with xywhr format.
-        obb2 (torch.Tensor | np.ndarray): A tensor of shape (M, 5) representing predicted obbs, with xywhr format.
+        obb1 (torch.Tensor | np.ndarray): A tensor of shape (N, 5) representing ground truth obbs, with xywhr format,
+            or prepared obbs of shape (N, 10).
+        obb2 (torch.Tensor | np.ndarray): A tensor of shape (M, 5) representing predicted obbs, with xywhr format,
+            or prepared obbs of shape (M, 10).
         eps (float, optional): A small value to avoid division by zero. Defaults to 1e-7.
+        threshold (float, optional): Only pairs that may reach this IoU are computed, the others are 0. Defaults to
+            None, all pairs.
 
     Returns:
         (torch.Tensor): A tensor of shape (N, M) representing obb similarities.
     """
-    obb1 = torch.from_numpy(obb1) if isinstance(obb1, np.ndarray) else obb1
-    obb2 = torch.from_numpy(obb2) if isinstance(obb2, np.ndarray) else obb2
-
-    x1, y1 = obb1[..., :2].split(1, dim=-1)
-    x2, y2 = (x.squeeze(-1)[None] for x in obb2[..., :2].split(1, dim=-1))
-    a1, b1, c1 = _get_covariance_matrix(obb1)
-    a2, b2, c2 = (x.squeeze(-1)[None] for x in _get_covariance_matrix(obb2))
-
-    t1 = (
-        ((a1 + a2) * (y1 - y2).pow(2) + (b1 + b2) * (x1 - x2).pow(2)) / ((a1 + a2) * (b1 + b2) - (c1 + c2).pow(2) + eps)
-    ) * 0.25
-    t2 = (((c1 + c2) * (x2 - x1) * (y1 - y2)) / ((a1 + a2) * (b1 + b2) - (c1 + c2).pow(2) + eps)) * 0.5
-    t3 = (
-        ((a1 + a2) * (b1 + b2) - (c1 + c2).pow(2))
-        / (4 * ((a1 * b1 - c1.pow(2)).clamp_(0) * (a2 * b2 - c2.pow(2)).clamp_(0)).sqrt() + eps)
-        + eps
-    ).log() * 0.5
-    bd = (t1 + t2 + t3).clamp(eps, 100.0)
-    hd = (1.0 - (-bd).exp() + eps).sqrt()
-    return 1 - hd
+    obb1, obb2 = prepare_obb(obb1), prepare_obb(obb2)
+    if threshold is None:
+        return _probiou(obb1[:, None], obb2[None], eps)[..., 0]
+    near = probiou_candidates(obb1, obb2, threshold, eps)
+    iou = torch.zeros(near.shape, dtype=obb1.dtype, device=obb1.device)
+    i, j = near.nonzero(as_tuple=True)
+    iou[i, j] = _probiou(obb1[i], obb2[j], eps)[:, 0]
+    return iou
 
 
 def smooth_BCE(eps=0.1):
@@ -425,7 +467,7 @@ class ConfusionMatrix:
         ax.set_xlabel("True")
         ax.set_ylabel("Predicted")
         ax.set_title(title)
-        plot_fname = Path(save_dir) / f'{title.lower().replace(" ", "_")}.png'
+        plot_fname = Path(save_dir) / f"{title.lower().replace(' ', '_')}.png"
         fig.savefig(plot_fname, dpi=250)
         plt.close(fig)
         if on_plot:
@@ -519,7 +561,8 @@ def compute_ap(recall, precision):
     method = "interp"  # methods: 'continuous', 'interp'
     if method == "interp":
         x = np.linspace(0, 1, 101)  # 101-point interp (COCO)
-        ap = np.trapz(np.interp(x, mrec, mpre), x)  # integrate
+        func = np.trapezoid if NUMPY_2_0 else np.trapz
+        ap = func(np.interp(x, mrec, mpre), x)  # integrate
     else:  # 'continuous'
         i = np.where(mrec[1:] != mrec[:-1])[0]  # points where x-axis (recall) changes
         ap = np.sum((mrec[i + 1] - mrec[i]) * mpre[i + 1])  # area under curve
@@ -527,12 +570,166 @@ def compute_ap(recall, precision):
     return ap, mpre, mrec
 
 
+def segment_interp(x, xp, fp, j, first, last, left=None):
+    """
+    Batched `np.interp` over independent segments of concatenated sample points, given the located samples.
+
+    Reproduces `np.interp(x, xp[first:last + 1], fp[first:last + 1], left=left)` for every query, including its
+    handling of repeated `xp` values, with the same arithmetic.
+
+    Args:
+        x (torch.Tensor): Query points, shape (Q,).
+        xp (torch.Tensor): Concatenated sample points, sorted within each segment, shape (P,).
+        fp (torch.Tensor): Sample values, shape (P,).
+        j (torch.Tensor): Index of the last sample of the query's segment that is <= x, or < first if none, shape (Q,).
+        first (torch.Tensor): Index of the first sample of the query's segment, shape (Q,).
+        last (torch.Tensor): Index of the last sample of the query's segment, shape (Q,).
+        left (float, optional): Value for queries below the first sample of their segment. Defaults to the first value.
+
+    Returns:
+        (torch.Tensor): Interpolated values, shape (Q,).
+    """
+    j0, j1 = j.clamp(min=0), (j + 1).clamp(max=len(xp) - 1)
+    slope = (fp[j1] - fp[j0]) / (xp[j1] - xp[j0])
+    y = torch.where(xp[j0] == x, fp[j0], slope * (x - xp[j0]) + fp[j0])
+    y = torch.where(j >= last, fp[last], y)
+    return torch.where(j < first, fp[first] if left is None else torch.full_like(y, left), y)
+
+
+def segment_cummax_reverse(v, seg):
+    """Reverse cumulative maximum of `v` (..., P) in [0, 1] along its last dim, restarted at each segment of `seg`."""
+    offset = 2.0 * (seg[-1] - seg)  # values of earlier segments can never reach into later ones
+    i = (v + offset).flip(-1).cummax(-1).indices.flip(-1)
+    return v.gather(-1, v.shape[-1] - 1 - i)  # original values, unaffected by the offset rounding
+
+
+def ap_curves_batched(tp, conf, pred_cls, unique_classes, nt, x, eps=1e-16, device=None):
+    """
+    Computes the AP and PR curves of `ap_per_class` for all classes and IoU thresholds at once on `device`.
+
+    Predictions are sorted once by class and confidence, TP/FP counts are segmented cumulative sums and every PR curve
+    interpolation is a single batched `segment_interp` call. Predictions with equal confidence are kept in their input
+    order. This is faster than the per-class loop on CUDA devices, but slower on CPU.
+
+    Args:
+        tp (np.ndarray): Binary array indicating whether the detection is correct (True) or not (False).
+        conf (np.ndarray): Array of confidence scores of the detections.
+        pred_cls (np.ndarray): Array of predicted classes of the detections.
+        unique_classes (np.ndarray): Sorted classes of the labels.
+        nt (np.ndarray): Number of labels of each class in `unique_classes`.
+        x (np.ndarray): Confidences and recalls to sample the curves at. Shape: (1000,).
+        eps (float, optional): A small value to avoid division by zero. Defaults to 1e-16.
+        device (torch.device, optional): Device to compute the curves on. Defaults to CPU.
+
+    Returns:
+        ap (np.ndarray): Average precision for each class at different IoU thresholds. Shape: (nc, 10).
+        p_curve (np.ndarray): Precision curves for each class. Shape: (nc, 1000).
+        r_curve (np.ndarray): Recall curves for each class. Shape: (nc, 1000).
+        prec_values (np.ndarray): Precision values at mAP@0.5 for each class with predictions. Shape: (k, 1000).
+    """
+    nc = unique_classes.shape[0]
+    ap, p_curve, r_curve = np.zeros((nc, tp.shape[1])), np.zeros((nc, 1000)), np.zeros((nc, 1000))
+    prec_values = np.zeros((0, 1000))
+    device = torch.device(device or "cpu")
+    dtype = torch.float32 if device.type == "mps" else torch.float64  # MPS has no float64
+
+    # Sort by objectness and rank confidences (equal confidences share a rank)
+    conf = torch.as_tensor(conf, device=device, dtype=dtype)
+    i = torch.argsort(-conf, stable=True)
+    new = torch.ones_like(i, dtype=torch.bool)
+    new[1:] = conf[i[1:]] != conf[i[:-1]]
+    rank = torch.empty_like(i)
+    rank[i] = new.cumsum(0) - 1
+    u = -conf[i[new]]  # unique negative confidences, ascending
+
+    # Keep predictions of labelled classes, sorted by class and then by decreasing confidence
+    uc = torch.as_tensor(unique_classes, device=device)
+    pred_cls = torch.as_tensor(pred_cls, device=device, dtype=uc.dtype)
+    ci = torch.searchsorted(uc, pred_cls).clamp(max=max(nc - 1, 0))  # class index of each prediction
+    i = i[uc[ci[i]] == pred_cls[i]] if nc else i[:0]
+    i = i[torch.argsort(ci[i], stable=True)]
+    tp, conf, rank, ci = torch.as_tensor(tp, device=device)[i].long(), conf[i], rank[i], ci[i]
+    n_p = torch.bincount(ci, minlength=nc)  # number of predictions per class
+    present, k = n_p > 0, int((n_p > 0).sum())  # classes with predictions, each a segment of the sorted arrays
+    if k:
+        N, nj, ar = len(tp), tp.shape[1], torch.arange(k, device=device)
+        n = n_p[present]
+        seg = (present.cumsum(0) - 1)[ci]  # segment id of each prediction
+        start = n.cumsum(0) - n  # first prediction of each segment
+
+        # Accumulate FPs and TPs
+        tpc = tp.cumsum(0)
+        tpc = tpc - torch.cat([tpc.new_zeros(1, nj), tpc])[start][seg]
+        fpc = ((torch.arange(N, device=device) - start[seg] + 1)[:, None] - tpc).to(dtype)
+        n_l = torch.as_tensor(nt, device=device, dtype=dtype)[present.cpu().numpy()]  # number of labels
+        recall = tpc / (n_l[seg, None] + eps)  # recall curve
+        precision = tpc / (tpc + fpc)  # precision curve
+
+        # Recall and precision at 1000 confidences (negative x, xp because xp decreases), located by confidence rank
+        xq = torch.as_tensor(-x, device=device, dtype=dtype)
+        key = seg * len(u) + rank
+        q = (ar[:, None] * len(u) + torch.searchsorted(u, xq, right=True) - 1).flatten()
+        j, sq = torch.searchsorted(key, q, right=True) - 1, ar.repeat_interleave(len(x))
+        first, last, xq = start[sq], start[sq] + n[sq] - 1, xq.repeat(k)
+        r_curve[present.cpu().numpy()] = segment_interp(xq, -conf, recall[:, 0], j, first, last, 0).view(k, -1).cpu()
+        p_curve[present.cpu().numpy()] = segment_interp(xq, -conf, precision[:, 0], j, first, last, 1).view(k, -1).cpu()
+
+        # Recall-precision curves with sentinels [0, recall, 1] and [1, precision, 0], and the precision envelope
+        seg_m, pos = ar.repeat_interleave(n + 2), torch.arange(N, device=device) + 2 * seg + 1
+        start_m = start + 2 * ar
+        mrec, mpre = recall.new_zeros(nj, N + 2 * k), recall.new_zeros(nj, N + 2 * k)
+        mrec[:, pos], mpre[:, pos] = recall.T, precision.T
+        mrec[:, start_m + n + 1], mpre[:, start_m] = 1.0, 1.0
+        mpre = segment_cummax_reverse(mpre, seg_m)
+
+        def interp_pr(xq, rows):
+            """Interpolate the envelopes of IoU `rows` at recalls `xq`, locating samples by integer TP counts."""
+            r = torch.arange(len(rows), device=device).repeat_interleave(k)  # position in rows of each segment
+            s = ar.repeat(len(rows))  # class segment
+            d = (n_l[s] + eps)[:, None]
+            t = (xq * d).floor().long()  # largest TP count whose recall is <= xq
+            t = t + ((t + 1) / d <= xq).long()
+            t = t - (t / d > xq).long()
+            g = (rows[r] * k + s)[:, None] * (N + 2)
+            key = (torch.arange(nj, device=device)[:, None] * k + seg) * (N + 2) + tpc.T.long()  # sorted
+            c = torch.searchsorted(key[rows].flatten(), (g + t).flatten(), right=True).view_as(t)
+            c = c - (r * N + start[s])[:, None]  # number of samples with recall <= xq in the segment
+            first = (r * (N + 2 * k) + start_m[s])[:, None]  # start sentinel
+            last = first + n[s, None] + 1  # end sentinel
+            j = torch.where(xq >= 1.0, last, first + c)  # last sample <= xq
+            first, last = first.expand_as(j).flatten(), last.expand_as(j).flatten()
+            y = segment_interp(xq.repeat(len(s)), mrec[rows].flatten(), mpre[rows].flatten(), j.flatten(), first, last)
+            return y.view(len(rows), k, -1)
+
+        # AP of all classes and IoU thresholds by 101-point interp (COCO) and integration
+        x101 = torch.linspace(0, 1, 101, device=device, dtype=dtype)
+        ap[present.cpu().numpy()] = torch.trapezoid(interp_pr(x101, torch.arange(nj, device=device)), x101).T.cpu()
+
+        # Precision at mAP@0.5
+        prec_values = interp_pr(torch.as_tensor(x, device=device, dtype=dtype), ar[:1])[0].cpu().numpy()
+
+    return ap, p_curve, r_curve, prec_values
+
+
 def ap_per_class(
-    tp, conf, pred_cls, target_cls, plot=False, on_plot=None, save_dir=Path(), names={}, eps=1e-16, prefix=""
+    tp,
+    conf,
+    pred_cls,
+    target_cls,
+    plot=False,
+    on_plot=None,
+    save_dir=Path(),
+    names={},
+    eps=1e-16,
+    prefix="",
+    device=None,
 ):
     """
     Computes the average precision per class for object detection evaluation.
 
+    On CUDA devices all classes are processed at once by `ap_curves_batched`, otherwise class by class with NumPy.
+    Predictions with equal confidence are kept in their input order.
+
     Args:
         tp (np.ndarray): Binary array indicating whether the detection is correct (True) or not (False).
         conf (np.ndarray): Array of confidence scores of the detections.
@@ -544,6 +741,7 @@ def ap_per_class(
         names (dict, optional): Dict of class names to plot PR curves. Defaults to an empty tuple.
         eps (float, optional): A small value to avoid division by zero. Defaults to 1e-16.
         prefix (str, optional): A prefix string for saving the plot files. Defaults to an empty string.
+        device (torch.device, optional): Validation device, the curves are computed on it if it is a CUDA device.
 
     Returns:
         tp (np.ndarray): True positive counts at threshold given by max F1 metric for each class.Shape: (nc,).
@@ -559,45 +757,46 @@ def ap_per_class(
         x (np.ndarray): X-axis values for the curves. Shape: (1000,).
         prec_values (np.ndarray): Precision values at mAP@0.5 for each class. Shape: (nc, 1000).
     """
-    # Sort by objectness
-    i = np.argsort(-conf)
-    tp, conf, pred_cls = tp[i], conf[i], pred_cls[i]
-
     # Find unique classes
     unique_classes, nt = np.unique(target_cls, return_counts=True)
     nc = unique_classes.shape[0]  # number of classes, number of detections
-
-    # Create Precision-Recall curve and compute AP for each class
-    x, prec_values = np.linspace(0, 1, 1000), []
-
-    # Average precision, precision and recall curves
-    ap, p_curve, r_curve = np.zeros((nc, tp.shape[1])), np.zeros((nc, 1000)), np.zeros((nc, 1000))
-    for ci, c in enumerate(unique_classes):
-        i = pred_cls == c
-        n_l = nt[ci]  # number of labels
-        n_p = i.sum()  # number of predictions
-        if n_p == 0 or n_l == 0:
-            continue
-
-        # Accumulate FPs and TPs
-        fpc = (1 - tp[i]).cumsum(0)
-        tpc = tp[i].cumsum(0)
-
-        # Recall
-        recall = tpc / (n_l + eps)  # recall curve
-        r_curve[ci] = np.interp(-x, -conf[i], recall[:, 0], left=0)  # negative x, xp because xp decreases
-
-        # Precision
-        precision = tpc / (tpc + fpc)  # precision curve
-        p_curve[ci] = np.interp(-x, -conf[i], precision[:, 0], left=1)  # p at pr_score
-
-        # AP from recall-precision curve
-        for j in range(tp.shape[1]):
-            ap[ci, j], mpre, mrec = compute_ap(recall[:, j], precision[:, j])
-            if j == 0:
-                prec_values.append(np.interp(x, mrec, mpre))  # precision at mAP@0.5
-
-    prec_values = np.array(prec_values)  # (nc, 1000)
+    x = np.linspace(0, 1, 1000)
+    if device is not None and torch.device(device).type == "cuda":
+        ap, p_curve, r_curve, prec_values = ap_curves_batched(tp, conf, pred_cls, unique_classes, nt, x, eps, device)
+    else:
+        # Sort by objectness
+        i = np.argsort(-conf, kind="stable")
+        tp, conf, pred_cls = tp[i], conf[i], pred_cls[i]
+
+        # Average precision, precision and recall curves
+        ap, p_curve, r_curve = np.zeros((nc, tp.shape[1])), np.zeros((nc, 1000)), np.zeros((nc, 1000))
+        prec_values = []
+        for ci, c in enumerate(unique_classes):
+            i = pred_cls == c
+            n_l = nt[ci]  # number of labels
+            n_p = i.sum()  # number of predictions
+            if n_p == 0 or n_l == 0:
+                continue
+
+            # Accumulate FPs and TPs
+            fpc = (1 - tp[i]).cumsum(0)
+            tpc = tp[i].cumsum(0)
+
+            # Recall
+            recall = tpc / (n_l + eps)  # recall curve
+            r_curve[ci] = np.interp(-x, -conf[i], recall[:, 0], left=0)  # negative x, xp because xp decreases
+
+            # Precision
+            precision = tpc / (tpc + fpc)  # precision curve
+            p_curve[ci] = np.interp(-x, -conf[i], precision[:, 0], left=1)  # p at pr_score
+
+            # AP from recall-precision curve
+            for j in range(tp.shape[1]):
+                ap[ci, j], mpre, mrec = compute_ap(recall[:, j], precision[:, j])
+                if j == 0:
+                    prec_values.append(np.interp(x, mrec, mpre))  # precision at mAP@0.5
+
+        prec_values = np.array(prec_values).reshape(-1, 1000)  # (nc, 1000)
 
     # Compute F1 (harmonic mean of precision and recall)
     f1_curve = 2 * p_curve * r_curve / (p_curve + r_curve + eps)
@@ -616,6 +815,34 @@ def ap_per_class(
     return tp, fp, p, r, f1, ap, unique_classes.astype(int), p_curve, r_curve, f1_curve, x, prec_values
 
 
+def parse_ap_metrics(ap_metrics=None):
+    """
+    Resolve named AP metrics into class and IoU threshold indices of the (nc, 10) AP array returned by ap_per_class.
+
+    Args:
+        ap_metrics (dict, optional): Extra metrics as {name: [classes, iou, weight]} where classes is a class index, a
+            list of indices or None for all classes, iou is a threshold, a list of thresholds or None for 0.5:0.95, and
+            the optional weight is the metric's contribution to fitness. Appended to `AP_METRICS`.
+
+    Returns:
+        (list): Tuples of (name, class indices or None, IoU threshold indices, fitness weight).
+
+    Examples:
+        >>> parse_ap_metrics({"FO": [0, 0.5, 0.1], "knives": [[0, 1], None]})[-1]
+        ('knives', array([0, 1]), array([0, 1, 2, 3, 4, 5, 6, 7, 8, 9]), 0.0)
+    """
+    metrics = list(AP_METRICS) + [(k, *v) for k, v in (ap_metrics or {}).items()]
+    parsed = []
+    for name, classes, iou, *weight in metrics:
+        classes = None if classes is None else np.atleast_1d(np.asarray(classes, dtype=int))
+        iou = IOU_THRESHOLDS if iou is None else np.atleast_1d(np.asarray(iou, dtype=float))
+        i = np.abs(iou[:, None] - IOU_THRESHOLDS).argmin(1)
+        if not np.allclose(IOU_THRESHOLDS[i], iou):
+            raise ValueError(f"AP metric '{name}' IoU thresholds {iou.tolist()} must be in {IOU_THRESHOLDS.round(2)}")
+        parsed.append((name, classes, i, float(weight[0]) if weight else 0.0))
+    return parsed
+
+
 class Metric(SimpleClass):
     """
     Class for computing evaluation metrics for YOLOv8 model.
@@ -627,6 +854,9 @@ class Metric(SimpleClass):
         all_ap (list): AP scores for all classes and all IoU thresholds. Shape: (nc, 10).
         ap_class_index (list): Index of class for each AP score. Shape: (nc,).
         nc (int): Number of classes.
+        ap_metrics (dict): Extra named AP metrics, see `parse_ap_metrics`.
+        results (np.ndarray): Structured scalar of mean precision, recall and named AP metrics, cached on update().
+        class_results (np.ndarray): Structured array of the same fields for each class in `ap_class_index`.
 
     Methods:
         ap50(): AP at IoU threshold of 0.5 for all classes. Returns: List of AP scores. Shape: (nc,) or [].
@@ -636,14 +866,15 @@ class Metric(SimpleClass):
         map50(): Mean AP at IoU threshold of 0.5 for all classes. Returns: Float.
         map75(): Mean AP at IoU threshold of 0.75 for all classes. Returns: Float.
         map(): Mean AP at IoU thresholds from 0.5 to 0.95 for all classes. Returns: Float.
-        mean_results(): Mean of results, returns mp, mr, map50, map.
-        class_result(i): Class-aware result, returns p[i], r[i], ap50[i], ap[i].
+        keys(suffix): Metric keys of the mean results, e.g. 'metrics/mAP50(B)'.
+        mean_results(): Mean of results, returns mp, mr and the named AP metrics.
+        class_result(i): Class-aware result, returns p[i], r[i] and the named AP metrics of class i.
         maps(): mAP of each class. Returns: Array of mAP scores, shape: (nc,).
         fitness(): Model fitness as a weighted combination of metrics. Returns: Float.
         update(results): Update metric attributes with new evaluation results.
     """
 
-    def __init__(self) -> None:
+    def __init__(self, ap_metrics=None) -> None:
         """Initializes a Metric instance for computing evaluation metrics for the YOLOv8 model."""
         self.p = []  # (nc, )
         self.r = []  # (nc, )
@@ -651,6 +882,22 @@ class Metric(SimpleClass):
         self.all_ap = []  # (nc, 10)
         self.ap_class_index = []  # (nc, )
         self.nc = 0
+        self.ap_metrics = ap_metrics
+
+    @property
+    def ap_metrics(self):
+        """Extra named AP metrics, e.g. {'FO': [0, 0.5, 0.1]} for AP50 of class 0 with fitness weight 0.1."""
+        return self._ap_metrics
+
+    @ap_metrics.setter
+    def ap_metrics(self, ap_metrics):
+        """Resolve named AP metrics and reset the cached results to their structured layout."""
+        self._ap_metrics = ap_metrics
+        self._specs = parse_ap_metrics(ap_metrics)
+        self._weights = np.array([0.0, 0.0] + [w for *_, w in self._specs])  # fitness weights incl. P and R
+        names = ["precision", "recall"] + [name for name, *_ in self._specs]
+        self.results = np.zeros((), dtype=[(name, "f8") for name in names])
+        self.class_results = np.zeros(0, dtype=self.results.dtype)
 
     @property
     def ap50(self):
@@ -665,14 +912,13 @@ class Metric(SimpleClass):
     @property
     def ap75(self):
         """
-        Returns the Average Precision (AP) at an IoU threshold of 0.5 for all classes.
+        Returns the Average Precision (AP) at an IoU threshold of 0.75 for all classes.
 
         Returns:
-            (np.ndarray, list): Array of shape (nc,) with AP50 values per class, or an empty list if not available.
+            (np.ndarray, list): Array of shape (nc,) with AP75 values per class, or an empty list if not available.
         """
         return self.all_ap[:, 5] if len(self.all_ap) else []
 
-
     @property
     def ap(self):
         """
@@ -733,28 +979,17 @@ class Metric(SimpleClass):
         """
         return self.all_ap.mean() if len(self.all_ap) else 0.0
 
-    def FO(self):
-        return self.all_ap[0,0] if len(self.all_ap) else 0.0
-
-    def ST(self):
-        return self.all_ap[1,0] if len(self.all_ap) else 0.0
+    def keys(self, suffix="B"):
+        """Returns the metric keys of `mean_results()`, e.g. 'metrics/mAP50(B)' for suffix 'B'."""
+        return [f"metrics/{name}({suffix})" for name in self.results.dtype.names]
 
-    def SC(self):
-        return self.all_ap[2,0] if len(self.all_ap) else 0.0
-
-    def UT(self):
-        return self.all_ap[3,0] if len(self.all_ap) else 0.0
-
-    def MU(self):
-        return self.all_ap[4,0] if len(self.all_ap) else 0.0
-        
     def mean_results(self):
-        """Mean of results, return mp, mr, map50, map."""
-        return [self.mp, self.mr, self.map50,self.map75,self.map,self.FO(),self.ST(),self.SC(),self.UT(),self.MU()]
+        """Mean of results, return mp, mr and the named AP metrics (mAP50, mAP75, mAP50-95, ...)."""
+        return list(self.results.item())
 
     def class_result(self, i):
-        """Class-aware result, return p[i], r[i], ap50[i], ap[i]."""
-        return self.p[i], self.r[i], self.ap50[i],self.ap75[i],self.ap[i]
+        """Class-aware result, return p[i], r[i] and the named AP metrics of class i (NaN for metrics excluding it)."""
+        return self.class_results[i].item()
 
     @property
     def maps(self):
@@ -766,8 +1001,7 @@ class Metric(SimpleClass):
 
     def fitness(self):
         """Model fitness as a weighted combination of metrics."""
-        w = [0.0,0.0,0.1,0.1,0.1,0.1,0.1,0.1,0.1,0.3]  # weights for [P, R, mAP@0.5, mAP@0.5:0.95]
-        return (np.array(self.mean_results()) * w).sum()
+        return (np.array(self.mean_results()) * self._weights).sum()
 
     def update(self, results):
         """
@@ -783,7 +1017,8 @@ class Metric(SimpleClass):
 
         Side Effects:
             Updates the class attributes `self.p`, `self.r`, `self.f1`, `self.all_ap`, and `self.ap_class_index` based
-            on the values provided in the `results` tuple.
+            on the values provided in the `results` tuple, and caches the named AP metrics in `self.results` and
+            `self.class_results`.
         """
         (
             self.p,
@@ -798,6 +1033,17 @@ class Metric(SimpleClass):
             self.prec_values,
         ) = results
 
+        # Named AP metrics, computed once per update from all_ap
+        all_ap, classes = np.asarray(self.all_ap).reshape(-1, 10), np.asarray(self.ap_class_index)
+        self.class_results = np.zeros(len(all_ap), dtype=self.results.dtype)
+        self.class_results["precision"], self.class_results["recall"] = self.p, self.r
+        self.results["precision"], self.results["recall"] = self.mp, self.mr
+        for name, c, iou, _ in self._specs:
+            ap = all_ap[:, iou].mean(1)  # (nc,) AP of each class averaged over the IoU thresholds
+            m = np.ones(len(ap), dtype=bool) if c is None else np.isin(classes, c)
+            self.class_results[name] = np.where(m, ap, np.nan)
+            self.results[name] = ap[m].mean() if m.any() else 0.0
+
     @property
     def curves(self):
         """Returns a list of curves for accessing specific metrics curves."""
@@ -824,13 +1070,16 @@ class DetMetrics(SimpleClass):
         plot (bool): A flag that indicates whether to plot precision-recall curves for each class. Defaults to False.
         on_plot (func): An optional callback to pass plots path and data when they are rendered. Defaults to None.
         names (dict of str): A dict of strings that represents the names of the classes. Defaults to an empty tuple.
+        ap_metrics (dict, optional): Extra named per-class AP metrics, see `parse_ap_metrics`. Defaults to None.
 
     Attributes:
         save_dir (Path): A path to the directory where the output plots will be saved.
         plot (bool): A flag that indicates whether to plot the precision-recall curves for each class.
         on_plot (func): An optional callback to pass plots path and data when they are rendered.
         names (dict of str): A dict of strings that represents the names of the classes.
+        ap_metrics (dict): Extra named per-class AP metrics reported in `keys` and `results_dict`.
         box (Metric): An instance of the Metric class for storing the results of the detection metrics.
+        device (torch.device): Validation device, PR curves are batched on it if it is CUDA. Defaults to None (CPU).
         speed (dict): A dictionary for storing the execution time of different parts of the detection process.
 
     Methods:
@@ -846,16 +1095,27 @@ class DetMetrics(SimpleClass):
         curves_results: TODO
     """
 
-    def __init__(self, save_dir=Path("."), plot=False, on_plot=None, names={}) -> None:
+    def __init__(self, save_dir=Path("."), plot=False, on_plot=None, names={}, ap_metrics=None) -> None:
         """Initialize a DetMetrics instance with a save directory, plot flag, callback function, and class names."""
         self.save_dir = save_dir
         self.plot = plot
         self.on_plot = on_plot
         self.names = names
-        self.box = Metric()
+        self.box = Metric(ap_metrics)
         self.speed = {"preprocess": 0.0, "inference": 0.0, "loss": 0.0, "postprocess": 0.0}
+        self.device = None  # device for ap_per_class, set by the validator
         self.task = "detect"
 
+    @property
+    def ap_metrics(self):
+        """Extra named per-class AP metrics, see `parse_ap_metrics`."""
+        return self.box.ap_metrics
+
+    @ap_metrics.setter
+    def ap_metrics(self, ap_metrics):
+        """Set the extra named per-class AP metrics."""
+        self.box.ap_metrics = ap_metrics
+
     def process(self, tp, conf, pred_cls, target_cls):
         """Process predicted results for object detection and update metrics."""
         results = ap_per_class(
@@ -867,6 +1127,7 @@ class DetMetrics(SimpleClass):
             save_dir=self.save_dir,
             names=self.names,
             on_plot=self.on_plot,
+            device=self.device,
         )[2:]
         self.box.nc = len(self.names)
         self.box.update(results)
@@ -874,7 +1135,7 @@ class DetMetrics(SimpleClass):
     @property
     def keys(self):
         """Returns a list of keys for accessing specific metrics."""
-        return ["metrics/precision(B)", "metrics/recall(B)", "metrics/mAP50(B)","metrics/mAP75(B)", "metrics/mAP50-95(B)","metrics/FO(B)","metrics/ST(B)","metrics/SC(B)","metrics/UT(B)","metrics/MU(B)"]
+        return self.box.keys("B")
 
     def mean_results(self):
         """Calculate mean of detected objects & return precision, recall, mAP50, and mAP50-95."""
@@ -933,6 +1194,7 @@ class SegmentMetrics(SimpleClass):
         box (Metric): An instance of the Metric class to calculate box detection metrics.
         seg (Metric): An instance of the Metric class to calculate mask segmentation metrics.
         speed (dict): Dictionary to store the time taken in different phases of inference.
+        device (torch.device): Validation device, PR curves are batched on it if it is CUDA. Defaults to None (CPU).
 
     Methods:
         process(tp_m, tp_b, conf, pred_cls, target_cls): Processes metrics over the given set of predictions.
@@ -944,17 +1206,28 @@ class SegmentMetrics(SimpleClass):
         results_dict: Returns the dictionary containing all the detection and segmentation metrics and fitness score.
     """
 
-    def __init__(self, save_dir=Path("."), plot=False, on_plot=None, names=()) -> None:
+    def __init__(self, save_dir=Path("."), plot=False, on_plot=None, names=(), ap_metrics=None) -> None:
         """Initialize a SegmentMetrics instance with a save directory, plot flag, callback function, and class names."""
         self.save_dir = save_dir
         self.plot = plot
         self.on_plot = on_plot
         self.names = names
-        self.box = Metric()
-        self.seg = Metric()
+        self.box = Metric(ap_metrics)
+        self.seg = Metric(ap_metrics)
         self.speed = {"preprocess": 0.0, "inference": 0.0, "loss": 0.0, "postprocess": 0.0}
+        self.device = None  # device for ap_per_class, set by the validator
         self.task = "segment"
 
+    @property
+    def ap_metrics(self):
+        """Extra named per-class AP metrics, see `parse_ap_metrics`."""
+        return self.box.ap_metrics
+
+    @ap_metrics.setter
+    def ap_metrics(self, ap_metrics):
+        """Set the extra named per-class AP metrics for boxes and masks."""
+        self.box.ap_metrics = self.seg.ap_metrics = ap_metrics
+
     def process(self, tp, tp_m, conf, pred_cls, target_cls):
         """
         Processes the detection and segmentation metrics over the given set of predictions.
@@ -976,6 +1249,7 @@ class SegmentMetrics(SimpleClass):
             save_dir=self.save_dir,
             names=self.names,
             prefix="Mask",
+            device=self.device,
         )[2:]
         self.seg.nc = len(self.names)
         self.seg.update(results_mask)
@@ -989,6 +1263,7 @@ class SegmentMetrics(SimpleClass):
             save_dir=self.save_dir,
             names=self.names,
             prefix="Box",
+            device=self.device,
         )[2:]
         self.box.nc = len(self.names)
         self.box.update(results_box)
@@ -996,28 +1271,7 @@ class SegmentMetrics(SimpleClass):
     @property
     def keys(self):
         """Returns a list of keys for accessing metrics."""
-        return [
-            "metrics/precision(B)",
-            "metrics/recall(B)",
-            "metrics/mAP50(B)",
-             "metrics/mAP75(B)", 
-            "metrics/mAP50-95(B)",
-           "metrics/FO(B)",
-            "metrics/ST(B)",
-            "metrics/SC(B)",
-            "metrics/UT(B)",
-            "metrics/MU(B)",
-            "metrics/precision(M)",
-            "metrics/recall(M)",
-            "metrics/mAP50(M)",
-            "metrics/mAP75(M)",
-            "metrics/mAP50-95(M)",
-            "metrics/FO(M)",
-            "metrics/ST(M)",
-            "metrics/SC(M)",
-            "metrics/UT(M)",
-            "metrics/MU(M)",
-        ]
+        return self.box.keys("B") + self.seg.keys("M")
 
     def mean_results(self):
         """Return the mean metrics for bounding box and segmentation results."""
@@ -1085,6 +1339,7 @@ class PoseMetrics(SegmentMetrics):
         box (Metric): An instance of the Metric class to calculate box detection metrics.
         pose (Metric): An instance of the Metric class to calculate mask segmentation metrics.
         speed (dict): Dictionary to store the time taken in different phases of inference.
+        device (torch.device): Validation device, PR curves are batched on it if it is CUDA. Defaults to None (CPU).
 
     Methods:
         process(tp_m, tp_b, conf, pred_cls, target_cls): Processes metrics over the given set of predictions.
@@ -1096,18 +1351,29 @@ class PoseMetrics(SegmentMetrics):
         results_dict: Returns the dictionary containing all the detection and segmentation metrics and fitness score.
     """
 
-    def __init__(self, save_dir=Path("."), plot=False, on_plot=None, names=()) -> None:
+    def __init__(self, save_dir=Path("."), plot=False, on_plot=None, names=(), ap_metrics=None) -> None:
         """Initialize the PoseMetrics class with directory path, class names, and plotting options."""
         super().__init__(save_dir, plot, names)
         self.save_dir = save_dir
         self.plot = plot
         self.on_plot = on_plot
         self.names = names
-        self.box = Metric()
-        self.pose = Metric()
+        self.box = Metric(ap_metrics)
+        self.pose = Metric(ap_metrics)
         self.speed = {"preprocess": 0.0, "inference": 0.0, "loss": 0.0, "postprocess": 0.0}
+        self.device = None  # device for ap_per_class, set by the validator
         self.task = "pose"
 
+    @property
+    def ap_metrics(self):
+        """Extra named per-class AP metrics, see `parse_ap_metrics`."""
+        return self.box.ap_metrics
+
+    @ap_metrics.setter
+    def ap_metrics(self, ap_metrics):
+        """Set the extra named per-class AP metrics for boxes and keypoints."""
+        self.box.ap_metrics = self.pose.ap_metrics = ap_metrics
+
     def process(self, tp, tp_p, conf, pred_cls, target_cls):
         """
         Processes the detection and pose metrics over the given set of predictions.
@@ -1129,6 +1395,7 @@ class PoseMetrics(SegmentMetrics):
             save_dir=self.save_dir,
             names=self.names,
             prefix="Pose",
+            device=self.device,
         )[2:]
         self.pose.nc = len(self.names)
         self.pose.update(results_pose)
@@ -1142,6 +1409,7 @@ class PoseMetrics(SegmentMetrics):
             save_dir=self.save_dir,
             names=self.names,
             prefix="Box",
+            device=self.device,
         )[2:]
         self.box.nc = len(self.names)
         self.box.update(results_box)
@@ -1149,28 +1417,7 @@ class PoseMetrics(SegmentMetrics):
     @property
     def keys(self):
         """Returns list of evaluation metric keys."""
-        return [
-            "metrics/precision(B)",
-            "metrics/recall(B)",
-            "metrics/mAP50(B)",
-            "metrics/mAP75(B)", 
-            "metrics/mAP50-95(B)",
-           "metrics/FO(B)",
-            "metrics/ST(B)",
-            "metrics/SC(B)",
-            "metrics/UT(B)",
-            "metrics/MU(B)",
-            "metrics/precision(P)",
-            "metrics/recall(P)",
-            "metrics/mAP50(P)",
-             "metrics/mAP75(P)",
-            "metrics/mAP50-95(P)",
-            "metrics/FO(P)",
-            "metrics/ST(P)",
-            "metrics/SC(P)",
-            "metrics/UT(P)",
-            "metrics/MU(P)",
-        ]
+        return self.box.keys("B") + self.pose.keys("P")
 
     def mean_results(self):
         """Return the mean results of box and pose."""
@@ -1269,14 +1516,25 @@ class ClassifyMetrics(SimpleClass):
 class OBBMetrics(SimpleClass):
     """Metrics for evaluating oriented bounding box (OBB) detection, see https://arxiv.org/pdf/2106.06072.pdf."""
 
-    def __init__(self, save_dir=Path("."), plot=False, on_plot=None, names=()) -> None:
+    def __init__(self, save_dir=Path("."), plot=False, on_plot=None, names=(), ap_metrics=None) -> None:
         """Initialize an OBBMetrics instance with directory, plotting, callback, and class names."""
         self.save_dir = save_dir
         self.plot = plot
         self.on_plot = on_plot
         self.names = names
-        self.box = Metric()
+        self.box = Metric(ap_metrics)
         self.speed = {"preprocess": 0.0, "inference": 0.0, "loss": 0.0, "postprocess": 0.0}
+        self.device = None  # device for ap_per_class, set by the validator
+
+    @property
+    def ap_metrics(self):
+        """Extra named per-class AP metrics, see `parse_ap_metrics`."""
+        return self.box.ap_metrics
+
+    @ap_metrics.setter
+    def ap_metrics(self, ap_metrics):
+        """Set the extra named per-class AP metrics."""
+        self.box.ap_metrics = ap_metrics
 
     def process(self, tp, conf, pred_cls, target_cls):
         """Process predicted results for object detection and update metrics."""
@@ -1289,6 +1547,7 @@ class OBBMetrics(SimpleClass):
             save_dir=self.save_dir,
             names=self.names,
             on_plot=self.on_plot,
+            device=self.device,
         )[2:]
         self.box.nc = len(self.names)
         self.box.update(results)
@@ -1296,7 +1555,7 @@ class OBBMetrics(SimpleClass):
     @property
     def keys(self):
         """Returns a list of keys for accessing specific metrics."""
-        return ["metrics/precision(B)", "metrics/recall(B)", "metrics/mAP50(B)", "metrics/mAP50-95(B)"]
+        return self.box.keys("B")
 
     def mean_results(self):
         """Calculate mean of detected objects & return precision, recall, mAP50, and mAP50-95."""
@@ -1334,4 +1593,4 @@ class OBBMetrics(SimpleClass):
     @property
     def curves_results(self):
         """Returns a list of curves for accessing specific metrics curves."""
-        return []
\ No newline at end of file
+        return []
@@ -10,8 +10,7 @@ import numpy as np
 import torch
 import torch.nn.functional as F
 
-from ultralytics.utils import LOGGER
-from ultralytics.utils.metrics import batch_probiou
+from ultralytics.utils.metrics import prepare_obb, probiou, probiou_candidates
 
 
 class Profile(contextlib.ContextDecorator):
@@ -138,25 +137,68 @@ def make_divisible(x, divisor):
     return math.ceil(x / divisor) * divisor
 
 
-def nms_rotated(boxes, scores, threshold=0.45):
+def nms_rotated(boxes, scores, threshold=0.45, idxs=None, greedy=False, tile=512):
     """
-    NMS for oriented bounding boxes using probiou and fast-nms.
+    NMS for oriented bounding boxes using probiou, evaluated in score-sorted tiles.
+
+    Boxes are sorted by group and score and compared tile by tile against the higher-scoring boxes of the same group,
+    so memory grows with `N * tile` instead of `N ** 2`. Suppressed boxes are dropped from the remaining comparisons
+    and probiou is only evaluated for pairs close enough to overlap. By default a box is suppressed by any
+    higher-scoring box (fast-NMS), with `greedy=True` only by kept boxes.
 
     Args:
         boxes (torch.Tensor): Rotated bounding boxes, shape (N, 5), format xywhr.
         scores (torch.Tensor): Confidence scores, shape (N,).
         threshold (float, optional): IoU threshold. Defaults to 0.45.
+        idxs (torch.Tensor, optional): Group of each box, e.g. image and class, shape (N,). Boxes are only suppressed
+            by boxes of the same group. Defaults to None, a single group.
+        greedy (bool, optional): Whether only kept boxes suppress lower-scoring boxes. Defaults to False.
+        tile (int, optional): Number of boxes compared at once. Defaults to 512.
 
     Returns:
-        (torch.Tensor): Indices of boxes to keep after NMS.
+        (torch.Tensor): Indices of boxes to keep after NMS, sorted by decreasing score.
     """
     if len(boxes) == 0:
-        return np.empty((0,), dtype=np.int8)
-    sorted_idx = torch.argsort(scores, descending=True)
-    boxes = boxes[sorted_idx]
-    ious = batch_probiou(boxes, boxes).triu_(diagonal=1)
-    pick = torch.nonzero(ious.max(dim=0)[0] < threshold).squeeze_(-1)
-    return sorted_idx[pick]
+        return torch.zeros(0, dtype=torch.long, device=boxes.device)
+    order = torch.argsort(scores, descending=True)
+    if idxs is not None:
+        order = order[torch.sort(idxs[order], stable=True)[1]]  # by group, then by score
+        groups = idxs[order]
+        first = torch.searchsorted(groups, groups).tolist()  # first box of the group of each box
+    boxes = prepare_obb(boxes[order])  # covariance computed once for all tiles
+    n = len(boxes)
+    keep = torch.ones(n, dtype=torch.bool, device=boxes.device)
+
+    def suppress(rows, cols):
+        """Return the (rows, cols) mask of boxes in `rows` suppressing lower-scoring boxes of their group in `cols`."""
+        mask = (rows[:, None] < cols[None]) & probiou_candidates(boxes[rows], boxes[cols], threshold)
+        if idxs is not None:
+            mask &= groups[rows, None] == groups[None, cols]
+        i, j = mask.nonzero(as_tuple=True)  # probiou of nearby pairs only
+        mask[i, j] = probiou(boxes[rows[i]], boxes[cols[j]])[:, 0] >= threshold
+        return mask
+
+    for start in range(0, n, tile):
+        cols = torch.arange(start, min(start + tile, n), device=boxes.device)
+        # Higher-scoring tiles of the same groups, all boxes for fast-NMS and kept boxes for greedy NMS
+        for r in range(first[start] if idxs is not None else 0, start, tile):
+            rows = torch.arange(r, min(r + tile, start), device=boxes.device)
+            rows, cols = rows[keep[rows]] if greedy else rows, cols[keep[cols]]
+            if len(rows) and len(cols):
+                keep[cols[suppress(rows, cols).any(0)]] = False
+        cols = cols[keep[cols]]
+        if not len(cols):
+            continue
+        if greedy:  # fixed point of 'kept unless a kept higher-scoring box overlaps', reached in few iterations
+            mask, k = suppress(cols, cols).float(), torch.ones(len(cols), device=boxes.device)
+            while not torch.equal(k_new := (k @ mask == 0).float(), k):
+                k = k_new
+            keep[cols] = k.bool()
+        else:
+            rows = torch.arange(start, min(start + tile, n), device=boxes.device)
+            keep[cols] = ~suppress(rows, cols).any(0)
+    i = order[keep]
+    return i[scores[i].argsort(descending=True, stable=True)] if idxs is not None else i
 
 
 def non_max_suppression(
@@ -195,7 +237,7 @@ def non_max_suppression(
             output by a dataloader, with each label being a tuple of (class_index, x1, y1, x2, y2).
         max_det (int): The maximum number of boxes to keep after NMS.
         nc (int, optional): The number of classes output by the model. Any indices after this will be considered masks.
-        max_time_img (float): The maximum time (seconds) for processing one image.
+        max_time_img (float): Unused, all images are processed at once without a time limit.
         max_nms (int): The maximum number of boxes into torchvision.ops.nms().
         max_wh (int): The maximum box width and height in pixels.
         in_place (bool): If True, the input prediction tensor will be modified in place.
@@ -230,7 +272,6 @@ def non_max_suppression(
 
     # Settings
     # min_wh = 2  # (pixels) minimum box width and height
-    time_limit = 2.0 + max_time_img * bs  # seconds to quit after
     multi_label &= nc > 1  # multiple labels per box (adds 0.5ms/img)
 
     prediction = prediction.transpose(-1, -2)  # shape(1,84,6300) to shape(1,6300,84)
@@ -240,75 +281,84 @@ def non_max_suppression(
         else:
             prediction = torch.cat((xywh2xyxy(prediction[..., :4]), prediction[..., 4:]), dim=-1)  # xywh to xyxy
 
-    t = time.time()
-    output = [torch.zeros((0, 6 + nm), device=prediction.device)] * bs
-    for xi, x in enumerate(prediction):  # image index, image inference
-        # Apply constraints
-        # x[((x[:, 2:4] < min_wh) | (x[:, 2:4] > max_wh)).any(1), 4] = 0  # width-height
-        x = x[xc[xi]]  # confidence
-
-        # Cat apriori labels if autolabelling
-        if labels and len(labels[xi]) and not rotated:
-            lb = labels[xi]
-            v = torch.zeros((len(lb), nc + nm + 4), device=x.device)
-            v[:, :4] = xywh2xyxy(lb[:, 1:5])  # box
-            v[range(len(lb)), lb[:, 0].long() + 4] = 1.0  # cls
-            x = torch.cat((x, v), 0)
-
-        # If none remain process next image
-        if not x.shape[0]:
-            continue
-
-        # Detections matrix nx6 (xyxy, conf, cls)
-        box, cls, mask = x.split((4, nc, nm), 1)
-
-        if multi_label:
-            i, j = torch.where(cls > conf_thres)
-            x = torch.cat((box[i], x[i, 4 + j, None], j[:, None].float(), mask[i]), 1)
-        else:  # best class only
-            conf, j = cls.max(1, keepdim=True)
-            x = torch.cat((box, conf, j.float(), mask), 1)[conf.view(-1) > conf_thres]
-
-        # Filter by class
-        if classes is not None:
-            x = x[(x[:, 5:6] == classes).any(1)]
-
-        # Check shape
-        n = x.shape[0]  # number of boxes
-        if not n:  # no boxes
-            continue
-        if n > max_nms:  # excess boxes
-            x = x[x[:, 4].argsort(descending=True)[:max_nms]]  # sort by confidence and remove excess boxes
-
-        # Batched NMS
+    # Candidates of all images at once, with their image index
+    image, anchor = torch.nonzero(xc, as_tuple=True)
+    x = prediction[image, anchor]  # confidence
+    # x[((x[:, 2:4] < min_wh) | (x[:, 2:4] > max_wh)).any(1), 4] = 0  # width-height
+
+    # Cat apriori labels if autolabelling
+    if labels and not rotated and any(len(lb) for lb in labels):
+        lb = torch.cat([lb for lb in labels[:bs]])
+        v = torch.zeros((len(lb), nc + nm + 4), device=x.device)
+        v[:, :4] = xywh2xyxy(lb[:, 1:5])  # box
+        v[range(len(lb)), lb[:, 0].long() + 4] = 1.0  # cls
+        li = torch.arange(len(labels[:bs]), device=x.device).repeat_interleave(
+            torch.tensor([len(lb) for lb in labels[:bs]], device=x.device)
+        )
+        order = torch.cat((image, li)).sort(stable=True)[1]  # each image's labels after its predictions
+        x, image = torch.cat((x, v))[order], torch.cat((image, li))[order]
+
+    # Detections matrix nx6 (xyxy, conf, cls)
+    box, cls, mask = x.split((4, nc, nm), 1)
+    if multi_label:
+        i, j = torch.where(cls > conf_thres)
+        x, image = torch.cat((box[i], x[i, 4 + j, None], j[:, None].float(), mask[i]), 1), image[i]
+    else:  # best class only
+        conf, j = cls.max(1, keepdim=True)
+        keep = conf.view(-1) > conf_thres
+        x, image = torch.cat((box, conf, j.float(), mask), 1)[keep], image[keep]
+
+    # Filter by class
+    if classes is not None:
+        keep = (x[:, 5:6] == classes).any(1)
+        x, image = x[keep], image[keep]
+
+    # Check shape
+    if not len(x):  # no boxes
+        return [torch.zeros((0, 6 + nm), device=prediction.device)] * bs
+    counts = torch.bincount(image, minlength=bs)  # number of boxes per image
+    if counts.max() > max_nms:  # excess boxes, keep the most confident max_nms of each image
+        i = x[:, 4].argsort(descending=True)
+        i = i[image[i].sort(stable=True)[1]]  # by image, then by confidence
+        x, image = x[i], image[i]
+        rank = torch.arange(len(x), device=x.device) - (counts.cumsum(0) - counts).repeat_interleave(counts)
+        x, image = x[rank < max_nms], image[rank < max_nms]
+
+    # Batched NMS of all images, boxes of other images and classes never suppress each other
+    if rotated:
+        groups = image if agnostic else image * (int(x[:, 5].max()) + 1) + x[:, 5].long()
+        i = nms_rotated(torch.cat((x[:, :4], x[:, -1:]), dim=-1), x[:, 4], iou_thres, idxs=groups)
+    else:
         c = x[:, 5:6] * (0 if agnostic else max_wh)  # classes
-        scores = x[:, 4]  # scores
-        if rotated:
-            boxes = torch.cat((x[:, :2] + c, x[:, 2:4], x[:, -1:]), dim=-1)  # xywhr
-            i = nms_rotated(boxes, scores, iou_thres)
-        else:
-            boxes = x[:, :4] + c  # boxes (offset by class)
-            i = torchvision.ops.nms(boxes, scores, iou_thres)  # NMS
-        i = i[:max_det]  # limit detections
-
-        # # Experimental
-        # merge = False  # use merge-NMS
-        # if merge and (1 < n < 3E3):  # Merge NMS (boxes merged using weighted mean)
-        #     # Update boxes as boxes(i,4) = weights(i,n) * boxes(n,4)
-        #     from .metrics import box_iou
-        #     iou = box_iou(boxes[i], boxes) > iou_thres  # IoU matrix
-        #     weights = iou * scores[None]  # box weights
-        #     x[i, :4] = torch.mm(weights, x[:, :4]).float() / weights.sum(1, keepdim=True)  # merged boxes
-        #     redundant = True  # require redundant detections
-        #     if redundant:
-        #         i = i[iou.sum(1) > 1]  # require redundancy
-
-        output[xi] = x[i]
-        if (time.time() - t) > time_limit:
-            LOGGER.warning(f"WARNING ⚠️ NMS time limit {time_limit:.3f}s exceeded")
-            break  # time limit exceeded
-
-    return output
+        if x.device.type == "cpu":  # CPU NMS time grows with boxes x kept boxes, so suppress image by image
+            boxes, scores = x[:, :4] + c, x[:, 4]  # candidates are contiguous per image
+            ends = torch.bincount(image, minlength=bs).cumsum(0).tolist()
+            i = torch.cat(
+                [torchvision.ops.nms(boxes[s:e], scores[s:e], iou_thres) + s for s, e in zip([0] + ends, ends)]
+            )
+        else:  # one kernel for the batch, boxes offset by class along x and by image along y
+            boxes = x[:, :4] + torch.cat((c, image[:, None].to(x.dtype) * max_wh), 1).repeat(1, 2)
+            i = torchvision.ops.nms(boxes, x[:, 4], iou_thres)
+
+    # Top max_det of each image, in decreasing confidence
+    i = i[image[i].sort(stable=True)[1]]
+    counts = torch.bincount(image[i], minlength=bs)
+    rank = torch.arange(len(i), device=i.device) - (counts.cumsum(0) - counts).repeat_interleave(counts)
+    i = i[rank < max_det]  # limit detections
+
+    # # Experimental
+    # merge = False  # use merge-NMS
+    # if merge and (1 < n < 3E3):  # Merge NMS (boxes merged using weighted mean)
+    #     # Update boxes as boxes(i,4) = weights(i,n) * boxes(n,4)
+    #     from .metrics import box_iou
+    #     iou = box_iou(boxes[i], boxes) > iou_thres  # IoU matrix
+    #     weights = iou * scores[None]  # box weights
+    #     x[i, :4] = torch.mm(weights, x[:, :4]).float() / weights.sum(1, keepdim=True)  # merged boxes
+    #     redundant = True  # require redundant detections
+    #     if redundant:
+    #         i = i[iou.sum(1) > 1]  # require redundancy
+
+    return list(x[i].split(counts.clamp(max=max_det).tolist()))
 
 
 def clip_boxes(boxes, shape):
@@ -616,6 +666,9 @@ def resample_segments(segments, n=1000):
     """
     Inputs a list of segments (n,2) and returns a list of segments (n,2) up-sampled to n points each.
 
+    All segments are interpolated at once over their concatenated closed outlines, the sample positions along each
+    outline only depend on its number of points.
+
     Args:
         segments (list): a list of (n,2) arrays, where n is the number of points in the segment.
         n (int): number of points to resample the segment to. Defaults to 1000
@@ -623,14 +676,21 @@ def resample_segments(segments, n=1000):
     Returns:
         segments (list): the resampled segments.
     """
-    for i, s in enumerate(segments):
-        s = np.concatenate((s, s[0:1, :]), axis=0)
-        x = np.linspace(0, len(s) - 1, n - len(s) if len(s) < n else n)
-        xp = np.arange(len(s))
-        x = np.insert(x, np.searchsorted(x, xp), xp) if len(s) < n else x
-        segments[i] = (
-            np.concatenate([np.interp(x, xp, s[:, i]) for i in range(2)], dtype=np.float32).reshape(2, -1).T
-        )  # segment xy
+    if not len(segments):
+        return segments
+    m = np.array([len(s) for s in segments]) + 1  # points per closed segment
+    xy = np.concatenate(segments, axis=0)
+    ends = np.cumsum(m - 1)
+    xy = np.insert(xy, ends, xy[ends - m + 1], axis=0)  # close every segment with its first point
+    x = np.empty((len(m), n))
+    for k in np.unique(m):
+        xk = np.linspace(0, k - 1, n - k if k < n else n)
+        x[m == k] = np.insert(xk, np.searchsorted(xk, np.arange(k)), np.arange(k)) if k < n else xk
+    x += (np.cumsum(m) - m)[:, None]  # positions in the concatenated segments
+    xp = np.arange(len(xy))
+    resampled = np.stack([np.interp(x, xp, xy[:, i]) for i in range(2)], axis=-1).astype(np.float32)  # segment xy
+    for i, s in enumerate(resampled):
+        segments[i] = s
     return segments
 
 
@@ -5,8 +5,7 @@ import torch.nn as nn
 
 from . import LOGGER
 from .checks import check_version
-from .metrics import bbox_iou, probiou
-from .ops import xywhr2xyxyxyxy
+from .metrics import bbox_iou, prepare_obb, probiou
 
 TORCH_1_10 = check_version(torch.__version__, "1.10.0")
 
@@ -298,6 +297,10 @@ class TaskAlignedAssigner(nn.Module):
 class RotatedTaskAlignedAssigner(TaskAlignedAssigner):
     """Assigns ground-truth objects to rotated bounding boxes using a task-aligned metric."""
 
+    def get_box_metrics(self, pd_scores, pd_bboxes, gt_labels, gt_bboxes, mask_gt):
+        """Compute alignment metric with the covariance of each box computed once rather than for every pair."""
+        return super().get_box_metrics(pd_scores, prepare_obb(pd_bboxes), gt_labels, prepare_obb(gt_bboxes), mask_gt)
+
     def iou_calculation(self, gt_bboxes, pd_bboxes):
         """IoU calculation for rotated bounding boxes."""
         return probiou(gt_bboxes, pd_bboxes).squeeze(-1).clamp_(0)
@@ -314,20 +317,11 @@ class RotatedTaskAlignedAssigner(TaskAlignedAssigner):
         Returns:
             (Tensor): shape(b, n_boxes, h*w)
         """
-        # (b, n_boxes, 5) --> (b, n_boxes, 4, 2)
-        corners = xywhr2xyxyxyxy(gt_bboxes)
-        # (b, n_boxes, 1, 2)
-        a, b, _, d = corners.split(1, dim=-2)
-        ab = b - a
-        ad = d - a
-
-        # (b, n_boxes, h*w, 2)
-        ap = xy_centers - a
-        norm_ab = (ab * ab).sum(dim=-1)
-        norm_ad = (ad * ad).sum(dim=-1)
-        ap_dot_ab = (ap * ab).sum(dim=-1)
-        ap_dot_ad = (ap * ad).sum(dim=-1)
-        return (ap_dot_ab >= 0) & (ap_dot_ab <= norm_ab) & (ap_dot_ad >= 0) & (ap_dot_ad <= norm_ad)  # is_in_box
+        # Anchor offsets projected on the box axes, (b, n_boxes, h*w) each
+        x, y, w, h, r = (gt_bboxes[..., i : i + 1] for i in range(5))
+        cos, sin = r.cos(), r.sin()
+        dx, dy = xy_centers[:, 0] - x, xy_centers[:, 1] - y
+        return ((dx * cos + dy * sin).abs_() <= w / 2) & ((dy * cos - dx * sin).abs_() <= h / 2)  # is_in_box
 
 
 def make_anchors(feats, strides, grid_cell_offset=0.5):
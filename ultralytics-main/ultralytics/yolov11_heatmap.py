@@ -1,11 +1,11 @@
 import warnings
 warnings.filterwarnings('ignore')
 warnings.simplefilter('ignore')
-import torch, yaml, cv2, os, shutil, sys, copy
+import torch, yaml, cv2, os, shutil, sys, copy, time
 import numpy as np
+from multiprocessing.pool import ThreadPool
 np.random.seed(0)
 import matplotlib.pyplot as plt
-from tqdm import trange
 from PIL import Image
 from ultralytics import YOLO
 from ultralytics.nn.tasks import attempt_load_weights
@@ -86,58 +86,54 @@ class ActivationsAndGradients:
         output.register_hook(_store_grad)
 
     def post_process(self, result):
+        # 按每张图的最大置信度降序排序, 返回每张图一组 [scores, boxes, ...]
+        def sort(x, indices):  # x: (B, C, A) -> (B, A, C) 按 indices 排序
+            x = x.transpose(1, 2)
+            return x.gather(1, indices[..., None].expand(-1, -1, x.shape[-1]))
+
         if self.model.end2end:
             logits_ = result[:, :, 4:]
             boxes_ = result[:, :, :4]
-            sorted, indices = torch.sort(logits_[:, :, 0], descending=True)
-            return logits_[0][indices[0]], boxes_[0][indices[0]]
+            indices = logits_[:, :, 0].argsort(dim=1, descending=True)
+            return list(zip(sort(logits_.transpose(1, 2), indices), sort(boxes_.transpose(1, 2), indices)))
         elif self.model.task == 'detect':
             logits_ = result[:, 4:]
             boxes_ = result[:, :4]
-            sorted, indices = torch.sort(logits_.max(1)[0], descending=True)
-            return torch.transpose(logits_[0], dim0=0, dim1=1)[indices[0]], torch.transpose(boxes_[0], dim0=0, dim1=1)[indices[0]]
+            indices = logits_.max(1)[0].argsort(dim=1, descending=True)
+            return list(zip(sort(logits_, indices), sort(boxes_, indices)))
         elif self.model.task == 'segment':
             logits_ = result[0][:, 4:4 + self.model.nc]
             boxes_ = result[0][:, :4]
-            mask_p, mask_nm = result[1][2].squeeze(), result[1][1].squeeze().transpose(1, 0)
-            c, h, w = mask_p.size()
-            mask = (mask_nm @ mask_p.view(c, -1))
-            sorted, indices = torch.sort(logits_.max(1)[0], descending=True)
-            return torch.transpose(logits_[0], dim0=0, dim1=1)[indices[0]], torch.transpose(boxes_[0], dim0=0, dim1=1)[indices[0]], mask[indices[0]]
+            mask_p, mask_nm = result[1][2], result[1][1]  # (B, nm, h, w), (B, nm, A)
+            # target 只用到每个 mask 的均值, mean(nm @ p) == nm @ mean(p), 无需生成 (A, h*w) 的完整 mask
+            mask = (mask_nm * mask_p.flatten(2).mean(2, keepdim=True)).sum(1, keepdim=True)  # (B, 1, A)
+            indices = logits_.max(1)[0].argsort(dim=1, descending=True)
+            return list(zip(sort(logits_, indices), sort(boxes_, indices), sort(mask, indices)))
         elif self.model.task == 'pose':
             logits_ = result[:, 4:4 + self.model.nc]
             boxes_ = result[:, :4]
             poses_ = result[:, 4 + self.model.nc:]
-            sorted, indices = torch.sort(logits_.max(1)[0], descending=True)
-            return torch.transpose(logits_[0], dim0=0, dim1=1)[indices[0]], torch.transpose(boxes_[0], dim0=0, dim1=1)[indices[0]], torch.transpose(poses_[0], dim0=0, dim1=1)[indices[0]]
+            indices = logits_.max(1)[0].argsort(dim=1, descending=True)
+            return list(zip(sort(logits_, indices), sort(boxes_, indices), sort(poses_, indices)))
         elif self.model.task == 'obb':
             logits_ = result[:, 4:4 + self.model.nc]
             boxes_ = result[:, :4]
             angles_ = result[:, 4 + self.model.nc:]
-            sorted, indices = torch.sort(logits_.max(1)[0], descending=True)
-            return torch.transpose(logits_[0], dim0=0, dim1=1)[indices[0]], torch.transpose(boxes_[0], dim0=0, dim1=1)[indices[0]], torch.transpose(angles_[0], dim0=0, dim1=1)[indices[0]]
+            indices = logits_.max(1)[0].argsort(dim=1, descending=True)
+            return list(zip(sort(logits_, indices), sort(boxes_, indices), sort(angles_, indices)))
         elif self.model.task == 'classify':
-            return result[0]
-  
+            return list(result[0])
+
     def __call__(self, x):
         self.gradients = []
         self.activations = []
         model_output = self.model(x)
-        if self.model.task == 'detect':
-            post_result, pre_post_boxes = self.post_process(model_output[0])
-            return [[post_result, pre_post_boxes]]
-        elif self.model.task == 'segment':
-            post_result, pre_post_boxes, pre_post_mask = self.post_process(model_output)
-            return [[post_result, pre_post_boxes, pre_post_mask]]
-        elif self.model.task == 'pose':
-            post_result, pre_post_boxes, pre_post_pose = self.post_process(model_output[0])
-            return [[post_result, pre_post_boxes, pre_post_pose]]
-        elif self.model.task == 'obb':
-            post_result, pre_post_boxes, pre_post_angle = self.post_process(model_output[0])
-            return [[post_result, pre_post_boxes, pre_post_angle]]
+        if self.model.task == 'segment':
+            return self.post_process(model_output)
         elif self.model.task == 'classify':
-            data = self.post_process(model_output)
-            return [data]
+            return self.post_process(model_output)
+        else:  # detect, pose, obb
+            return self.post_process(model_output[0])
 
     def release(self):
         for handle in self.handles:
@@ -150,79 +146,66 @@ class yolo_detect_target(torch.nn.Module):
         self.conf = conf
         self.ratio = ratio
         self.end2end = end2end
-    
+
+    def keep(self, post_result):
+        # 取前 ratio 比例的预测, 遇到第一个低于 conf 的预测即截止 (预测已按置信度降序排列)
+        n = int(post_result.size(0) * self.ratio)
+        scores = post_result[:n, 0] if self.end2end else post_result[:n].max(1)[0]
+        return n, scores, (scores >= self.conf).cumprod(0).bool()
+
     def forward(self, data):
         post_result, pre_post_boxes = data
-        result = []
-        for i in trange(int(post_result.size(0) * self.ratio)):
-            if (self.end2end and float(post_result[i, 0]) < self.conf) or (not self.end2end and float(post_result[i].max()) < self.conf):
-                break
-            if self.ouput_type == 'class' or self.ouput_type == 'all':
-                if self.end2end:
-                    result.append(post_result[i, 0])
-                else:
-                    result.append(post_result[i].max())
-            elif self.ouput_type == 'box' or self.ouput_type == 'all':
-                for j in range(4):
-                    result.append(pre_post_boxes[i, j])
-        return sum(result)
+        n, scores, keep = self.keep(post_result)
+        if self.ouput_type == 'class' or self.ouput_type == 'all':
+            return scores[keep].sum()
+        elif self.ouput_type == 'box':
+            return pre_post_boxes[:n][keep].sum()
+        return scores.sum() * 0
 
 class yolo_segment_target(yolo_detect_target):
     def __init__(self, ouput_type, conf, ratio, end2end):
-        super().__init__(ouput_type, conf, ratio, end2end)
-    
+        super().__init__(ouput_type, conf, ratio, False)
+
     def forward(self, data):
         post_result, pre_post_boxes, pre_post_mask = data
-        result = []
-        for i in trange(int(post_result.size(0) * self.ratio)):
-            if float(post_result[i].max()) < self.conf:
-                break
-            if self.ouput_type == 'class' or self.ouput_type == 'all':
-                result.append(post_result[i].max())
-            elif self.ouput_type == 'box' or self.ouput_type == 'all':
-                for j in range(4):
-                    result.append(pre_post_boxes[i, j])
-            elif self.ouput_type == 'segment' or self.ouput_type == 'all':
-                result.append(pre_post_mask[i].mean())
-        return sum(result)
+        n, scores, keep = self.keep(post_result)
+        if self.ouput_type == 'class' or self.ouput_type == 'all':
+            return scores[keep].sum()
+        elif self.ouput_type == 'box':
+            return pre_post_boxes[:n][keep].sum()
+        elif self.ouput_type == 'segment':
+            return pre_post_mask[:n][keep].sum()  # pre_post_mask 已是每个 mask 的均值
+        return scores.sum() * 0
 
 class yolo_pose_target(yolo_detect_target):
     def __init__(self, ouput_type, conf, ratio, end2end):
-        super().__init__(ouput_type, conf, ratio, end2end)
-    
+        super().__init__(ouput_type, conf, ratio, False)
+
     def forward(self, data):
         post_result, pre_post_boxes, pre_post_pose = data
-        result = []
-        for i in trange(int(post_result.size(0) * self.ratio)):
-            if float(post_result[i].max()) < self.conf:
-                break
-            if self.ouput_type == 'class' or self.ouput_type == 'all':
-                result.append(post_result[i].max())
-            elif self.ouput_type == 'box' or self.ouput_type == 'all':
-                for j in range(4):
-                    result.append(pre_post_boxes[i, j])
-            elif self.ouput_type == 'pose' or self.ouput_type == 'all':
-                result.append(pre_post_pose[i].mean())
-        return sum(result)
+        n, scores, keep = self.keep(post_result)
+        if self.ouput_type == 'class' or self.ouput_type == 'all':
+            return scores[keep].sum()
+        elif self.ouput_type == 'box':
+            return pre_post_boxes[:n][keep].sum()
+        elif self.ouput_type == 'pose':
+            return pre_post_pose[:n][keep].mean(1).sum()
+        return scores.sum() * 0
 
 class yolo_obb_target(yolo_detect_target):
     def __init__(self, ouput_type, conf, ratio, end2end):
-        super().__init__(ouput_type, conf, ratio, end2end)
-    
+        super().__init__(ouput_type, conf, ratio, False)
+
     def forward(self, data):
         post_result, pre_post_boxes, pre_post_angle = data
-        result = []
-        for i in trange(int(post_result.size(0) * self.ratio)):
-            if float(post_result[i].max()) < self.conf:
-                break
-            if self.ouput_type == 'class' or self.ouput_type == 'all':
-                result.append(post_result[i].max())
-            elif self.ouput_type == 'box' or self.ouput_type == 'all':
-                for j in range(4):
-                    result.append(pre_post_boxes[i, j])
-            elif self.ouput_type == 'obb' or self.ouput_type == 'all':
-                result.append(pre_post_angle[i])
-        return sum(result)
+        n, scores, keep = self.keep(post_result)
+        if self.ouput_type == 'class' or self.ouput_type == 'all':
+            return scores[keep].sum()
+        elif self.ouput_type == 'box':
+            return pre_post_boxes[:n][keep].sum()
+        elif self.ouput_type == 'obb':
+            return pre_post_angle[:n][keep].sum()
+        return scores.sum() * 0
 
 class yolo_classify_target(yolo_detect_target):
     def __init__(self, ouput_type, conf, ratio, end2end):
@@ -232,7 +215,7 @@ class yolo_classify_target(yolo_detect_target):
         return data.max()
 
 class yolo_heatmap:
-    def __init__(self, weight, device, method, layer, backward_type, conf_threshold, ratio, show_result, renormalize, task, img_size):
+    def __init__(self, weight, device, method, layer, backward_type, conf_threshold, ratio, show_result, renormalize, task, img_size, batch_size=1, workers=4):
         device = torch.device(device)
         model_yolo = YOLO(weight)
         model_names = model_yolo.names
@@ -280,54 +263,68 @@ class yolo_heatmap:
 
     def renormalize_cam_in_bounding_boxes(self, boxes, image_float_np, grayscale_cam):
         """Normalize the CAM to be in the range [0, 1] 
-        inside every bounding boxes, and zero outside of the bounding boxes. """
+        inside every bounding boxes, and zero outside of the bounding boxes.
+
+        Batched: boxes is a list of (n, 4) arrays, image_float_np (N, H, W, 3) and grayscale_cam (N, H, W).
+        Like scale_cam_image on a 2D array, normalization is applied row by row."""
+        def scale_rows(cam):
+            cam = cam - cam.min(-1, keepdims=True)
+            return cam / (1e-7 + cam.max(-1, keepdims=True))
+
         renormalized_cam = np.zeros(grayscale_cam.shape, dtype=np.float32)
-        for x1, y1, x2, y2 in boxes:
-            x1, y1 = max(x1, 0), max(y1, 0)
-            x2, y2 = min(grayscale_cam.shape[1] - 1, x2), min(grayscale_cam.shape[0] - 1, y2)
-            renormalized_cam[y1:y2, x1:x2] = scale_cam_image(grayscale_cam[y1:y2, x1:x2].copy())    
-        renormalized_cam = scale_cam_image(renormalized_cam)
-        eigencam_image_renormalized = show_cam_on_image(image_float_np, renormalized_cam, use_rgb=True)
-        return eigencam_image_renormalized
-    
-    def process(self, img_path, save_path):
-        # img process
+        for i, b in enumerate(boxes):
+            for x1, y1, x2, y2 in b:
+                x1, y1 = max(x1, 0), max(y1, 0)
+                x2, y2 = min(grayscale_cam.shape[2] - 1, x2), min(grayscale_cam.shape[1] - 1, y2)
+                if x2 > x1 and y2 > y1:
+                    renormalized_cam[i, y1:y2, x1:x2] = scale_rows(grayscale_cam[i, y1:y2, x1:x2])
+        renormalized_cam = scale_rows(renormalized_cam)
+        return [show_cam_on_image(img, cam, use_rgb=True) for img, cam in zip(image_float_np, renormalized_cam)]
+
+    def load(self, img_path):
+        # 读取并 letterbox, batch_size>1 时需固定尺寸才能组成 batch
         try:
             img = cv2.imdecode(np.fromfile(img_path, np.uint8), cv2.IMREAD_COLOR)
-        except:
+            img, _, pad = letterbox(img, new_shape=(self.img_size, self.img_size), auto=self.batch_size == 1) # 如果需要完全固定成宽高一样就把auto设置为False
+        except Exception:
             print(f"Warning... {img_path} read failure.")
-            return
-        img, _, (top, bottom, left, right) = letterbox(img, new_shape=(self.img_size, self.img_size), auto=True) # 如果需要完全固定成宽高一样就把auto设置为False
+            return None
         img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-        img = np.float32(img) / 255.0
-        tensor = torch.from_numpy(np.transpose(img, axes=[2, 0, 1])).unsqueeze(0).to(self.device)
+        return np.float32(img) / 255.0, pad
+
+    def process(self, items, save_paths):
+        # items: [(img, pad), ...] 同一 batch 的图像
+        imgs = np.stack([img for img, _ in items])
+        tensor = torch.from_numpy(np.ascontiguousarray(imgs.transpose(0, 3, 1, 2))).to(self.device)
         print(f'tensor size:{tensor.size()}')
-        
+
         try:
-            grayscale_cam = self.method(tensor, [self.target])
+            grayscale_cam = self.method(tensor, [self.target] * len(items))
         except AttributeError as e:
             print(f"Warning... self.method(tensor, [self.target]) failure.")
             return
-        
-        grayscale_cam = grayscale_cam[0, :]
-        cam_image = show_cam_on_image(img, grayscale_cam, use_rgb=True)
-        
-        pred = self.model_yolo.predict(tensor, conf=self.conf_threshold, iou=0.7)[0]
+
+        preds = self.model_yolo.predict(tensor, conf=self.conf_threshold, iou=0.7, verbose=False)
         if self.renormalize and self.task in ['detect', 'segment', 'pose']:
-            cam_image = self.renormalize_cam_in_bounding_boxes(pred.boxes.xyxy.cpu().detach().numpy().astype(np.int32), img, grayscale_cam)
-        if self.show_result:
-            cam_image = pred.plot(img=cam_image,
-                                  conf=True, # 显示置信度
-                                  font_size=None, # 字体大小，None为根据当前image尺寸计算
-                                  line_width=None, # 线条宽度，None为根据当前image尺寸计算
-                                  labels=False, # 显示标签
-                                  )
-        
-        # 去掉padding边界
-        cam_image = cam_image[top:cam_image.shape[0] - bottom, left:cam_image.shape[1] - right]
-        cam_image = Image.fromarray(cam_image)
-        cam_image.save(save_path)
-    
+            boxes = [pred.boxes.xyxy.cpu().detach().numpy().astype(np.int32) for pred in preds]
+            cam_images = self.renormalize_cam_in_bounding_boxes(boxes, imgs, grayscale_cam)
+        else:
+            cam_images = [show_cam_on_image(img, cam, use_rgb=True) for img, cam in zip(imgs, grayscale_cam)]
+
+        for cam_image, pred, (_, (top, bottom, left, right)), save_path in zip(cam_images, preds, items, save_paths):
+            if self.show_result:
+                cam_image = pred.plot(img=cam_image,
+                                      conf=True, # 显示置信度
+                                      font_size=None, # 字体大小，None为根据当前image尺寸计算
+                                      line_width=None, # 线条宽度，None为根据当前image尺寸计算
+                                      labels=False, # 显示标签
+                                      )
+
+            # 去掉padding边界
+            cam_image = cam_image[top:cam_image.shape[0] - bottom, left:cam_image.shape[1] - right]
+            cam_image = Image.fromarray(cam_image)
+            cam_image.save(save_path)
+
     def __call__(self, img_path, save_path):
         # remove dir if exist
         if os.path.exists(save_path):
@@ -336,11 +333,28 @@ class yolo_heatmap:
         os.makedirs(save_path, exist_ok=True)
 
         if os.path.isdir(img_path):
-            for img_path_ in os.listdir(img_path):
-                self.process(f'{img_path}/{img_path_}', f'{save_path}/{img_path_}')
+            names = os.listdir(img_path)
+            files = [f'{img_path}/{name}' for name in names]
+            save_paths = [f'{save_path}/{name}' for name in names]
         else:
-            self.process(img_path, f'{save_path}/result.png')
-        
+            files, save_paths = [img_path], [f'{save_path}/result.png']
+
+        # 解码下一个 batch 的同时在 GPU 上计算当前 batch 的 CAM
+        bs = max(self.batch_size, 1)
+        batches = [(files[i:i + bs], save_paths[i:i + bs]) for i in range(0, len(files), bs)]
+        t0, n = time.time(), 0
+        with ThreadPool(max(self.workers, 1)) as pool:  # 图像解码线程池, 处理完所有 batch 后关闭
+            pending = pool.map_async(self.load, batches[0][0]) if batches else None
+            for i, (_, paths) in enumerate(batches):
+                items = pending.get()
+                if i + 1 < len(batches):
+                    pending = pool.map_async(self.load, batches[i + 1][0])
+                ok = [j for j, item in enumerate(items) if item is not None]
+                if ok:
+                    self.process([items[j] for j in ok], [paths[j] for j in ok])
+                    n += len(ok)
+        print(f'{n} images processed in {time.time() - t0:.1f}s ({n / max(time.time() - t0, 1e-6):.2f} images/s)')
+
 def get_params():
     params = {
         'weight': '../ultralytics-main/runs/train/exp33/weights/best.pt', # 现在只需要指定权重即可,不需要指定cfg
@@ -354,6 +368,8 @@ def get_params():
         'renormalize': False, # 需要把热力图限制在框内请设置为True(仅对detect,segment,pose有效)
         'task':'obb', # 任务(detect,segment,pose,obb,classify)
         'img_size':640, # 图像尺寸
+        'batch_size': 8, # 每次前向/反向的图像数量, 1 为逐张处理
+        'workers': 4, # 图像解码线程数, 解码与 CAM 计算并行
     }
     return params
 
@@ -1,145 +1,303 @@
 # website.py 2025/3/14
-from flask import Flask, render_template_string, request, send_file
-import io
-import cv2
-from ultralytics import YOLO
-from PyQt5.QtWidgets import QApplication
-import sys
+# 常驻模型的检测服务: 模型只加载一次 (LRU 缓存), 并发请求合并成一个 batch 调用 predict
+#   python website.py --model best.pt --max-batch 8 --max-wait 5
+#   网页:  GET/POST /
+#   接口:  POST /api/models   上传 .pt (multipart: model_file) 或 JSON {"path": "best.pt"}, 返回模型 id
+#          POST /api/predict  multipart: image_file [+ model_file / model] 或 JSON {"image": base64, "model": id},
+#                             可选 annotate=1 返回标注后的 JPEG (base64)
+#          GET  /api/stats    模型缓存与 batch 统计
+# 压测见 load_test.py
+import argparse
+import base64
+import hashlib
 import os
+import pickle
+import queue
+import tempfile
+import threading
+import time
+from collections import Counter, OrderedDict
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeoutError
 
+import cv2
+import numpy as np
+from flask import Flask, jsonify, render_template_string, request
 
-app = Flask(__name__)
-app_qt = QApplication(sys.argv)
-
-
-# 模拟 Worker 类和 MainWindow 类的功能
-class Worker:
-    def __init__(self):
-        self.model = None
-        self.current_annotated_image = None
-        self.detection_type = None
-
-
-    def load_model(self, model_path):
-        if model_path:
-            self.model = YOLO(model_path)
-            self.model.to('cpu')
-            if self.model:
-                return True
-        return False
-
-
-    def detect_objects(self, results):
-        det_info = []
-        for frame in results:
-            class_names_dict = frame.names
-            if hasattr(frame, 'obb') and frame.obb is not None:
-                class_ids = frame.obb.cls
-                for class_id in class_ids:
-                    class_name = class_names_dict[int(class_id)]
-                    det_info.append(class_name)
-            else:
-                print("No OBB data found in the frame.")
-        return det_info
+from ultralytics import YOLO
 
+app = Flask(__name__)
+# 模型文件不存在 / 不是 YOLO 模型 / 内容损坏时 YOLO(path) 抛出的异常
+LOAD_ERRORS = (OSError, KeyError, AttributeError, TypeError, RuntimeError, pickle.UnpicklingError)
 
-    def detect_image(self, image_path):
-        if image_path:
-            image = cv2.imread(image_path)
-            if image is not None:
-                results = self.model.predict(image)
-                self.detection_type = "image"
-                if results:
-                    self.current_annotated_image = results[0].plot()
-                    return results
-        return None
+class BatcherStopped(RuntimeError):
+    """模型已被淘汰 (MicroBatcher 已停止), 请求没有被执行."""
 
 
-    def get_annotated_image_bytes(self):
-        if self.current_annotated_image is not None:
-            _, buffer = cv2.imencode('.jpg', self.current_annotated_image)
-            return io.BytesIO(buffer.tobytes())
-        return None
+class MicroBatcher:
+    """
+    把并发请求合并成一个 batch.
 
+    请求线程调用 submit(image) 拿到 Future; 后台线程从队列取出第一个请求后, 最多再等 max_wait 秒凑够 max_batch
+    张图片, 然后一次 model.predict(list) 推理, 把每张图的 Results 填回对应的 Future. stop() 之后 submit 抛出
+    BatcherStopped, 队列里还没开始推理的请求也以 BatcherStopped 结束, 不会有 Future 一直等不到结果.
+    """
 
+    def __init__(self, model, max_batch=8, max_wait=0.005, timeout=30):
+        self.model = model
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.timeout = timeout  # predict 等待结果的最长时间 (s)
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()  # 保证 stop 之后不会再有请求排到结束标记 None 后面
+        self.stopped = False
+        self.batches = Counter()  # batch 大小 -> 次数
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def submit(self, image):
+        future = Future()
+        with self.lock:
+            if self.stopped:
+                raise BatcherStopped('模型已被卸载')
+            self.queue.put((image, future))
+        return future
+
+    def predict(self, image):
+        """提交一张图片并等待结果, 超过 timeout 抛出 FutureTimeoutError 并取消还没开始推理的请求."""
+        future = self.submit(image)
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise
+
+    def stop(self):
+        with self.lock:
+            self.stopped = True
+            while True:
+                try:
+                    item = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is not None and item[1].set_running_or_notify_cancel():
+                    item[1].set_exception(BatcherStopped('模型已被卸载'))
+            self.queue.put(None)
+
+    def run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            items = [item]
+            deadline = time.perf_counter() + self.max_wait
+            while len(items) < self.max_batch:
+                try:
+                    item = self.queue.get(timeout=max(deadline - time.perf_counter(), 0))
+                except queue.Empty:
+                    break
+                if item is None:
+                    self.queue.put(None)  # 处理完当前 batch 再退出
+                    break
+                items.append(item)
+            items = [(image, future) for image, future in items if future.set_running_or_notify_cancel()]
+            if not items:  # 全部超时取消
+                continue
+            self.batches[len(items)] += 1
+            try:
+                results = self.model.predict([image for image, _ in items], verbose=False)
+                for (_, future), result in zip(items, results):
+                    future.set_result(result)
+            except Exception as e:  # 推理失败只影响这个 batch 的请求, 后台线程继续处理后续请求
+                for _, future in items:
+                    if not future.done():
+                        future.set_exception(e)
+
+
+class ModelRegistry:
+    """按 key (文件内容 sha1 或路径) 缓存已加载的模型, 超过 capacity 时淘汰最久未使用的模型 (默认模型常驻)."""
+
+    def __init__(self, capacity=2, max_batch=8, max_wait=0.005, device='cpu', timeout=30):
+        self.capacity = capacity
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.device = device
+        self.timeout = timeout
+        self.models = OrderedDict()  # key -> MicroBatcher
+        self.lock = threading.Lock()
+        self.default = None
+
+    def get(self, key):
+        with self.lock:
+            if key not in self.models:
+                return None
+            self.models.move_to_end(key)
+            return self.models[key]
+
+    def load(self, path, key=None):
+        key = key or os.path.abspath(path)
+        batcher = self.get(key)
+        if batcher is None:
+            model = YOLO(path)
+            model.to(self.device)
+            batcher = MicroBatcher(model, self.max_batch, self.max_wait, self.timeout)
+            with self.lock:
+                if key in self.models:  # 其他线程已经加载
+                    batcher.stop()
+                    batcher = self.models[key]
+                self.models[key] = batcher
+                self.models.move_to_end(key)
+                # 默认模型和刚加载的模型不淘汰
+                old = [k for k in self.models if k not in (self.default, key)]
+                for k in old[:max(len(self.models) - self.capacity, 0)]:
+                    self.models.pop(k).stop()
+        return key
+
+    def load_bytes(self, data):
+        key = hashlib.sha1(data).hexdigest()
+        if self.get(key) is None:
+            with tempfile.TemporaryDirectory() as d:
+                path = os.path.join(d, 'model.pt')
+                with open(path, 'wb') as f:
+                    f.write(data)
+                self.load(path, key)
+        return key
+
+    def stats(self):
+        with self.lock:
+            return {k: {'batches': dict(b.batches), 'queued': b.queue.qsize()} for k, b in self.models.items()}
+
+
+registry = ModelRegistry()
+
+
+def decode_image(data):
+    image = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR) if data else None  # 空数据 imdecode 会报错
+    if image is None:
+        raise ValueError('无法解码图片')
+    return image
+
+
+def result_to_json(result):
+    detections = []
+    if result.obb is not None:
+        for xywhr, points, conf, cls in zip(result.obb.xywhr.tolist(), result.obb.xyxyxyxy.tolist(),
+                                            result.obb.conf.tolist(), result.obb.cls.tolist()):
+            detections.append({'name': result.names[int(cls)], 'class': int(cls), 'confidence': round(conf, 4),
+                               'xywhr': [round(x, 2) for x in xywhr],
+                               'points': [[round(x, 2), round(y, 2)] for x, y in points]})
+    elif result.boxes is not None:
+        for xyxy, conf, cls in zip(result.boxes.xyxy.tolist(), result.boxes.conf.tolist(), result.boxes.cls.tolist()):
+            detections.append({'name': result.names[int(cls)], 'class': int(cls), 'confidence': round(conf, 4),
+                               'xyxy': [round(x, 2) for x in xyxy]})
+    return {'detections': detections, 'count': dict(Counter(d['name'] for d in detections)),
+            'speed': result.speed}
+
+
+def encode_jpeg(image):
+    _, buffer = cv2.imencode('.jpg', image)
+    return base64.b64encode(buffer.tobytes()).decode('utf-8')
+
+
+def resolve_model(model_file=None, model_key=None):
+    # 优先级: 上传的模型文件 > 指定的模型 id > 默认模型
+    if model_file:
+        return registry.get(registry.load_bytes(model_file.read()))
+    if model_key:
+        return registry.get(model_key)
+    return registry.get(registry.default) if registry.default else None
+
+
+@app.route('/api/models', methods=['POST'])
+def api_models():
+    try:
+        if 'model_file' in request.files:
+            key = registry.load_bytes(request.files['model_file'].read())
+        else:
+            key = registry.load((request.get_json(silent=True) or {})['path'])
+    except LOAD_ERRORS as e:
+        return jsonify({'error': f'模型加载失败: {e}'}), 400
+    return jsonify({'model': key})
+
+
+@app.route('/api/predict', methods=['POST'])
+def api_predict():
+    t0 = time.perf_counter()
+    try:
+        if request.files:
+            data = request.files['image_file'].read()
+            options = request.form
+            batcher = resolve_model(request.files.get('model_file'), options.get('model'))
+        else:
+            options = request.get_json(force=True)
+            data = base64.b64decode(options['image'])
+            batcher = resolve_model(model_key=options.get('model'))
+        image = decode_image(data)
+    except (ValueError, *LOAD_ERRORS) as e:  # 缺字段 / base64 或图片无法解码 / 上传的模型无法加载
+        return jsonify({'error': f'请求解析失败: {e}'}), 400
+    if batcher is None:
+        return jsonify({'error': '模型未加载, 请先上传模型或通过 --model 指定默认模型'}), 400
+
+    try:
+        result = batcher.predict(image)
+    except BatcherStopped:  # 取到 batcher 之后模型被其他请求淘汰
+        return jsonify({'error': '模型已被卸载, 请重新上传模型后重试'}), 503
+    except FutureTimeoutError:
+        return jsonify({'error': f'推理超时 ({batcher.timeout}s)'}), 504
+    response = result_to_json(result)
+    if str(options.get('annotate', '0')).lower() in ('1', 'true'):
+        response['annotated_image'] = encode_jpeg(result.plot())
+    response['latency'] = round((time.perf_counter() - t0) * 1000, 2)  # ms, 含排队时间
+    return jsonify(response)
+
+
+@app.route('/api/stats')
+def api_stats():
+    return jsonify({'default': registry.default, 'models': registry.stats()})
 
 
 @app.route('/', methods=['GET', 'POST'])
 def index():
     if request.method == 'POST':
-        # 获取用户上传的模型文件和图片文件
-        model_file = request.files['model_file']
-        image_file = request.files['image_file']
-
-
-        if model_file and image_file:
-            # 保存上传的文件到临时目录
-            model_path = 'temp_model.pt'
-            image_path = 'temp_image.png'
-            model_file.save(model_path)
-            image_file.save(image_path)
-
-
-            worker = Worker()
-            if worker.load_model(model_path):
-                results = worker.detect_image(image_path)
-                if results:
-                    det_info = worker.detect_objects(results)
-                    object_count = len(det_info)
-                    object_info = f"识别到的物体总个数：{object_count}\n"
-                    object_dict = {}
-                    for obj in det_info:
-                        if obj in object_dict:
-                            object_dict[obj] += 1
-                        else:
-                            object_dict[obj] = 1
-                    sorted_objects = sorted(object_dict.items(), key=lambda x: x[1], reverse=True)
-                    for obj_name, obj_count in sorted_objects:
-                        object_info += f"{obj_name}: {obj_count}\n"
-
-
-                    # 获取带标注的图片字节流
-                    annotated_image_bytes = worker.get_annotated_image_bytes()
-                    if annotated_image_bytes:
-                        import base64
-                        annotated_image_base64 = base64.b64encode(annotated_image_bytes.getvalue()).decode('utf-8')
-                    else:
-                        annotated_image_base64 = ""
-
-
-                    # 读取原始图片并转换为 Base64 字符串
-                    with open(image_path, 'rb') as f:
-                        original_image_bytes = f.read()
-                    original_image_base64 = base64.b64encode(original_image_bytes).decode('utf-8')
-
-
-                    html = f"""
-                    <!DOCTYPE html>
-                    <html lang="en">
-                    <head>
-                        <meta charset="UTF-8">
-                        <title>目标检测结果</title>
-                    </head>
-                    <body>
-                        <h1>目标检测结果</h1>
-                        <h2>检测信息</h2>
-                        <pre>{object_info}</pre>
-                        <h2>原始图片</h2>
-                        <img src="data:image/png;base64,{original_image_base64}" alt="Original Image">
-                        <h2>检测结果图片</h2>
-                        {f'<img src="data:image/jpeg;base64,{annotated_image_base64}" alt="Annotated Image">' if annotated_image_base64 else '未找到检测图片'}
-                    </body>
-                    </html>
-                    """
-                    # 删除临时文件
-                    os.remove(model_path)
-                    os.remove(image_path)
-                    return render_template_string(html)
-            # 删除临时文件
-            os.remove(model_path)
-            os.remove(image_path)
-            return "模型加载或图片检测失败"
-
+        # 获取用户上传的模型文件和图片文件, 模型按文件内容缓存, 同一模型不会重复加载
+        model_file = request.files.get('model_file')
+        image_file = request.files.get('image_file')
+        if image_file:
+            try:
+                data = image_file.read()
+                image = decode_image(data)
+                batcher = resolve_model(model_file)
+                result = batcher.predict(image) if batcher is not None else None
+            except (ValueError, BatcherStopped, FutureTimeoutError, *LOAD_ERRORS):
+                result = None
+            if result is not None:
+                counts = result_to_json(result)['count']
+                object_info = f"识别到的物体总个数：{sum(counts.values())}\n"
+                for obj_name, obj_count in sorted(counts.items(), key=lambda x: x[1], reverse=True):
+                    object_info += f"{obj_name}: {obj_count}\n"
+                annotated_image_base64 = encode_jpeg(result.plot())
+                original_image_base64 = base64.b64encode(data).decode('utf-8')
+
+                html = f"""
+                <!DOCTYPE html>
+                <html lang="en">
+                <head>
+                    <meta charset="UTF-8">
+                    <title>目标检测结果</title>
+                </head>
+                <body>
+                    <h1>目标检测结果</h1>
+                    <h2>检测信息</h2>
+                    <pre>{object_info}</pre>
+                    <h2>原始图片</h2>
+                    <img src="data:image/png;base64,{original_image_base64}" alt="Original Image">
+                    <h2>检测结果图片</h2>
+                    <img src="data:image/jpeg;base64,{annotated_image_base64}" alt="Annotated Image">
+                </body>
+                </html>
+                """
+                return render_template_string(html)
+        return "模型加载或图片检测失败"
 
     # 显示文件上传表单
     html = """
@@ -152,7 +310,7 @@ def index():
     <body>
         <h1>目标检测</h1>
         <form method="post" enctype="multipart/form-data">
-            <label for="model_file">选择模型文件:</label>
+            <label for="model_file">选择模型文件 (已通过 --model 加载时可不选):</label>
             <input type="file" id="model_file" name="model_file" accept=".pt"><br><br>
             <label for="image_file">选择图片文件:</label>
             <input type="file" id="image_file" name="image_file" accept=".jpg,.jpeg,.png"><br><br>
@@ -164,7 +322,19 @@ def index():
     return render_template_string(html)
 
 
-
-
 if __name__ == '__main__':
-    app.run(debug=True)
\ No newline at end of file
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--model', default='', help='启动时预加载的默认模型')
+    parser.add_argument('--device', default='cpu')
+    parser.add_argument('--max-batch', type=int, default=8, help='每个 batch 最多合并的请求数')
+    parser.add_argument('--max-wait', type=float, default=5, help='凑 batch 的最长等待时间 (ms)')
+    parser.add_argument('--max-models', type=int, default=2, help='缓存的模型个数')
+    parser.add_argument('--timeout', type=float, default=30, help='每个请求等待推理结果的最长时间 (s)')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5000)
+    opt = parser.parse_args()
+
+    registry = ModelRegistry(opt.max_models, opt.max_batch, opt.max_wait / 1000, opt.device, opt.timeout)
+    if opt.model:
+        registry.default = registry.load(opt.model)
+    app.run(host=opt.host, port=opt.port, threaded=True)